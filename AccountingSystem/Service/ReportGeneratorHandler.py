@@ -20,6 +20,7 @@ from DIRAC.Core.Utilities.Plotting.Plots import generateErrorMessagePlot
 from DIRAC.Core.Utilities.Plotting.FileCoding import extractRequestFromFileId
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.Utilities.ReplicaRouting import readOnly
 
 
 class ReportGeneratorHandler(RequestHandler):
@@ -99,6 +100,7 @@ class ReportGeneratorHandler(RequestHandler):
 
   types_generatePlot = [types.DictType]
 
+  @readOnly
   def export_generatePlot(self, reportRequest):
     """
     Plot a accounting
@@ -121,6 +123,7 @@ class ReportGeneratorHandler(RequestHandler):
 
   types_getReport = [types.DictType]
 
+  @readOnly
   def export_getReport(self, reportRequest):
     """
     Plot a accounting
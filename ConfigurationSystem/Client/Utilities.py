@@ -509,7 +509,7 @@ def getDBParameters(fullname):
   CS
 
   Returns a dictionary with the keys: 'host', 'port', 'user', 'password',
-  'db' and 'queueSize'
+  'db' and 'queueSize', 'MaxConnections', 'ConnectionWaitTimeout', 'ReplicaHosts' and 'MaxReplicaLag'
   """
 
   cs_path = getDatabaseSection(fullname)
@@ -566,6 +566,26 @@ def getDBParameters(fullname):
   dbName = result['Value']
   parameters['DBName'] = dbName
 
+  # Connections shared by the threads, at most MaxConnections of them, instead of one per thread
+  for option, default in (('MaxConnections', 0), ('ConnectionWaitTimeout', 60)):
+    value = default
+    result = gConfig.getOption(cs_path + '/' + option)
+    if not result['OK']:
+      # No individual value found, try at the common place
+      result = gConfig.getOption('/Systems/Databases/' + option)
+    if result['OK']:
+      value = int(result['Value'])
+    parameters[option] = value
+
+  # Read replicas, as host or host:port, used by the readOnly methods
+  replicaHosts = []
+  for replicaHost in gConfig.getValue(cs_path + '/ReplicaHosts', []):
+    replicaHost, _sep, replicaPort = replicaHost.partition(':')
+    replicaHosts.append((replicaHost, int(replicaPort) if replicaPort else dbPort))
+  parameters['ReplicaHosts'] = replicaHosts
+  parameters['MaxReplicaLag'] = gConfig.getValue(cs_path + '/MaxReplicaLag',
+                                                 gConfig.getValue('/Systems/Databases/MaxReplicaLag', 10))
+
   return S_OK(parameters)
 
 
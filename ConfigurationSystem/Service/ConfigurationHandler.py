@@ -31,6 +31,7 @@ class ConfigurationHandler(RequestHandler):
     return S_OK(gServiceInterface.getVersion())
 
   types_getCompressedData = []
+  cache_getCompressedData = 5
 
   @classmethod
   def export_getCompressedData(cls):
@@ -38,6 +39,7 @@ class ConfigurationHandler(RequestHandler):
     return S_OK(sData)
 
   types_getCompressedDataIfNewer = [basestring]
+  cache_getCompressedDataIfNewer = 5
 
   @classmethod
   def export_getCompressedDataIfNewer(cls, sClientVersion):
@@ -64,6 +66,7 @@ class ConfigurationHandler(RequestHandler):
     res = gServiceInterface.updateConfiguration(sData, credDict['username'])
     if not res['OK']:
       return res
+    self.srv_invalidateResponseCache()
 
     # Check the flag for updating the pilot 3 JSON file
     updatePilotCStoJSONFileFlag = Operations().getValue('Pilot/UpdatePilotCStoJSONFile', True)
@@ -134,6 +137,8 @@ class ConfigurationHandler(RequestHandler):
     credDict = self.getRemoteCredentials()
     if 'DN' not in credDict or 'username' not in credDict:
       return S_ERROR("You must be authenticated!")
-    return gServiceInterface.updateConfiguration(retVal['Value'],
-                                                 credDict['username'],
-                                                 updateVersionOption=True)
+    retVal = gServiceInterface.updateConfiguration(retVal['Value'],
+                                                   credDict['username'],
+                                                   updateVersionOption=True)
+    self.srv_invalidateResponseCache()
+    return retVal
@@ -36,7 +36,11 @@ class DB(MySQL):
                              passwd=self.dbPass,
                              dbName=self.dbName,
                              port=self.dbPort,
-                             debug=debug)
+                             debug=debug,
+                             maxConnections=dbParameters['MaxConnections'],
+                             waitTimeout=dbParameters['ConnectionWaitTimeout'],
+                             replicaHosts=dbParameters['ReplicaHosts'],
+                             maxReplicaLag=dbParameters['MaxReplicaLag'])
 
     if not self._connected:
       raise RuntimeError("Can not connect to DB '%s', exiting..." % self.dbName)
@@ -47,6 +51,10 @@ class DB(MySQL):
     self.log.info("Port:           " + str(self.dbPort))
     #self.log.info("Password:       "+self.dbPass)
     self.log.info("DBName:         " + self.dbName)
+    if dbParameters['MaxConnections']:
+      self.log.info("MaxConnections: " + str(dbParameters['MaxConnections']))
+    if dbParameters['ReplicaHosts']:
+      self.log.info("Replicas:       " + ", ".join("%s:%s" % replica for replica in dbParameters['ReplicaHosts']))
     self.log.info("==================================================")
 
 #############################################################################
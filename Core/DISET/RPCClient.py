@@ -3,7 +3,13 @@
 
 __RCSID__ = "$Id$"
 
+import threading
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.Core.Utilities.ReturnValues import S_ERROR
 from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
 
 class _MagicMethod( object ):
@@ -64,6 +70,23 @@ class RPCClient( object ):
         # Here we call the method __call__ of the MagicMethod
         func()
 
+      Methods of the service exported as streams (stream_<method>) are
+      iterated over with executeStream, which yields S_OK( chunk ) items::
+
+        for result in rpc.executeStream( 'getSEDump', ( seName, ) ):
+          if not result['OK']:
+            break
+          processChunk( result['Value'] )
+
+      A call can also be executed in the background with callAsync, which returns
+      a future. Its result is the S_OK/S_ERROR structure of the call::
+
+        future = rpc.callAsync( 'getJobParameter', jobID, 'Pilot_Reference' )
+        ...
+        result = future.result()
+
+      To execute many calls concurrently, use :class:`BatchRPC`.
+
   """
 
 
@@ -77,6 +100,7 @@ class RPCClient( object ):
         * kwargs: all the arguments InnerRPCClient and BaseClient accept as configuration
     """
     self.__innerRPCClient = InnerRPCClient( *args, **kwargs )
+    self.__clientArgs = ( args, kwargs )
 
 
   def __doRPC( self, sFunctionName, args ):
@@ -89,6 +113,19 @@ class RPCClient( object ):
     """
     return self.__innerRPCClient.executeRPC( sFunctionName, args )
 
+  def callAsync( self, sFunctionName, *args ):
+    """
+      Execute the RPC action in a thread of the process wide
+      executor (see getGlobalRPCExecutor)
+
+      :param sFunctionName: name of the remote function
+      :param args: arguments to pass to the function
+
+      :return: a future, whose result is the S_OK/S_ERROR of the call
+    """
+    return getGlobalRPCExecutor().submit( _executeRPC, _ClientFactory( *self.__clientArgs ),
+                                          sFunctionName, args )
+
 
 
   def __getattr__( self, attrName ):
@@ -103,6 +140,151 @@ class RPCClient( object ):
       return getattr( self.__innerRPCClient, attrName )
     return _MagicMethod( self.__doRPC, attrName )
 
+class _ClientFactory( object ):
+  """ Creates RPCClient objects, one per thread: the DISET clients must not
+      be shared between threads
+  """
+
+  def __init__( self, args, kwargs ):
+    self.__args = args
+    self.__kwargs = kwargs
+    self.__local = threading.local()
+
+  def __call__( self ):
+    rpcClient = getattr( self.__local, 'rpcClient', None )
+    if rpcClient is None:
+      rpcClient = RPCClient( *self.__args, **self.__kwargs )
+      self.__local.rpcClient = rpcClient
+    return rpcClient
+
+def _executeRPC( clientFactory, sFunctionName, args ):
+  """ Execute an RPC call in an executor thread. Exceptions are returned as S_ERROR
+      so that the result of the future is always a return structure
+  """
+  try:
+    return clientFactory().executeRPC( sFunctionName, args )
+  except Exception as e:
+    gLogger.exception( "Exception while executing RPC call %s" % sFunctionName, lException = e )
+    return S_ERROR( "Exception while executing RPC call %s: %s" % ( sFunctionName, e ) )
+
+gRPCExecutor = None
+gRPCExecutorLock = threading.Lock()
+def getGlobalRPCExecutor():
+  """
+  Executor of the RPCClient.callAsync calls.
+  Its number of threads is /DIRAC/RPCClient/MaxAsyncCalls (10 by default)
+  """
+  global gRPCExecutor
+  with gRPCExecutorLock:
+    if not gRPCExecutor:
+      gRPCExecutor = ThreadPoolExecutor( max( 1, gConfig.getValue( "/DIRAC/RPCClient/MaxAsyncCalls", 10 ) ) )
+  return gRPCExecutor
+
+class BatchRPC( object ):
+  """ Executes many independent RPC calls to the same service concurrently,
+      with a bounded number of calls in progress.
+
+      The calls return futures, whose results are the S_OK/S_ERROR structures of the calls::
+
+        with BatchRPC( 'WorkloadManagement/JobMonitoring', maxParallel = 20 ) as batch:
+          futures = dict( ( jobID, batch.getJobParameter( jobID, 'Pilot_Reference' ) ) for jobID in jobIDs )
+        # Leaving the with block waits for all the calls
+        for jobID, future in futures.iteritems():
+          result = future.result()
+
+      or, when the same function is called with different arguments::
+
+        results = batch.map( 'getJobParameter', [ ( jobID, 'Pilot_Reference' ) for jobID in jobIDs ] )
+
+      Each thread of the batch uses its own RPCClient, whose connection is kept
+      open between the calls thanks to the connection pool.
+  """
+
+  def __init__( self, *args, **kwargs ):
+    """
+      Constructor
+
+      :param maxParallel: maximum number of calls in progress. By default /DIRAC/RPCClient/MaxParallelCalls (10)
+
+      The other arguments are passed on to RPCClient
+    """
+    maxParallel = kwargs.pop( 'maxParallel', None )
+    if not maxParallel:
+      maxParallel = gConfig.getValue( "/DIRAC/RPCClient/MaxParallelCalls", 10 )
+    self.__clientFactory = _ClientFactory( args, kwargs )
+    self.__executor = ThreadPoolExecutor( max( 1, int( maxParallel ) ) )
+    self.__pending = set()
+    self.__pendingLock = threading.Lock()
+
+  def __discardFuture( self, future ):
+    with self.__pendingLock:
+      self.__pending.discard( future )
+
+  def call( self, sFunctionName, *args ):
+    """
+      Queue a RPC call
+
+      :param sFunctionName: name of the remote function
+      :param args: arguments to pass to the function
+
+      :return: a future, whose result is the S_OK/S_ERROR of the call
+    """
+    future = self.__executor.submit( _executeRPC, self.__clientFactory, sFunctionName, args )
+    with self.__pendingLock:
+      self.__pending.add( future )
+    future.add_done_callback( self.__discardFuture )
+    return future
+
+  def __call( self, sFunctionName, args ):
+    return self.call( sFunctionName, *args )
+
+  def map( self, sFunctionName, argsList ):
+    """
+      Call the same remote function with each tuple of arguments and wait for all the calls
+
+      :param sFunctionName: name of the remote function
+      :param argsList: iterable of argument tuples
+
+      :return: list of the S_OK/S_ERROR of the calls, in the same order as argsList
+    """
+    futures = [ self.call( sFunctionName, *args ) for args in argsList ]
+    return [ future.result() for future in futures ]
+
+  def waitAll( self, timeout = None ):
+    """
+      Wait for the calls queued so far
+
+      :param timeout: maximum number of seconds to wait, forever by default
+
+      :return: True if all the calls are done
+    """
+    with self.__pendingLock:
+      pending = list( self.__pending )
+    return not wait( pending, timeout )[ 1 ]
+
+  def close( self, waitForCalls = True ):
+    """
+      Release the threads of the batch. No call can be queued afterwards
+
+      :param waitForCalls: wait for the calls in progress
+    """
+    self.__executor.shutdown( wait = waitForCalls )
+
+  def __enter__( self ):
+    return self
+
+  def __exit__( self, *excInfo ):
+    self.close()
+    return False
+
+  def __getattr__( self, attrName ):
+    """ Any other attribute is a remote function: calling it queues the call
+        and returns a future
+    """
+    if attrName.startswith( '__' ):
+      raise AttributeError( attrName )
+    return _MagicMethod( self.__call, attrName )
+
 def executeRPCStub( rpcStub ):
   """
   Playback a stub
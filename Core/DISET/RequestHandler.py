@@ -5,16 +5,19 @@ __RCSID__ = "$Id$"
 
 import os
 import time
+import tempfile
 import psutil
 
 import DIRAC
 
 from DIRAC.Core.DISET.private.FileHelper import FileHelper
+from DIRAC.Core.Utilities import DEncode
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR, isReturnStructure
 from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.SamplingProfiler import gSamplingProfiler
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Security.Properties import CS_ADMINISTRATOR
+from DIRAC.Core.Security.Properties import CS_ADMINISTRATOR, SERVICE_ADMINISTRATOR
 
 
 def getServiceOption(serviceInfo, optionName, defaultValue):
@@ -39,6 +42,10 @@ class RequestHandler(object):
     def __str__(self):
       return "ConnectionError: %s" % self.__msg
 
+  # Set by _rh__initializeClass when the service has them
+  __responseCache = None
+  __latencyStats = None
+
   def __init__(self, handlerInitDict, trid):
     """
     Constructor
@@ -62,7 +69,8 @@ class RequestHandler(object):
     pass
 
   @classmethod
-  def _rh__initializeClass(cls, serviceInfoDict, lockManager, msgBroker, monitor):
+  def _rh__initializeClass(cls, serviceInfoDict, lockManager, msgBroker, monitor, responseCache=None,
+                           latencyStats=None):
     """
     Class initialization (not to be called by hand or overwritten!!)
 
@@ -72,6 +80,10 @@ class RequestHandler(object):
     :param msgBroker: Message delivery
     :type lockManager: object
     :param lockManager: Lock manager to use
+    :type responseCache: object
+    :param responseCache: ResponseCache for the methods declaring a cache_<method> time to live
+    :type latencyStats: object
+    :param latencyStats: LatencyStats of the service, exported by getLatencyStats
     """
     cls.__srvInfoDict = serviceInfoDict
     cls.__svcName = cls.__srvInfoDict['serviceName']
@@ -79,6 +91,8 @@ class RequestHandler(object):
     cls.__msgBroker = msgBroker
     cls.__trPool = msgBroker.getTransportPool()
     cls.__monitor = monitor
+    cls.__responseCache = responseCache
+    cls.__latencyStats = latencyStats
     cls.log = gLogger
 
   def getRemoteAddress(self):
@@ -119,9 +133,15 @@ class RequestHandler(object):
     startTime = time.time()
     actionType = actionTuple[0]
     self.serviceInfoDict['actionTuple'] = actionTuple
+    # Duration of the phases, recorded by the service
+    self.__phaseTimes = self.__trPool.getAssociatedData(self.__trid, 'phaseTimes')
+    if not isinstance(self.__phaseTimes, dict):
+      self.__phaseTimes = {}
     try:
       if actionType == "RPC":
         retVal = self.__doRPC(actionTuple[1])
+      elif actionType == "Stream":
+        retVal = self.__doStream(actionTuple[1])
       elif actionType == "FileTransfer":
         retVal = self.__doFileTransfer(actionTuple[1])
       elif actionType == "Connection":
@@ -136,9 +156,11 @@ class RequestHandler(object):
       gLogger.error(message)
       retVal = S_ERROR(message)
     elapsedTime = time.time() - startTime
+    self.__phaseTimes['execution'] = elapsedTime - self.__phaseTimes.get('arguments', 0)
     self.__logRemoteQueryResponse(retVal, elapsedTime)
     result = self.__trPool.send(self.__trid, retVal)  # this will delete the value from the S_OK(value)
     del retVal
+    self.__phaseTimes['response'] = time.time() - startTime - elapsedTime
     return S_OK([result, elapsedTime])
 
 #####
@@ -231,11 +253,13 @@ class RequestHandler(object):
     :param method: Method to execute
     :return: S_OK/S_ERROR
     """
+    startTime = time.time()
     retVal = self.__trPool.receive(self.__trid)
     if not retVal['OK']:
       raise RequestHandler.ConnectionError("Error while receiving arguments %s %s" %
                                            (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
     args = retVal['Value']
+    self.__phaseTimes['arguments'] = time.time() - startTime
     self.__logRemoteQuery("RPC/%s" % method, args)
     return self.__RPCCallFunction(method, args)
 
@@ -259,6 +283,24 @@ class RequestHandler(object):
     dRetVal = self.__checkExpectedArgumentTypes(method, args)
     if not dRetVal['OK']:
       return dRetVal
+    # Identical requests to cacheable methods share the same result
+    cacheTTL = getattr(self, "cache_%s" % method, 0)
+    if cacheTTL and self.__responseCache:
+      cacheKey = (method, DEncode.encode(args), self.getRemoteCredentials().get('group'))
+      return self.__responseCache.execute(cacheKey, cacheTTL, self.__executeRPCFunction, method, oMethod, args)
+    return self.__executeRPCFunction(method, oMethod, args)
+
+  def __executeRPCFunction(self, method, oMethod, args):
+    """
+      Call the RPC function
+
+      :type method: string
+      :param method: name of the method
+      :param oMethod: the export_ function
+      :param args: arguments sent by the remote client
+
+      :return: S_OK/S_ERROR
+    """
     # Lock the method with Semaphore to avoid too many calls at the same time
     self.__lockManager.lock("RPC/%s" % method)
     # 18.02.19 WARNING CHRIS
@@ -290,6 +332,66 @@ class RequestHandler(object):
       gLogger.exception("Uncaught exception when serving RPC", "Function %s" % method, lException=e)
       return S_ERROR("Server error while serving %s: %s" % (method, str(e)))
 
+#####
+#
+# Streaming RPC Methods
+#
+#####
+
+  def __doStream(self, method):
+    """
+    Execute a streaming RPC action.
+
+    The stream_<method> function returns S_OK with an iterable. Each item of it
+    is sent to the client as S_OK(chunk) as soon as it is produced, so only one chunk
+    is in memory at a time. Sending blocks while the client does not read,
+    which throttles the production of the chunks.
+    The returned value, sent after the last chunk, is flagged with EndOfStream.
+
+    :type method: string
+    :param method: Method to execute
+    :return: S_OK/S_ERROR
+    """
+    retVal = self.__trPool.receive(self.__trid)
+    if not retVal['OK']:
+      raise RequestHandler.ConnectionError("Error while receiving arguments %s %s" %
+                                           (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+    args = retVal['Value']
+    self.__logRemoteQuery("Stream/%s" % method, args)
+
+    realMethod = "stream_%s" % method
+    gLogger.debug("Stream RPC to %s" % realMethod)
+    try:
+      oMethod = getattr(self, realMethod)
+    except BaseException:
+      return S_ERROR("Unknown stream method %s" % method)
+    dRetVal = self.__checkExpectedArgumentTypes(realMethod, args)
+    if not dRetVal['OK']:
+      return dRetVal
+    self.__lockManager.lock("Stream/%s" % method)
+    try:
+      try:
+        result = oMethod(*args)
+        if not isReturnStructure(result) or not result['OK']:
+          return result
+        nbChunks = 0
+        for chunk in result['Value']:
+          retVal = self.__trPool.send(self.__trid, S_OK(chunk))
+          if not retVal['OK']:
+            raise RequestHandler.ConnectionError("Error while sending chunk %s %s" %
+                                                 (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+          nbChunks += 1
+        retVal = S_OK(nbChunks)
+        retVal['EndOfStream'] = True
+        return retVal
+      finally:
+        self.__lockManager.unlock("Stream/%s" % method)
+    except RequestHandler.ConnectionError:
+      raise
+    except Exception as e:
+      gLogger.exception("Uncaught exception when serving Stream", "Function %s" % method, lException=e)
+      return S_ERROR("Server error while serving %s: %s" % (method, str(e)))
+
   def __checkExpectedArgumentTypes(self, method, args):
     """
     Check that the arguments received match the ones expected
@@ -519,6 +621,40 @@ class RequestHandler(object):
     """
     return gConfig.forceRefresh(fromMaster=fromMaster)
 
+  types_getLatencyStats = []
+  auth_getLatencyStats = [SERVICE_ADMINISTRATOR]
+
+  @classmethod
+  def export_getLatencyStats(cls):
+    """
+    Get the latencies of the actions served since the service started, for each phase
+    of the processing: proposal, authorization, instantiation, arguments, execution, response and total
+
+    :return: S_OK, Value is a dict action -> phase -> dict with count, mean, max, p50, p95 and p99 in seconds
+    """
+    if not cls.__latencyStats:
+      return S_ERROR("No latency statistics for this service")
+    return S_OK(cls.__latencyStats.getSummary())
+
+  types_startProfiling = [[int, long]]
+  auth_startProfiling = [SERVICE_ADMINISTRATOR]
+
+  @classmethod
+  def export_startProfiling(cls, seconds):
+    """
+    Sample the stacks of all the threads of the service process during some seconds.
+    The result is written in the collapsed stacks format of flamegraph.pl
+
+    :param int seconds: duration of the profiling, at most 600 seconds
+
+    :return: S_OK, Value is the path of the file written on the service host at the end of the profiling
+    """
+    if not 0 < seconds <= 600:
+      return S_ERROR("The profiling duration must be between 1 and 600 seconds")
+    outputFile = os.path.join(tempfile.gettempdir(), "%s-%s.collapsed" % (cls.srv_getServiceName().replace("/", "_"),
+                                                                         time.strftime("%Y%m%dT%H%M%S")))
+    return gSamplingProfiler.start(seconds, outputFile)
+
 ####
 #
 #  Utilities methods
@@ -579,6 +715,21 @@ class RequestHandler(object):
   def srv_getClientVersion(self):
     return self.serviceInfoDict.get("clientVersion")
 
+  @classmethod
+  def srv_invalidateResponseCache(cls, method=None):
+    """
+    Forget the cached results of a method declaring a cache_<method> time to live
+
+    :param str method: name of the method (without export_). By default all the methods
+
+    :return: number of results forgotten
+    """
+    if not cls.__responseCache:
+      return 0
+    if method is None:
+      return cls.__responseCache.invalidate()
+    return cls.__responseCache.invalidate(lambda cacheKey: cacheKey[0] == method)
+
   @classmethod
   def srv_getURL(cls):
     return cls.__srvInfoDict['URL']
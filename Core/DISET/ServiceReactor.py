@@ -13,11 +13,17 @@
   DIRAC Systems are called XXXSystem where XXX is the [DIRAC System Name], and
   must inherit from the base class RequestHandler
 
+  The reactor loop waits on a SocketPoller (epoll when available) for the listening
+  sockets and for the idle connections the services keep open between two requests.
+  The threads of the services only execute requests, they never wait for idle sockets.
+
 """
 
+import heapq
 import select
 import time
 import socket
+import threading
 
 try:
   import multiprocessing
@@ -27,6 +33,7 @@ except:
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.Core.DISET.private.Service import Service
 from DIRAC.Core.DISET.private.GatewayService import GatewayService
+from DIRAC.Core.DISET.private.SocketPoller import SocketPoller
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC.Core.Utilities import Time
 from DIRAC.Core.Base.private.ModuleLoader import ModuleLoader
@@ -53,6 +60,12 @@ class ServiceReactor(object):
     self.__maxFD = 0
     self.__listeningConnections = {}
     self.__stats = ReactorStats()
+    self.__poller = SocketPoller()
+    # Connections watched for the services: transport -> ( expiration time, callback )
+    self.__watchedConnections = {}
+    # Heap of ( expiration time, transport ), may contain connections not watched anymore
+    self.__watchExpirations = []
+    self.__watchLock = threading.Lock()
 
   def initialize(self, servicesList):
     try:
@@ -69,6 +82,7 @@ class ServiceReactor(object):
 
     for serviceName in self.__serviceModules:
       self.__services[serviceName] = Service(self.__serviceModules[serviceName])
+      self.__services[serviceName].setConnectionWatcher(self.watchConnection)
 
     # Loop again to include the GW in case there is one (included in the __init__)
     for serviceName in self.__services:
@@ -117,6 +131,7 @@ class ServiceReactor(object):
         return S_ERROR("Cannot start listening connection for service %s: %s" % (serviceName, retVal['Message']))
       self.__listeningConnections[serviceName]['transport'] = transport
       self.__listeningConnections[serviceName]['socket'] = transport.getSocket()
+      self.__poller.register(transport.getSocket(), ('listen', serviceName))
     return S_OK()
 
   def serve(self):
@@ -141,65 +156,145 @@ class ServiceReactor(object):
   def __startCloneProcess(self, svcName, i):
     self.__services[svcName].setCloneProcessId(i)
     self.__alive = i
+    # The clone only accepts connections for its service
+    for otherSvcName in self.__listeningConnections:
+      if otherSvcName != svcName:
+        self.__poller.unregister(self.__listeningConnections[otherSvcName]['socket'])
     while self.__alive:
       self.__acceptIncomingConnection(svcName)
 
-  def __getListeningSocketsList(self, svcName=False):
-    if svcName:
-      sockets = [self.__listeningConnections[svcName]['socket']]
-    else:
-      sockets = []
-      for svcName in self.__listeningConnections:
-        sockets.append(self.__listeningConnections[svcName]['socket'])
-    return sockets
+  def watchConnection(self, transport, callback, timeout):
+    """
+      Watch an idle connection in the reactor loop instead of keeping a thread waiting for it.
+      The connection is not watched anymore once the callback has been called.
+
+      :param transport: transport of the connection
+      :param callback: called as callback(transport, True) when the connection is readable
+                       or as callback(transport, False) when it was idle for timeout seconds
+      :param timeout: seconds to wait for the connection to become readable
+    """
+    if transport.byteStream or transport.receivedMessages:
+      callback(transport, True)
+      return
+    expiration = time.time() + timeout
+    with self.__watchLock:
+      try:
+        self.__poller.register(transport.getSocket(), ('watch', transport))
+      except Exception:  # pylint: disable=broad-except
+        # The connection is unusable
+        registered = False
+      else:
+        registered = True
+        self.__watchedConnections[transport] = (expiration, callback)
+        heapq.heappush(self.__watchExpirations, (expiration, transport))
+    if not registered:
+      callback(transport, False)
+
+  def __releaseWatchedConnection(self, transport, readable):
+    """
+      Stop watching a connection and give it back to its service
+
+      :param transport: transport of the connection
+      :param bool readable: whether the connection is readable or idle for too long
+    """
+    with self.__watchLock:
+      watched = self.__watchedConnections.pop(transport, None)
+      self.__poller.unregister(transport.getSocket())
+    if not watched:
+      return
+    try:
+      watched[1](transport, readable)
+    except Exception as e:  # pylint: disable=broad-except
+      gLogger.exception("Exception while giving back a connection to its service", lException=e)
+
+  def __expireWatchedConnections(self):
+    """
+      Give back the connections idle for too long
+    """
+    now = time.time()
+    expired = []
+    with self.__watchLock:
+      while self.__watchExpirations and self.__watchExpirations[0][0] <= now:
+        _expiration, transport = heapq.heappop(self.__watchExpirations)
+        # Skip the connections given back, or watched again since
+        if self.__watchedConnections.get(transport, (None, ))[0] <= now:
+          expired.append(transport)
+    for transport in expired:
+      self.__releaseWatchedConnection(transport, False)
+
+  def __getPollTimeout(self):
+    """
+      Connections may be watched while the reactor waits: do not wait too long
+      if some are, so that they are released in time when they expire
+    """
+    if self.__watchedConnections:
+      return 1
+    return 10
 
   def __acceptIncomingConnection(self, svcName=False):
     """
-      This method just gets the incoming connection, checks IP address
+      This method waits for events on the listening sockets and on the connections watched for the services.
+
+      It gets the incoming connection, checks IP address
       and generates job. SSL/TLS handshake and execution of the remote call
       are made by Service._processInThread() (in another thread) so
       the service can accept other clients while another thread handling remote call
 
-      :param str svcName=False: Name of a service if you use multiple
-                                services at the same time
+      Watched connections which became readable or expired are given back to their service.
+
+      :param str svcName=False: ignored, a clone process only watches the listening socket of its service
     """
-    sockets = self.__getListeningSocketsList(svcName)
     while self.__alive:
       try:
-        inList, _outList, _exList = select.select(sockets, [], [], 10)
-        if len(inList) == 0:
-          return
-        for inSocket in inList:
-          for svcName in self.__listeningConnections:
-            if inSocket == self.__listeningConnections[svcName]['socket']:
-              retVal = self.__listeningConnections[svcName]['transport'].acceptConnection()
-              if not retVal['OK']:
-                gLogger.warn("Error while accepting a connection: ", retVal['Message'])
-                return
-              clientTransport = retVal['Value']
-      except socket.error:
+        readyList = self.__poller.poll(self.__getPollTimeout())
+      except (socket.error, select.error):
         return
-      self.__maxFD = max(self.__maxFD, clientTransport.oSocket.fileno())
-      # Is it banned?
-      clientIP = clientTransport.getRemoteAddress()[0]
-      if clientIP in Registry.getBannedIPs():
-        gLogger.warn("Client connected from banned ip %s" % clientIP)
-        clientTransport.close()
-        continue
-      # Handle connection
-      self.__stats.connectionStablished()
-      self.__services[svcName].handleConnection(clientTransport)
-      # Renew context?
-      now = time.time()
-      renewed = False
-      for svcName in self.__listeningConnections:
-        tr = self.__listeningConnections[svcName]['transport']
-        if now - tr.latestServerRenewTime() > self.__services[svcName].getConfig().getContextLifeTime():
-          result = tr.renewServerContext()
-          if result['OK']:
-            renewed = True
-      if renewed:
-        sockets = self.__getListeningSocketsList()
+      accepted = False
+      for _sock, (eventType, eventData) in readyList:
+        if eventType == 'watch':
+          self.__releaseWatchedConnection(eventData, True)
+          continue
+        svcName = eventData
+        try:
+          retVal = self.__listeningConnections[svcName]['transport'].acceptConnection()
+        except socket.error as e:
+          retVal = S_ERROR(str(e))
+        if not retVal['OK']:
+          gLogger.warn("Error while accepting a connection: ", retVal['Message'])
+          continue
+        clientTransport = retVal['Value']
+        self.__maxFD = max(self.__maxFD, clientTransport.oSocket.fileno())
+        # Is it banned?
+        clientIP = clientTransport.getRemoteAddress()[0]
+        if clientIP in Registry.getBannedIPs():
+          gLogger.warn("Client connected from banned ip %s" % clientIP)
+          clientTransport.close()
+          continue
+        # Handle connection
+        self.__stats.connectionStablished()
+        self.__services[svcName].handleConnection(clientTransport)
+        accepted = True
+      self.__expireWatchedConnections()
+      if not readyList:
+        return
+      if accepted:
+        self.__renewServerContexts()
+
+  def __renewServerContexts(self):
+    """
+      Renew the context of the listening connections older than their context life time
+    """
+    now = time.time()
+    for svcName in self.__listeningConnections:
+      lc = self.__listeningConnections[svcName]
+      tr = lc['transport']
+      if now - tr.latestServerRenewTime() > self.__services[svcName].getConfig().getContextLifeTime():
+        result = tr.renewServerContext()
+        if result['OK'] and tr.getSocket() is not lc['socket']:
+          # The listening socket was replaced
+          self.__poller.unregister(lc['socket'])
+          lc['socket'] = tr.getSocket()
+          self.__poller.register(lc['socket'], ('listen', svcName))
 
   def __closeListeningConnections(self):
     for svcName in self.__listeningConnections:
@@ -5,7 +5,7 @@ __RCSID__ = "$Id$"
 
 import os
 
-from DIRAC import S_OK, S_ERROR
+from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.Core.Utilities import File
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
 from DIRAC.Core.DISET.private.FileHelper import FileHelper
@@ -118,6 +118,18 @@ class TransferClient( BaseClient ):
         bogusEntries.append( entry )
     return bogusEntries
 
+  @staticmethod
+  def __getBulkCompression( compress ):
+    if compress is True:
+      return gConfig.getValue( "/DIRAC/Transfers/BulkCompression", "bz2" )
+    return compress
+
+  @staticmethod
+  def __getBulkName( bulkId, compress ):
+    if compress:
+      return "%s.tar.%s" % ( bulkId, compress )
+    return "%s.tar" % bulkId
+
   def sendBulk( self, fileList, bulkId, token = "", compress = True, bulkSize = -1, onthefly = True ):
     """
     Send a bulk of files to server
@@ -128,8 +140,10 @@ class TransferClient( BaseClient ):
     :param bulkId: Identification of the files being sent
     :type token: string
     :param token: Token for the bulk
-    :type compress: boolean
-    :param compress: Enable compression for the bulk. By default its True
+    :type compress: boolean or string
+    :param compress: Enable compression for the bulk. By default its True, for the
+                     compression defined in /DIRAC/Transfers/BulkCompression (bz2 by default).
+                     "gz" compresses in parallel threads, "bz2" in a single one
     :type bulkSize: integer
     :param bulkSize: Optional size of the bulk
     :return: S_OK/S_ERROR
@@ -137,10 +151,8 @@ class TransferClient( BaseClient ):
     bogusEntries = self.__checkFileList( fileList )
     if bogusEntries:
       return S_ERROR( "Some files or directories don't exist :\n\t%s" % "\n\t".join( bogusEntries ) )
-    if compress:
-      bulkId = "%s.tar.bz2" % bulkId
-    else:
-      bulkId = "%s.tar" % bulkId
+    compress = self.__getBulkCompression( compress )
+    bulkId = self.__getBulkName( bulkId, compress )
     retVal = self._sendTransferHeader( "BulkFromClient", ( bulkId, token, bulkSize ) )
     if not retVal[ 'OK' ]:
       return retVal
@@ -165,16 +177,13 @@ class TransferClient( BaseClient ):
     :param bulkId: Identification of the files being received
     :type token: string
     :param token: Token for the bulk
-    :type compress: boolean
-    :param compress: Enable compression for the bulk. By default its True
+    :type compress: boolean or string
+    :param compress: Enable compression for the bulk, as for sendBulk. By default its True
     :return: S_OK/S_ERROR
     """
     if not os.path.isdir( destDir ):
       return S_ERROR( "%s is not a directory for bulk receival" % destDir )
-    if compress:
-      bulkId = "%s.tar.bz2" % bulkId
-    else:
-      bulkId = "%s.tar" % bulkId
+    bulkId = self.__getBulkName( bulkId, self.__getBulkCompression( compress ) )
     retVal = self._sendTransferHeader( "BulkToClient", ( bulkId, token ) )
     if not retVal[ 'OK' ]:
       return retVal
@@ -197,14 +206,11 @@ class TransferClient( BaseClient ):
     :param bulkId: Identification of the bulk to list
     :type token: string
     :param token: Token for the bulk
-    :type compress: boolean
-    :param compress: Enable compression for the bulk. By default its True
+    :type compress: boolean or string
+    :param compress: Enable compression for the bulk, as for sendBulk. By default its True
     :return: S_OK/S_ERROR
     """
-    if compress:
-      bulkId = "%s.tar.bz2" % bulkId
-    else:
-      bulkId = "%s.tar" % bulkId
+    bulkId = self.__getBulkName( bulkId, self.__getBulkCompression( compress ) )
     trid = None
     retVal = self._sendTransferHeader( "ListBulk", ( bulkId, token ) )
     if not retVal[ 'OK' ]:
@@ -4,6 +4,7 @@
 
 __RCSID__ = "$Id$"
 
+import os
 import time
 import thread
 import DIRAC
@@ -16,6 +17,7 @@ from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServic
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import skipCACheck
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionPool import getGlobalConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -39,6 +41,8 @@ class BaseClient(object):
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_WIRE_COMPRESSION = "wireCompression"
+  KW_CONNECTION_POOL = "connectionPool"
 
   __threadConfig = ThreadConfig()
 
@@ -58,6 +62,8 @@ class BaseClient(object):
       :param proxyChain: Specify the proxy chain
       :param skipCACheck: Do not check the CA
       :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+      :param wireCompression: Propose to the service to compress big messages (default True)
+      :param connectionPool: Reuse the connections the service keeps open between RPC calls (default True)
     """
 
     if not isinstance(serviceName, basestring):
@@ -450,7 +456,10 @@ and this is thread %s
       transport = gProtocolDict[self.__URLTuple[0]]['transport'](self.__URLTuple[1:3], **self.kwargs)
       # the socket timeout is the default value which is 1.
       # later we increase to 5
+      connectionStart = time.time()
       retVal = transport.initAsClient()
+      if retVal['OK']:
+        getGlobalConnectionPool().recordHandshake(time.time() - connectionStart)
       # We try at most __nbOfRetry each URLs
       if not retVal['OK']:
         gLogger.warn("Issue getting socket:", "%s : %s : %s" % (transport, self.__URLTuple, retVal['Message']))
@@ -497,7 +506,61 @@ and this is thread %s
     """
     getGlobalTransportPool().close(trid)
 
-  def _proposeAction(self, transport, action):
+  def __getConnectionPoolKey(self):
+    """ Connections can be reused for the same service and the same credentials,
+        including the extra credentials the service gets with each proposal
+    """
+    extraCredentials = self.__extraCredentials
+    if isinstance(extraCredentials, list):
+      extraCredentials = tuple(extraCredentials)
+    return (self.serviceURL,
+            extraCredentials,
+            self.__useCertificates,
+            self.kwargs.get(self.KW_PROXY_LOCATION),
+            self.kwargs.get(self.KW_PROXY_STRING),
+            self.kwargs.get(self.KW_SKIP_CA_CHECK),
+            self.kwargs.get(self.KW_TIMEOUT),
+            os.environ.get('X509_USER_PROXY'))
+
+  def _connectFromPool(self):
+    """ Get a connection kept open by the service from the connection pool,
+        or establish a new one with _connect.
+
+        :return: S_OK((trid, transport, reused)), reused being True if the connection
+                 comes from the pool
+    """
+    if not self.kwargs.get(self.KW_CONNECTION_POOL, True):
+      retVal = self._connect()
+      if not retVal['OK']:
+        return retVal
+      return S_OK(retVal['Value'] + (False,))
+    if not self.__initStatus['OK']:
+      return self.__initStatus
+    # The extra credentials are sent with each proposal and are part of the pool key
+    retVal = self.__discoverExtraCredentials()
+    if not retVal['OK']:
+      return retVal
+    transport = getGlobalConnectionPool().checkout(self.__getConnectionPoolKey())
+    if not transport:
+      retVal = self._connect()
+      if not retVal['OK']:
+        return retVal
+      return S_OK(retVal['Value'] + (False,))
+    gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+    trid = getGlobalTransportPool().add(transport)
+    return S_OK((trid, transport, True))
+
+  def _releaseConnection(self, trid, transport, lifeTime=None):
+    """ Give back to the connection pool a connection the service keeps open
+
+        :param trid: Transport ID in the transportPool
+        :param transport: the Transport object
+        :param lifeTime: seconds the service keeps the connection open
+    """
+    getGlobalTransportPool().remove(trid)
+    getGlobalConnectionPool().checkin(self.__getConnectionPoolKey(), transport, lifeTime)
+
+  def _proposeAction(self, transport, action, keepConnection=False):
     """ Proposes an action by sending a tuple containing
 
           * System/Component
@@ -505,26 +568,40 @@ and this is thread %s
           * VO
           * action
           * extraCredentials
+          * DIRAC version
+          * capabilities: the wire compressions supported by the transport
 
         It is kind of a handshake.
 
         The server might ask for a delegation, in which case it is done here.
         The result of the delegation is then returned.
 
+        If the server agrees on a wire compression, the transport uses it from then on.
+        Servers that do not know about capabilities just ignore them.
+
         :param transport: the Transport object returned by _connect
         :param action: tuple (<action type>, <action name>). It depends on the
                        subclasses of BaseClient. <action type> can be for example
                        'RPC' or 'FileTransfer'
+        :param keepConnection: ask the server to keep the connection open after the action.
+                               If it agrees, the answer contains keepConnection with the number
+                               of seconds it waits for the next proposal
 
        :return: whatever the server sent back
 
     """
     if not self.__initStatus['OK']:
       return self.__initStatus
+    capabilities = {}
+    if self.kwargs.get(self.KW_WIRE_COMPRESSION, True):
+      capabilities['wireCompression'] = transport.wireCompressions
+    if keepConnection:
+      capabilities['keepConnection'] = True
     stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo),
                         action,
                         self.__extraCredentials,
-                        DIRAC.version)
+                        DIRAC.version,
+                        capabilities)
 
     # Send the connection info and get the answer back
     retVal = transport.sendData(S_OK(stConnectionInfo))
@@ -536,6 +613,11 @@ and this is thread %s
     if serverReturn['OK'] and 'Value' in serverReturn and isinstance(serverReturn['Value'], dict):
       gLogger.debug("There is a server requirement")
       serverRequirements = serverReturn['Value']
+      if 'wireCompression' in serverRequirements:
+        gLogger.debug("Using wire compression", serverRequirements['wireCompression'])
+        retVal = transport.setWireCompression(serverRequirements['wireCompression'])
+        if not retVal['OK']:
+          return retVal
       if 'delegate' in serverRequirements:
         gLogger.debug("A delegation is requested")
         serverReturn = self.__delegateCredentials(transport, serverRequirements['delegate'])
@@ -0,0 +1,184 @@
+""" ConnectionPool keeps the client connections that services agreed to keep open
+    after an RPC call, so that the next calls to the same service with the same
+    credentials skip the connection and the SSL handshake.
+
+    The pool is shared by all the clients of the process (see getGlobalConnectionPool).
+    A connection is given to one client at a time: it is removed from the pool while in use.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import select
+import threading
+
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+
+class ConnectionPool(object):
+  """ Pool of idle client transports, keyed by service URL and credentials
+  """
+
+  def __init__(self, maxIdleTime=10, maxConnectionsPerHost=10):
+    """ c'tor
+
+        :param maxIdleTime: seconds after which an idle connection is closed
+        :param maxConnectionsPerHost: maximum number of idle connections kept for the same host and port
+    """
+    self.log = gLogger.getSubLogger("ConnectionPool")
+    self.maxIdleTime = maxIdleTime
+    self.maxConnectionsPerHost = maxConnectionsPerHost
+    self.__lock = threading.Lock()
+    # key -> list of ( expiration time, transport ), the most recently used last
+    self.__idleConnections = {}
+    # ( host, port ) -> number of idle connections
+    self.__hostConnections = {}
+    self.__stats = {'hits': 0,
+                    'misses': 0,
+                    'evictions': 0,
+                    'handshakes': 0,
+                    'handshakeTime': 0.}
+    gThreadScheduler.addPeriodicTask(max(1, maxIdleTime), self.evictExpired)
+
+  @staticmethod
+  def __isHealthy(transport):
+    """ An idle connection must not have anything to read:
+        if it has, the service closed it (or the stream is out of sync)
+    """
+    try:
+      inList, _outList, _exList = select.select([transport.getSocket()], [], [], 0)
+    except Exception:  # pylint: disable=broad-except
+      return False
+    return not inList and not transport.byteStream and not transport.receivedMessages
+
+  def __removeFromHost(self, transport):
+    """ Decrease the idle connections counter of the host (lock held) """
+    address = transport.stServerAddress
+    self.__hostConnections[address] -= 1
+    if not self.__hostConnections[address]:
+      del self.__hostConnections[address]
+
+  @staticmethod
+  def __close(transport):
+    try:
+      transport.close()
+    except Exception:  # pylint: disable=broad-except
+      pass
+
+  def checkout(self, key):
+    """ Take an idle connection out of the pool
+
+        :param key: tuple identifying the service and the credentials
+
+        :return: a transport or None if there is no usable connection for that key
+    """
+    toClose = []
+    transport = None
+    with self.__lock:
+      connections = self.__idleConnections.get(key, [])
+      now = time.time()
+      while connections:
+        expiration, candidate = connections.pop()
+        self.__removeFromHost(candidate)
+        if expiration > now and self.__isHealthy(candidate):
+          transport = candidate
+          break
+        toClose.append(candidate)
+      if not connections:
+        self.__idleConnections.pop(key, None)
+      self.__stats['evictions'] += len(toClose)
+      if transport:
+        self.__stats['hits'] += 1
+      else:
+        self.__stats['misses'] += 1
+    for candidate in toClose:
+      self.__close(candidate)
+    return transport
+
+  def checkin(self, key, transport, lifeTime=None):
+    """ Give back a connection to the pool
+
+        :param key: tuple identifying the service and the credentials
+        :param transport: the transport to keep
+        :param lifeTime: seconds the service keeps the connection open
+    """
+    idleTime = self.maxIdleTime
+    if lifeTime is not None:
+      # Give back the connection to the service a bit before it closes it
+      idleTime = min(idleTime, lifeTime - 1)
+    address = transport.stServerAddress
+    with self.__lock:
+      keep = idleTime > 0 and self.__hostConnections.get(address, 0) < self.maxConnectionsPerHost
+      if keep:
+        self.__idleConnections.setdefault(key, []).append((time.time() + idleTime, transport))
+        self.__hostConnections[address] = self.__hostConnections.get(address, 0) + 1
+      else:
+        self.__stats['evictions'] += 1
+    if not keep:
+      self.__close(transport)
+
+  def evictExpired(self):
+    """ Close the connections idle for too long
+    """
+    toClose = []
+    with self.__lock:
+      now = time.time()
+      for key in list(self.__idleConnections):
+        connections = self.__idleConnections[key]
+        expired = [conn for conn in connections if conn[0] <= now]
+        if not expired:
+          continue
+        self.__idleConnections[key] = [conn for conn in connections if conn[0] > now]
+        if not self.__idleConnections[key]:
+          del self.__idleConnections[key]
+        for _expiration, transport in expired:
+          self.__removeFromHost(transport)
+          toClose.append(transport)
+      self.__stats['evictions'] += len(toClose)
+    for transport in toClose:
+      self.__close(transport)
+    return len(toClose)
+
+  def closeAll(self):
+    """ Close all the idle connections
+    """
+    with self.__lock:
+      toClose = [transport for connections in self.__idleConnections.itervalues()
+                 for _expiration, transport in connections]
+      self.__idleConnections = {}
+      self.__hostConnections = {}
+    for transport in toClose:
+      self.__close(transport)
+
+  def recordHandshake(self, elapsedTime):
+    """ Account a new connection, done because no idle one was available
+
+        :param elapsedTime: seconds spent connecting, including the handshake
+    """
+    with self.__lock:
+      self.__stats['handshakes'] += 1
+      self.__stats['handshakeTime'] += elapsedTime
+
+  def getStats(self):
+    """ Get the usage counters of the pool
+
+        :return: dict with hits, misses, evictions, handshakes, handshakeTime (total seconds)
+                 and idle (number of idle connections)
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['idle'] = sum(self.__hostConnections.itervalues())
+    return stats
+
+
+gConnectionPool = None
+
+
+def getGlobalConnectionPool():
+  global gConnectionPool
+  if not gConnectionPool:
+    gConnectionPool = ConnectionPool(maxIdleTime=gConfig.getValue("/DIRAC/ConnectionPool/MaxIdleTime", 10),
+                                     maxConnectionsPerHost=gConfig.getValue("/DIRAC/ConnectionPool/MaxPerHost", 10))
+  return gConnectionPool
@@ -1,6 +1,7 @@
 __RCSID__ = "$Id$"
 
 import os
+import Queue
 import hashlib
 import threading
 import cStringIO
@@ -8,10 +9,96 @@ import tarfile
 import tempfile
 
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+from DIRAC.Core.Utilities.ParallelGzip import ParallelGzipWriter, openDecompressedStream
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 gLogger = gLogger.getSubLogger( "FileTransmissionHelper" )
 
+
+class _BackgroundMD5( threading.Thread ):
+  """ MD5 computed in a separate thread, so hashing a chunk overlaps with sending
+      or receiving the next one (hashlib releases the GIL while hashing big buffers)
+  """
+
+  def __init__( self, maxPending = 4 ):
+    threading.Thread.__init__( self )
+    self.setDaemon( True )
+    self.__md5 = hashlib.md5()
+    self.__pending = Queue.Queue( maxPending )
+    self.__digest = None
+    self.start()
+
+  def run( self ):
+    while True:
+      data = self.__pending.get()
+      if data is None:
+        return
+      self.__md5.update( data )
+
+  def update( self, data ):
+    self.__pending.put( data )
+
+  def hexdigest( self ):
+    """ Wait for the pending chunks to be hashed and stop the thread
+    """
+    if self.__digest is None:
+      self.__pending.put( None )
+      self.join()
+      self.__digest = self.__md5.hexdigest()
+    return self.__digest
+
+
+class _ReadAhead( threading.Thread ):
+  """ Reads the next chunks of a data source in a separate thread
+      while the current one is in flight
+  """
+
+  def __init__( self, readFunction, chunkSize, depth = 2 ):
+    threading.Thread.__init__( self )
+    self.setDaemon( True )
+    self.__read = readFunction
+    self.__chunkSize = chunkSize
+    self.__chunks = Queue.Queue( depth )
+    self.__stopEvent = threading.Event()
+    self.start()
+
+  def run( self ):
+    try:
+      while not self.__stopEvent.isSet():
+        data = self.__read( self.__chunkSize )
+        self.__put( data )
+        if not data:
+          return
+    except Exception as e:
+      self.__put( e )
+
+  def __put( self, item ):
+    while not self.__stopEvent.isSet():
+      try:
+        self.__chunks.put( item, timeout = 0.5 )
+        return
+      except Queue.Full:
+        pass
+
+  def __iter__( self ):
+    """ Iterate over the chunks read, raising the exception raised by the read function
+    """
+    while True:
+      data = self.__chunks.get()
+      if isinstance( data, Exception ):
+        raise data
+      if not data:
+        return
+      yield data
+
+  def stop( self ):
+    """ Stop reading. The source is not used anymore once it returns
+    """
+    self.__stopEvent.set()
+    self.join()
+
+
 class FileHelper(object):
 
   __validDirections = ( "toClient", "fromClient", 'receive', 'send' )
@@ -34,6 +121,16 @@ class FileHelper(object):
   def enableCheckSum( self ):
     self.__checkMD5 = True
 
+  def __resetChecksum( self ):
+    if self.__checkMD5:
+      self.__oMD5 = _BackgroundMD5()
+    else:
+      self.__oMD5 = hashlib.md5()
+
+  def __finishChecksum( self ):
+    # Stops the background thread if the transfer was interrupted
+    self.__oMD5.hexdigest()
+
   def setTransport( self, oTransport ):
     self.oTransport = oTransport
 
@@ -146,7 +243,13 @@ class FileHelper(object):
   def networkToDataSink( self, dataSink, maxFileSize = 0 ):
     if "write" not in dir( dataSink ):
       return S_ERROR( "%s data sink object does not have a write method" % str( dataSink ) )
-    self.__oMD5 = hashlib.md5()
+    self.__resetChecksum()
+    try:
+      return self.__networkToDataSink( dataSink, maxFileSize )
+    finally:
+      self.__finishChecksum()
+
+  def __networkToDataSink( self, dataSink, maxFileSize ):
     self.bReceivedEOF = False
     self.bErrorInMD5 = False
     receivedBytes = 0
@@ -180,6 +283,7 @@ class FileHelper(object):
     """
 
     stringIO = cStringIO.StringIO( stringVal )
+    self.__resetChecksum()
 
     iPacketSize = self.packetSize
     ioffset = 0
@@ -199,6 +303,8 @@ class FileHelper(object):
       self.sendEOF()
     except Exception as e:
       return S_ERROR( "Error while sending string: %s" % str( e ) )
+    finally:
+      self.__finishChecksum()
     try:
       stringIO.close()
     except:
@@ -206,27 +312,7 @@ class FileHelper(object):
     return S_OK()
 
   def FDToNetwork( self, iFD ):
-    self.__oMD5 = hashlib.md5()
-    iPacketSize = self.packetSize
-    self.__fileBytes = 0
-    sentBytes = 0
-    try:
-      sBuffer = os.read( iFD, iPacketSize )
-      while len( sBuffer ) > 0:
-        dRetVal = self.sendData( sBuffer )
-        if not dRetVal[ 'OK' ]:
-          return dRetVal
-        if 'AbortTransfer' in dRetVal and dRetVal[ 'AbortTransfer' ]:
-          self.__log.verbose( "Transfer aborted" )
-          return S_OK()
-        sentBytes += len( sBuffer )
-        sBuffer = os.read( iFD, iPacketSize )
-      self.sendEOF()
-    except Exception as e:
-      gLogger.exception( "Error while sending file" )
-      return S_ERROR( "Error while sending file: %s" % str( e ) )
-    self.__fileBytes = sentBytes
-    return S_OK()
+    return self.__readFunctionToNetwork( lambda size: os.read( iFD, size ) )
 
   def BufferToNetwork( self, stringToSend ):
     sIO = cStringIO.StringIO( stringToSend )
@@ -238,13 +324,18 @@ class FileHelper(object):
   def DataSourceToNetwork( self, dataSource ):
     if "read" not in dir( dataSource ):
       return S_ERROR( "%s data source object does not have a read method" % str( dataSource ) )
-    self.__oMD5 = hashlib.md5()
-    iPacketSize = self.packetSize
+    return self.__readFunctionToNetwork( dataSource.read )
+
+  def __readFunctionToNetwork( self, readFunction ):
+    """ Send the data returned by readFunction( size ) until it returns an empty string.
+        Reading the next chunk and checksumming the current one overlap with sending it
+    """
+    self.__resetChecksum()
     self.__fileBytes = 0
     sentBytes = 0
+    readAhead = _ReadAhead( readFunction, self.packetSize )
     try:
-      sBuffer = dataSource.read( iPacketSize )
-      while len( sBuffer ) > 0:
+      for sBuffer in readAhead:
         dRetVal = self.sendData( sBuffer )
         if not dRetVal[ 'OK' ]:
           return dRetVal
@@ -252,11 +343,13 @@ class FileHelper(object):
           self.__log.verbose( "Transfer aborted" )
           return S_OK()
         sentBytes += len( sBuffer )
-        sBuffer = dataSource.read( iPacketSize )
       self.sendEOF()
     except Exception as e:
       gLogger.exception( "Error while sending file" )
       return S_ERROR( "Error while sending file: %s" % str( e ) )
+    finally:
+      readAhead.stop()
+      self.__finishChecksum()
     self.__fileBytes = sentBytes
     return S_OK()
 
@@ -307,12 +400,22 @@ class FileHelper(object):
     else:
       filePipe = os.fdopen( wPipe, "w" )
     tarMode = "w|"
-    if compress:
+    gzipWriter = None
+    if compress == "gz":
+      # Blocks compressed in parallel as independent gzip members
+      gzipWriter = ParallelGzipWriter( filePipe,
+                                       level = gConfig.getValue( "/DIRAC/Transfers/BulkCompressionLevel", 6 ),
+                                       threads = gConfig.getValue( "/DIRAC/Transfers/BulkCompressionThreads", 0 ) )
+    elif compress:
       tarMode = "w|bz2"
 
-    with tarfile.open( name = "Pipe", mode = tarMode, fileobj = filePipe ) as tar:
-      for entry in fileList:
-        tar.add( os.path.realpath( entry ), os.path.basename( entry ), recursive = True )
+    try:
+      with tarfile.open( name = "Pipe", mode = tarMode, fileobj = gzipWriter or filePipe ) as tar:
+        for entry in fileList:
+          tar.add( os.path.realpath( entry ), os.path.basename( entry ), recursive = True )
+    finally:
+      if gzipWriter:
+        gzipWriter.close()
     if autoClose:
       try:
         filePipe.close()
@@ -320,6 +423,14 @@ class FileHelper(object):
         pass
 
   def bulkToNetwork( self, fileList, compress = True, onthefly = True ):
+    """ Send a tar archive of the files
+
+        :param list fileList: paths of the files and directories to send
+        :param compress: "gz" for a gzip compression in parallel threads
+                         (level /DIRAC/Transfers/BulkCompressionLevel, 6 by default),
+                         "bz2" or True for bz2, False for none
+        :param bool onthefly: send the archive while it is created, instead of creating it first
+    """
     if not onthefly:
       try:
         filePipe, filePath = tempfile.mkstemp()
@@ -348,12 +459,9 @@ class FileHelper(object):
         pass
       return response
 
-  def __extractTar( self, destDir, rPipe, compress ):
+  def __extractTar( self, destDir, rPipe ):
     filePipe = os.fdopen( rPipe, "r" )
-    tarMode = "r|*"
-    if compress:
-      tarMode = "r|bz2"
-    with tarfile.open( mode = tarMode, fileobj = filePipe ) as tar:
+    with tarfile.open( mode = "r|*", fileobj = openDecompressedStream( filePipe ) ) as tar:
       for tarInfo in tar:
         tar.extract( tarInfo, destDir )
     try:
@@ -369,12 +477,17 @@ class FileHelper(object):
       pass
 
   def networkToBulk( self, destDir, compress = True, maxFileSize = 0 ):
+    """ Receive a tar archive and extract it in destDir, while it is received
+
+        The compression of the archive (gzip members, bz2 or none) is detected,
+        compress is kept for backward compatibility
+    """
     retList = []
     rPipe, wPipe = os.pipe()
     thrd = threading.Thread( target = self.__receiveToPipe, args = ( wPipe, retList, maxFileSize ) )
     thrd.start()
     try:
-      self.__extractTar( destDir, rPipe, compress )
+      self.__extractTar( destDir, rPipe )
     except Exception as e:
       return S_ERROR( "Error while extracting bulk: %s" % e )
     thrd.join()
@@ -383,11 +496,8 @@ class FileHelper(object):
   def bulkListToNetwork( self, iFD, compress = True ):
     filePipe = os.fdopen( iFD, "r" )
     try:
-      tarMode = "r|"
-      if compress:
-        tarMode = "r|bz2"
       entries = []
-      with tarfile.open( mode = tarMode, fileobj = filePipe ) as tar:
+      with tarfile.open( mode = "r|*", fileobj = openDecompressedStream( filePipe ) ) as tar:
         for tarInfo in tar:
           entries.append( tarInfo.name )
       filePipe.close()
@@ -4,7 +4,7 @@
 __RCSID__ = "$Id$"
 
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
-from DIRAC.Core.Utilities.ReturnValues import S_OK
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.DErrno import cmpError, ENOAUTH
 
 class InnerRPCClient( BaseClient ):
@@ -24,6 +24,8 @@ class InnerRPCClient( BaseClient ):
 
   def executeRPC( self, functionName, args ):
     """ Perform the RPC call, connect before and disconnect after.
+        If the service agrees to keep the connection open, it is given back to
+        the connection pool instead of being closed, and reused by the next call.
 
         :param functionName: name of the function
         :param args: arguments to the function
@@ -33,7 +35,7 @@ class InnerRPCClient( BaseClient ):
 
 
     """
-    retVal = self._connect()
+    retVal = self._connectFromPool()
 
     # Generate the stub which contains all the connection and call options
     stub = ( self._getBaseStub(), functionName, args )
@@ -41,14 +43,17 @@ class InnerRPCClient( BaseClient ):
       retVal[ 'rpcStub' ] = stub
       return retVal
     # Get the transport connection ID as well as the Transport object
-    trid, transport = retVal[ 'Value' ]
+    trid, transport, reused = retVal[ 'Value' ]
+    keepConnection = None
     try:
       # Handshake to perform the RPC call for functionName
-      retVal = self._proposeAction( transport, ( "RPC", functionName ) )
+      retVal = self._proposeAction( transport, ( "RPC", functionName ), keepConnection = True )
       if not retVal['OK']:
         if cmpError( retVal, ENOAUTH ):  # This query is unauthorized
           retVal[ 'rpcStub' ] = stub
           return retVal
+        elif reused:  # the service closed the connection in the meantime
+          return self.executeRPC( functionName, args )
         else:  # we have network problem or the service is not responding
           if self.__retry < 3:
             self.__retry += 1
@@ -56,16 +61,68 @@ class InnerRPCClient( BaseClient ):
           else:
             retVal[ 'rpcStub' ] = stub
             return retVal
+      if isinstance( retVal.get( 'Value' ), dict ):
+        keepConnection = retVal[ 'Value' ].get( 'keepConnection' )
 
       # Send the arguments to the function
       retVal = transport.sendData( S_OK( args ) )
       if not retVal[ 'OK' ]:
+        keepConnection = None
         return retVal
 
       # Get the result of the call and append the stub to it
       receivedData = transport.receiveData()
       if isinstance( receivedData, dict ):
         receivedData[ 'rpcStub' ] = stub
+      # Errors may come from the connection itself: do not reuse it
+      if not isinstance( receivedData, dict ) or not receivedData.get( 'OK' ):
+        keepConnection = None
       return receivedData
+    finally:
+      if keepConnection:
+        self._releaseConnection( trid, transport, keepConnection )
+      else:
+        self._disconnect( trid )
+
+  def executeStream( self, functionName, args ):
+    """ Perform a streaming RPC call to the stream_<functionName> method of the service.
+        This is a generator: the connection is established at the first iteration,
+        and closed once the stream is exhausted or the generator is closed.
+
+        :param functionName: name of the function
+        :param args: arguments to the function
+
+        :return: yields S_OK( chunk ) for each chunk sent by the service. In case of error,
+                 the last item is the S_ERROR, with the connection stub added to it.
+    """
+    stub = ( self._getBaseStub(), functionName, args )
+    retVal = self._connect()
+    if not retVal[ 'OK' ]:
+      retVal[ 'rpcStub' ] = stub
+      yield retVal
+      return
+    trid, transport = retVal[ 'Value' ]
+    try:
+      retVal = self._proposeAction( transport, ( "Stream", functionName ) )
+      if not retVal[ 'OK' ]:
+        retVal[ 'rpcStub' ] = stub
+        yield retVal
+        return
+      retVal = transport.sendData( S_OK( args ) )
+      if not retVal[ 'OK' ]:
+        yield retVal
+        return
+      while True:
+        receivedData = transport.receiveData()
+        if not isinstance( receivedData, dict ):
+          yield S_ERROR( "Invalid stream message received" )
+          return
+        if not receivedData[ 'OK' ]:
+          receivedData[ 'rpcStub' ] = stub
+          yield receivedData
+          return
+        if receivedData.get( 'EndOfStream' ):
+          return
+        yield receivedData
     finally:
       self._disconnect( trid )
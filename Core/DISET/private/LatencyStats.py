@@ -0,0 +1,133 @@
+""" LatencyStats keeps latency histograms of the actions served by a service,
+    for each phase of the request processing:
+
+      * proposal: receiving and checking the action proposal (without authorization)
+      * authorization: checking the client is allowed to execute the action
+      * instantiation: creating the handler
+      * arguments: receiving and decoding the arguments
+      * execution: executing the handler method
+      * response: encoding and sending the result
+      * total: the whole request
+
+    The histograms have logarithmic buckets, so percentiles are exact within 10%
+    whatever the number of requests, using little memory.
+"""
+
+__RCSID__ = "$Id$"
+
+import math
+import threading
+
+
+class LatencyHistogram(object):
+  """ Histogram of durations
+  """
+
+  # Durations under minValue seconds are counted in the first bucket
+  minValue = 0.00001
+  # Each bucket is bucketRatio times wider than the previous one
+  bucketRatio = 2 ** 0.125
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.
+    self.max = 0.
+    # bucket index -> count
+    self.__buckets = {}
+    self.__logRatio = math.log(self.bucketRatio)
+
+  def add(self, value):
+    """ Account a duration
+
+        :param float value: duration in seconds
+    """
+    self.count += 1
+    self.total += value
+    self.max = max(self.max, value)
+    if value <= self.minValue:
+      index = 0
+    else:
+      index = int(math.ceil(math.log(value / self.minValue) / self.__logRatio))
+    self.__buckets[index] = self.__buckets.get(index, 0) + 1
+
+  def percentile(self, percent):
+    """ Get the duration under which percent % of the durations are
+
+        :param float percent: between 0 and 100
+
+        :return: the upper bound of the bucket containing the percentile, 0 without data
+    """
+    if not self.count:
+      return 0.
+    rank = percent / 100. * self.count
+    seen = 0
+    for index in sorted(self.__buckets):
+      seen += self.__buckets[index]
+      if seen >= rank:
+        return min(self.max, self.minValue * self.bucketRatio ** index)
+    return self.max
+
+  def getSummary(self):
+    """ :return: dict with count, mean, max, p50, p95 and p99
+    """
+    return {'count': self.count,
+            'mean': self.total / self.count if self.count else 0.,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)}
+
+
+class LatencyStats(object):
+  """ Latency histograms by action and phase, since the start of the service
+      and for the current reporting period
+  """
+
+  PHASES = ('proposal', 'authorization', 'instantiation', 'arguments', 'execution', 'response', 'total')
+
+  def __init__(self):
+    self.__lock = threading.Lock()
+    # ( action, phase ) -> LatencyHistogram
+    self.__histograms = {}
+    self.__periodHistograms = {}
+
+  def record(self, action, phaseTimes):
+    """ Account the durations of the phases of a request
+
+        :param str action: action of the request, e.g. RPC/getJobs
+        :param dict phaseTimes: phase name -> duration in seconds
+    """
+    with self.__lock:
+      for phase, value in phaseTimes.iteritems():
+        key = (action, phase)
+        for histograms in (self.__histograms, self.__periodHistograms):
+          histogram = histograms.get(key)
+          if histogram is None:
+            histogram = LatencyHistogram()
+            histograms[key] = histogram
+          histogram.add(value)
+
+  @staticmethod
+  def __summarize(histograms):
+    summary = {}
+    for (action, phase), histogram in histograms.iteritems():
+      summary.setdefault(action, {})[phase] = histogram.getSummary()
+    return summary
+
+  def getSummary(self):
+    """ Get the latencies since the service started
+
+        :return: dict action -> phase -> dict with count, mean, max, p50, p95 and p99 (seconds)
+    """
+    with self.__lock:
+      return self.__summarize(self.__histograms)
+
+  def popPeriodSummary(self):
+    """ Get the latencies since the previous call, and start a new period
+
+        :return: same as getSummary
+    """
+    with self.__lock:
+      histograms = self.__periodHistograms
+      self.__periodHistograms = {}
+    return self.__summarize(histograms)
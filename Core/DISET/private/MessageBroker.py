@@ -11,6 +11,7 @@ from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
 from DIRAC.Core.Utilities.ThreadPool import getGlobalThreadPool
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
 from DIRAC.Core.DISET.private.MessageFactory import MessageFactory, DummyMessage
+from DIRAC.Core.DISET.private.SocketPoller import SocketPoller
 
 
 class MessageBroker( object ):
@@ -36,6 +37,8 @@ class MessageBroker( object ):
     self.__threadPool = threadPool
     self.__listeningForMessages = False
     self.__listenThread = None
+    # Sockets of the transports to listen to, registered with their trid
+    self.__poller = SocketPoller()
 
   def getNumConnections( self ):
     return len( self.__messageTransports )
@@ -90,6 +93,8 @@ class MessageBroker( object ):
                                            'cbDisconnect' : disconnectCallback,
                                            'listen' : listenToConnection,
                                            'idleRead' : idleRead }
+      if listenToConnection:
+        self.__poller.register( tr.getSocket(), trid )
       self.__startListeningThread()
       return S_OK()
     finally:
@@ -99,7 +104,12 @@ class MessageBroker( object ):
     self.__trInOutLock.acquire()
     try:
       if trid in self.__messageTransports:
-        self.__messageTransports[ trid ][ 'listen' ] = listen
+        mt = self.__messageTransports[ trid ]
+        mt[ 'listen' ] = listen
+        if listen:
+          self.__poller.register( mt[ 'transport' ].getSocket(), trid )
+        else:
+          self.__poller.unregister( mt[ 'transport' ].getSocket() )
       self.__startListeningThread()
     finally:
       self.__trInOutLock.release()
@@ -119,21 +129,15 @@ class MessageBroker( object ):
     while self.__listeningForMessages:
       self.__trInOutLock.acquire()
       try:
-        sIdList = []
-        for trid in self.__messageTransports:
-          mt = self.__messageTransports[ trid ]
-          if not mt[ 'listen' ]:
-            continue
-          sIdList.append( ( trid, mt[ 'transport' ].getSocket() ) )
-        if not sIdList:
+        if not len( self.__poller ):
           self.__listeningForMessages = False
           return
       finally:
         self.__trInOutLock.release()
       try:
         try:
-          inList, _outList, _exList = select.select( [ pos[1] for pos in sIdList ] , [], [], 1 )
-          if len( inList ) == 0:
+          readyList = self.__poller.poll( 1 )
+          if not readyList:
             continue
         except socket.error:
           time.sleep( 0.001 )
@@ -142,17 +146,13 @@ class MessageBroker( object ):
           time.sleep( 0.001 )
           continue
       except Exception as e:
-        gLogger.exception( "Exception while selecting persistent connections", lException = e )
+        gLogger.exception( "Exception while polling persistent connections", lException = e )
         continue
-      for sock in inList:
-        for iPos in range( len( sIdList ) ):
-          if sock == sIdList[ iPos ][1]:
-            trid = sIdList[ iPos ][0]
-            if trid in self.__messageTransports:
-              result = self.__receiveMsgDataAndQueue( trid )
-              if not result[ 'OK' ]:
-                self.removeTransport( trid )
-            break
+      for _sock, trid in readyList:
+        if trid in self.__messageTransports:
+          result = self.__receiveMsgDataAndQueue( trid )
+          if not result[ 'OK' ]:
+            self.removeTransport( trid )
 
   #Process received data functions
 
@@ -381,7 +381,7 @@ class MessageBroker( object ):
       else:
         cbDisconnect = False
 
-      self.__messageTransports.pop( trid )
+      self.__poller.unregister( self.__messageTransports.pop( trid )[ 'transport' ].getSocket() )
       if closeTransport:
         self.__trPool.close( trid )
     finally:
@@ -0,0 +1,127 @@
+""" ResponseCache keeps the results of the RPC methods declared as cacheable
+    by the handlers (see RequestHandler, cache_<method> attributes).
+
+    Identical concurrent requests are coalesced: the method is executed once,
+    and the other requests wait for its result (single flight).
+    Only successful results are kept, for their time to live, in a bounded LRU.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import threading
+from collections import OrderedDict
+
+from DIRAC.Core.Utilities.ReturnValues import S_ERROR
+
+
+class _Flight(object):
+  """ An execution in progress, waited for by the identical requests
+  """
+
+  def __init__(self):
+    self.event = threading.Event()
+    self.result = None
+
+
+class ResponseCache(object):
+  """ Bounded LRU of results with a time to live, coalescing identical requests
+  """
+
+  def __init__(self, maxSize=1000):
+    """ c'tor
+
+        :param maxSize: maximum number of results kept
+    """
+    self.maxSize = maxSize
+    self.__lock = threading.Lock()
+    # key -> ( expiration time, result ), the most recently used last
+    self.__entries = OrderedDict()
+    # key -> _Flight
+    self.__inFlight = {}
+    # Incremented by each invalidation: results computed meanwhile may be outdated
+    self.__generation = 0
+    self.__stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+  def execute(self, key, ttl, function, *args):
+    """ Get the result of function( \\*args ) from the cache, or execute it
+
+        :param key: hashable key identifying the request
+        :param ttl: seconds the result is kept
+        :param function: function returning a S_OK/S_ERROR structure
+
+        :return: the result of the function
+    """
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry:
+        if entry[0] > time.time():
+          self.__stats['hits'] += 1
+          # Mark it as the most recently used
+          del self.__entries[key]
+          self.__entries[key] = entry
+          return entry[1]
+        del self.__entries[key]
+      flight = self.__inFlight.get(key)
+      leader = not flight
+      if flight:
+        self.__stats['coalesced'] += 1
+      else:
+        self.__stats['misses'] += 1
+        flight = _Flight()
+        self.__inFlight[key] = flight
+      generation = self.__generation
+    if not leader:
+      flight.event.wait()
+      return flight.result
+
+    flight.result = S_ERROR("Exception while executing the request")
+    try:
+      flight.result = function(*args)
+      return flight.result
+    finally:
+      with self.__lock:
+        del self.__inFlight[key]
+        result = flight.result
+        if isinstance(result, dict) and result.get('OK') and ttl > 0 and self.maxSize > 0 and \
+           generation == self.__generation:
+          self.__entries[key] = (time.time() + ttl, result)
+          while len(self.__entries) > self.maxSize:
+            self.__entries.popitem(last=False)
+      flight.event.set()
+
+  def invalidate(self, keyFilter=None):
+    """ Forget cached results
+
+        :param keyFilter: function called with each key, returning True for the results to forget.
+                          By default all the results are forgotten
+
+        :return: number of results forgotten
+    """
+    with self.__lock:
+      self.__generation += 1
+      if keyFilter is None:
+        nbKeys = len(self.__entries)
+        self.__entries.clear()
+        return nbKeys
+      keys = [key for key in self.__entries if keyFilter(key)]
+      for key in keys:
+        del self.__entries[key]
+      return len(keys)
+
+  def getStats(self, reset=False):
+    """ Get the usage counters
+
+        :param reset: set the counters back to zero
+
+        :return: dict with hits, misses, coalesced (requests which waited for an identical one),
+                 hitRatio (percentage of the requests not executed) and size
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['size'] = len(self.__entries)
+      if reset:
+        self.__stats = dict.fromkeys(self.__stats, 0)
+    requests = stats['hits'] + stats['misses'] + stats['coalesced']
+    stats['hitRatio'] = 100. * (stats['hits'] + stats['coalesced']) / requests if requests else 0.
+    return stats
@@ -11,6 +11,7 @@
 import os
 import time
 import threading
+import functools
 
 import DIRAC
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
@@ -22,6 +23,9 @@ from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
 from DIRAC.Core.DISET.private.ServiceConfiguration import ServiceConfiguration
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
 from DIRAC.Core.DISET.private.MessageBroker import MessageBroker, MessageSender
+from DIRAC.Core.DISET.private.ResponseCache import ResponseCache
+from DIRAC.Core.DISET.private.LatencyStats import LatencyStats
+from DIRAC.Core.Utilities.ReplicaRouting import startRequest
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
@@ -39,6 +43,7 @@ __RCSID__ = "$Id$"
 class Service(object):
 
   SVC_VALID_ACTIONS = {'RPC': 'export',
+                       'Stream': 'stream',
                        'FileTransfer': 'transfer',
                        'Message': 'msg',
                        'Connection': 'Message'}
@@ -72,6 +77,8 @@ class Service(object):
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    self.__connectionWatcher = None
+    self._latencyStats = LatencyStats()
 
   def setCloneProcessId(self, cloneId):
     self.__cloneId = cloneId
@@ -102,6 +109,7 @@ class Service(object):
                                   self._cfg.getMaxWaitingPetitions())
     self._threadPool.daemonize()
     self._msgBroker = MessageBroker("%sMSB" % self._name, threadPool=self._threadPool)
+    self._responseCache = ResponseCache(self._cfg.getResponseCacheSize())
     # Create static dict
     self._serviceInfoDict = {'serviceName': self._name,
                              'serviceSectionPath': PathFinder.getServiceSection(self._name),
@@ -130,12 +138,16 @@ class Service(object):
         self._handler['class']._rh__initializeClass(dict(self._serviceInfoDict),
                                                     self._lockManager,
                                                     self._msgBroker,
-                                                    self.activityMonitoringReporter)
+                                                    self.activityMonitoringReporter,
+                                                    self._responseCache,
+                                                    self._latencyStats)
       else:
         self._handler['class']._rh__initializeClass(dict(self._serviceInfoDict),
                                                     self._lockManager,
                                                     self._msgBroker,
-                                                    self._monitor)
+                                                    self._monitor,
+                                                    self._responseCache,
+                                                    self._latencyStats)
       if self._handler['init']:
         for initFunc in self._handler['init']:
           gLogger.verbose("Executing initialization function")
@@ -291,6 +303,11 @@ class Service(object):
           'threads',
           MonitoringClient.OP_MEAN)
       self._monitor.registerActivity('MaxFD', "Max File Descriptors", 'Framework', 'fd', MonitoringClient.OP_MEAN)
+      self._monitor.registerActivity('CacheHits', "Queries served from the cache", 'Framework', 'queries',
+                                     MonitoringClient.OP_RATE)
+      self._monitor.registerActivity('CacheMisses', "Cacheable queries executed", 'Framework', 'queries',
+                                     MonitoringClient.OP_RATE)
+      self._monitor.registerActivity('CacheHitRatio', "Cache hit ratio", 'Framework', '%', MonitoringClient.OP_MEAN)
 
       self._monitor.setComponentExtraParam('DIRACVersion', DIRAC.version)
       self._monitor.setComponentExtraParam('platform', DIRAC.getPlatform())
@@ -311,9 +328,11 @@ class Service(object):
     return S_OK()
 
   def __reportThreadPoolContents(self):
+    cacheStats = self._responseCache.getStats(reset=True)
+    cacheHits = cacheStats['hits'] + cacheStats['coalesced']
     if self.activityMonitoring:
       # As ES accepts raw data these monitoring fields are being sent here because they are time dependant.
-      self.activityMonitoringReporter.addRecord({
+      record = {
           'timestamp': int(Time.toEpoch()),
           'host': Network.getFQDN(),
           'componentType': 'service',
@@ -323,17 +342,50 @@ class Service(object):
           'ActiveQueries': self._threadPool.numWorkingThreads(),
           'RunningThreads': threading.activeCount(),
           'MaxFD': self.__maxFD,
-      })
+      }
+      if cacheHits or cacheStats['misses']:
+        record.update({'CacheHits': cacheHits,
+                       'CacheMisses': cacheStats['misses'],
+                       'CacheHitRatio': cacheStats['hitRatio']})
+      self.activityMonitoringReporter.addRecord(record)
     else:
       self._monitor.addMark('PendingQueries', self._threadPool.pendingJobs())
       self._monitor.addMark('ActiveQueries', self._threadPool.numWorkingThreads())
       self._monitor.addMark('RunningThreads', threading.activeCount())
       self._monitor.addMark('MaxFD', self.__maxFD)
+      if cacheHits or cacheStats['misses']:
+        self._monitor.addMark('CacheHits', cacheHits)
+        self._monitor.addMark('CacheMisses', cacheStats['misses'])
+        self._monitor.addMark('CacheHitRatio', cacheStats['hitRatio'])
+      self.__reportLatencies()
     self.__maxFD = 0
 
+  def __reportLatencies(self):
+    """
+    Report the percentiles of the response time of each action since the previous report.
+    The activities are registered when an action is reported for the first time
+    """
+    for action, phases in self._latencyStats.popPeriodSummary().iteritems():
+      if 'total' not in phases:
+        continue
+      for percentile in ('p50', 'p95', 'p99'):
+        activityName = "Latency %s %s" % (action, percentile)
+        self._monitor.registerActivity(activityName, "%s response time of %s" % (percentile, action),
+                                       'Latency', 'seconds', MonitoringClient.OP_MEAN, 300)
+        self._monitor.addMark(activityName, phases['total'][percentile])
+
   def getConfig(self):
     return self._cfg
 
+  def setConnectionWatcher(self, connectionWatcher):
+    """
+      Set the function watching the connections kept open between two requests,
+      so that no thread waits for them. See ServiceReactor.watchConnection
+
+      :param connectionWatcher: function called with the transport, a callback and a timeout
+    """
+    self.__connectionWatcher = connectionWatcher
+
   # End of initialization functions
 
   def handleConnection(self, clientTransport):
@@ -383,54 +435,178 @@ class Service(object):
 
     :param clientTransport: Object who describe the opened connection (SSLTransport or PlainTransport)
 
+    If the client asked to keep the connection open after an RPC, and it was agreed on,
+    the next proposal on it is waited for (see __keepConnection).
+
     :return: S_OK with "closeTransport" a boolean to indicate if th connection have to be closed
             e.g. after RPC, closeTransport=True
 
     """
     self.__maxFD = max(self.__maxFD, clientTransport.oSocket.fileno())
+    trid, result = self.__processLockedRequest(clientTransport)
+    self.__keepConnection(trid, clientTransport, result)
+    return result
+
+  def _processKeptConnection(self, trid, clientTransport):
+    """
+    Process the next request received on a connection kept open after an RPC
+
+    :param str trid: transport ID
+    :param clientTransport: transport of the connection
+
+    :return: the result of _processRequest
+    """
+    trid, result = self.__processLockedRequest(clientTransport, trid)
+    self.__keepConnection(trid, clientTransport, result)
+    return result
+
+  def __processLockedRequest(self, clientTransport, trid=None):
+    """
+    Process one request holding the global lock.
+    A new connection (without trid) is handshaked and added to the transport pool first.
+
+    :return: tuple ( trid, result of _processRequest or None )
+    """
     self._lockManager.lockGlobal()
     try:
       monReport = self.__startReportToMonitoring()
     except Exception:
       monReport = False
     try:
-      # Handshake
-      try:
-        result = clientTransport.handshake()
-        if not result['OK']:
-          clientTransport.close()
-          return
-      except BaseException:
-        return
-      # Add to the transport pool
-      trid = self._transportPool.add(clientTransport)
       if not trid:
-        return
-      # Receive and check proposal
-      result = self._receiveAndCheckProposal(trid)
-      if not result['OK']:
-        self._transportPool.sendAndClose(trid, result)
-        return
-      proposalTuple = result['Value']
-      # Instantiate handler
-      result = self._instantiateHandler(trid, proposalTuple)
-      if not result['OK']:
-        self._transportPool.sendAndClose(trid, result)
-        return
-      handlerObj = result['Value']
-      # Execute the action
-      result = self._processProposal(trid, proposalTuple, handlerObj)
-      # Close the connection if required
-      if result['closeTransport'] or not result['OK']:
-        if not result['OK']:
-          gLogger.error("Error processing proposal", result['Message'])
-        self._transportPool.close(trid)
-      return result
+        # Handshake
+        try:
+          result = clientTransport.handshake()
+          if not result['OK']:
+            clientTransport.close()
+            return trid, None
+        except BaseException:
+          return trid, None
+        # Add to the transport pool
+        trid = self._transportPool.add(clientTransport)
+        if not trid:
+          return trid, None
+        # The authorization changes the credentials in place: each proposal starts from a copy of these
+        self._transportPool.associateData(trid, 'handshakeCredentials',
+                                          dict(clientTransport.getConnectingCredentials()))
+      return trid, self._processRequest(trid)
     finally:
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring(*monReport)
 
+  def __keepConnection(self, trid, clientTransport, result):
+    """
+    Wait for the next proposal on a connection if it was agreed to keep it open.
+
+    The connection is watched by the reactor if there is one: no thread waits for it.
+    Otherwise this thread waits up to ConnectionIdleTimeout seconds for the next proposal,
+    and gives up as soon as there are connections waiting for a thread.
+
+    :param str trid: transport ID
+    :param clientTransport: transport of the connection
+    :param result: result of the previous request
+    """
+    while result and result.get('keepConnection'):
+      if self.__connectionWatcher:
+        self.__connectionWatcher(clientTransport,
+                                 functools.partial(self.__keptConnectionEvent, trid),
+                                 self._cfg.getConnectionIdleTimeout())
+        return
+      if not self.__waitForNextRequest(clientTransport):
+        self._transportPool.close(trid)
+        return
+      trid, result = self.__processLockedRequest(clientTransport, trid)
+
+  def __keptConnectionEvent(self, trid, clientTransport, readable):
+    """
+    Called by the connection watcher when a kept connection is readable or was idle for too long
+
+    :param str trid: transport ID
+    :param clientTransport: transport of the connection
+    :param bool readable: True if there is a new proposal to process
+    """
+    if not readable:
+      self._transportPool.close(trid)
+      return
+    self._threadPool.generateJobAndQueueIt(self._processKeptConnection,
+                                           args=(trid, clientTransport))
+
+  def _processRequest(self, trid):
+    """
+    Receive a proposal on an opened connection, check it and execute it
+
+    :param str trid: transport ID
+
+    :return: the result of _processProposal, or None if the proposal was refused
+    """
+    # Duration of each phase, completed by the authorization and the handler
+    startTime = time.time()
+    phaseTimes = {}
+    self._transportPool.associateData(trid, 'phaseTimes', phaseTimes)
+    # Reads of the DB replicas see the writes of the request only
+    startRequest()
+    # Receive and check proposal
+    result = self._receiveAndCheckProposal(trid)
+    if not result['OK']:
+      self._transportPool.sendAndClose(trid, result)
+      return
+    proposalTuple = result['Value']
+    phaseTimes['proposal'] = time.time() - startTime - phaseTimes.get('authorization', 0)
+    # Instantiate handler
+    phaseStartTime = time.time()
+    result = self._instantiateHandler(trid, proposalTuple)
+    if not result['OK']:
+      self._transportPool.sendAndClose(trid, result)
+      return
+    handlerObj = result['Value']
+    phaseTimes['instantiation'] = time.time() - phaseStartTime
+    # Execute the action
+    result = self._processProposal(trid, proposalTuple, handlerObj)
+    phaseTimes['total'] = time.time() - startTime
+    self._latencyStats.record(self._getLatencyKey(proposalTuple[1]), phaseTimes)
+    # Close the connection if required
+    if result['closeTransport'] or not result['OK']:
+      if not result['OK']:
+        gLogger.error("Error processing proposal", result['Message'])
+      self._transportPool.close(trid)
+    return result
+
+  def _getLatencyKey(self, actionTuple):
+    """
+    Get the name under which the latencies of an action are recorded.
+    The action names come from the clients: the ones not exported by the handler are recorded together
+
+    :param tuple actionTuple: action type and name
+
+    :return: str
+    """
+    actionType, actionName = actionTuple[0], actionTuple[1]
+    if actionType == "FileTransfer" and actionName:
+      actionName = actionName[0].lower() + actionName[1:]
+    if actionName in self._actions['methods'].get(actionType, []):
+      return "/".join(actionTuple)
+    return "unknown"
+
+  def __waitForNextRequest(self, clientTransport):
+    """
+    Wait for the client to send a new proposal on a connection kept open
+
+    :param clientTransport: transport of the connection
+
+    :return: True if there is data to read
+    """
+    endTime = time.time() + self._cfg.getConnectionIdleTimeout()
+    while True:
+      # Do not keep a thread idle while other connections wait for one
+      if self._threadPool.pendingJobs():
+        return False
+      remaining = endTime - time.time()
+      if remaining <= 0:
+        return False
+      if clientTransport.waitForData(min(0.5, remaining)):
+        return True
+
   def _createIdentityString(self, credDict, clientTransport=None):
     if 'username' in credDict:
       if 'group' in credDict:
@@ -447,22 +623,40 @@ class Service(object):
       identity += "(%s)" % credDict['DN']
     return identity
 
+  def __resetCredentials(self, trid, clientTransport):
+    """
+    Give the transport a fresh copy of the peer credentials obtained in the handshake,
+    without the changes done by the authorization of a previous proposal on the connection
+
+    :param str trid: transport ID
+    :param clientTransport: transport of the connection
+
+    :return: dict with the credentials
+    """
+    handshakeCredentials = self._transportPool.getAssociatedData(trid, 'handshakeCredentials')
+    if handshakeCredentials is not None:
+      clientTransport.setConnectingCredentials(dict(handshakeCredentials))
+    return clientTransport.getConnectingCredentials()
+
   def _receiveAndCheckProposal(self, trid):
     clientTransport = self._transportPool.get(trid)
     # Get the peer credentials
-    credDict = clientTransport.getConnectingCredentials()
+    credDict = self.__resetCredentials(trid, clientTransport)
     # Receive the action proposal
     retVal = clientTransport.receiveData(1024)
     if not retVal['OK']:
+      if self._transportPool.getAssociatedData(trid, 'keepConnection'):
+        # Clients close the connections kept open when they do not need them anymore
+        gLogger.debug("Kept connection closed by client", retVal['Message'])
+        return S_ERROR("Connection closed")
       gLogger.error("Invalid action proposal", "%s %s" % (self._createIdentityString(credDict,
                                                                                      clientTransport),
                                                           retVal['Message']))
       return S_ERROR("Invalid action proposal")
     proposalTuple = retVal['Value']
     gLogger.debug("Received action from client", "/".join(list(proposalTuple[1])))
-    # Check if there are extra credentials
-    if proposalTuple[2]:
-      clientTransport.setExtraCredentials(proposalTuple[2])
+    # Set the extra credentials of this proposal
+    clientTransport.setExtraCredentials(proposalTuple[2])
     # Check if this is the requested service
     requestedService = proposalTuple[0][0]
     if requestedService not in self._validNames:
@@ -472,9 +666,23 @@ class Service(object):
     if requestedActionType not in Service.SVC_VALID_ACTIONS:
       return S_ERROR("%s is not a known action type" % requestedActionType)
     # Check if it's authorized
+    startTime = time.time()
     result = self._authorizeProposal(proposalTuple[1], trid, credDict)
+    phaseTimes = self._transportPool.getAssociatedData(trid, 'phaseTimes')
+    if phaseTimes is not None:
+      phaseTimes['authorization'] = time.time() - startTime
     if not result['OK']:
       return result
+    # The 5th element holds the client capabilities if available
+    capabilities = proposalTuple[4] if len(proposalTuple) > 4 else {}
+    if capabilities and self._cfg.getWireCompression():
+      compression = clientTransport.negotiateWireCompression(capabilities.get('wireCompression', []))
+      if compression:
+        gLogger.debug("Negotiated wire compression", compression)
+    # Only RPC connections can be kept open for the next proposal
+    keepConnection = bool(capabilities.get('keepConnection') and requestedActionType == 'RPC' and
+                          self._cfg.getConnectionIdleTimeout())
+    self._transportPool.associateData(trid, 'keepConnection', keepConnection)
     #Proposal is OK
     return S_OK(proposalTuple)
 
@@ -564,8 +772,17 @@ class Service(object):
     return S_OK(handlerInstance)
 
   def _processProposal(self, trid, proposalTuple, handlerObj):
-    # Notify the client we're ready to execute the action
-    retVal = self._transportPool.send(trid, S_OK())
+    # Notify the client we're ready to execute the action,
+    # with the wire compression and connection keeping if agreed on
+    agreements = {}
+    clientTransport = self._transportPool.get(trid)
+    if clientTransport and clientTransport.getWireCompression():
+      agreements['wireCompression'] = clientTransport.getWireCompression()
+    keepConnection = self._transportPool.getAssociatedData(trid, 'keepConnection')
+    if keepConnection:
+      agreements['keepConnection'] = self._cfg.getConnectionIdleTimeout()
+    readyMsg = S_OK(agreements) if agreements else S_OK()
+    retVal = self._transportPool.send(trid, readyMsg)
     if not retVal['OK']:
       return retVal
 
@@ -594,6 +811,9 @@ class Service(object):
         self._msgBroker.removeTransport(trid)
 
     result['closeTransport'] = not messageConnection or not result['OK']
+    if keepConnection and result['OK'] and not messageConnection:
+      result['closeTransport'] = False
+      result['keepConnection'] = True
     return result
 
   def _mbConnect(self, trid, handlerObj=None):
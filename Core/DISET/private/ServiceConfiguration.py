@@ -130,6 +130,24 @@ class ServiceConfiguration:
     self.setURL( serviceURL )
     return serviceURL
 
+  def getConnectionIdleTimeout( self ):
+    try:
+      return max( 0, int( self.getOption( "ConnectionIdleTimeout" ) ) )
+    except:
+      return 5
+
+  def getResponseCacheSize( self ):
+    try:
+      return max( 0, int( self.getOption( "ResponseCacheSize" ) ) )
+    except:
+      return 1000
+
+  def getWireCompression( self ):
+    optionValue = self.getOption( "WireCompression" )
+    if optionValue is None:
+      return True
+    return optionValue.lower() in ( "y", "yes", "true", "1" )
+
   def getContextLifeTime( self ):
     optionValue = self.getOption( "ContextLifeTime" )
     try:
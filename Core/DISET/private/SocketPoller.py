@@ -0,0 +1,143 @@
+""" SocketPoller waits for sockets to become readable using the best mechanism
+    available on the platform: epoll, then poll, then select.
+
+    Unlike select, the cost of a wakeup with epoll does not depend on the number of
+    sockets being watched and there is no FD_SETSIZE limit, so a process can watch
+    tens of thousands of idle connections.
+
+    Sockets are registered once and stay registered until they are unregistered:
+    there is no need to rebuild the list of sockets before each wait.
+    Readiness is level triggered: the DISET transports are blocking and read one
+    message at a time, so a socket with pending data is reported again by the next poll.
+"""
+
+__RCSID__ = "$Id$"
+
+import errno
+import select
+import threading
+
+
+class SocketPoller(object):
+  """ Registry of sockets to watch for reading, each one with associated data
+  """
+
+  def __init__(self, backend=None):
+    """ c'tor
+
+        :param backend: "epoll", "poll" or "select". By default the best available one
+    """
+    if not backend:
+      for backend in ('epoll', 'poll', 'select'):
+        if hasattr(select, backend):
+          break
+    self.backend = backend
+    self.__lock = threading.Lock()
+    # fd -> ( socket, data )
+    self.__registered = {}
+    self.__poller = None
+    if backend == 'epoll':
+      self.__poller = select.epoll()
+      self.__readMask = select.EPOLLIN | select.EPOLLPRI | select.EPOLLERR | select.EPOLLHUP
+    elif backend == 'poll':
+      self.__poller = select.poll()
+      self.__readMask = select.POLLIN | select.POLLPRI | select.POLLERR | select.POLLHUP
+    elif backend != 'select':
+      raise ValueError("Unknown poller backend %s" % backend)
+
+  def __len__(self):
+    return len(self.__registered)
+
+  def register(self, sock, data=None):
+    """ Watch a socket
+
+        :param sock: socket or any object with a fileno method
+        :param data: returned by poll when the socket is readable
+    """
+    fd = sock.fileno()
+    with self.__lock:
+      if self.__poller is not None:
+        try:
+          self.__poller.register(fd, self.__readMask)
+        except (IOError, OSError) as e:
+          if e.errno != errno.EEXIST:
+            raise
+          self.__poller.modify(fd, self.__readMask)
+      self.__registered[fd] = (sock, data)
+
+  def unregister(self, sock):
+    """ Stop watching a socket. Unknown sockets are ignored
+
+        :param sock: socket or any object with a fileno method
+    """
+    try:
+      fd = sock.fileno()
+    except Exception:  # pylint: disable=broad-except
+      fd = -1
+    if fd < 0:
+      # The socket is already closed: look for it
+      with self.__lock:
+        fds = [fd for fd in self.__registered if self.__registered[fd][0] is sock]
+      for fd in fds:
+        self.__unregisterFD(fd)
+      return
+    self.__unregisterFD(fd)
+
+  def __unregisterFD(self, fd):
+    with self.__lock:
+      if self.__registered.pop(fd, None) is None:
+        return
+      if self.__poller is not None:
+        try:
+          self.__poller.unregister(fd)
+        except (IOError, OSError, KeyError, ValueError):
+          # The fd was closed, the kernel already forgot it
+          pass
+
+  def getData(self, sock):
+    """ Get the data associated to a registered socket
+
+        :return: the data or None if the socket is not registered
+    """
+    return self.__registered.get(sock.fileno(), (None, None))[1]
+
+  def poll(self, timeout):
+    """ Wait for registered sockets to become readable
+
+        :param timeout: maximum time to wait in seconds
+
+        :return: list of ( socket, data ) for the readable sockets
+    """
+    try:
+      if self.__poller is None:
+        with self.__lock:
+          sockets = [sockData[0] for sockData in self.__registered.itervalues()]
+        if not sockets:
+          # select does not wait without sockets
+          select.select([], [], [], timeout)
+          return []
+        inList, _outList, _exList = select.select(sockets, [], [], timeout)
+        fds = [sock.fileno() for sock in inList]
+      elif self.backend == 'epoll':
+        fds = [event[0] for event in self.__poller.poll(timeout)]
+      else:
+        fds = [event[0] for event in self.__poller.poll(int(timeout * 1000))]
+    except (select.error, IOError, OSError) as e:
+      if e.args and e.args[0] == errno.EINTR:
+        return []
+      raise
+    ready = []
+    with self.__lock:
+      for fd in fds:
+        if fd in self.__registered:
+          ready.append(self.__registered[fd])
+    return ready
+
+  def close(self):
+    """ Forget all the sockets and release the poller
+    """
+    with self.__lock:
+      self.__registered = {}
+      if self.__poller is not None and self.backend == 'epoll':
+        self.__poller.close()
+      self.__poller = None
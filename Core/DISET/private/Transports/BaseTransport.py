@@ -22,6 +22,7 @@ __RCSID__ = "$Id$"
 
 import time
 import select
+import zlib
 import cStringIO
 from hashlib import md5
 
@@ -41,6 +42,13 @@ class BaseTransport(object):
   iListenQueueSize = 128
   iReadTimeout = 600
   keepAliveMagic = "dka"
+  # Wire compressions this transport can negotiate with its peer, by order of preference
+  wireCompressions = ('zlib',)
+  # Marks a compressed message. DEncode data never starts with it
+  compressedDataMagic = "Z"
+  # Once negotiated, encoded messages bigger than this are compressed
+  wireCompressionThreshold = 65536
+  wireCompressionLevel = 1
 
   def __init__(self, stServerAddress, bServerMode=False, **kwargs):
     self.bServerMode = bServerMode
@@ -57,6 +65,7 @@ class BaseTransport(object):
     self.sentKeepAlives = 0
     self.waitingForKeepAlivePong = False
     self.__keepAliveLapse = 0
+    self.__wireCompression = None
     self.oSocket = None
     if 'keepAliveLapse' in kwargs:
       try:
@@ -76,6 +85,31 @@ class BaseTransport(object):
   def getKeepAliveLapse(self):
     return self.__keepAliveLapse
 
+  def negotiateWireCompression(self, proposedCompressions):
+    """ Select the first of the compressions proposed by the peer that
+        this transport supports, and use it for the messages sent from now on
+
+        :param proposedCompressions: list of compression names proposed by the peer
+
+        :return: the name of the selected compression or None
+    """
+    for compression in proposedCompressions:
+      if compression in self.wireCompressions:
+        self.__wireCompression = compression
+        return compression
+    return None
+
+  def setWireCompression(self, compression):
+    """ Use the compression agreed with the peer for the messages sent from now on
+    """
+    if compression not in self.wireCompressions:
+      return S_ERROR("Unknown wire compression %s" % compression)
+    self.__wireCompression = compression
+    return S_OK()
+
+  def getWireCompression(self):
+    return self.__wireCompression
+
   def handshake(self):
     """ This method is overwritten by SSLTransport if we use a secured transport.
     """
@@ -118,8 +152,18 @@ class BaseTransport(object):
     """
     return self.peerCredentials
 
+  def setConnectingCredentials(self, credDict):
+    """ Replace the credentials of the peer, e.g. by a copy of the ones obtained in the handshake
+
+    :param dict credDict: credentials
+    """
+    self.peerCredentials = credDict
+
   def setExtraCredentials(self, group):
-    self.peerCredentials['extraCredentials'] = group
+    if group:
+      self.peerCredentials['extraCredentials'] = group
+    else:
+      self.peerCredentials.pop('extraCredentials', None)
 
   def serverMode(self):
     return self.bServerMode
@@ -141,6 +185,21 @@ class BaseTransport(object):
       return True
     return False
 
+  def waitForData(self, timeout):
+    """ Wait for data to be available for reading
+
+        :param timeout: maximum time to wait in seconds
+
+        :return: True if there is something to read (or the peer closed the connection)
+    """
+    if self.byteStream or self.receivedMessages:
+      return True
+    try:
+      inList, _outList, _exList = select.select([self.oSocket], [], [], timeout)
+    except (select.error, ValueError):
+      return True
+    return self.oSocket in inList
+
   def _read(self, bufSize=4096, skipReadyCheck=False):
     try:
       if skipReadyCheck or self._readReady():
@@ -160,6 +219,8 @@ class BaseTransport(object):
   def sendData(self, uData, prefix=False):
     self.__updateLastActionTimestamp()
     sCodedData = DEncode.encode(uData)
+    if self.__wireCompression and len(sCodedData) > self.wireCompressionThreshold:
+      sCodedData = self.compressedDataMagic + zlib.compress(sCodedData, self.wireCompressionLevel)
     if prefix:
       dataToSend = "%s%s:%s" % (prefix, len(sCodedData), sCodedData)
     else:
@@ -249,6 +310,14 @@ class BaseTransport(object):
           pkgMem.seek(0, 0)
           data = pkgMem.read(pkgSize)
           self.byteStream = pkgMem.read()
+      if data[:1] == self.compressedDataMagic:
+        decompressor = zlib.decompressobj()
+        try:
+          data = decompressor.decompress(data[1:], maxBufferSize)
+        except zlib.error as e:
+          return S_ERROR("Could not decompress received data: %s" % str(e))
+        if decompressor.unconsumed_tail:
+          return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
       try:
         data = DEncode.decode(data)[0]
       except Exception as e:
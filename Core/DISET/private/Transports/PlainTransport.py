@@ -95,12 +95,14 @@ class PlainTransport(BaseTransport):
       timeout = self.extraArgsDict['timeout']
     if timeout:
       start = time.time()
+    # Resending the unsent part of the buffer does not copy it
+    view = memoryview(buf)
     while sentBytes < len(buf):
       try:
         if timeout:
           if time.time() - start > timeout:
             return S_ERROR("Socket write timeout exceeded")
-        sent = self.oSocket.send(buf[sentBytes:])
+        sent = self.oSocket.send(view[sentBytes:])
         if sent == 0:
           return S_ERROR("Connection closed by peer")
         if sent > 0:
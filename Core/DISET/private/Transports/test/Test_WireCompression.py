@@ -0,0 +1,71 @@
+""" Test the negotiated compression of the messages sent by the transports """
+
+import socket
+import threading
+
+from pytest import fixture
+
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+
+# Big enough to be compressed, and highly compressible
+BIG_MESSAGE = {'OK': True, 'Value': dict(('/lfn/%s' % i, ['SE-1', 'SE-2']) for i in xrange(10000))}
+SMALL_MESSAGE = {'OK': True, 'Value': 'Who let the dog out'}
+
+
+@fixture
+def transportPair():
+  """ Returns two transports connected to each other """
+  sockA, sockB = socket.socketpair()
+  transportA = PlainTransport(('', 0))
+  transportB = PlainTransport(('', 0))
+  transportA.oSocket = sockA
+  transportB.oSocket = sockB
+  yield transportA, transportB
+  transportA.close()
+  transportB.close()
+
+
+def sendAndReceive(sender, receiver, message, maxBufferSize=0):
+  """ Send the message from a thread and return what the receiver got """
+  sendResult = {}
+  sendThread = threading.Thread(target=lambda: sendResult.update(sender.sendData(message)))
+  sendThread.start()
+  received = receiver.receiveData(maxBufferSize)
+  sendThread.join()
+  assert sendResult['OK']
+  return received
+
+
+def test_negotiation():
+  """ The first proposed compression known by the transport is selected """
+  transport = PlainTransport(('', 0))
+  assert transport.getWireCompression() is None
+  assert transport.negotiateWireCompression(['lz4']) is None
+  assert transport.getWireCompression() is None
+  assert transport.negotiateWireCompression(['lz4', 'zlib']) == 'zlib'
+  assert transport.getWireCompression() == 'zlib'
+  assert not transport.setWireCompression('lz4')['OK']
+
+
+def test_uncompressed(transportPair):
+  """ Without negotiation, messages go as plain DEncode """
+  sender, receiver = transportPair
+  assert sendAndReceive(sender, receiver, BIG_MESSAGE) == BIG_MESSAGE
+
+
+def test_compressed(transportPair):
+  """ Once negotiated, big messages are compressed and small ones are not """
+  sender, receiver = transportPair
+  sender.setWireCompression('zlib')
+  assert sendAndReceive(sender, receiver, BIG_MESSAGE) == BIG_MESSAGE
+  assert sendAndReceive(sender, receiver, SMALL_MESSAGE) == SMALL_MESSAGE
+
+
+def test_compressedReadLimit(transportPair):
+  """ The read limit applies to the decompressed data """
+  sender, receiver = transportPair
+  sender.setWireCompression('zlib')
+  result = sendAndReceive(sender, receiver, BIG_MESSAGE, maxBufferSize=100000)
+  assert not result['OK']
+  assert 'Read limit exceeded' in result['Message']
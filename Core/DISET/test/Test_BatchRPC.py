@@ -0,0 +1,83 @@
+""" Unit tests for the concurrent RPC calls: RPCClient.callAsync and BatchRPC
+"""
+
+import threading
+import time
+
+import pytest
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET import RPCClient as moduleRPCClient
+from DIRAC.Core.DISET.RPCClient import RPCClient, BatchRPC
+
+__RCSID__ = "$Id$"
+
+
+class FakeInnerRPCClient(object):
+  """ Replaces the InnerRPCClient: echoes the calls and counts the concurrent ones """
+
+  lock = threading.Lock()
+  inProgress = 0
+  maxInProgress = 0
+  instances = []
+
+  def __init__(self, *args, **kwargs):
+    self.thread = threading.current_thread()
+    FakeInnerRPCClient.instances.append(self)
+
+  def executeRPC(self, functionName, args):
+    # Each client is used by a single thread
+    assert threading.current_thread() is self.thread
+    with FakeInnerRPCClient.lock:
+      FakeInnerRPCClient.inProgress += 1
+      FakeInnerRPCClient.maxInProgress = max(FakeInnerRPCClient.maxInProgress, FakeInnerRPCClient.inProgress)
+    try:
+      time.sleep(0.01)
+      if functionName == 'fail':
+        return S_ERROR("Failed")
+      if functionName == 'crash':
+        raise RuntimeError("Crashed")
+      return S_OK((functionName, args))
+    finally:
+      with FakeInnerRPCClient.lock:
+        FakeInnerRPCClient.inProgress -= 1
+
+
+@pytest.fixture
+def fakeInnerRPCClient(mocker):
+  mocker.patch.object(moduleRPCClient, 'InnerRPCClient', FakeInnerRPCClient)
+  FakeInnerRPCClient.inProgress = 0
+  FakeInnerRPCClient.maxInProgress = 0
+  FakeInnerRPCClient.instances = []
+  yield FakeInnerRPCClient
+
+
+def test_batchRPC(fakeInnerRPCClient):
+  """ The calls are executed concurrently, within the limit """
+  with BatchRPC('Test/Service', maxParallel=4) as batch:
+    futures = [batch.echo(nb) for nb in range(40)]
+  assert all(future.done() for future in futures)
+  assert [future.result()['Value'] for future in futures] == [('echo', (nb,)) for nb in range(40)]
+  assert 1 < fakeInnerRPCClient.maxInProgress <= 4
+  # One client per thread, not per call
+  assert len(fakeInnerRPCClient.instances) <= 4
+
+
+def test_batchRPCErrors(fakeInnerRPCClient):
+  """ Errors and exceptions are returned as S_ERROR """
+  with BatchRPC('Test/Service', maxParallel=2) as batch:
+    results = batch.map('fail', [(), ()])
+    assert [result['OK'] for result in results] == [False, False]
+    result = batch.call('crash').result()
+    assert not result['OK']
+    assert 'Crashed' in result['Message']
+    batch.echo(1)
+    assert batch.waitAll()
+
+
+def test_callAsync(fakeInnerRPCClient):
+  """ callAsync executes the call in another thread """
+  rpcClient = RPCClient('Test/Service')
+  future = rpcClient.callAsync('echo', 1, 2)
+  assert future.result() == S_OK(('echo', (1, 2)))
+  assert fakeInnerRPCClient.instances[-1].thread is not threading.current_thread()
@@ -0,0 +1,74 @@
+""" Unit tests for the client ConnectionPool
+"""
+
+import socket
+import time
+
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+__RCSID__ = "$Id$"
+
+KEY = ('dips://server:1234/Test/Service', None)
+
+
+def getTransport(address=('server', 1234)):
+  """ Returns a connected client transport, and the socket of its peer """
+  clientSock, serverSock = socket.socketpair()
+  transport = PlainTransport(address)
+  transport.oSocket = clientSock
+  return transport, serverSock
+
+
+def test_reuse():
+  """ A connection given back is reused for the same key only """
+  pool = ConnectionPool()
+  transport, _peer = getTransport()
+  assert pool.checkout(KEY) is None
+  pool.checkin(KEY, transport)
+  assert pool.checkout(('otherKey',)) is None
+  assert pool.checkout(KEY) is transport
+  assert pool.checkout(KEY) is None
+  stats = pool.getStats()
+  assert stats['hits'] == 1
+  assert stats['misses'] == 3
+  assert stats['idle'] == 0
+
+
+def test_closedByPeer():
+  """ A connection closed by the service is not reused """
+  pool = ConnectionPool()
+  transport, peer = getTransport()
+  pool.checkin(KEY, transport)
+  peer.close()
+  assert pool.checkout(KEY) is None
+  assert pool.getStats()['evictions'] == 1
+
+
+def test_expiration():
+  """ Connections are not kept longer than the service keeps them """
+  pool = ConnectionPool(maxIdleTime=10)
+  transport, _peer = getTransport()
+  pool.checkin(KEY, transport, lifeTime=1)
+  assert pool.getStats()['idle'] == 0
+  transport, _peer = getTransport()
+  pool.checkin(KEY, transport, lifeTime=1.1)
+  assert pool.getStats()['idle'] == 1
+  time.sleep(0.2)
+  assert pool.evictExpired() == 1
+  assert pool.checkout(KEY) is None
+
+
+def test_hostLimit():
+  """ The number of idle connections per host is bounded """
+  pool = ConnectionPool(maxConnectionsPerHost=2)
+  peers = []
+  for _ in xrange(3):
+    transport, peer = getTransport()
+    peers.append(peer)
+    pool.checkin(KEY, transport)
+  transport, peer = getTransport(('otherServer', 1234))
+  pool.checkin(KEY, transport)
+  stats = pool.getStats()
+  assert stats['idle'] == 3
+  assert stats['evictions'] == 1
@@ -0,0 +1,119 @@
+""" Unit tests for the FileHelper transfers, between two FileHelpers
+    connected by an in-memory transport
+"""
+
+import hashlib
+import os
+import Queue
+import threading
+import cStringIO
+
+import pytest
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.FileHelper import FileHelper
+
+__RCSID__ = "$Id$"
+
+
+class FakeTransport(object):
+  """ One end of an in-memory connection """
+
+  def __init__(self, inQueue, outQueue):
+    self.inQueue = inQueue
+    self.outQueue = outQueue
+
+  def sendData(self, uData):
+    self.outQueue.put(uData)
+    return S_OK()
+
+  def receiveData(self, maxBufferSize=0):
+    return self.inQueue.get(timeout=10)
+
+
+def transfer(sendFunction, receiveFunction):
+  """ Run the sender in a thread and the receiver in the current one
+
+      :return: ( sender result, receiver result )
+  """
+  toReceiver = Queue.Queue()
+  toSender = Queue.Queue()
+  sender = FileHelper(FakeTransport(toSender, toReceiver))
+  receiver = FileHelper(FakeTransport(toReceiver, toSender))
+  sendResult = []
+  thread = threading.Thread(target=lambda: sendResult.append(sendFunction(sender)))
+  thread.start()
+  receiveResult = receiveFunction(receiver)
+  thread.join()
+  return sendResult[0], receiveResult, sender, receiver
+
+
+@pytest.mark.parametrize("size", [0, 10, 1048576, 3 * 1048576 + 17])
+def test_fdToNetwork(tmpdir, size):
+  """ A file is received as it was sent, with its checksum """
+  data = os.urandom(size)
+  path = str(tmpdir.join('file'))
+  with open(path, 'wb') as fd:
+    fd.write(data)
+  sink = cStringIO.StringIO()
+  with open(path, 'rb') as fd:
+    sendResult, receiveResult, sender, receiver = transfer(lambda helper: helper.FDToNetwork(fd.fileno()),
+                                                           lambda helper: helper.networkToDataSink(sink))
+  assert sendResult['OK'], sendResult
+  assert receiveResult['OK'], receiveResult
+  assert sink.getvalue() == data
+  assert sender.getHash() == receiver.getHash() == hashlib.md5(data).hexdigest()
+  assert sender.getTransferedBytes() == receiver.getTransferedBytes() == size
+
+
+def test_maxFileSize():
+  """ The receiver stops the transfer of a file too big """
+  data = os.urandom(3 * 1048576)
+  sendResult, receiveResult, _sender, _receiver = transfer(lambda helper: helper.BufferToNetwork(data),
+                                                           lambda helper: helper.networkToString(1048576))
+  assert not receiveResult['OK']
+  assert 'maximum size' in receiveResult['Message']
+  assert not sendResult['OK']
+
+
+def test_readError():
+  """ Errors reading the source are reported by the sender """
+  class FailingSource(object):
+    """ Fails after the first chunk """
+
+    def __init__(self):
+      self.calls = 0
+
+    def read(self, size):
+      self.calls += 1
+      if self.calls > 1:
+        raise IOError("Disk error")
+      return 'x' * size
+
+  source = FailingSource()
+
+  def receive(helper):
+    # Consume the first chunk, the sender fails on the next one
+    return helper.receiveData()
+
+  sendResult, receiveResult, _sender, _receiver = transfer(lambda helper: helper.DataSourceToNetwork(source),
+                                                           receive)
+  assert receiveResult['OK']
+  assert not sendResult['OK']
+  assert 'Disk error' in sendResult['Message']
+
+
+@pytest.mark.parametrize("compress", [False, True, "gz"])
+def test_bulk(tmpdir, compress):
+  """ Bulks are extracted as they are received, whatever their compression """
+  source = tmpdir.mkdir('source')
+  source.join('small').write('small')
+  source.mkdir('sub').join('big').write_binary(os.urandom(3 * 1048576))
+  destination = tmpdir.mkdir('destination')
+  sendResult, receiveResult, _sender, _receiver = transfer(
+      lambda helper: helper.bulkToNetwork([str(source)], compress=compress),
+      lambda helper: helper.networkToBulk(str(destination)))
+  assert sendResult['OK'], sendResult
+  assert receiveResult['OK'], receiveResult
+  assert destination.join('source', 'small').read() == 'small'
+  assert destination.join('source', 'sub', 'big').read_binary() == source.join('sub', 'big').read_binary()
@@ -0,0 +1,46 @@
+""" Unit tests for the latency histograms of the services
+"""
+
+import pytest
+
+from DIRAC.Core.DISET.private.LatencyStats import LatencyHistogram, LatencyStats
+
+__RCSID__ = "$Id$"
+
+
+def test_percentiles():
+  """ Percentiles are within the bucket precision """
+  histogram = LatencyHistogram()
+  assert histogram.percentile(50) == 0.
+  for value in xrange(1, 1001):
+    histogram.add(value / 1000.)
+  summary = histogram.getSummary()
+  assert summary['count'] == 1000
+  assert summary['max'] == 1.
+  assert summary['mean'] == pytest.approx(0.5005)
+  for percentile, expected in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+    assert expected <= summary[percentile] <= expected * LatencyHistogram.bucketRatio
+  # Tiny durations go in the first bucket
+  histogram = LatencyHistogram()
+  histogram.add(0)
+  assert histogram.percentile(99) == 0.
+
+
+def test_latencyStats():
+  """ Durations are kept by action and phase, and by period """
+  stats = LatencyStats()
+  stats.record('RPC/getJobs', {'execution': 0.2, 'total': 0.3})
+  stats.record('RPC/getJobs', {'execution': 0.4, 'total': 0.5})
+  stats.record('RPC/ping', {'total': 0.01})
+  summary = stats.getSummary()
+  assert sorted(summary) == ['RPC/getJobs', 'RPC/ping']
+  assert sorted(summary['RPC/getJobs']) == ['execution', 'total']
+  assert summary['RPC/getJobs']['total']['count'] == 2
+  assert summary['RPC/getJobs']['total']['max'] == 0.5
+  assert stats.popPeriodSummary() == summary
+  stats.record('RPC/ping', {'total': 0.02})
+  periodSummary = stats.popPeriodSummary()
+  assert list(periodSummary) == ['RPC/ping']
+  assert periodSummary['RPC/ping']['total']['count'] == 1
+  assert stats.popPeriodSummary() == {}
+  assert stats.getSummary()['RPC/ping']['total']['count'] == 2
@@ -0,0 +1,78 @@
+""" Unit tests for the streaming RPC actions of the RequestHandler
+"""
+
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.RequestHandler import RequestHandler
+
+__RCSID__ = "$Id$"
+
+
+class StreamHandler(RequestHandler):
+  """ Handler with a few stream methods """
+
+  types_stream_numbers = [int]
+
+  def stream_numbers(self, nbChunks):
+    return S_OK([i] * 3 for i in xrange(nbChunks))
+
+  types_stream_failing = []
+
+  def stream_failing(self):
+    return S_ERROR("No way")
+
+  types_stream_broken = []
+
+  def stream_broken(self):
+    def chunks():
+      yield 1
+      raise ValueError("Broken")
+    return S_OK(chunks())
+
+
+def executeStream(method, args):
+  """ Run the stream action and return the messages sent to the client """
+  trPool = MagicMock()
+  trPool.receive.return_value = S_OK(args)
+  trPool.send.return_value = S_OK()
+  msgBroker = MagicMock()
+  msgBroker.getTransportPool.return_value = trPool
+  StreamHandler._rh__initializeClass({'serviceName': 'Test/Stream', 'csPaths': []},
+                                     MagicMock(), msgBroker, MagicMock())
+  handler = StreamHandler({}, 1)
+  result = handler._rh_executeAction((('Test/Stream', 'Setup', 'VO'), ('Stream', method), '', 'v'))
+  assert result['OK']
+  return [call[0][1] for call in trPool.send.call_args_list]
+
+
+def test_stream():
+  """ Each chunk is sent on its own, then the end of stream """
+  messages = executeStream('numbers', (3,))
+  assert [message['Value'] for message in messages[:-1]] == [[0] * 3, [1] * 3, [2] * 3]
+  assert all(message['OK'] and 'EndOfStream' not in message for message in messages[:-1])
+  assert messages[-1]['OK']
+  assert messages[-1]['EndOfStream']
+  assert messages[-1]['Value'] == 3
+
+
+def test_streamError():
+  """ An error before streaming is sent as the only message """
+  messages = executeStream('failing', ())
+  assert len(messages) == 1
+  assert not messages[0]['OK']
+
+
+def test_streamException():
+  """ An exception while streaming ends the stream with an error """
+  messages = executeStream('broken', ())
+  assert messages[0] == S_OK(1)
+  assert not messages[-1]['OK']
+  assert len(messages) == 2
+
+
+def test_streamTypeCheck():
+  """ Arguments are checked against types_stream_<method> """
+  messages = executeStream('numbers', ('3',))
+  assert len(messages) == 1
+  assert not messages[0]['OK']
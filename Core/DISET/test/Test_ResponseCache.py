@@ -0,0 +1,98 @@
+""" Unit tests for the ResponseCache of the cacheable RPC methods
+"""
+
+import threading
+import time
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.ResponseCache import ResponseCache
+
+__RCSID__ = "$Id$"
+
+
+class Counter(object):
+  """ Function counting its executions """
+
+  def __init__(self, result=None, delay=0):
+    self.calls = 0
+    self.result = result
+    self.delay = delay
+
+  def __call__(self, value):
+    self.calls += 1
+    time.sleep(self.delay)
+    if self.result is not None:
+      return self.result
+    return S_OK(value)
+
+
+def test_hitAndExpiration():
+  """ Results are served from the cache for their time to live """
+  cache = ResponseCache()
+  func = Counter()
+  assert cache.execute('key', 0.2, func, 1) == S_OK(1)
+  assert cache.execute('key', 0.2, func, 2) == S_OK(1)
+  assert func.calls == 1
+  time.sleep(0.25)
+  assert cache.execute('key', 0.2, func, 3) == S_OK(3)
+  assert func.calls == 2
+  stats = cache.getStats(reset=True)
+  assert (stats['hits'], stats['misses'], stats['coalesced']) == (1, 2, 0)
+  assert round(stats['hitRatio']) == 33
+  assert cache.getStats()['hits'] == 0
+
+
+def test_errorsNotCached():
+  """ Only successful results are kept """
+  cache = ResponseCache()
+  func = Counter(S_ERROR("Failed"))
+  assert not cache.execute('key', 10, func, 1)['OK']
+  assert not cache.execute('key', 10, func, 1)['OK']
+  assert func.calls == 2
+
+
+def test_lru():
+  """ The least recently used result is dropped first """
+  cache = ResponseCache(maxSize=2)
+  func = Counter()
+  cache.execute('a', 10, func, 'a')
+  cache.execute('b', 10, func, 'b')
+  cache.execute('a', 10, func, 'a')
+  cache.execute('c', 10, func, 'c')
+  assert func.calls == 3
+  cache.execute('a', 10, func, 'a')
+  assert func.calls == 3
+  cache.execute('b', 10, func, 'b')
+  assert func.calls == 4
+  assert cache.getStats()['size'] == 2
+
+
+def test_coalescing():
+  """ Identical concurrent requests are executed once """
+  cache = ResponseCache()
+  func = Counter(delay=0.2)
+  results = []
+  threads = [threading.Thread(target=lambda: results.append(cache.execute('key', 0, func, 1)))
+             for _ in range(5)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert func.calls == 1
+  assert results == [S_OK(1)] * 5
+  assert cache.getStats()['coalesced'] == 4
+  # Nothing kept with a null time to live
+  assert cache.getStats()['size'] == 0
+
+
+def test_invalidate():
+  """ Invalidated results are executed again """
+  cache = ResponseCache()
+  func = Counter()
+  cache.execute(('select', 1), 10, func, 1)
+  cache.execute(('other', 1), 10, func, 1)
+  assert cache.invalidate(lambda key: key[0] == 'select') == 1
+  cache.execute(('select', 1), 10, func, 1)
+  cache.execute(('other', 1), 10, func, 1)
+  assert func.calls == 3
+  assert cache.invalidate() == 2
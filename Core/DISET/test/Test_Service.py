@@ -0,0 +1,117 @@
+""" Unit tests for the checks of the proposals received by a Service
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock, patch
+
+from DIRAC import gConfig, S_OK
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.Core.DISET.AuthManager import AuthManager
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
+
+__RCSID__ = "$Id$"
+
+testCFG = """
+Systems
+{
+  Service
+  {
+    Authorization
+    {
+      Method = NormalUser
+    }
+  }
+}
+Registry
+{
+  Users
+  {
+    userA
+    {
+      DN = /User/test/DN/CN=userA
+    }
+  }
+  Hosts
+  {
+    test.hostA.ch
+    {
+      DN = /User/test/DN/CN=test.hostA.ch
+      Properties = TrustedHost
+    }
+  }
+  Groups
+  {
+    group_test
+    {
+      Users = userA
+      Properties = NormalUser
+    }
+  }
+}
+"""
+
+hostDN = '/User/test/DN/CN=test.hostA.ch'
+
+
+def getService(transport):
+  """ Service with a single connection, from the trusted host """
+  cfg = CFG()
+  cfg.loadFromBuffer(testCFG)
+  gConfig.loadCFG(cfg)
+
+  associatedData = {}
+  trPool = MagicMock()
+  trPool.get.return_value = transport
+  trPool.associateData.side_effect = lambda trid, key, value: associatedData.__setitem__(key, value)
+  trPool.getAssociatedData.side_effect = lambda trid, key: associatedData.get(key)
+
+  service = Service.__new__(Service)
+  service._name = 'Test/Service'
+  service._validNames = ['Test/Service']
+  service._transportPool = trPool
+  service._authMgr = AuthManager('/Systems/Service/Authorization')
+  service._actions = {'auth': {}}
+  service._cfg = MagicMock()
+  service._cfg.getWireCompression.return_value = False
+  return service
+
+
+@patch.object(Service, 'SVC_SECLOG_CLIENT', MagicMock())
+def test_forwardedCredentials():
+  """ Each proposal of a kept connection is authorized with the credentials of the handshake """
+  transport = BaseTransport(('localhost', 9135), bServerMode=True)
+  transport.peerCredentials = {'DN': hostDN, 'CN': 'test.hostA.ch', 'isProxy': False}
+  transport.getRemoteAddress = MagicMock(return_value=('127.0.0.1', 4321))
+  transport.receiveData = MagicMock()
+  service = getService(transport)
+  service._transportPool.associateData('trid', 'handshakeCredentials', dict(transport.getConnectingCredentials()))
+
+  for _ in range(2):
+    proposal = (('Test/Service', 'Setup', 'VO'), ('RPC', 'Method'), ('/User/test/DN/CN=userA', 'group_test'), 'v')
+    transport.receiveData.return_value = S_OK(proposal)
+    result = service._receiveAndCheckProposal('trid')
+    assert result['OK'], result
+    credDict = transport.getConnectingCredentials()
+    assert credDict['DN'] == '/User/test/DN/CN=userA'
+    assert credDict['username'] == 'userA'
+
+  # The host calling for itself is not taken for the forwarded user
+  proposal = (('Test/Service', 'Setup', 'VO'), ('RPC', 'Method'), 'hosts', 'v')
+  transport.receiveData.return_value = S_OK(proposal)
+  result = service._receiveAndCheckProposal('trid')
+  assert not result['OK']
+  credDict = transport.getConnectingCredentials()
+  assert credDict['DN'] == hostDN
+  assert credDict['username'] == 'test.hostA.ch'
+
+
+def test_latencyKey():
+  """ The latencies of the actions not exported by the handler are recorded together """
+  service = Service.__new__(Service)
+  service._actions = {'methods': {'RPC': ['getJobs'], 'FileTransfer': ['fromClient']}}
+  assert service._getLatencyKey(('RPC', 'getJobs')) == 'RPC/getJobs'
+  assert service._getLatencyKey(('FileTransfer', 'FromClient')) == 'FileTransfer/FromClient'
+  assert service._getLatencyKey(('RPC', 'noSuchMethod')) == 'unknown'
+  assert service._getLatencyKey(('Connection', 'new')) == 'unknown'
@@ -0,0 +1,59 @@
+""" Unit tests for the SocketPoller
+"""
+
+import select
+import socket
+
+import pytest
+
+from DIRAC.Core.DISET.private.SocketPoller import SocketPoller
+
+__RCSID__ = "$Id$"
+
+BACKENDS = [backend for backend in ('epoll', 'poll', 'select') if hasattr(select, backend)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_readable(backend):
+  """ Only the readable sockets are returned, with their data """
+  poller = SocketPoller(backend)
+  pairs = [socket.socketpair() for _ in range(3)]
+  for nb, (sock, _peer) in enumerate(pairs):
+    poller.register(sock, nb)
+  assert len(poller) == 3
+  assert poller.poll(0) == []
+  pairs[1][1].send("x")
+  assert poller.poll(1) == [(pairs[1][0], 1)]
+  # Level triggered: still readable until read
+  assert poller.poll(0) == [(pairs[1][0], 1)]
+  pairs[1][0].recv(1)
+  assert poller.poll(0) == []
+  poller.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_unregister(backend):
+  """ Unregistered and closed sockets are not watched anymore """
+  poller = SocketPoller(backend)
+  sock, peer = socket.socketpair()
+  poller.register(sock, 'data')
+  # Registering again replaces the data
+  poller.register(sock, 'newData')
+  assert poller.getData(sock) == 'newData'
+  peer.send("x")
+  poller.unregister(sock)
+  assert len(poller) == 0
+  assert poller.poll(0) == []
+  # Unknown sockets are ignored
+  poller.unregister(sock)
+  poller.register(sock, 'data')
+  sock.close()
+  poller.unregister(sock)
+  assert len(poller) == 0
+  poller.close()
+
+
+def test_unknownBackend():
+  """ Only epoll, poll and select are supported """
+  with pytest.raises(ValueError):
+    SocketPoller('kqueue')
@@ -289,9 +289,10 @@ g_dDecodeFunctions['n'] = decodeNone
 def encodeList(lValue, eList):
   """ Encoding list """
 
+  encodeFunctions = g_dEncodeFunctions
   eList.append("l")
   for uObject in lValue:
-    g_dEncodeFunctions[type(uObject)](uObject, eList)
+    encodeFunctions[type(uObject)](uObject, eList)
   eList.append("e")
 
 
@@ -317,9 +318,10 @@ def encodeTuple(lValue, eList):
     print('=' * 45, "Encoding tuples", '=' * 45)
     printDebugCallstack()
 
+  encodeFunctions = g_dEncodeFunctions
   eList.append("t")
   for uObject in lValue:
-    g_dEncodeFunctions[type(uObject)](uObject, eList)
+    encodeFunctions[type(uObject)](uObject, eList)
   eList.append("e")
 
 
@@ -347,10 +349,12 @@ def encodeDict(dValue, eList):
       print('=' * 40, "Encoding dict with numeric keys", '=' * 40)
       printDebugCallstack()
 
+  encodeFunctions = g_dEncodeFunctions
   eList.append("d")
   for key in sorted(dValue):
-    g_dEncodeFunctions[type(key)](key, eList)
-    g_dEncodeFunctions[type(dValue[key])](dValue[key], eList)
+    value = dValue[key]
+    encodeFunctions[type(key)](key, eList)
+    encodeFunctions[type(value)](value, eList)
   eList.append("e")
 
 
@@ -389,13 +393,138 @@ def encode(uObject):
     raise
 
 
+# Marker for a dictionary waiting for its next key
+_NO_KEY = object()
+
+# Types built from the tuple following the datetime identifier
+_dateTimeDecodeTypes = {'a': datetime.datetime, 'd': datetime.date, 't': datetime.time}
+
+
+def _decodeIterative(data, i):
+  """ Single pass decoding of an encoded stream starting at position i.
+
+      Containers are kept on an explicit stack instead of recursing through
+      g_dDecodeFunctions, so that the depth of the structure is not limited by
+      the interpreter recursion limit and no call is done per token for the
+      builtin types. Types registered in g_dDecodeFunctions by third parties
+      are still decoded through their own function.
+
+      :param str data: encoded stream
+      :param int i: position to start decoding at
+
+      :returns: tuple (decoded object, position after the decoded object)
+  """
+  index = data.index
+  decodeFunctions = g_dDecodeFunctions
+  # Container being filled, its type identifier and the append method of
+  # the sequences. A dictionary keeps the key waiting for its value.
+  # A datetime frame has no container: its type is the class to build from the next value.
+  # The enclosing frames are saved on the stack.
+  items = None
+  itemsType = None
+  append = None
+  key = _NO_KEY
+  stack = []
+
+  while True:
+    token = data[i]
+
+    if token == 's':
+      colon = index(':', i + 1)
+      end = colon + 1 + int(data[i + 1:colon])
+      value = data[colon + 1:end]
+      i = end
+    elif token == 'i':
+      end = index('e', i + 1)
+      value = int(data[i + 1:end])
+      i = end + 1
+    elif token == 'd':
+      stack.append((items, itemsType, append, key))
+      items = {}
+      itemsType = 'd'
+      append = None
+      key = _NO_KEY
+      i += 1
+      continue
+    elif token == 'l' or token == 't':
+      stack.append((items, itemsType, append, key))
+      items = []
+      itemsType = token
+      append = items.append
+      i += 1
+      continue
+    elif token == 'e' and (append is not None or itemsType == 'd'):
+      if itemsType == 't':
+        value = tuple(items)
+      else:
+        value = items
+      items, itemsType, append, key = stack.pop()
+      i += 1
+    elif token == 'n':
+      value = None
+      i += 1
+    elif token == 'b':
+      value = data[i + 1] != '0'
+      i += 2
+    elif token == 'u':
+      colon = index(':', i + 1)
+      end = colon + 1 + int(data[i + 1:colon])
+      value = unicode(data[colon + 1:end], 'utf-8')
+      i = end
+    elif token == 'I':
+      end = index('e', i + 1)
+      value = long(data[i + 1:end])
+      i = end + 1
+    elif token == 'z':
+      # The date/time components follow as an encoded tuple
+      dataType = data[i + 1]
+      if dataType not in _dateTimeDecodeTypes:
+        raise Exception("Unexpected type %s while decoding a datetime object" % dataType)
+      stack.append((items, itemsType, append, key))
+      items = None
+      itemsType = _dateTimeDecodeTypes[dataType]
+      append = None
+      i += 2
+      continue
+    else:
+      # Floats need the exponent handling, anything else is a custom type
+      value, i = decodeFunctions[token](data, i)
+
+    # Attach the value to the enclosing container. Datetime frames
+    # turn their tuple into a value that has to be attached in turn.
+    while True:
+      if append is not None:
+        append(value)
+        break
+      elif itemsType == 'd':
+        if key is _NO_KEY:
+          key = value
+        else:
+          items[key] = value
+          key = _NO_KEY
+          # Keys are most of the time strings, read them straight away
+          if data[i] == 's':
+            colon = index(':', i + 1)
+            end = colon + 1 + int(data[i + 1:colon])
+            key = data[colon + 1:end]
+            i = end
+        break
+      elif itemsType is None:
+        return (value, i)
+      value = itemsType(*value)
+      items, itemsType, append, key = stack.pop()
+
+
 def decode(data):
   """ Generic decoding function """
   if not data:
     return data
   try:
     # print "DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ]
-    return g_dDecodeFunctions[data[0]](data, 0)
+    if DIRAC_DEBUG_DENCODE_CALLSTACK:
+      # The per type functions carry the call stack debugging hooks
+      return g_dDecodeFunctions[data[0]](data, 0)
+    return _decodeIterative(data, 0)
   except Exception:
     raise
 
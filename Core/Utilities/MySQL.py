@@ -14,6 +14,15 @@
     connections available from the object.
     maxConnsInQueue = 0 means unlimited and it is not supported.
 
+    With maxConnections > 0, the connections to the server are shared by all the
+    threads (BoundedConnectionPool), at most maxConnections of them: each query takes
+    one and gives it back, the threads waiting for one up to waitTimeout seconds
+    in their order of arrival. getConnectionPoolStats() gives the usage of the pool.
+
+    With replicaHosts, the reads (_query, _queryIter) of the methods decorated with
+    ReplicaRouting.readOnly are executed by a replica lagging less than maxReplicaLag
+    seconds behind the primary, unless the thread wrote in its request.
+
 
     _except( methodName, exception, errorMessage )
 
@@ -39,6 +48,21 @@
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
+    _queryIter( cmd, [batchSize], [columns] )
+
+    Executes SQL command "cmd" with a server side cursor, on a connection of its own.
+    Returns S_OK with an iterator over batches of rows in Value or S_ERROR upon failure.
+    The rows are read from the server while iterating, so that big results are
+    processed in bounded memory. With columns = True, each batch is a list of
+    tuples, one per column, instead of a list of rows.
+
+
+    _queryColumns( cmd )
+
+    Executes SQL command "cmd", returning the result column by column:
+    S_OK with a list of lists, one per column, or S_ERROR upon failure.
+
+
     _update( cmd, [conn] )
 
     Executes SQL command "cmd" and issue a commit
@@ -58,6 +82,8 @@
 
     Gets a connection from the Queue (or open a new one if none is available)
     Returns S_OK with connection in Value or S_ERROR
+    With a bounded pool, the queries of the thread use this connection as long as
+    it is referenced
     the calling method is responsible for closing this connection once it is no
     longer needed.
 
@@ -90,6 +116,22 @@
       String type values will be appropriately escaped.
 
 
+    insertMany( self, tableName, inFields, valuesList, sqlValues = None, updateFields = None,
+                ignore = False, conn = None ):
+
+      Insert the rows of "valuesList" in "tableName", several rows per INSERT statement,
+      splitting them according to the max_allowed_packet of the server.
+      The values are escaped by the MySQLdb literal conversion, sqlValues gives SQL
+      expressions common to all the rows (e.g. {'LastUpdate': 'UTC_TIMESTAMP()'}).
+      updateFields adds an ON DUPLICATE KEY UPDATE of these fields.
+      return S_OK( number of affected rows ), with 'lastRowIds' when the IDs can be known
+
+
+    upsertMany( self, tableName, inFields, valuesList, updateFields = None, sqlValues = None, conn = None ):
+
+      Same as insertMany, updating the rows which already exist
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -149,14 +191,18 @@
 
 from __future__ import print_function
 import collections
+import random
 import time
 import threading
 import MySQLdb
+import MySQLdb.cursors
 
 from DIRAC import gLogger
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Utilities.Time import fromString
 from DIRAC.Core.Utilities import DErrno
+from DIRAC.Core.Utilities.QueryStats import QueryStats
+from DIRAC.Core.Utilities.ReplicaRouting import useReplicas, setWrote
 
 # This is for proper initialization of embedded server, it should only be called once
 try:
@@ -170,6 +216,10 @@ __RCSID__ = "$Id$"
 
 
 MAXCONNECTRETRY = 10
+# Seconds between two checks of the replication lag of a replica
+REPLICACHECKINTERVAL = 30
+# Statements _query can execute on a replica, the others are writes
+READSTATEMENTS = ('SELECT', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN')
 
 
 def _checkFields(inFields, inValues):
@@ -291,6 +341,36 @@ class MySQL(object):
           return S_ERROR(DErrno.EMYSQL, "Could not connect")
       return S_OK(conn)
 
+    def getDedicated(self, dbName):
+      """ Get a connection not assigned to the thread, for a streaming query which
+          keeps it busy until all its rows are read
+      """
+      try:
+        try:
+          conn, lastName = self.__spares.pop()
+        except IndexError:
+          conn, lastName = self.__newConn(), ""
+        if not self.__ping(conn):
+          conn, lastName = self.__newConn(), ""
+        if lastName != dbName:
+          conn.select_db(dbName)
+      except MySQLdb.MySQLError as excp:
+        return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
+      return S_OK(conn)
+
+    def releaseDedicated(self, conn, dbName, reusable=True):
+      """ Give back a connection obtained with getDedicated
+
+          :param bool reusable: False if the connection is not usable anymore (e.g. unread rows)
+      """
+      if reusable and len(self.__spares) < self.__maxSpares:
+        self.__spares.append((conn, dbName))
+        return
+      try:
+        conn.close()
+      except BaseException as exc:
+        gLogger.warn("Exception while closing MySQL connection: %s" % exc)
+
     def __ping(self, conn):
       try:
         conn.ping(True)
@@ -377,13 +457,391 @@ class MySQL(object):
       except MySQLdb.MySQLError as excp:
         return S_ERROR(DErrno.EMYSQL, "Could not rollback transaction: %s" % excp)
 
+    def release(self, thid=None):
+      """ The connections stay assigned to their thread, nothing to release
+      """
+      pass
+
+    def getStats(self, reset=False):
+      """ :return: dict with inUse (connections assigned to threads) and idle (spare connections)
+      """
+      return {'inUse': len(self.__assigned), 'idle': len(self.__spares)}
+
+  class BoundedConnectionPool(object):
+    """
+    Connections shared by all the threads, at most maxConnections of them
+
+    A thread holds a connection while it executes a query, from the start to the end
+    of a transaction, and as long as it keeps a connection given by _getConnection.
+    The threads waiting for a connection are served in their order of arrival,
+    for at most waitTimeout seconds
+
+    The streaming queries (getDedicated) have connections of their own, at most
+    maxConnections of them besides the shared ones. A thread already holding a
+    connection never waits for a dedicated one, as it could wait for threads waiting
+    for its connection: it takes one of at most maxExtraConnections extra connections
+    instead, or gets an error if they are all in use.
+    So at most 2 * maxConnections + maxExtraConnections connections are open
+    """
+
+    def __init__(self, host, user, passwd, port=3306, maxConnections=10, waitTimeout=60, graceTime=600,
+                 maxExtraConnections=2):
+      self.__host = host
+      self.__user = user
+      self.__passwd = passwd
+      self.__port = port
+      self.maxConnections = max(1, maxConnections)
+      self.maxExtraConnections = maxExtraConnections
+      self.waitTimeout = waitTimeout
+      self.__graceTime = graceTime
+      self.__lock = threading.RLock()
+      # ( connection, dbName, time of release ) of the connections not in use, the most recently used last
+      self.__idle = collections.deque()
+      # thread -> [ connection, dbName, number of holds ]
+      self.__held = {}
+      # id of the connections given by getDedicated -> thread which got them
+      self.__dedicated = {}
+      # ( connection, dbName, time of release ) of the dedicated connections not in use
+      self.__dedicatedIdle = collections.deque()
+      # Dedicated connections open or being open
+      self.__nbDedicatedConnections = 0
+      self.__dedicatedReleased = threading.Condition(self.__lock)
+      # Connections open or being open
+      self.__nbConnections = 0
+      # [ event, ( connection, dbName ) ] of the waiting threads, the first arrived first.
+      # A None connection means the waiter opens a new one
+      self.__waiters = collections.deque()
+      self.__lastClean = time.time()
+      self.__stats = {}
+      self.__resetStats()
+
+    def __resetStats(self):
+      self.__stats = {'checkouts': 0, 'waits': 0, 'waitTime': 0., 'maxWaitTime': 0., 'timeouts': 0}
+      self.__statsStart = time.time()
+
+    def __newConn(self):
+      conn = MySQLdb.connect(host=self.__host,
+                             port=self.__port,
+                             user=self.__user,
+                             passwd=self.__passwd)
+
+      self.__execute(conn, "SET AUTOCOMMIT=1")
+      return conn
+
+    def __execute(self, conn, cmd):
+      cursor = conn.cursor()
+      res = cursor.execute(cmd)
+      conn.commit()
+      cursor.close()
+      return res
+
+    def __ping(self, conn):
+      try:
+        conn.ping(True)
+        return True
+      except BaseException:
+        return False
+
+    def __close(self, conn):
+      if conn is None:
+        return
+      try:
+        conn.close()
+      except BaseException as exc:
+        gLogger.warn("Exception while closing MySQL connection: %s" % exc)
+
+    def __checkout(self):
+      """ Take a connection not in use, waiting for one if there are already maxConnections
+
+          :return: S_OK( ( connection, dbName ) ), with a None connection when a new one is to be open
+      """
+      start = time.time()
+      with self.__lock:
+        self.__stats['checkouts'] += 1
+        if start - self.__lastClean > 60:
+          self.clean(start)
+        if not self.__waiters:
+          if self.__idle:
+            conn, dbName, _released = self.__idle.pop()
+            return S_OK((conn, dbName))
+          if self.__nbConnections < self.maxConnections:
+            self.__nbConnections += 1
+            return S_OK((None, ""))
+        waiter = [threading.Event(), None]
+        self.__waiters.append(waiter)
+
+      waiter[0].wait(self.waitTimeout)
+
+      with self.__lock:
+        waitTime = time.time() - start
+        self.__stats['waits'] += 1
+        self.__stats['waitTime'] += waitTime
+        self.__stats['maxWaitTime'] = max(self.__stats['maxWaitTime'], waitTime)
+        if waiter[1] is None:
+          self.__waiters.remove(waiter)
+          self.__stats['timeouts'] += 1
+          return S_ERROR(DErrno.EMYSQL, "No MySQL connection available after %s seconds (%d in use)"
+                         % (self.waitTimeout, self.__nbConnections))
+      return S_OK(waiter[1])
+
+    def __checkin(self, conn, dbName, reusable=True):
+      """ Give a connection to the first waiting thread, or keep it for later use
+
+          :param bool reusable: False to close the connection, the first waiting thread opens a new one
+      """
+      if not reusable:
+        self.__close(conn)
+        conn, dbName = None, ""
+      with self.__lock:
+        if self.__waiters:
+          waiter = self.__waiters.popleft()
+          waiter[1] = (conn, dbName)
+          waiter[0].set()
+        elif conn is None:
+          self.__nbConnections -= 1
+        else:
+          self.__idle.append((conn, dbName, time.time()))
+
+    def __prepare(self, conn, lastName, dbName):
+      """ Open the connection if needed, check it is alive and select the database
+
+          :return: S_OK( connection ) / S_ERROR, the connection is then closed
+      """
+      try:
+        if conn is not None and not self.__ping(conn):
+          self.__close(conn)
+          conn = None
+        if conn is None:
+          conn, lastName = self.__newConn(), ""
+        if lastName != dbName:
+          conn.select_db(dbName)
+      except MySQLdb.MySQLError as excp:
+        self.__close(conn)
+        return S_ERROR(DErrno.EMYSQL, "Could not connect to %s: %s" % (dbName, excp))
+      return S_OK(conn)
+
+    def get(self, dbName, retries=10):
+      """ Get the connection held by the thread, or hold one.
+          Each call is to be followed by a call to release
+
+          :param int retries: unused, the thread waits for at most waitTimeout seconds
+      """
+      thid = threading.current_thread()
+      held = self.__held.get(thid)
+      if held:
+        if held[1] != dbName:
+          try:
+            held[0].select_db(dbName)
+          except MySQLdb.MySQLError as excp:
+            return S_ERROR(DErrno.EMYSQL, "Could not select db %s: %s" % (dbName, excp))
+          held[1] = dbName
+        held[2] += 1
+        return S_OK(held[0])
+
+      result = self.__checkout()
+      if not result['OK']:
+        return result
+      conn, lastName = result['Value']
+      result = self.__prepare(conn, lastName, dbName)
+      if not result['OK']:
+        self.__checkin(None, dbName)
+        return result
+      with self.__lock:
+        self.__held[thid] = [result['Value'], dbName, 1]
+      return result
+
+    def release(self, thid=None):
+      """ Release a hold of the thread on its connection, given back when there are no more
+
+          :param thid: thread which got the connection, the current one by default
+      """
+      if thid is None:
+        thid = threading.current_thread()
+      with self.__lock:
+        held = self.__held.get(thid)
+        if not held:
+          return
+        held[2] -= 1
+        if held[2] > 0:
+          return
+        del self.__held[thid]
+      self.__checkin(held[0], held[1])
+
+    def getDedicated(self, dbName):
+      """ Get a connection not held by the thread, for a streaming query which
+          keeps it busy until all its rows are read
+
+          :return: S_OK(connection), or S_ERROR with result['NoExtraConnection'] if the thread
+                   holds a connection and the extra connections are all in use
+      """
+      thid = threading.current_thread()
+      start = time.time()
+      with self.__lock:
+        self.__stats['checkouts'] += 1
+        # The connections of the thread are not given back while it waits
+        mayWait = thid not in self.__held and thid not in self.__dedicated.values()
+        waited = False
+        while mayWait and not self.__dedicatedIdle and self.__nbDedicatedConnections >= self.maxConnections:
+          remaining = start + self.waitTimeout - time.time()
+          if remaining <= 0:
+            self.__stats['waits'] += 1
+            self.__stats['timeouts'] += 1
+            return S_ERROR(DErrno.EMYSQL, "No MySQL connection available for streaming after %s seconds "
+                           "(%d in use)" % (self.waitTimeout, len(self.__dedicated)))
+          waited = True
+          self.__dedicatedReleased.wait(remaining)
+        if not self.__dedicatedIdle and \
+           self.__nbDedicatedConnections >= self.maxConnections + self.maxExtraConnections:
+          result = S_ERROR(DErrno.EMYSQL, "No extra MySQL connection available for streaming "
+                           "(%d in use)" % len(self.__dedicated))
+          result['NoExtraConnection'] = True
+          return result
+        if waited:
+          waitTime = time.time() - start
+          self.__stats['waits'] += 1
+          self.__stats['waitTime'] += waitTime
+          self.__stats['maxWaitTime'] = max(self.__stats['maxWaitTime'], waitTime)
+        if self.__dedicatedIdle:
+          conn, lastName, _released = self.__dedicatedIdle.pop()
+        else:
+          conn, lastName = None, ""
+          self.__nbDedicatedConnections += 1
+
+      result = self.__prepare(conn, lastName, dbName)
+      with self.__lock:
+        if result['OK']:
+          self.__dedicated[id(result['Value'])] = thid
+        else:
+          self.__nbDedicatedConnections -= 1
+          self.__dedicatedReleased.notify()
+      return result
+
+    def releaseDedicated(self, conn, dbName, reusable=True):
+      """ Give back a connection obtained with getDedicated
+
+          :param bool reusable: False if the connection is not usable anymore (e.g. unread rows)
+      """
+      with self.__lock:
+        self.__dedicated.pop(id(conn), None)
+        # The extra connections are not kept
+        if reusable and self.__nbDedicatedConnections <= self.maxConnections:
+          self.__dedicatedIdle.append((conn, dbName, time.time()))
+          conn = None
+        else:
+          self.__nbDedicatedConnections -= 1
+        self.__dedicatedReleased.notify()
+      self.__close(conn)
+
+    def clean(self, now=False):
+      """ Give back the connections of the threads which ended, and close the connections
+          unused for more than graceTime seconds
+      """
+      if not now:
+        now = time.time()
+      with self.__lock:
+        self.__lastClean = now
+        for thid in [thid for thid in self.__held if not thid.isAlive()]:
+          conn, dbName, _holds = self.__held.pop(thid)
+          self.__checkin(conn, dbName)
+        while self.__idle and now - self.__idle[0][2] > self.__graceTime:
+          self.__close(self.__idle.popleft()[0])
+          self.__nbConnections -= 1
+        while self.__dedicatedIdle and now - self.__dedicatedIdle[0][2] > self.__graceTime:
+          self.__close(self.__dedicatedIdle.popleft()[0])
+          self.__nbDedicatedConnections -= 1
+
+    def getStats(self, reset=False):
+      """ Get the usage of the pool
+
+          :param reset: set the counters back to zero
+
+          :return: dict with inUse, dedicated (in use by streaming queries), idle, waiting (threads),
+                   connections (open, besides the dedicated ones), maxConnections, maxExtraConnections,
+                   and since the last reset: checkouts, checkoutsPerSecond, waits (checkouts which waited),
+                   meanWaitTime and maxWaitTime (seconds) and timeouts
+      """
+      with self.__lock:
+        stats = dict(self.__stats)
+        elapsed = time.time() - self.__statsStart
+        stats.update({'inUse': len(self.__held) + len(self.__dedicated),
+                      'dedicated': len(self.__dedicated),
+                      'idle': len(self.__idle),
+                      'waiting': len(self.__waiters),
+                      'connections': self.__nbConnections,
+                      'maxConnections': self.maxConnections,
+                      'maxExtraConnections': self.maxExtraConnections})
+        if reset:
+          self.__resetStats()
+      stats['checkoutsPerSecond'] = stats['checkouts'] / elapsed if elapsed > 0 else 0.
+      waitTime = stats.pop('waitTime')
+      stats['meanWaitTime'] = waitTime / stats['waits'] if stats['waits'] else 0.
+      return stats
+
+    def transactionStart(self, dbName):
+      """ Start a transaction on a connection held by the thread until its end
+      """
+      result = self.get(dbName)
+      if not result['OK']:
+        return result
+      conn = result['Value']
+      try:
+        return S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+      except MySQLdb.MySQLError as excp:
+        self.release()
+        return S_ERROR(DErrno.EMYSQL, "Could not begin transaction: %s" % excp)
+
+    def __transactionEnd(self, cmd, action):
+      held = self.__held.get(threading.current_thread())
+      if not held:
+        return S_ERROR(DErrno.EMYSQL, "Could not %s transaction: no transaction started" % action)
+      try:
+        result = S_OK(self.__execute(held[0], cmd))
+      except MySQLdb.MySQLError as excp:
+        result = S_ERROR(DErrno.EMYSQL, "Could not %s transaction: %s" % (action, excp))
+      # Hold taken by transactionStart
+      self.release()
+      return result
+
+    def transactionCommit(self, dbName):
+      return self.__transactionEnd("COMMIT", "commit")
+
+    def transactionRollback(self, dbName):
+      return self.__transactionEnd("ROLLBACK", "rollback")
+
+  class _HeldConnection(object):
+    """
+    Connection given by _getConnection with a bounded pool: the thread holds it,
+    so that the queries it executes meanwhile use it, until it is not referenced anymore
+    """
+
+    def __init__(self, pool, conn):
+      self.__pool = pool
+      self.__conn = conn
+      self.__thid = threading.current_thread()
+
+    def __getattr__(self, name):
+      return getattr(self.__conn, name)
+
+    def __del__(self):
+      try:
+        self.__pool.release(self.__thid)
+      except BaseException:
+        pass
+
   __connectionPools = {}
 
-  def __init__(self, hostName='localhost', userName='dirac', passwd='dirac', dbName='', port=3306, debug=False):
+  def __init__(self, hostName='localhost', userName='dirac', passwd='dirac', dbName='', port=3306, debug=False,
+               maxConnections=0, waitTimeout=60, replicaHosts=None, maxReplicaLag=10):
     """
     set MySQL connection parameters and try to connect
 
     :param debug: unused
+    :param int maxConnections: if not 0, the connections to the server are shared by all the threads,
+                               at most maxConnections of them (BoundedConnectionPool), instead of one per thread
+    :param waitTimeout: seconds a thread waits for a connection of the bounded pool
+    :param list replicaHosts: ( host, port ) of the read replicas of the database, used by
+                              the readOnly methods (see ReplicaRouting)
+    :param maxReplicaLag: seconds a replica can be behind the primary to be used
     """
     global gInstancesCount
     gInstancesCount += 1
@@ -403,16 +861,42 @@ class MySQL(object):
     self.__passwd = str(passwd)
     self.__dbName = str(dbName)
     self.__port = port
-    cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
-    if cKey not in MySQL.__connectionPools:
-      MySQL.__connectionPools[cKey] = MySQL.ConnectionPool(*cKey)
-    self.__connectionPool = MySQL.__connectionPools[cKey]
+    self.__bounded = maxConnections > 0
+    self.__connectionPool = self.__getPool(self.__hostName, self.__port, maxConnections, waitTimeout)
+
+    # Read replicas, whose health is checked every REPLICACHECKINTERVAL seconds
+    self.__maxReplicaLag = maxReplicaLag
+    self.__replicas = []
+    for replicaHost, replicaPort in replicaHosts or []:
+      self.__replicas.append({'Host': "%s:%s" % (replicaHost, replicaPort),
+                              'Pool': self.__getPool(str(replicaHost), replicaPort, maxConnections, waitTimeout),
+                              'Healthy': True,
+                              'NextCheck': 0})
+    self.__replicaLock = threading.Lock()
+
+    # max_allowed_packet and innodb_autoinc_lock_mode of the server, read when needed
+    self.__serverVariables = None
+    # Execution statistics of the queries, by fingerprint
+    self.__queryStats = QueryStats()
 
     self.__initialized = True
     result = self._connect()
     if not result['OK']:
       gLogger.error("Cannot connect to to DB", " %s" % result['Message'])
 
+  def __getPool(self, hostName, port, maxConnections, waitTimeout):
+    """ Get the connection pool of a server, shared by the databases of the server:
+        for a bounded pool, the first database sets its size
+    """
+    pKey = (hostName, self.__userName, self.__passwd, port, maxConnections > 0)
+    if pKey not in MySQL.__connectionPools:
+      if maxConnections > 0:
+        pool = MySQL.BoundedConnectionPool(*pKey[:4], maxConnections=maxConnections, waitTimeout=waitTimeout)
+      else:
+        pool = MySQL.ConnectionPool(*pKey[:4])
+      MySQL.__connectionPools[pKey] = pool
+    return MySQL.__connectionPools[pKey]
+
   def __del__(self):
     global gInstancesCount
     try:
@@ -456,11 +940,6 @@ class MySQL(object):
     It also includes quotation marks " around the given string
     """
 
-    retDict = self._getConnection()
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
-
     try:
       myString = str(myString)
     except ValueError:
@@ -484,7 +963,13 @@ class MySQL(object):
           self.log.debug('__escape_string: Could not escape string', '"%s"' % myString)
           return S_ERROR(DErrno.EMYSQL, '__escape_string: Could not escape string')
 
-      escape_string = connection.escape_string(str(myString))
+      retDict = self.__getConnection()
+      if not retDict['OK']:
+        return retDict
+      try:
+        escape_string = retDict['Value'].escape_string(str(myString))
+      finally:
+        self.__releaseConnection()
       self.log.debug('__escape_string: returns', '"%s"' % escape_string)
       return S_OK('"%s"' % escape_string)
     except BaseException as x:
@@ -599,17 +1084,38 @@ class MySQL(object):
 
     self.logger.debug('_query: %s' % self._safeCmd(cmd))
 
-    retDict = self._getConnection()
+    if cmd.split(None, 1)[0].upper() not in READSTATEMENTS:
+      setWrote()
+      replica = None
+    else:
+      replica = self.__getReplica()
+    if replica:
+      retDict = self.__query(cmd, replica['Pool'], onReplica=True)
+      if not retDict.pop('ReplicaFailed', False):
+        return retDict
+      self.__setReplicaFailed(replica, retDict['Message'])
+    return self.__query(cmd, self.__connectionPool)
+
+  def __query(self, cmd, pool, onReplica=False):
+    """ Execute a query on a connection of the pool of the primary or of a replica
+
+        :param bool onReplica: add ReplicaFailed = True to the error if the replica is unreachable
+    """
+    retDict = self.__getConnection(pool)
     if not retDict['OK']:
+      if onReplica:
+        retDict['ReplicaFailed'] = True
       return retDict
     connection = retDict['Value']
 
+    start = time.time()
     try:
       cursor = connection.cursor()
       if cursor.execute(cmd):
         res = cursor.fetchall()
       else:
         res = ()
+      self.__queryStats.record(cmd, time.time() - start, rows=len(res))
 
       # Log the result limiting it to just 10 records
       if len(res) <= 10:
@@ -620,16 +1126,144 @@ class MySQL(object):
 
       retDict = S_OK(res)
     except BaseException as x:
+      self.__queryStats.record(cmd, time.time() - start, error=True)
       self.log.debug('_query: %s' % self._safeCmd(cmd))
       retDict = self._except('_query', x, 'Execution failed.')
+      if onReplica and isinstance(x, MySQLdb.OperationalError):
+        retDict['ReplicaFailed'] = True
 
     try:
       cursor.close()
     except BaseException:
       pass
+    self.__releaseConnection(pool)
 
     return retDict
 
+  def _queryIter(self, cmd, batchSize=1000, columns=False):
+    """
+    execute MySQL query command, reading the result from the server while iterating
+
+    The query uses a server side cursor (SSCursor), on a connection which is not
+    available to other queries until the iteration ends: iterate to the end, or
+    close the iterator. If the thread holds a connection and the pool has no extra
+    connection for it, the rows are read at once by _query instead
+
+    :param str cmd: query
+    :param int batchSize: number of rows per batch
+    :param bool columns: each batch is a list of tuples, one per column, instead of a list of rows
+
+    return S_OK with an iterator over the batches of rows
+    return S_ERROR upon error
+    """
+
+    self.logger.debug('_queryIter: %s' % self._safeCmd(cmd))
+
+    if not self.__initialized:
+      error = 'DB not properly initialized'
+      gLogger.error(error)
+      return S_ERROR(DErrno.EMYSQL, error)
+
+    pool = self.__connectionPool
+    replica = self.__getReplica()
+    if replica:
+      retDict = replica['Pool'].getDedicated(self.__dbName)
+      if retDict['OK']:
+        pool = replica['Pool']
+      elif not retDict.get('NoExtraConnection'):
+        self.__setReplicaFailed(replica, retDict['Message'])
+    if pool is self.__connectionPool:
+      retDict = pool.getDedicated(self.__dbName)
+    if not retDict['OK']:
+      if retDict.get('NoExtraConnection'):
+        return self.__queryBuffered(cmd, batchSize, columns)
+      return retDict
+    connection = retDict['Value']
+
+    start = time.time()
+    try:
+      cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+      cursor.execute(cmd)
+    except BaseException as x:
+      self.__queryStats.record(cmd, time.time() - start, error=True)
+      pool.releaseDedicated(connection, self.__dbName, reusable=False)
+      return self._except('_queryIter', x, 'Execution failed.')
+
+    batches = self.__iterBatches(cmd, time.time() - start, pool, connection, cursor, batchSize, columns)
+    # Started, so that closing it before the first batch gives back the connection
+    next(batches)
+    return S_OK(batches)
+
+  def __queryBuffered(self, cmd, batchSize, columns):
+    """ Execute the query of _queryIter with _query, and iterate over the batches of its rows
+    """
+    result = self._query(cmd)
+    if not result['OK']:
+      return result
+    rows = result['Value']
+
+    def batches():
+      for i in xrange(0, len(rows), batchSize):
+        yield zip(*rows[i:i + batchSize]) if columns else rows[i:i + batchSize]
+    return S_OK(batches())
+
+  def __iterBatches(self, cmd, elapsed, pool, connection, cursor, batchSize, columns):
+    """ Generator of the batches of rows of a query executed by _queryIter
+
+        :param float elapsed: execution time of the query, to which the time reading the rows is added
+    """
+    exhausted = False
+    nbRows = 0
+    try:
+      yield None
+      while True:
+        start = time.time()
+        rows = cursor.fetchmany(batchSize)
+        elapsed += time.time() - start
+        if not rows:
+          break
+        nbRows += len(rows)
+        if columns:
+          rows = zip(*rows)
+        yield rows
+      # Stored procedures return a status after their results
+      while cursor.nextset():
+        pass
+      exhausted = True
+    finally:
+      self.__queryStats.record(cmd, elapsed, rows=nbRows)
+      try:
+        cursor.close()
+      except BaseException:
+        pass
+      # Unread rows prevent any other query on the connection
+      pool.releaseDedicated(connection, self.__dbName, reusable=exhausted)
+
+  def _queryColumns(self, cmd, batchSize=10000):
+    """
+    execute MySQL query command, without keeping a tuple per row
+
+    :param str cmd: query
+    :param int batchSize: number of rows read from the server at once
+
+    return S_OK with a list of lists, one per column, or an empty list if no matching rows are found
+    return S_ERROR upon error
+    """
+    result = self._queryIter(cmd, batchSize=batchSize, columns=True)
+    if not result['OK']:
+      return result
+    resultColumns = []
+    try:
+      for batch in result['Value']:
+        if not resultColumns:
+          resultColumns = [[] for _column in batch]
+        for resultColumn, values in zip(resultColumns, batch):
+          resultColumn.extend(values)
+    except BaseException as x:
+      return self._except('_queryColumns', x, 'Execution failed.')
+    self.logger.debug('_queryColumns: Total %d records returned' % (len(resultColumns[0]) if resultColumns else 0))
+    return S_OK(resultColumns)
+
   def _update(self, cmd, conn=None, debug=False):
     """ execute MySQL update command
 
@@ -640,21 +1274,25 @@ class MySQL(object):
     """
 
     self.logger.debug('_update: %s' % self._safeCmd(cmd))
+    setWrote()
 
-    retDict = self._getConnection()
+    retDict = self.__getConnection()
     if not retDict['OK']:
       return retDict
     connection = retDict['Value']
 
+    start = time.time()
     try:
       cursor = connection.cursor()
       res = cursor.execute(cmd)
+      self.__queryStats.record(cmd, time.time() - start, rows=res)
       # connection.commit()
       self.log.debug('_update:', res)
       retDict = S_OK(res)
       if cursor.lastrowid:
         retDict['lastRowId'] = cursor.lastrowid
     except Exception as x:
+      self.__queryStats.record(cmd, time.time() - start, error=True)
       self.log.debug('_update: %s: %s' % (self._safeCmd(cmd), str(x)))
       retDict = self._except('_update', x, 'Execution failed.')
 
@@ -662,6 +1300,7 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self.__releaseConnection()
 
     return retDict
 
@@ -676,11 +1315,12 @@ class MySQL(object):
     """
     if not isinstance(cmdList, list):
       return S_ERROR(DErrno.EMYSQL, "_transaction: wrong type (%s) for cmdList" % type(cmdList))
+    setWrote()
 
     # # get connection
     connection = conn
     if not connection:
-      retDict = self._getConnection()
+      retDict = self.__getConnection()
       if not retDict['OK']:
         return retDict
       connection = retDict['Value']
@@ -692,13 +1332,16 @@ class MySQL(object):
       for cmd in cmdList:
         cmdRet.append((cmd, cursor.execute(cmd)))
       connection.commit()
+      # # close cursor, put back connection to the pool
+      cursor.close()
     except Exception as error:
       self.logger.exception(error)
       # # rollback, put back connection to the pool
       connection.rollback()
       return S_ERROR(DErrno.EMYSQL, error)
-    # # close cursor, put back connection to the pool
-    cursor.close()
+    finally:
+      if not conn:
+        self.__releaseConnection()
     return S_OK(cmdRet)
 
   def _createViews(self, viewsDict, force=False):
@@ -933,6 +1576,18 @@ class MySQL(object):
         Try the Queue, if it is empty add a newConnection to the Queue and retry
         it will retry MAXCONNECTRETRY to open a new connection and will return
         an error if it fails.
+
+        With a bounded pool, the thread holds the connection as long as it references it
+    """
+    result = self.__getConnection()
+    if not result['OK'] or not self.__bounded:
+      return result
+    return S_OK(MySQL._HeldConnection(self.__connectionPool, result['Value']))
+
+  def __getConnection(self, pool=None):
+    """ Get the connection of the thread, to be given back with __releaseConnection
+
+        :param pool: pool of a replica, the one of the primary by default
     """
     self.log.debug('_getConnection:')
 
@@ -941,7 +1596,92 @@ class MySQL(object):
       gLogger.error(error)
       return S_ERROR(DErrno.EMYSQL, error)
 
-    return self.__connectionPool.get(self.__dbName)
+    return (pool or self.__connectionPool).get(self.__dbName)
+
+  def __releaseConnection(self, pool=None):
+    """ Give back the connection obtained with __getConnection, for the bounded pool
+    """
+    (pool or self.__connectionPool).release()
+
+  def __getReplica(self):
+    """ Choose the replica executing a read query
+
+        :return: replica dict, or None to use the primary: the query is not in a readOnly method,
+                 the thread wrote in its request, or no replica is in sync
+    """
+    if not self.__replicas or not useReplicas():
+      return None
+    now = time.time()
+    healthy = []
+    for replica in self.__replicas:
+      with self.__replicaLock:
+        check = replica['NextCheck'] <= now
+        if check:
+          replica['NextCheck'] = now + REPLICACHECKINTERVAL
+      if check:
+        self.__checkReplica(replica)
+      if replica['Healthy']:
+        healthy.append(replica)
+    if not healthy:
+      return None
+    return random.choice(healthy)
+
+  def __checkReplica(self, replica):
+    """ Check the replication lag of a replica, it is not used if it exceeds maxReplicaLag
+    """
+    retDict = self.__getConnection(replica['Pool'])
+    if not retDict['OK']:
+      self.__setReplicaFailed(replica, retDict['Message'])
+      return
+    lag = None
+    try:
+      cursor = retDict['Value'].cursor()
+      cursor.execute("SHOW SLAVE STATUS")
+      row = cursor.fetchone()
+      if row is None:
+        # Not a replica, e.g. a node of a multi-primary cluster
+        lag = 0
+      else:
+        lag = dict(zip([column[0] for column in cursor.description], row)).get('Seconds_Behind_Master')
+      cursor.close()
+    except BaseException as x:
+      self.log.warn("Cannot get the replication lag", "%s: %s" % (replica['Host'], x))
+    finally:
+      self.__releaseConnection(replica['Pool'])
+    healthy = lag is not None and lag <= self.__maxReplicaLag
+    if healthy != replica['Healthy']:
+      if healthy:
+        self.log.info("Using again the replica", "%s (lag %s s)" % (replica['Host'], lag))
+      else:
+        self.log.warn("Not using the replica", "%s (lag %s s)" % (replica['Host'], lag))
+    replica['Healthy'] = healthy
+
+  def __setReplicaFailed(self, replica, error):
+    """ Use the primary instead of a replica which failed, until its next check
+    """
+    self.log.warn("Query failed on the replica, using the primary", "%s: %s" % (replica['Host'], error))
+    with self.__replicaLock:
+      replica['Healthy'] = False
+      replica['NextCheck'] = time.time() + REPLICACHECKINTERVAL
+
+  def getQueryStats(self, reset=False, sortBy='totalTime', limit=0):
+    """ Get the execution statistics of the queries of this DB, by fingerprint:
+        the query with its literals replaced by "?" (see QueryStats)
+
+        :param bool reset: forget the statistics
+        :param str sortBy: count, totalTime, meanTime, maxTime, rows or errors, in decreasing order
+        :param int limit: maximum number of fingerprints returned, all by default
+
+        :return: S_OK( list of dict with fingerprint, count, totalTime, meanTime, maxTime, rows and errors )
+    """
+    return S_OK(self.__queryStats.getStats(reset=reset, sortBy=sortBy, limit=limit))
+
+  def getConnectionPoolStats(self, reset=False):
+    """ Get the usage of the connection pool, see BoundedConnectionPool.getStats
+
+        :param reset: set the counters back to zero
+    """
+    return S_OK(self.__connectionPool.getStats(reset=reset))
 
 ########################################################################################
 #
@@ -950,6 +1690,7 @@ class MySQL(object):
 ########################################################################################
 
   def transactionStart(self):
+    setWrote()
     return self.__connectionPool.transactionStart(self.__dbName)
 
   def transactionCommit(self):
@@ -1227,13 +1968,14 @@ class MySQL(object):
                 limit=False, conn=None,
                 older=None, newer=None,
                 timeStamp=None, orderAttribute=None,
-                greater=None, smaller=None):
+                greater=None, smaller=None, columns=False):
     """
       Select "outFields" from "tableName" with condDict
       N records can match the condition
       return S_OK( tuple(Field,Value) )
       if outFields is None all fields in "tableName" are returned
       if limit is not False, the given limit is set
+      if columns is True, the result is given column by column, as by _queryColumns
       inValues are properly escaped using the _escape_string method, they can be single values or lists of values.
     """
     table = _quotedList([tableName])
@@ -1268,8 +2010,10 @@ class MySQL(object):
     except Exception as x:
       return S_ERROR(DErrno.EMYSQL, x)
 
-    return self._query('SELECT %s FROM %s %s' %
-                       (quotedOutFields, table, condition), conn)
+    cmd = 'SELECT %s FROM %s %s' % (quotedOutFields, table, condition)
+    if columns:
+      return self._queryColumns(cmd)
+    return self._query(cmd, conn)
 
 #############################################################################
   def deleteEntries(self, tableName,
@@ -1427,8 +2171,144 @@ class MySQL(object):
     return self._update('INSERT INTO %s %s VALUES %s' %
                         (table, inFieldString, inValueString), conn)
 
+  def __getServerVariables(self):
+    """ Get the server variables insertMany depends on
+
+        :return: S_OK( ( max_allowed_packet, innodb_autoinc_lock_mode, auto_increment_increment ) )
+    """
+    if self.__serverVariables is None:
+      result = self._query("SELECT @@max_allowed_packet, @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+      if not result['OK']:
+        return result
+      maxPacket, lockMode, autoincIncrement = result['Value'][0]
+      self.__serverVariables = (int(maxPacket), int(lockMode) if lockMode is not None else None,
+                                int(autoincIncrement))
+    return S_OK(self.__serverVariables)
+
+  def insertMany(self, tableName, inFields, valuesList, sqlValues=None, updateFields=None,
+                 ignore=False, conn=None):
+    """
+      Insert the rows of valuesList in tableName with as few statements as possible:
+      several rows per INSERT, within the max_allowed_packet of the server
+
+      :param str tableName: table name
+      :param list inFields: field names
+      :param list valuesList: list of rows, each a list of values for inFields.
+                              The values are escaped with the MySQLdb literal conversion
+      :param dict sqlValues: field name -> SQL expression used for all the rows, e.g. UTC_TIMESTAMP()
+      :param list updateFields: fields to update when the row already exists (ON DUPLICATE KEY UPDATE)
+      :param bool ignore: ignore the rows which already exist (INSERT IGNORE)
+
+      return S_OK( number of affected rows ), with 'lastRowIds' the auto increment IDs of the
+      inserted rows, in the order of valuesList, when they can be known: every row inserted
+      (no ignore nor update) by a server giving consecutive IDs to multi-row inserts
+      (innodb_autoinc_lock_mode 0 or 1), spaced by auto_increment_increment
+    """
+    table = _quotedList([tableName])
+    if not table:
+      error = 'Invalid tableName argument'
+      self.log.debug('insertMany:', error)
+      return S_ERROR(DErrno.EMYSQL, error)
+
+    if not valuesList:
+      result = S_OK(0)
+      result['lastRowIds'] = []
+      return result
+
+    sqlValues = sqlValues or {}
+    sqlFields = list(sqlValues)
+    inFieldString = _quotedList(list(inFields) + sqlFields)
+    if inFieldString is None:
+      error = 'Invalid inFields arguments'
+      self.log.debug('insertMany:', error)
+      return S_ERROR(DErrno.EMYSQL, error)
+    sqlValueString = ''.join(', %s' % sqlValues[field] for field in sqlFields)
+
+    updateString = ''
+    if updateFields:
+      quotedUpdateFields = [_quotedList([field]) for field in updateFields]
+      if None in quotedUpdateFields:
+        error = 'Invalid updateFields arguments'
+        self.log.debug('insertMany:', error)
+        return S_ERROR(DErrno.EMYSQL, error)
+      updateString = ' ON DUPLICATE KEY UPDATE %s' % ', '.join('%s=VALUES(%s)' % (field, field)
+                                                               for field in quotedUpdateFields)
+
+    result = self.__getServerVariables()
+    if not result['OK']:
+      return result
+    maxPacket, autoincLockMode, autoincIncrement = result['Value']
+
+    retDict = self.__getConnection()
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    cmdStart = 'INSERT %sINTO %s ( %s ) VALUES ' % ('IGNORE ' if ignore else '', table, inFieldString)
+    # Room left for the values in each statement, with a margin for the protocol
+    maxValuesLength = maxPacket - len(cmdStart) - len(updateString) - 1024
+
+    statements = []
+    rows = []
+    rowsLength = 0
+    try:
+      for values in valuesList:
+        if len(values) != len(inFields):
+          return S_ERROR(DErrno.EMYSQL, 'Mismatch between inFields and inValues.')
+        row = '(%s%s)' % (', '.join(connection.literal(tuple(values))), sqlValueString)
+        if rows and rowsLength + len(row) + 1 > maxValuesLength:
+          statements.append((rows, len(rows)))
+          rows = []
+          rowsLength = 0
+        rows.append(row)
+        rowsLength += len(row) + 1
+    except Exception as x:
+      return self._except('insertMany', x, 'Could not escape values')
+    finally:
+      self.__releaseConnection()
+    statements.append((rows, len(rows)))
+
+    self.log.debug('insertMany:', 'inserting %d rows into table %s with %d statements'
+                   % (len(valuesList), table, len(statements)))
+
+    knowIds = not ignore and not updateFields and autoincLockMode in (0, 1)
+    affectedRows = 0
+    lastRowIds = []
+    for rows, nbRows in statements:
+      result = self._update('%s%s%s' % (cmdStart, ','.join(rows), updateString), conn)
+      if not result['OK']:
+        return result
+      affectedRows += result['Value']
+      # The ID of the first row of a multi-row insert is given, the next ones follow
+      # with the increment of the server (e.g. several masters replication)
+      if knowIds and result['Value'] == nbRows and result.get('lastRowId'):
+        lastRowIds.extend(range(result['lastRowId'], result['lastRowId'] + nbRows * autoincIncrement,
+                                autoincIncrement))
+      else:
+        knowIds = False
+
+    result = S_OK(affectedRows)
+    if knowIds:
+      result['lastRowIds'] = lastRowIds
+    return result
+
+  def upsertMany(self, tableName, inFields, valuesList, updateFields=None, sqlValues=None, conn=None):
+    """
+      Insert the rows of valuesList in tableName, updating the rows which already exist,
+      as insertMany with ON DUPLICATE KEY UPDATE
+
+      :param list updateFields: fields to update when the row already exists, all the inFields by default
+
+      return S_OK( number of affected rows: 1 per inserted row, 2 per updated row )
+    """
+    if updateFields is None:
+      updateFields = inFields
+    return self.insertMany(tableName, inFields, valuesList, sqlValues=sqlValues, updateFields=updateFields,
+                           conn=conn)
+
   def executeStoredProcedure(self, packageName, parameters, outputIds):
-    conDict = self._getConnection()
+    setWrote()
+    conDict = self.__getConnection()
     if not conDict['OK']:
       return conDict
 
@@ -1450,11 +2330,13 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self.__releaseConnection()
     return retDict
 
   # For the procedures that execute a select without storing the result
   def executeStoredProcedureWithCursor(self, packageName, parameters):
-    conDict = self._getConnection()
+    setWrote()
+    conDict = self.__getConnection()
     if not conDict['OK']:
       return conDict
 
@@ -1474,5 +2356,6 @@ class MySQL(object):
       cursor.close()
     except Exception:
       pass
+    self.__releaseConnection()
 
     return retDict
@@ -0,0 +1,189 @@
+"""
+Multi-threaded gzip compression of streams, in the pigz style
+
+The stream is cut in blocks which are compressed in parallel as independent
+gzip members, written in order. Concatenated gzip members are a valid gzip
+file (RFC 1952), so the result is decompressed by the standard tools
+(gunzip, tar xz, python gzip module). zlib releases the GIL while compressing,
+so the threads use as many cores.
+
+The python tarfile stream mode only reads the first gzip member, hence
+GzipMembersReader to decompress such streams on the fly.
+"""
+
+__RCSID__ = "$Id$"
+
+import zlib
+import multiprocessing
+from collections import deque
+
+from concurrent.futures import ThreadPoolExecutor
+
+GZIP_MAGIC = "\x1f\x8b"
+
+
+def compressMember(data, level=6):
+  """ Compress data as a complete gzip member
+
+      :param str data: data to compress
+      :param int level: zlib compression level, 1 (fastest) to 9 (best)
+
+      :return: str gzip member
+  """
+  compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter(object):
+  """ File like object compressing what is written to another file object
+  """
+
+  def __init__(self, fileObj, level=6, threads=None, blockSize=1048576):
+    """ c'tor
+
+        :param fileObj: file object the gzip stream is written to. It is not closed
+        :param int level: zlib compression level
+        :param int threads: number of compression threads, the number of CPUs by default
+        :param int blockSize: size of the uncompressed blocks compressed independently
+    """
+    if not threads:
+      threads = multiprocessing.cpu_count()
+    self.level = level
+    self.blockSize = blockSize
+    self.closed = False
+    self.__fileObj = fileObj
+    self.__executor = ThreadPoolExecutor(threads)
+    # Blocks being compressed, in the order they are written
+    self.__pending = deque()
+    self.__maxPending = 2 * threads
+    self.__buffer = []
+    self.__bufferSize = 0
+
+  def write(self, data):
+    if self.closed:
+      raise ValueError("I/O operation on closed file")
+    self.__buffer.append(data)
+    self.__bufferSize += len(data)
+    if self.__bufferSize >= self.blockSize:
+      data = "".join(self.__buffer)
+      offset = 0
+      while len(data) - offset >= self.blockSize:
+        self.__submit(data[offset:offset + self.blockSize])
+        offset += self.blockSize
+      self.__buffer = [data[offset:]]
+      self.__bufferSize = len(data) - offset
+
+  def __submit(self, block):
+    self.__pending.append(self.__executor.submit(compressMember, block, self.level))
+    # Bound the memory used when the output is slower than the compression
+    while len(self.__pending) > self.__maxPending:
+      self.__fileObj.write(self.__pending.popleft().result())
+
+  def flush(self):
+    """ The data is written as blocks are complete, flush does not force it
+    """
+    pass
+
+  def close(self):
+    """ Compress what remains and wait for all the blocks to be written
+    """
+    if self.closed:
+      return
+    self.closed = True
+    try:
+      if self.__bufferSize or not self.__pending:
+        self.__submit("".join(self.__buffer))
+      self.__buffer = []
+      while self.__pending:
+        self.__fileObj.write(self.__pending.popleft().result())
+    finally:
+      self.__executor.shutdown(wait=False)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+class GzipMembersReader(object):
+  """ File like object decompressing on the fly a stream of gzip members
+  """
+
+  def __init__(self, fileObj, head="", chunkSize=65536):
+    """ c'tor
+
+        :param fileObj: file object to read the gzip stream from
+        :param str head: beginning of the stream already read from fileObj
+        :param int chunkSize: size of the reads from fileObj
+    """
+    self.__fileObj = fileObj
+    self.__chunkSize = chunkSize
+    self.__input = head
+    self.__decompressor = None
+    self.__output = ""
+    self.__eof = False
+
+  def __fill(self):
+    data = self.__input or self.__fileObj.read(self.__chunkSize)
+    self.__input = ""
+    if not data:
+      self.__eof = True
+      return
+    if self.__decompressor is None:
+      self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    self.__output += self.__decompressor.decompress(data)
+    if self.__decompressor.unused_data:
+      # End of the member, what follows is the next one
+      self.__input = self.__decompressor.unused_data
+      self.__decompressor = None
+
+  def read(self, size=-1):
+    while not self.__eof and (size < 0 or len(self.__output) < size):
+      self.__fill()
+    if size < 0:
+      size = len(self.__output)
+    data = self.__output[:size]
+    self.__output = self.__output[size:]
+    return data
+
+  def close(self):
+    pass
+
+
+class _HeadReader(object):
+  """ File object whose first bytes were already read
+  """
+
+  def __init__(self, fileObj, head):
+    self.__fileObj = fileObj
+    self.__head = head
+
+  def read(self, size=-1):
+    head = self.__head
+    if not head:
+      return self.__fileObj.read(size)
+    self.__head = ""
+    if size < 0:
+      return head + self.__fileObj.read()
+    if len(head) >= size:
+      self.__head = head[size:]
+      return head[:size]
+    return head + self.__fileObj.read(size - len(head))
+
+  def close(self):
+    pass
+
+
+def openDecompressedStream(fileObj):
+  """ Get a file object over a stream which may be made of gzip members
+
+      :param fileObj: file object to read the stream from
+
+      :return: file object returning the decompressed data of a gzip stream,
+               or the stream itself otherwise (e.g. for tarfile to detect bz2)
+  """
+  head = fileObj.read(len(GZIP_MAGIC))
+  if head == GZIP_MAGIC:
+    return GzipMembersReader(fileObj, head)
+  return _HeadReader(fileObj, head)
@@ -0,0 +1,134 @@
+"""
+Statistics of SQL queries by fingerprint
+
+The fingerprint of a query is its text with the literals replaced by "?", the
+value lists collapsed to "(?+)" and the repeated rows of multi-row inserts
+collapsed to one, so that the queries differing only by their values are
+accounted together. For instance::
+
+  SELECT JobID FROM Jobs WHERE Status IN ( 'Waiting', 'Running' ) AND Site = "LCG.CERN.ch" LIMIT 10
+
+has the fingerprint::
+
+  SELECT JobID FROM Jobs WHERE Status IN (?+) AND Site = ? LIMIT ?
+
+For each fingerprint, the number of executions, the total and maximum time,
+the number of rows returned or affected and the number of errors are kept,
+which gives the profile of the load a database receives.
+"""
+
+__RCSID__ = "$Id$"
+
+import re
+import threading
+from collections import OrderedDict
+
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'?|\"(?:[^\"\\]|\\.|\"\")*\"?|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_SPACES_RE = re.compile(r"\s+")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED_GROUP_RE = re.compile(r"(\((?:[^()]|\(\))*\))(?:\s*,\s*\1)+")
+
+
+def getFingerprint(cmd, maxLength=2048):
+  """ Get the fingerprint of a query
+
+      :param str cmd: query
+      :param int maxLength: only the first maxLength characters are considered,
+                            enough to tell the queries apart, e.g. not all the rows of an insert
+
+      :return: str fingerprint
+  """
+  fingerprint = _LITERAL_RE.sub("?", cmd[:maxLength])
+  fingerprint = _SPACES_RE.sub(" ", fingerprint).strip()
+  fingerprint = _LIST_RE.sub("(?+)", fingerprint)
+  return _REPEATED_GROUP_RE.sub(r"\1+", fingerprint)
+
+
+class QueryStats(object):
+  """ Execution statistics by query fingerprint
+  """
+
+  # Fingerprint accounting the queries beyond maxFingerprints
+  OTHERS = "<others>"
+
+  def __init__(self, maxFingerprints=1000, cacheSize=1000):
+    """ c'tor
+
+        :param int maxFingerprints: maximum number of fingerprints accounted separately
+        :param int cacheSize: number of short queries whose fingerprint is kept,
+                              not to compute it again for the identical queries
+    """
+    self.maxFingerprints = maxFingerprints
+    self.cacheSize = cacheSize
+    self.__lock = threading.Lock()
+    # fingerprint -> [ count, total time, max time, rows, errors ]
+    self.__stats = {}
+    # query -> fingerprint, the most recently used last
+    self.__fingerprints = OrderedDict()
+
+  def __getFingerprint(self, cmd):
+    cacheable = len(cmd) < 1000
+    if cacheable:
+      with self.__lock:
+        fingerprint = self.__fingerprints.pop(cmd, None)
+        if fingerprint is not None:
+          self.__fingerprints[cmd] = fingerprint
+          return fingerprint
+    fingerprint = getFingerprint(cmd)
+    if cacheable:
+      with self.__lock:
+        self.__fingerprints[cmd] = fingerprint
+        while len(self.__fingerprints) > self.cacheSize:
+          self.__fingerprints.popitem(last=False)
+    return fingerprint
+
+  def record(self, cmd, elapsed, rows=0, error=False):
+    """ Account an execution of a query
+
+        :param str cmd: query
+        :param float elapsed: execution time in seconds
+        :param int rows: number of rows returned or affected
+        :param bool error: the execution failed
+    """
+    fingerprint = self.__getFingerprint(cmd)
+    with self.__lock:
+      stats = self.__stats.get(fingerprint)
+      if stats is None:
+        if len(self.__stats) >= self.maxFingerprints:
+          fingerprint = self.OTHERS
+          stats = self.__stats.get(fingerprint)
+        if stats is None:
+          stats = [0, 0., 0., 0, 0]
+          self.__stats[fingerprint] = stats
+      stats[0] += 1
+      stats[1] += elapsed
+      stats[2] = max(stats[2], elapsed)
+      stats[3] += rows
+      if error:
+        stats[4] += 1
+
+  def getStats(self, reset=False, sortBy='totalTime', limit=0):
+    """ Get the statistics of the queries
+
+        :param bool reset: forget the statistics
+        :param str sortBy: key the list is sorted by, in decreasing order
+        :param int limit: maximum number of fingerprints returned, all by default
+
+        :return: list of dict with fingerprint, count, totalTime, meanTime, maxTime, rows and errors
+    """
+    with self.__lock:
+      stats = self.__stats
+      if reset:
+        self.__stats = {}
+      stats = [{'fingerprint': fingerprint,
+                'count': count,
+                'totalTime': totalTime,
+                'meanTime': totalTime / count,
+                'maxTime': maxTime,
+                'rows': rows,
+                'errors': errors}
+               for fingerprint, (count, totalTime, maxTime, rows, errors) in stats.iteritems()]
+    stats.sort(key=lambda queryStats: queryStats.get(sortBy), reverse=True)
+    if limit:
+      stats = stats[:limit]
+    return stats
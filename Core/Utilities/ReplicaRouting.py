@@ -0,0 +1,64 @@
+"""
+Routing of the read-only queries to the replicas of the databases
+
+The methods decorated with readOnly (DB methods or service handler methods)
+execute their queries (MySQL._query, _queryIter) on a replica of the database,
+if the database has replicas (ReplicaHosts option) lagging less than
+MaxReplicaLag seconds behind the primary, on the primary otherwise.
+
+Once a thread wrote to a database (_update, _transaction, transactionStart...),
+the rest of its request reads from the primary, so that it sees its own writes.
+The services start a new request for each action they execute (startRequest).
+"""
+
+__RCSID__ = "$Id$"
+
+import threading
+import functools
+
+
+class _RoutingState(threading.local):
+  """ Routing state of a thread
+  """
+
+  def __init__(self):
+    # Number of readOnly methods being executed
+    self.readOnly = 0
+    # The thread wrote to a database since the start of its request
+    self.wrote = False
+
+
+gRoutingState = _RoutingState()
+
+
+def readOnly(method):
+  """ Decorator of the methods whose queries can be executed by replicas
+  """
+
+  @functools.wraps(method)
+  def wrapper(*args, **kwargs):
+    gRoutingState.readOnly += 1
+    try:
+      return method(*args, **kwargs)
+    finally:
+      gRoutingState.readOnly -= 1
+
+  return wrapper
+
+
+def startRequest():
+  """ Start a new request in the thread: forget the writes of the previous one
+  """
+  gRoutingState.wrote = False
+
+
+def setWrote():
+  """ Note that the thread wrote to a database: it reads from the primaries until its next request
+  """
+  gRoutingState.wrote = True
+
+
+def useReplicas():
+  """ :return: True if the queries of the thread can be executed by replicas
+  """
+  return gRoutingState.readOnly > 0 and not gRoutingState.wrote
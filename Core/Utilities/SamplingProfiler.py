@@ -0,0 +1,108 @@
+"""
+Sampling profiler of all the threads of the process
+
+The stacks of the threads are sampled periodically during some seconds, and
+written in the "collapsed stacks" format of flamegraph.pl: one line per distinct
+stack, with the frames from the outermost one separated by semicolons, followed
+by the number of samples. For instance::
+
+  flamegraph.pl /tmp/Framework_Monitoring-20190101T120000.collapsed > profile.svg
+
+Unlike cProfile, which only profiles the thread enabling it, it sees all the
+threads, and its overhead does not depend on the number of function calls.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import sys
+import time
+import thread
+import threading
+
+from DIRAC import gLogger, S_OK, S_ERROR
+
+
+class SamplingProfiler(object):
+  """ Samples the stacks of all the threads in a background thread
+  """
+
+  def __init__(self, interval=0.005):
+    """ c'tor
+
+        :param float interval: seconds between two samples
+    """
+    self.interval = interval
+    self.__lock = threading.Lock()
+    self.__thread = None
+    self.__stopEvent = threading.Event()
+
+  def isRunning(self):
+    """ :return: True if a profiling is in progress
+    """
+    return self.__thread is not None and self.__thread.isAlive()
+
+  def start(self, duration, outputFile):
+    """ Start sampling the threads
+
+        :param duration: seconds to sample
+        :param str outputFile: path of the file written at the end of the profiling
+
+        :return: S_OK( outputFile ) / S_ERROR if a profiling is already in progress
+    """
+    with self.__lock:
+      if self.isRunning():
+        return S_ERROR("A profiling is already in progress")
+      self.__stopEvent.clear()
+      self.__thread = threading.Thread(target=self.__run, args=(duration, outputFile))
+      self.__thread.setDaemon(True)
+      self.__thread.start()
+    return S_OK(outputFile)
+
+  def stop(self):
+    """ Stop the profiling in progress, writing what was sampled so far
+    """
+    self.__stopEvent.set()
+    profilingThread = self.__thread
+    if profilingThread is not None:
+      profilingThread.join()
+
+  @staticmethod
+  def getStack(frame):
+    """ Get the collapsed representation of a stack
+
+        :param frame: innermost frame of the stack
+
+        :return: str with the frames from the outermost one, separated by semicolons
+    """
+    stack = []
+    while frame is not None:
+      code = frame.f_code
+      stack.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+      frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+  def __run(self, duration, outputFile):
+    stacks = {}
+    ownThreadId = thread.get_ident()
+    endTime = time.time() + duration
+    while time.time() < endTime and not self.__stopEvent.isSet():
+      for threadId, frame in sys._current_frames().items():  # pylint: disable=protected-access
+        if threadId == ownThreadId:
+          continue
+        stack = self.getStack(frame)
+        stacks[stack] = stacks.get(stack, 0) + 1
+      del frame
+      self.__stopEvent.wait(self.interval)
+    try:
+      with open(outputFile, "w") as fd:
+        for stack in sorted(stacks):
+          fd.write("%s %d\n" % (stack, stacks[stack]))
+    except IOError as e:
+      gLogger.error("Cannot write the profiling results", "%s: %s" % (outputFile, e))
+      return
+    gLogger.notice("Profiling results written", "%s (%d samples)" % (outputFile, sum(stacks.itervalues())))
+
+
+gSamplingProfiler = SamplingProfiler()
@@ -13,7 +13,8 @@ import datetime
 import sys
 
 
-from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions, \
+    g_dDecodeFunctions
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 
 from hypothesis import given
@@ -286,3 +287,32 @@ def test_nestedSerializable(data):
   subObj = Serializable(instAttr=data)
   objData = Serializable(instAttr=subObj)
   agnosticTestFunction(jsonTuple, objData)
+
+
+@given(data=nestedStrategy)
+def test_iterativeDecodeMatchesPerTypeDecoders(data):
+  """ Test that the single pass decoder gives the same result and position
+      as the per type decoding functions
+  """
+  encodedData = disetEncode(data)
+  assert disetDecode(encodedData) == g_dDecodeFunctions[encodedData[0]](encodedData, 0)
+
+
+def test_deeplyNestedDecode():
+  """ Test that decoding is not limited by the recursion depth """
+  depth = sys.getrecursionlimit() * 2
+  decodedData, lenData = disetDecode('l' * depth + 'e' * depth)
+
+  assert lenData == 2 * depth
+  for _ in xrange(depth - 1):
+    assert len(decodedData) == 1
+    decodedData = decodedData[0]
+  assert decodedData == []
+
+
+def test_unknownTokenDecode():
+  """ Test that an unknown type identifier still raises KeyError """
+  with raises(KeyError):
+    disetDecode('x')
+  with raises(KeyError):
+    disetDecode('e')
@@ -0,0 +1,71 @@
+""" Unit tests for the multi-threaded gzip compression
+"""
+
+import gzip
+import os
+import random
+import zlib
+import cStringIO
+
+import pytest
+
+from DIRAC.Core.Utilities.ParallelGzip import ParallelGzipWriter, GzipMembersReader, openDecompressedStream
+
+__RCSID__ = "$Id$"
+
+
+def compressibleData(size):
+  """ Random words, compressible but not trivially """
+  rand = random.Random(size)
+  words = ["word%d" % nb for nb in range(1000)]
+  data = []
+  total = 0
+  while total < size:
+    word = rand.choice(words)
+    data.append(word)
+    total += len(word)
+  return "".join(data)[:size]
+
+
+def parallelCompress(data, writeSize=10000, **kwargs):
+  output = cStringIO.StringIO()
+  with ParallelGzipWriter(output, **kwargs) as writer:
+    for offset in range(0, len(data), writeSize):
+      writer.write(data[offset:offset + writeSize])
+  return output.getvalue()
+
+
+@pytest.mark.parametrize("size", [0, 1, 65536, 1000000])
+def test_standardFormat(size):
+  """ The output is read by the standard gzip module """
+  data = compressibleData(size)
+  compressed = parallelCompress(data, blockSize=65536, threads=4)
+  assert gzip.GzipFile(fileobj=cStringIO.StringIO(compressed)).read() == data
+  if size > 65536:
+    assert len(compressed) < len(data)
+
+
+@pytest.mark.parametrize("readSize", [1, 1000, 100000, -1])
+def test_membersReader(readSize):
+  """ Several members are decompressed as one stream """
+  data = compressibleData(300000)
+  compressed = parallelCompress(data, blockSize=50000, threads=3, level=1)
+  reader = GzipMembersReader(cStringIO.StringIO(compressed), chunkSize=4096)
+  received = []
+  while True:
+    chunk = reader.read(readSize)
+    if not chunk:
+      break
+    received.append(chunk)
+  assert "".join(received) == data
+
+
+def test_openDecompressedStream():
+  """ Streams which are not gzip are returned as they are """
+  data = os.urandom(1000)
+  assert openDecompressedStream(cStringIO.StringIO(data)).read() == data
+  assert openDecompressedStream(cStringIO.StringIO(data)).read(1) == data[:1]
+  compressed = parallelCompress(data)
+  assert openDecompressedStream(cStringIO.StringIO(compressed)).read() == data
+  with pytest.raises(zlib.error):
+    openDecompressedStream(cStringIO.StringIO(compressed[:2] + data)).read()
@@ -0,0 +1,61 @@
+""" Unit tests for the statistics of the SQL queries by fingerprint
+"""
+
+import pytest
+
+from DIRAC.Core.Utilities.QueryStats import getFingerprint, QueryStats
+
+__RCSID__ = "$Id$"
+
+
+@pytest.mark.parametrize("cmd, fingerprint", [
+    ("SELECT JobID FROM Jobs WHERE Status IN ( 'Waiting', 'Running' ) AND Site = \"LCG.CERN.ch\" LIMIT 10",
+     "SELECT JobID FROM Jobs WHERE Status IN (?+) AND Site = ? LIMIT ?"),
+    ("SELECT JobID FROM Jobs WHERE Status IN ('Done')  AND\n Site = 'It''s' LIMIT 2",
+     "SELECT JobID FROM Jobs WHERE Status IN (?+) AND Site = ? LIMIT ?"),
+    ("SELECT * FROM `tq_TQToSites` WHERE TQId = 1.5e3 AND Value = \"a\\\"b\"",
+     "SELECT * FROM `tq_TQToSites` WHERE TQId = ? AND Value = ?"),
+    ("INSERT INTO T ( `a`, `b` ) VALUES (1, 'x', UTC_TIMESTAMP()),(2, 'y', UTC_TIMESTAMP()),(3, 'z', UTC_TIMESTAMP())",
+     "INSERT INTO T ( `a`, `b` ) VALUES (?, ?, UTC_TIMESTAMP())+"),
+    ("INSERT INTO T ( `a` ) VALUES (1),(2)",
+     "INSERT INTO T ( `a` ) VALUES (?+)+"),
+])
+def test_fingerprint(cmd, fingerprint):
+  """ Literals and value lists are replaced """
+  assert getFingerprint(cmd) == fingerprint
+
+
+def test_truncatedFingerprint():
+  """ Long queries are cut, in the middle of a literal """
+  cmd = "INSERT INTO T VALUES ('%s')" % ("x" * 100)
+  assert getFingerprint(cmd, maxLength=30) == "INSERT INTO T VALUES (?"
+
+
+def test_stats():
+  """ Executions are accounted by fingerprint """
+  stats = QueryStats()
+  stats.record("SELECT a FROM T WHERE b = 1", 0.1, rows=2)
+  stats.record("SELECT a FROM T WHERE b = 2", 0.3, rows=1)
+  stats.record("SELECT a FROM T WHERE b = 2", 0.2, error=True)
+  stats.record("UPDATE T SET a = 1", 0.5, rows=10)
+  result = stats.getStats()
+  assert [queryStats['fingerprint'] for queryStats in result] == ["SELECT a FROM T WHERE b = ?",
+                                                                 "UPDATE T SET a = ?"]
+  select = result[0]
+  assert (select['count'], select['rows'], select['errors']) == (3, 3, 1)
+  assert select['totalTime'] == pytest.approx(0.6)
+  assert select['meanTime'] == pytest.approx(0.2)
+  assert select['maxTime'] == pytest.approx(0.3)
+
+  assert [queryStats['count'] for queryStats in stats.getStats(sortBy='rows', limit=1, reset=True)] == [1]
+  assert stats.getStats() == []
+
+
+def test_maxFingerprints():
+  """ The fingerprints beyond the maximum are accounted together """
+  stats = QueryStats(maxFingerprints=2, cacheSize=1)
+  for table in "ABCD":
+    stats.record("SELECT a FROM %s" % table, 0.1)
+  stats.record("SELECT a FROM A", 0.1)
+  counts = dict((queryStats['fingerprint'], queryStats['count']) for queryStats in stats.getStats())
+  assert counts == {"SELECT a FROM A": 2, "SELECT a FROM B": 1, QueryStats.OTHERS: 2}
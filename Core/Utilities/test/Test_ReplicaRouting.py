@@ -0,0 +1,47 @@
+""" Unit tests for the routing of the read-only queries to the DB replicas
+"""
+
+import threading
+
+from DIRAC.Core.Utilities.ReplicaRouting import readOnly, startRequest, setWrote, useReplicas
+
+__RCSID__ = "$Id$"
+
+
+@readOnly
+def read(nested=False):
+  """ Read-only method, possibly calling another one """
+  if nested:
+    return read() and useReplicas()
+  return useReplicas()
+
+
+def test_readOnly():
+  """ Only the readOnly methods use the replicas """
+  startRequest()
+  assert not useReplicas()
+  assert read()
+  assert read(nested=True)
+  assert not useReplicas()
+
+
+def test_readYourWrites():
+  """ After a write, the request reads from the primary """
+  startRequest()
+  setWrote()
+  assert not read()
+  startRequest()
+  assert read()
+
+
+def test_threads():
+  """ The routing state is per thread """
+  startRequest()
+  setWrote()
+  results = []
+  thread = threading.Thread(target=lambda: results.append(read()))
+  thread.start()
+  thread.join()
+  assert results == [True]
+  assert not read()
+  startRequest()
@@ -0,0 +1,53 @@
+""" Unit tests for the SamplingProfiler
+"""
+
+import time
+import threading
+
+from DIRAC.Core.Utilities.SamplingProfiler import SamplingProfiler
+
+__RCSID__ = "$Id$"
+
+
+def busyFunction(stopEvent):
+  """ Function appearing in the profile """
+  while not stopEvent.isSet():
+    sum(xrange(1000))
+
+
+def test_profile(tmpdir):
+  """ The stacks of the other threads are written in the collapsed format """
+  stopEvent = threading.Event()
+  busyThread = threading.Thread(target=busyFunction, args=(stopEvent, ))
+  busyThread.start()
+  outputFile = str(tmpdir.join("profile.collapsed"))
+  profiler = SamplingProfiler(interval=0.001)
+  try:
+    result = profiler.start(0.2, outputFile)
+    assert result['OK']
+    assert result['Value'] == outputFile
+    assert profiler.isRunning()
+    assert not profiler.start(1, outputFile)['OK']
+    time.sleep(0.3)
+    profiler.stop()
+    assert not profiler.isRunning()
+  finally:
+    stopEvent.set()
+    busyThread.join()
+  lines = open(outputFile).read().splitlines()
+  busyLines = [line for line in lines if 'busyFunction (Test_SamplingProfiler.py:' in line]
+  assert busyLines
+  for line in lines:
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0
+    assert '__run (SamplingProfiler.py:' not in stack
+
+
+def test_getStack():
+  """ Frames go from the outermost to the innermost """
+  def inner():
+    import sys
+    return SamplingProfiler.getStack(sys._getframe())  # pylint: disable=protected-access
+  stack = inner().split(';')
+  assert stack[-1].startswith('inner (Test_SamplingProfiler.py:')
+  assert stack[-2].startswith('test_getStack (Test_SamplingProfiler.py:')
@@ -1994,6 +1994,7 @@ File Catalog Client $Revision: 1.17 $Date:
           dataset update <dataset_name>                    - update the dataset parameters
           dataset freeze <dataset_name>                    - fix the current contents of the dataset     
           dataset release <dataset_name>                   - release the dynamic dataset
+          dataset materialize <dataset_name>               - store the contents of the dataset and keep them up to date
     """
     argss = args.split()
     if (len(argss)==0):
@@ -2019,6 +2020,8 @@ File Catalog Client $Revision: 1.17 $Date:
       self.dataset_freeze( argss )
     elif command == "release":
       self.dataset_release( argss )      
+    elif command == "materialize":
+      self.dataset_materialize( argss )
     elif command == "status":
       self.dataset_status( argss )        
 
@@ -2121,6 +2124,16 @@ File Catalog Client $Revision: 1.17 $Date:
     else:
       print("Successfully released dataset", datasetName)
 
+  def dataset_materialize( self, argss ):
+    """ Materialize the given dataset
+    """
+    datasetName = argss[0]
+    result = returnSingleResult( self.fc.materializeDataset( datasetName ) )
+    if not result['OK']:
+      print("ERROR: failed to materialize dataset:", result['Message'])
+    else:
+      print("Successfully materialized dataset", datasetName)
+
   def dataset_files( self, argss ):
     """ Get the given dataset files
     """
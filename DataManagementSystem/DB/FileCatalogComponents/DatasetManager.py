@@ -1,4 +1,12 @@
 """ DIRAC FileCatalog plug-in class to manage dynamic datasets defined by a metadata query
+
+The contents of a dataset are either evaluated from its metadata query when requested (Dynamic),
+or stored in the FC_MetaDatasetFiles table: as a fixed snapshot (Frozen) or kept up to date with
+the files added and removed and with the metadata changes of the catalog (Materialized).
+
+The number of files and total size of the materialized datasets are updated with their contents,
+and checked against them by checkDataset, but not their hash, which would need all their LFNs: it is
+empty while they are materialized, and set again when they are frozen or released.
 """
 
 __RCSID__ = "$Id$"
@@ -7,7 +15,15 @@ import hashlib
 import os
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import stringListToString
+from DIRAC.Core.Utilities.List import stringListToString, intListToString, breakListIntoChunks
+
+
+def _isInPath( path, topPath ):
+  """ Check whether a path is the given top directory or one of its subdirectories
+  """
+  topPath = topPath.rstrip( '/' )
+  return not topPath or path == topPath or path.startswith( topPath + '/' )
+
 
 class DatasetManager( object ):
 
@@ -343,6 +359,40 @@ class DatasetManager( object ):
                      'LFNIDList': lfnIDList } )
     return result
 
+  def __getStoredParameters( self, datasetID, credDict ):
+    """ Get parameters ( hash, total size, number of files ) for the stored contents of a dataset
+    """
+    result = self.__getFrozenDatasetFiles( datasetID, credDict )
+    if not result['OK']:
+      return result
+    lfnIDList = result['FileIDList']
+    lfnList = sorted( result['Value'] )
+    myMd5 = hashlib.md5()
+    myMd5.update( str( lfnList ) )
+    result = self.__getFileSizes( lfnIDList )
+    if not result['OK']:
+      return result
+    return S_OK( { 'DatasetHash': myMd5.hexdigest().upper(),
+                   'NumberOfFiles': len( lfnList ),
+                   'TotalSize': sum( result['Value'].values() ),
+                   'LFNList': lfnList,
+                   'LFNIDList': lfnIDList } )
+
+  def __getFileSizes( self, fileIDs ):
+    """ Get the sizes of the given files
+
+    :return: S_OK( { FileID: Size } )
+    """
+    sizes = {}
+    for chunk in breakListIntoChunks( list( fileIDs ), 10000 ):
+      req = "SELECT FileID, Size FROM FC_Files WHERE FileID IN (%s)" % intListToString( chunk )
+      result = self.db._query( req )
+      if not result['OK']:
+        return result
+      for fileID, size in result['Value']:
+        sizes[fileID] = int( size )
+    return S_OK( sizes )
+
   def removeDataset( self, datasets, credDict ):
     """ Remove the requested datasets
 
@@ -402,7 +452,7 @@ class DatasetManager( object ):
   def __checkDataset( self, datasetName, credDict ):
     """ Check that the dataset parameters correspond to the actual state
     """
-    req = "SELECT MetaQuery,DatasetHash,TotalSize,NumberOfFiles FROM FC_MetaDatasets"
+    req = "SELECT MetaQuery,DatasetHash,TotalSize,NumberOfFiles,DatasetID,Status FROM FC_MetaDatasets"
     req += " WHERE DatasetName='%s'" % datasetName
     result = self.db._query( req )
     if not result['OK']:
@@ -416,12 +466,21 @@ class DatasetManager( object ):
     totalSizeOld = int( row[2] )
     numberOfFilesOld = int( row[3] )
 
-    result = self.__getMetaQueryParameters( metaQuery, credDict )
-    if not result['OK']:
-      return result
-    totalSize = result['Value']['TotalSize']
-    datasetHash = result['Value']['DatasetHash']
-    numberOfFiles = result['Value']['NumberOfFiles']
+    result = self.db.fileManager._getIntStatus( int( row[5] ) )
+    if result['OK'] and result['Value'] == 'Materialized':
+      # The counters are checked against the stored contents, the hash is not kept up to date
+      result = self.__getStoredCounters( int( row[4] ) )
+      if not result['OK']:
+        return result
+      numberOfFiles, totalSize = result['Value']
+      datasetHash = datasetHashOld
+    else:
+      result = self.__getMetaQueryParameters( metaQuery, credDict )
+      if not result['OK']:
+        return result
+      totalSize = result['Value']['TotalSize']
+      datasetHash = result['Value']['DatasetHash']
+      numberOfFiles = result['Value']['NumberOfFiles']
 
     changeDict = {}
     if totalSize != totalSizeOld:
@@ -704,6 +763,10 @@ class DatasetManager( object ):
       return result
 
     fileIDList = [ row[0] for row in result['Value'] ]
+    if not fileIDList:
+      result = S_OK( [] )
+      result['FileIDList'] = []
+      return result
     result = self.db.fileManager._getFileLFNs( fileIDList )
     if not result['OK']:
       return result
@@ -740,7 +803,7 @@ class DatasetManager( object ):
       return result
     status = result['Value']['Status']
     datasetID = result['Value']['DatasetID']
-    if status in ["Frozen","Static"]:
+    if status in ["Frozen","Static","Materialized"]:
       return self.__getFrozenDatasetFiles( datasetID, credDict )
     else:
       return self.__getDynamicDatasetFiles( datasetID, credDict )
@@ -774,25 +837,326 @@ class DatasetManager( object ):
       return S_OK()
 
     datasetID = result['Value']['DatasetID']
+    if status == "Materialized":
+      # The contents of the materialized datasets are already stored, not their hash
+      result = self.__setStoredDatasetHash( datasetID, credDict )
+      if not result['OK']:
+        return result
+    else:
+      req = "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=%d" % datasetID
+      result = self.db._update( req )
+
+      result = self.__getDynamicDatasetFiles( datasetID, credDict )
+
+      if not result['OK']:
+        return result
+      result = self.__insertDatasetFiles( datasetID, result['FileIDList'] )
+      if not result['OK']:
+        return result
+
+    result = self.setDatasetStatus( datasetName, 'Frozen' )
+    return result
+
+  def __setStoredDatasetHash( self, datasetID, credDict ):
+    """ Set the hash of a dataset from its stored contents
+    """
+    result = self.__getStoredParameters( datasetID, credDict )
+    if not result['OK']:
+      return result
+    req = "UPDATE FC_MetaDatasets SET DatasetHash='%s' WHERE DatasetID=%d" % ( result['Value']['DatasetHash'],
+                                                                             datasetID )
+    return self.db._update( req )
+
+  def __insertDatasetFiles( self, datasetID, fileIDs ):
+    """ Add files to the stored contents of a dataset
+
+    :return: S_OK( number of files added, without those already there )
+    """
+    nFiles = 0
+    for chunk in breakListIntoChunks( list( fileIDs ), 10000 ):
+      valueString = ','.join( [ '(%d,%d)' % ( datasetID, fileID ) for fileID in chunk ] )
+      req = "INSERT IGNORE INTO FC_MetaDatasetFiles (DatasetID,FileID) VALUES %s" % valueString
+      result = self.db._update( req )
+      if not result['OK']:
+        return result
+      nFiles += result['Value']
+    return S_OK( nFiles )
+
+  def __deleteDatasetFiles( self, datasetID, fileIDs ):
+    """ Remove files from the stored contents of a dataset
+
+    :return: S_OK( number of files removed )
+    """
+    nFiles = 0
+    for chunk in breakListIntoChunks( list( fileIDs ), 10000 ):
+      req = "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=%d AND FileID IN (%s)" % ( datasetID,
+                                                                                       intListToString( chunk ) )
+      result = self.db._update( req )
+      if not result['OK']:
+        return result
+      nFiles += result['Value']
+    return S_OK( nFiles )
+
+  def __getStoredCounters( self, datasetID ):
+    """ Count the files of the stored contents of a dataset
+
+    :return: S_OK( ( number of files, total size ) )
+    """
+    req = "SELECT COUNT(*), SUM(F.Size) FROM FC_MetaDatasetFiles AS D JOIN FC_Files AS F ON D.FileID=F.FileID"
+    req += " WHERE D.DatasetID=%d" % datasetID
+    result = self.db._query( req )
+    if not result['OK']:
+      return result
+    nFiles, size = result['Value'][0] if result['Value'] else ( 0, 0 )
+    return S_OK( ( int( nFiles ), int( size or 0 ) ) )
+
+  def materializeDataset( self, datasets, credDict ):
+    """ Store the contents of datasets and keep them up to date with the changes of the catalog
+
+    :param dict datasets: dictionary describing dataset definitions
+    :param credDict:  dictionary of the caller credentials
+    :return: S_OK/S_ERROR bulk return structure
+    """
+    failed = dict()
+    successful = dict()
+    for datasetName in datasets:
+      result = self.__materializeDataset( datasetName, credDict )
+      if result['OK']:
+        successful[datasetName] = True
+      else:
+        failed[datasetName] = result['Message']
+
+    return S_OK( { "Successful": successful, "Failed": failed } )
+
+  def __materializeDataset( self, datasetName, credDict ):
+    """ Store the result of the dataset metaquery as the dataset contents. Materializing
+        again an already materialized dataset resynchronizes its contents
+    """
+    result = self.__getDatasetParameters( datasetName, credDict )
+    if not result['OK']:
+      return result
+    datasetID = result['Value']['DatasetID']
+    metaQuery = result['Value']['MetaQuery']
+
+    result = self.db.fileManager._getStatusInt( 'Materialized' )
+    if not result['OK']:
+      return result
+    intStatus = result['Value']
+
+    result = self.__getMetaQueryParameters( metaQuery, credDict )
+    if not result['OK']:
+      return result
+    parameters = result['Value']
+
     req = "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=%d" % datasetID
     result = self.db._update( req )
+    if not result['OK']:
+      return result
+    result = self.__insertDatasetFiles( datasetID, parameters['LFNIDList'] )
+    if not result['OK']:
+      return result
+
+    # The hash is not kept up to date with the contents
+    req = "UPDATE FC_MetaDatasets SET Status=%d, TotalSize=%d, NumberOfFiles=%d, DatasetHash='', " % \
+        ( intStatus, parameters['TotalSize'], parameters['NumberOfFiles'] )
+    req += "ModificationDate=UTC_TIMESTAMP() WHERE DatasetID=%d" % datasetID
+    return self.db._update( req )
 
-    result = self.__getDynamicDatasetFiles( datasetID, credDict )
+  def __getMaterializedDatasets( self, metaFields = None ):
+    """ Get the materialized datasets, only those with conditions on one of the given fields if any
 
+    :return: S_OK( list of ( DatasetID, metaQuery ) )
+    """
+    req = "SELECT D.DatasetID, D.MetaQuery FROM FC_MetaDatasets AS D JOIN FC_Statuses AS S"
+    req += " ON D.Status=S.StatusID WHERE S.Status='Materialized'"
+    result = self.db._query( req )
     if not result['OK']:
       return result
-    fileIDList = result['FileIDList']
-    valueList = []
-    for fileID in fileIDList:
-      valueList.append( '(%d,%d)' % (datasetID,fileID) )
-    valueString = ','.join( valueList )
-    req = "INSERT INTO FC_MetaDatasetFiles (DatasetID,FileID) VALUES %s" % valueString
-    result = self.db._update( req )
+    datasets = []
+    for datasetID, metaQuery in result['Value']:
+      metaQuery = eval( metaQuery )
+      if metaFields is None or set( metaFields ) & set( metaQuery ):
+        datasets.append( ( datasetID, metaQuery ) )
+    return S_OK( datasets )
+
+  def __updateDatasetCounters( self, datasetID, nFiles, size ):
+    """ Shift the number of files and the total size of a dataset
+    """
+    req = "UPDATE FC_MetaDatasets SET NumberOfFiles=NumberOfFiles%+d, TotalSize=TotalSize%+d, " % ( nFiles, size )
+    req += "ModificationDate=UTC_TIMESTAMP() WHERE DatasetID=%d" % datasetID
+    return self.db._update( req )
+
+  def __resetDatasetCounters( self, datasetID ):
+    """ Set the number of files and the total size of a dataset from its stored contents, when
+        a concurrent change added or removed some of the files before us
+    """
+    result = self.__getStoredCounters( datasetID )
     if not result['OK']:
       return result
+    req = "UPDATE FC_MetaDatasets SET NumberOfFiles=%d, TotalSize=%d, " % result['Value']
+    req += "ModificationDate=UTC_TIMESTAMP() WHERE DatasetID=%d" % datasetID
+    return self.db._update( req )
 
-    result = self.setDatasetStatus( datasetName, 'Frozen' )
-    return result
+  def __refreshDatasetFiles( self, datasetID, metaQuery, path, fileIDs, credDict ):
+    """ Evaluate the dataset metaquery in a directory subtree for the given files of the subtree,
+        and add them to or remove them from the stored contents of the dataset accordingly
+    """
+    findMetaQuery = dict( metaQuery )
+    findMetaQuery.pop( 'Path', None )
+    result = self.db.fmeta.findFilesByMetadata( findMetaQuery, path, credDict )
+    if not result['OK']:
+      return result
+    selected = set( result['Value'] ) & fileIDs
+
+    stored = set()
+    for chunk in breakListIntoChunks( list( fileIDs ), 10000 ):
+      req = "SELECT FileID FROM FC_MetaDatasetFiles WHERE DatasetID=%d AND FileID IN (%s)" % ( datasetID,
+                                                                                             intListToString( chunk ) )
+      result = self.db._query( req )
+      if not result['OK']:
+        return result
+      stored.update( row[0] for row in result['Value'] )
+
+    toAdd = selected - stored
+    toRemove = stored - selected
+    if not toAdd and not toRemove:
+      return S_OK()
+    result = self.__getFileSizes( toAdd | toRemove )
+    if not result['OK']:
+      return result
+    sizes = result['Value']
+    result = self.__insertDatasetFiles( datasetID, toAdd )
+    if not result['OK']:
+      return result
+    nAdded = result['Value']
+    result = self.__deleteDatasetFiles( datasetID, toRemove )
+    if not result['OK']:
+      return result
+    nRemoved = result['Value']
+    if ( nAdded, nRemoved ) != ( len( toAdd ), len( toRemove ) ):
+      return self.__resetDatasetCounters( datasetID )
+    size = sum( sizes.get( fileID, 0 ) for fileID in toAdd ) - sum( sizes.get( fileID, 0 ) for fileID in toRemove )
+    return self.__updateDatasetCounters( datasetID, nAdded - nRemoved, size )
+
+  def refreshMaterializedFiles( self, lfns, credDict, metaFields = None ):
+    """ Update the contents of the materialized datasets for files added or whose metadata changed
+
+    :param list lfns: LFNs of the files
+    :param credDict:  dictionary of the caller credentials
+    :param list metaFields: changed metadata fields, only the datasets with conditions on them are updated
+    :return: S_OK/S_ERROR
+    """
+    result = self.__getMaterializedDatasets( metaFields )
+    if not result['OK'] or not result['Value']:
+      return result
+    datasets = result['Value']
+
+    result = self.db.fileManager._findFiles( list( lfns ), ['FileID'] )
+    if not result['OK']:
+      return result
+    dirFiles = {}
+    for lfn, fileDict in result['Value']['Successful'].items():
+      dirFiles.setdefault( os.path.dirname( lfn ), set() ).add( fileDict['FileID'] )
+
+    for dirPath, fileIDs in dirFiles.items():
+      for datasetID, metaQuery in datasets:
+        if _isInPath( dirPath, metaQuery.get( 'Path', '/' ) ):
+          result = self.__refreshDatasetFiles( datasetID, metaQuery, dirPath, fileIDs, credDict )
+          if not result['OK']:
+            return result
+    return S_OK()
+
+  def __getSubtreeFileIDs( self, path ):
+    """ Get the IDs of the files of a directory and of its subdirectories
+    """
+    result = self.db.dtree.findDir( path )
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK( set() )
+    dirID = result['Value']
+    result = self.db.dtree.getCachedSubdirectoriesByID( [dirID] )
+    if not result['OK']:
+      return result
+    dirIDs = set( result['Value'] ) | set( [dirID] )
+
+    fileIDs = set()
+    for chunk in breakListIntoChunks( list( dirIDs ), 10000 ):
+      req = "SELECT FileID FROM FC_Files WHERE DirID IN (%s)" % intListToString( chunk )
+      result = self.db._query( req )
+      if not result['OK']:
+        return result
+      fileIDs.update( row[0] for row in result['Value'] )
+    return S_OK( fileIDs )
+
+  def refreshMaterializedDirectory( self, path, credDict, metaFields = None ):
+    """ Update the contents of the materialized datasets for the files of a directory subtree
+        whose directory metadata changed
+
+    :param str path: directory path
+    :param credDict:  dictionary of the caller credentials
+    :param list metaFields: changed metadata fields, only the datasets with conditions on them are updated
+    :return: S_OK/S_ERROR
+    """
+    result = self.__getMaterializedDatasets( metaFields )
+    if not result['OK'] or not result['Value']:
+      return result
+
+    subtreeFiles = {}
+    for datasetID, metaQuery in result['Value']:
+      queryPath = metaQuery.get( 'Path', '/' )
+      # The changed files are those of the smallest of the directory and dataset subtrees
+      if _isInPath( path, queryPath ):
+        subtreePath = path
+      elif _isInPath( queryPath, path ):
+        subtreePath = queryPath
+      else:
+        continue
+      if subtreePath not in subtreeFiles:
+        result = self.__getSubtreeFileIDs( subtreePath )
+        if not result['OK']:
+          return result
+        subtreeFiles[subtreePath] = result['Value']
+      if not subtreeFiles[subtreePath]:
+        continue
+      result = self.__refreshDatasetFiles( datasetID, metaQuery, subtreePath, subtreeFiles[subtreePath], credDict )
+      if not result['OK']:
+        return result
+    return S_OK()
+
+  def removeMaterializedFiles( self, fileSizes ):
+    """ Remove files deleted from the catalog from the contents of the materialized datasets
+
+    :param dict fileSizes: { FileID: Size } of the removed files
+    :return: S_OK/S_ERROR
+    """
+    result = self.__getMaterializedDatasets()
+    if not result['OK'] or not result['Value']:
+      return result
+    datasetIDs = [ datasetID for datasetID, _metaQuery in result['Value'] ]
+
+    datasetFiles = {}
+    for chunk in breakListIntoChunks( fileSizes.keys(), 10000 ):
+      req = "SELECT DatasetID, FileID FROM FC_MetaDatasetFiles WHERE DatasetID IN (%s) AND FileID IN (%s)" % \
+          ( intListToString( datasetIDs ), intListToString( chunk ) )
+      result = self.db._query( req )
+      if not result['OK']:
+        return result
+      for datasetID, fileID in result['Value']:
+        datasetFiles.setdefault( datasetID, [] ).append( fileID )
+
+    for datasetID, fileIDs in datasetFiles.items():
+      result = self.__deleteDatasetFiles( datasetID, fileIDs )
+      if not result['OK']:
+        return result
+      if result['Value'] != len( fileIDs ):
+        result = self.__resetDatasetCounters( datasetID )
+      else:
+        result = self.__updateDatasetCounters( datasetID, -len( fileIDs ),
+                                               -sum( fileSizes[fileID] for fileID in fileIDs ) )
+      if not result['OK']:
+        return result
+    return S_OK()
 
   def releaseDataset( self, datasets, credDict ):
     """ Unfreeze datasets
@@ -824,6 +1188,10 @@ class DatasetManager( object ):
       return S_OK()
 
     datasetID = result['Value']['DatasetID']
+    if status == "Materialized":
+      result = self.__setStoredDatasetHash( datasetID, credDict )
+      if not result['OK']:
+        return result
     req = "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=%d" % datasetID
     result = self.db._update( req )
 
@@ -0,0 +1,449 @@
+""" DIRAC FileCatalog component caching the directory path <-> DirID mapping of the directory trees
+
+The mapping of an existing directory does not change until the directory is removed, so the
+cache keeps it without time to live, in a bounded LRU, and the directory trees invalidate it
+when they remove a directory. Only the existing directories are cached.
+
+With several FileCatalog services on the same database, the directories removed by the other
+services are learnt through the optional invalidation channel: the removals are recorded in the
+FC_DirectoryCacheInvalidations table, read back by all the services every few seconds. Until then,
+a cached DirID may belong to a removed directory: the directory trees check it in the database
+before registering files or directories under it, and only the read operations use it as is.
+
+The SubdirectoryCache keeps the subdirectories of the subtrees used by the metadata queries. The directories
+created by the other services are not known, so its entries expire after a short time.
+
+The PermissionCache keeps the permissions of the directories computed by the security managers for each
+user and group. The changes of owner, group or mode done by this service invalidate it, those done by the
+other services are seen when its entries expire.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from DIRAC import S_OK, gLogger
+
+
+class DirectoryCache(object):
+  """ Bounded LRU of the path <-> DirID mapping of the directories
+  """
+
+  def __init__(self, maxSize=100000):
+    """ c'tor
+
+        :param int maxSize: maximum number of directories kept
+    """
+    self.maxSize = maxSize
+    self.__lock = threading.Lock()
+    # path -> DirID, the most recently used last
+    self.__dirIDs = OrderedDict()
+    # DirID -> path
+    self.__paths = {}
+    self.__stats = {'hits': 0, 'misses': 0}
+    self.__channel = None
+    self.__syncPeriod = 0
+    self.__nextSync = 0
+    self.__syncing = False
+
+  def __len__(self):
+    return len(self.__dirIDs)
+
+  def setInvalidationChannel(self, channel, syncPeriod=5):
+    """ Share the invalidations with the other services through a channel
+
+        :param channel: object with publish( list of (DirID, path) ) and fetch() methods
+        :param int syncPeriod: seconds between two reads of the invalidations of the other services
+    """
+    self.__channel = channel
+    self.__syncPeriod = syncPeriod
+
+  def __sync(self):
+    """ Apply the invalidations of the other services, at most every syncPeriod seconds
+    """
+    if self.__channel is None or time.time() < self.__nextSync:
+      return
+    with self.__lock:
+      if self.__syncing:
+        return
+      self.__syncing = True
+    try:
+      result = self.__channel.fetch()
+      if not result['OK']:
+        gLogger.warn("Failed to get the directory cache invalidations", result['Message'])
+        # Without the invalidations, the cached directories may have been removed
+        self.clear()
+      else:
+        with self.__lock:
+          for dirID, path in result['Value']:
+            self.__remove(path, dirID)
+    finally:
+      self.__nextSync = time.time() + self.__syncPeriod
+      self.__syncing = False
+
+  def __remove(self, path, dirID):
+    """ Remove the entries of path and dirID, with the lock held
+    """
+    if path is not None:
+      cachedID = self.__dirIDs.pop(path, None)
+      if cachedID is not None:
+        self.__paths.pop(cachedID, None)
+    if dirID is not None:
+      cachedPath = self.__paths.pop(dirID, None)
+      if cachedPath is not None:
+        self.__dirIDs.pop(cachedPath, None)
+
+  def getDirID(self, path):
+    """ :return: DirID of the directory, None if not cached
+    """
+    return self.getDirIDs([path]).get(os.path.normpath(path))
+
+  def getDirIDs(self, paths):
+    """ :return: dict normalized path -> DirID of the cached directories
+    """
+    self.__sync()
+    dirIDs = {}
+    with self.__lock:
+      for path in paths:
+        path = os.path.normpath(path)
+        dirID = self.__dirIDs.get(path)
+        if dirID is None:
+          self.__stats['misses'] += 1
+          continue
+        self.__stats['hits'] += 1
+        # Mark it as the most recently used
+        del self.__dirIDs[path]
+        self.__dirIDs[path] = dirID
+        dirIDs[path] = dirID
+    return dirIDs
+
+  def getPath(self, dirID):
+    """ :return: path of the directory, None if not cached
+    """
+    return self.getPaths([dirID]).get(dirID)
+
+  def getPaths(self, dirIDs):
+    """ :return: dict DirID -> path of the cached directories
+    """
+    self.__sync()
+    paths = {}
+    with self.__lock:
+      for dirID in dirIDs:
+        path = self.__paths.get(dirID)
+        if path is None:
+          self.__stats['misses'] += 1
+          continue
+        self.__stats['hits'] += 1
+        del self.__dirIDs[path]
+        self.__dirIDs[path] = dirID
+        paths[dirID] = path
+    return paths
+
+  def add(self, path, dirID):
+    """ Cache an existing directory
+    """
+    self.addMany({path: dirID})
+
+  def addMany(self, dirIDs):
+    """ Cache existing directories
+
+        :param dict dirIDs: path -> DirID
+    """
+    with self.__lock:
+      for path, dirID in dirIDs.iteritems():
+        if not dirID:
+          continue
+        path = os.path.normpath(path)
+        dirID = int(dirID)
+        self.__remove(path, dirID)
+        self.__dirIDs[path] = dirID
+        self.__paths[dirID] = path
+      while len(self.__dirIDs) > self.maxSize:
+        _path, dirID = self.__dirIDs.popitem(last=False)
+        self.__paths.pop(dirID, None)
+
+  def discard(self, path=None, dirID=None):
+    """ Forget a directory in this service only, e.g. when found removed by another service
+
+        :param str path: path of the directory
+        :param int dirID: ID of the directory
+    """
+    if path is not None:
+      path = os.path.normpath(path)
+    if dirID is not None:
+      dirID = int(dirID)
+    with self.__lock:
+      self.__remove(path, dirID)
+
+  def invalidate(self, path=None, dirID=None):
+    """ Forget a directory, e.g. when it is removed, in this service and the others
+
+        :param str path: path of the directory
+        :param int dirID: ID of the directory
+    """
+    if path is not None:
+      path = os.path.normpath(path)
+    if dirID is not None:
+      dirID = int(dirID)
+    self.discard(path, dirID)
+    if self.__channel is not None:
+      result = self.__channel.publish([(dirID, path)])
+      if not result['OK']:
+        gLogger.error("Failed to publish the directory cache invalidation", result['Message'])
+
+  def clear(self):
+    """ Forget all the directories
+    """
+    with self.__lock:
+      self.__dirIDs.clear()
+      self.__paths.clear()
+
+  def getStats(self, reset=False):
+    """ :return: dict with the size, maxSize, hits and misses of the cache
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['size'] = len(self.__dirIDs)
+      stats['maxSize'] = self.maxSize
+      if reset:
+        self.__stats = {'hits': 0, 'misses': 0}
+    return stats
+
+
+class DBInvalidationChannel(object):
+  """ Channel sharing the directory cache invalidations of the services through the FileCatalogDB
+  """
+
+  _tables = dict()
+  _tables["FC_DirectoryCacheInvalidations"] = {"Fields": {
+      "InvalidationID": "BIGINT UNSIGNED AUTO_INCREMENT",
+      "DirID": "INT",
+      "DirName": "VARCHAR(255) CHARACTER SET latin1 COLLATE latin1_bin",
+      "InvalidationTime": "DATETIME NOT NULL"
+  },
+      "PrimaryKey": "InvalidationID",
+      "Indexes": {"InvalidationTime": ["InvalidationTime"]}
+  }
+
+  def __init__(self, database, keepTime=86400):
+    """ c'tor
+
+        :param database: FileCatalogDB
+        :param int keepTime: seconds the invalidations are kept in the table
+    """
+    self.db = None
+    self.keepTime = keepTime
+    self.__lastID = None
+    self.__nextCleaning = 0
+    if database is not None:
+      self.setDatabase(database)
+
+  def setDatabase(self, database):
+    """ Create the table if needed
+    """
+    self.db = database
+    result = self.db._query("SHOW TABLES")
+    if not result['OK']:
+      return result
+    tableList = [x[0] for x in result['Value']]
+    tablesToCreate = dict((table, self._tables[table]) for table in self._tables if table not in tableList)
+    result = self.db._createTables(tablesToCreate)
+    if not result['OK']:
+      gLogger.error("Failed to create tables", str(self._tables.keys()))
+    elif result['Value']:
+      gLogger.info("Tables created: %s" % ','.join(result['Value']))
+    return result
+
+  def publish(self, invalidations):
+    """ Record invalidations
+
+        :param list invalidations: (DirID, path) tuples
+    """
+    return self.db.insertMany('FC_DirectoryCacheInvalidations', ['DirID', 'DirName'],
+                              [list(invalidation) for invalidation in invalidations],
+                              sqlValues={'InvalidationTime': 'UTC_TIMESTAMP()'})
+
+  def fetch(self):
+    """ Get the invalidations recorded since the previous call
+
+        :return: S_OK(list of (DirID, path))
+    """
+    if self.__lastID is None:
+      # The cache is filled after the first call: only the invalidations recorded since then matter
+      result = self.db._query("SELECT MAX(InvalidationID) FROM FC_DirectoryCacheInvalidations")
+      if not result['OK']:
+        return result
+      self.__lastID = result['Value'][0][0] or 0
+      return S_OK([])
+
+    result = self.db._query("SELECT InvalidationID, DirID, DirName FROM FC_DirectoryCacheInvalidations "
+                            "WHERE InvalidationID > %d ORDER BY InvalidationID" % self.__lastID)
+    if not result['OK']:
+      return result
+    invalidations = []
+    for invalidationID, dirID, path in result['Value']:
+      self.__lastID = invalidationID
+      invalidations.append((dirID, path))
+
+    if time.time() > self.__nextCleaning:
+      self.__nextCleaning = time.time() + 3600
+      self.db._update("DELETE FROM FC_DirectoryCacheInvalidations "
+                      "WHERE InvalidationTime < UTC_TIMESTAMP() - INTERVAL %d SECOND" % self.keepTime)
+    return S_OK(invalidations)
+
+
+class SubdirectoryCache(object):
+  """ Bounded LRU of the IDs of all the subdirectories of sets of directories, with time to live
+  """
+
+  def __init__(self, maxSize=1000000, cacheTime=60):
+    """ c'tor
+
+        :param int maxSize: maximum number of subdirectory IDs kept, all the entries together
+        :param int cacheTime: seconds the entries are kept
+    """
+    self.maxSize = maxSize
+    self.cacheTime = cacheTime
+    self.__lock = threading.Lock()
+    # tuple of sorted DirIDs -> ( expiration time, list of subdirectory IDs ), the most recently used last
+    self.__subdirs = OrderedDict()
+    self.__size = 0
+    self.__stats = {'hits': 0, 'misses': 0}
+
+  def __len__(self):
+    return len(self.__subdirs)
+
+  @staticmethod
+  def __key(dirIDs):
+    return tuple(sorted(set(dirIDs)))
+
+  def get(self, dirIDs):
+    """ :return: list of the IDs of the subdirectories of the directories, None if not cached
+    """
+    key = self.__key(dirIDs)
+    with self.__lock:
+      entry = self.__subdirs.pop(key, None)
+      if entry is None or entry[0] < time.time():
+        if entry is not None:
+          self.__size -= len(entry[1])
+        self.__stats['misses'] += 1
+        return None
+      self.__stats['hits'] += 1
+      self.__subdirs[key] = entry
+      return list(entry[1])
+
+  def add(self, dirIDs, subdirIDs):
+    """ Cache the subdirectories of a set of directories
+    """
+    if len(subdirIDs) > self.maxSize:
+      return
+    key = self.__key(dirIDs)
+    with self.__lock:
+      entry = self.__subdirs.pop(key, None)
+      if entry is not None:
+        self.__size -= len(entry[1])
+      self.__subdirs[key] = (time.time() + self.cacheTime, list(subdirIDs))
+      self.__size += len(subdirIDs)
+      while self.__size > self.maxSize:
+        _key, (_expiration, evicted) = self.__subdirs.popitem(last=False)
+        self.__size -= len(evicted)
+
+  def clear(self):
+    """ Forget all the entries, e.g. when a directory is created or removed
+    """
+    with self.__lock:
+      self.__subdirs.clear()
+      self.__size = 0
+
+  def getStats(self, reset=False):
+    """ :return: dict with the number of entries, size, maxSize, hits and misses of the cache
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['entries'] = len(self.__subdirs)
+      stats['size'] = self.__size
+      stats['maxSize'] = self.maxSize
+      if reset:
+        self.__stats = {'hits': 0, 'misses': 0}
+    return stats
+
+
+class PermissionCache(object):
+  """ Bounded LRU of the permissions of the directories per user and group, with time to live
+  """
+
+  def __init__(self, maxSize=100000, cacheTime=10):
+    """ c'tor
+
+        :param int maxSize: maximum number of entries kept
+        :param int cacheTime: seconds the entries are kept
+    """
+    self.maxSize = maxSize
+    self.cacheTime = cacheTime
+    self.__lock = threading.Lock()
+    # ( path, username, group ) -> ( expiration time, permission dict ), the most recently used last
+    self.__permissions = OrderedDict()
+    self.__stats = {'hits': 0, 'misses': 0}
+
+  def __len__(self):
+    return len(self.__permissions)
+
+  @staticmethod
+  def __key(path, credDict):
+    return (os.path.normpath(path), credDict.get('username'), credDict.get('group'))
+
+  def get(self, path, credDict):
+    """ :return: copy of the permission dict of the directory for the credentials, None if not cached
+    """
+    key = self.__key(path, credDict)
+    with self.__lock:
+      entry = self.__permissions.pop(key, None)
+      if entry is None or entry[0] < time.time():
+        self.__stats['misses'] += 1
+        return None
+      self.__stats['hits'] += 1
+      self.__permissions[key] = entry
+      return dict(entry[1])
+
+  def add(self, path, credDict, permissions):
+    """ Cache the permissions of an existing directory for the credentials
+    """
+    key = self.__key(path, credDict)
+    with self.__lock:
+      self.__permissions.pop(key, None)
+      self.__permissions[key] = (time.time() + self.cacheTime, dict(permissions))
+      while len(self.__permissions) > self.maxSize:
+        self.__permissions.popitem(last=False)
+
+  def invalidate(self, paths, recursive=False):
+    """ Forget the permissions of directories, for all the credentials
+
+        :param list paths: directory paths
+        :param bool recursive: also forget those of their subdirectories
+    """
+    paths = set(os.path.normpath(path) for path in paths)
+    prefixes = tuple(path.rstrip('/') + '/' for path in paths)
+    with self.__lock:
+      for key in self.__permissions.keys():
+        if key[0] in paths or (recursive and key[0].startswith(prefixes)):
+          del self.__permissions[key]
+
+  def clear(self):
+    """ Forget all the entries
+    """
+    with self.__lock:
+      self.__permissions.clear()
+
+  def getStats(self, reset=False):
+    """ :return: dict with the size, maxSize, hits and misses of the cache
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['size'] = len(self.__permissions)
+      stats['maxSize'] = self.maxSize
+      if reset:
+        self.__stats = {'hits': 0, 'misses': 0}
+    return stats
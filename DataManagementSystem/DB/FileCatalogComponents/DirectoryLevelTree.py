@@ -29,6 +29,9 @@ class DirectoryLevelTree(DirectoryTreeBase):
   def findDir(self, path, connection=False):
     """  Find directory ID for the given path
     """
+    res = self._findCachedDir(path)
+    if res is not None:
+      return res
 
     dpath = self.db._escapeString(os.path.normpath(path))
     if not dpath['OK']:
@@ -44,11 +47,20 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
     res = S_OK(result['Value'][0][0])
     res['Level'] = result['Value'][0][1]
+    if self.dirCache is not None:
+      self.dirCache.add(path, res['Value'])
     return res
 
   def findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
     """
+    dirDict = {}
+    if self.dirCache is not None:
+      dirDict = self.dirCache.getDirIDs(paths)
+      paths = [path for path in paths if os.path.normpath(path) not in dirDict]
+      if not paths:
+        return S_OK(dirDict)
+
     dpathList = []
     for path in paths:
       dpath = self.db._escapeString(os.path.normpath(path))
@@ -60,9 +72,10 @@ class DirectoryLevelTree(DirectoryTreeBase):
     result = self.db._query(req, connection)
     if not result['OK']:
       return result
-    dirDict = {}
     for dirName, dirID in result['Value']:
       dirDict[dirName] = dirID
+    if self.dirCache is not None:
+      self.dirCache.addMany(dict(result['Value']))
 
     return S_OK(dirDict)
 
@@ -81,6 +94,9 @@ class DirectoryLevelTree(DirectoryTreeBase):
     dirID = result['Value']
     req = "DELETE FROM FC_DirectoryLevelTree WHERE DirID=%d" % dirID
     result = self.db._update(req)
+    if self.dirCache is not None:
+      self.dirCache.invalidate(path, dirID)
+    self._treeChanged()
     result['DirID'] = dirID
     return result
 
@@ -166,6 +182,9 @@ class DirectoryLevelTree(DirectoryTreeBase):
       else:
         return result
     dirID = result['lastRowId']
+    if self.dirCache is not None:
+      self.dirCache.add(path, dirID)
+    self._treeChanged()
 
     # Update the path number
     if parentDirID:
@@ -235,6 +254,11 @@ class DirectoryLevelTree(DirectoryTreeBase):
   def getDirectoryPath(self, dirID):
     """ Get directory name by directory ID
     """
+    if self.dirCache is not None:
+      dirPath = self.dirCache.getPath(int(dirID))
+      if dirPath is not None:
+        return S_OK(dirPath)
+
     req = "SELECT DirName FROM FC_DirectoryLevelTree WHERE DirID=%d" % int(dirID)
     result = self.db._query(req)
     if not result['OK']:
@@ -242,6 +266,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not result['Value']:
       return S_ERROR('Directory with id %d not found' % int(dirID))
 
+    if self.dirCache is not None:
+      self.dirCache.add(result['Value'][0][0], dirID)
     return S_OK(result['Value'][0][0])
 
   def getDirectoryPaths(self, dirIDList):
@@ -254,6 +280,13 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not dirs:
       return S_OK({})
 
+    resultDict = {}
+    if self.dirCache is not None:
+      resultDict = self.dirCache.getPaths([int(d) for d in dirs])
+      dirs = [d for d in dirs if int(d) not in resultDict]
+      if not dirs:
+        return S_OK(resultDict)
+
     dirListString = ','.join([str(d) for d in dirs])
     req = "SELECT DirID,DirName FROM FC_DirectoryLevelTree WHERE DirID in ( %s )" % dirListString
     result = self.db._query(req)
@@ -262,9 +295,10 @@ class DirectoryLevelTree(DirectoryTreeBase):
     if not result['Value']:
       return S_ERROR('Directories not found: %s' % dirListString)
 
-    resultDict = {}
     for row in result['Value']:
       resultDict[int(row[0])] = row[1]
+    if self.dirCache is not None:
+      self.dirCache.addMany(dict((dirName, dirID) for dirID, dirName in result['Value']))
 
     return S_OK(resultDict)
 
@@ -283,6 +317,10 @@ class DirectoryLevelTree(DirectoryTreeBase):
         specified by its path
     """
 
+    dirIDs = self._getCachedPathIDs(path)
+    if dirIDs is not None:
+      return S_OK(sorted(dirIDs))
+
     elements = path.split('/')
     pelements = []
     dPath = ''
@@ -292,14 +330,16 @@ class DirectoryLevelTree(DirectoryTreeBase):
     pelements.append('/')
 
     pathString = ["'" + p + "'" for p in pelements]
-    req = "SELECT DirID FROM FC_DirectoryLevelTree WHERE DirName in (%s) ORDER BY DirID" % ','.join(pathString)
+    req = "SELECT DirName,DirID FROM FC_DirectoryLevelTree WHERE DirName in (%s) ORDER BY DirID" % ','.join(pathString)
     result = self.db._query(req)
     if not result['OK']:
       return result
     if not result['Value']:
       return S_ERROR('Directory %s not found' % path)
 
-    return S_OK([x[0] for x in result['Value']])
+    if self.dirCache is not None:
+      self.dirCache.addMany(dict(result['Value']))
+    return S_OK([x[1] for x in result['Value']])
 
   def getPathIDsByID_old(self, dirID):
     """ Get IDs of all the directories in the parent hierarchy for a directory
@@ -318,6 +358,12 @@ class DirectoryLevelTree(DirectoryTreeBase):
     """ Get IDs of all the directories in the parent hierarchy for a directory
         specified by its ID
     """
+    if self.dirCache is not None:
+      dirPath = self.dirCache.getPath(int(dirID))
+      dirIDs = self._getCachedPathIDs(dirPath) if dirPath is not None else None
+      if dirIDs is not None:
+        return S_OK(dirIDs)
+
     result = self.__getNumericPath(dirID)
     if not result['OK']:
       return result
@@ -502,6 +548,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
           continue
         req = "UPDATE FC_DirectoryInfo SET DirID=%s WHERE DirID=%s" % (oldParentID, parentID)
         result = self.db._update(req)
+        if self.dirCache is not None:
+          self.dirCache.invalidate(parentPath, parentID)
 
         parentID = oldParentID
         # We have to change also the ownership of the new directory to the most likely one
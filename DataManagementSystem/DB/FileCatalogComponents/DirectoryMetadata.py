@@ -8,6 +8,7 @@ __RCSID__ = "$Id$"
 import os
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Utilities.Time import queryTime
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.MetaQueryPlanner import MetaQueryPlanner
 
 
 class DirectoryMetadata:
@@ -15,9 +16,11 @@ class DirectoryMetadata:
   def __init__(self, database=None):
 
     self.db = database
+    self.planner = MetaQueryPlanner(database)
 
   def setDatabase(self, database):
     self.db = database
+    self.planner.setDatabase(database)
 
 ##############################################################################
 #
@@ -67,6 +70,7 @@ class DirectoryMetadata:
       return result
 
     metadataID = result['lastRowId']
+    self.planner.invalidate(pname)
     result = self.__transformMetaParameterToData(pname)
     if not result['OK']:
       return result
@@ -79,6 +83,7 @@ class DirectoryMetadata:
 
     req = "DROP TABLE FC_Meta_%s" % pname
     result = self.db._update(req)
+    self.planner.invalidate(pname)
     error = ''
     if not result['OK']:
       error = result["Message"]
@@ -202,10 +207,13 @@ class DirectoryMetadata:
         if result['Message'].find('Duplicate') != -1:
           req = "UPDATE FC_Meta_%s SET Value='%s' WHERE DirID=%d" % (metaName, metaValue, dirID)
           result = self.db._update(req)
+          self.planner.invalidate(metaName)
           if not result['OK']:
             return result
         else:
           return result
+      else:
+        self.planner.addValue(metaName, metaValue)
 
     return S_OK()
 
@@ -230,6 +238,7 @@ class DirectoryMetadata:
         # Indexed meta case
         req = "DELETE FROM FC_Meta_%s WHERE DirID=%d" % (meta, dirID)
         result = self.db._update(req)
+        self.planner.invalidate(meta)
         if not result['OK']:
           failedMeta[meta] = result['Value']
       else:
@@ -440,10 +449,8 @@ class DirectoryMetadata:
 
     return S_OK(selectString)
 
-  def __findSubdirByMeta(self, meta, value, pathSelection='', subdirFlag=True):
-    """ Find directories for the given meta datum. If the the meta datum type is a list,
-        combine values in OR. In case the meta datum is 'Any', finds all the subdirectories
-        for which the meta datum is defined at all.
+  def __getSubdirByMetaRequest(self, meta, value, pathSelection=''):
+    """ Get the SQL request selecting the directories having the given meta datum defined for themselves
     """
 
     result = self.__createMetaSelection(meta, value, "M.")
@@ -459,6 +466,18 @@ class DirectoryMetadata:
         req += " AND %s" % selectString
       else:
         req += " WHERE %s" % selectString
+    return S_OK(req)
+
+  def __findSubdirByMeta(self, meta, value, pathSelection='', subdirFlag=True):
+    """ Find directories for the given meta datum. If the the meta datum type is a list,
+        combine values in OR. In case the meta datum is 'Any', finds all the subdirectories
+        for which the meta datum is defined at all.
+    """
+
+    result = self.__getSubdirByMetaRequest(meta, value, pathSelection)
+    if not result['OK']:
+      return result
+    req = result['Value']
 
     result = self.db._query(req)
     if not result['OK']:
@@ -476,13 +495,27 @@ class DirectoryMetadata:
       #    return result
       #  dirList += result['Value']
     if subdirFlag:
-      result = self.db.dtree.getAllSubdirectoriesByID(dirList)
+      result = self.db.dtree.getCachedSubdirectoriesByID(dirList)
       if not result['OK']:
         return result
       dirList += result['Value']
 
     return S_OK(dirList)
 
+  def __filterDirsByMeta(self, meta, value, dirSet):
+    """ Keep the directories of a set conforming to the given meta datum, defined for themselves
+        or for one of their parent directories. The check is done by the directory tree, in SQL if possible
+    """
+    result = self.__getSubdirByMetaRequest(meta, 'Any' if value == "Missing" else value)
+    if not result['OK']:
+      return result
+    result = self.db.dtree.getDirIDsUnder(dirSet, result['Value'])
+    if not result['OK']:
+      return result
+    if value == "Missing":
+      return S_OK(dirSet - result['Value'])
+    return S_OK(set(result['Value']))
+
   def __findSubdirMissingMeta(self, meta, pathSelection):
     """ Find directories not having the given meta datum defined
     """
@@ -600,25 +633,29 @@ class DirectoryMetadata:
         if not result['OK']:
           return result
         pathSelection = result['Value']
-      dirList = []
-      first = True
-      for meta, value in finalMetaDict.items():
-        if value == "Missing":
-          result = self.__findSubdirMissingMeta(meta, pathSelection)
-        else:
-          result = self.__findSubdirByMeta(meta, value, pathSelection)
-        if not result['OK']:
-          return result
-        mList = result['Value']
-        if first:
-          dirList = mList
-          first = False
+      # The most selective condition is evaluated first, the following ones only check
+      # the directories still selected
+      result = self.planner.orderConditions(finalMetaDict)
+      if not result['OK']:
+        return result
+      dirSet = None
+      for meta, value in result['Value']:
+        if dirSet is None:
+          if value == "Missing":
+            result = self.__findSubdirMissingMeta(meta, pathSelection)
+          else:
+            result = self.__findSubdirByMeta(meta, value, pathSelection)
+          if not result['OK']:
+            return result
+          dirSet = set(result['Value'])
         else:
-          newList = []
-          for d in dirList:
-            if d in mList:
-              newList.append(d)
-          dirList = newList
+          result = self.__filterDirsByMeta(meta, value, dirSet)
+          if not result['OK']:
+            return result
+          dirSet = result['Value']
+        if not dirSet:
+          break
+      dirList = list(dirSet)
     else:
       if pathDirID:
         result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
@@ -852,6 +889,7 @@ class DirectoryMetadata:
       return result
     metaFields = result['Value']
 
+    self.planner.invalidate()
     for meta in metaFields:
       req = "DELETE FROM FC_Meta_%s WHERE DirID in ( %s )" % (meta, dirListString)
       result = self.db._query(req)
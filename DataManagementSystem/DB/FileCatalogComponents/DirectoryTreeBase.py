@@ -21,6 +21,10 @@ class DirectoryTreeBase(object):
     self.db = database
     self.lock = threading.Lock()
     self.treeTable = ''
+    # DirectoryCache of the path <-> DirID mapping, if used by the tree
+    self.dirCache = None
+    # SubdirectoryCache of the subdirectories of the subtrees, if used by the tree
+    self.subdirCache = None
 
 ############################################################################
 #
@@ -34,9 +38,16 @@ class DirectoryTreeBase(object):
     return S_ERROR("To be implemented on derived class")
 
   def findDirs(self, paths, connection=False):
-    """ Find DirIDs for the given path list
+    """ Find DirIDs for the given path list, one path at a time if not implemented on derived class
     """
-    return S_ERROR("To be implemented on derived class")
+    dirDict = {}
+    for path in paths:
+      result = self.findDir(path)
+      if not result['OK']:
+        return result
+      if result['Value']:
+        dirDict[path] = result['Value']
+    return S_OK(dirDict)
 
   def makeDir(self, path):
 
@@ -81,6 +92,125 @@ class DirectoryTreeBase(object):
   def setDatabase(self, database):
     self.db = database
 
+  def setDirectoryCache(self, dirCache):
+    """ Use a DirectoryCache for the path <-> DirID mapping of the directories
+    """
+    self.dirCache = dirCache
+
+  def setSubdirectoryCache(self, subdirCache):
+    """ Use a SubdirectoryCache for the subdirectories of the subtrees
+    """
+    self.subdirCache = subdirCache
+
+  def _treeChanged(self):
+    """ To be called when a directory is created or removed
+    """
+    if self.subdirCache is not None:
+      self.subdirCache.clear()
+
+  def getAllSubdirectoriesByID(self, dirList):
+    """ Get IDs of all the subdirectories of directories in a given list
+    """
+    return S_ERROR("To be implemented on derived class")
+
+  def getCachedSubdirectoriesByID(self, dirList):
+    """ Get IDs of all the subdirectories of directories in a given list,
+        from the subdirectory cache if the same directories were expanded recently
+    """
+    if not isinstance(dirList, list):
+      dirList = [dirList]
+    if self.subdirCache is None:
+      return self.getAllSubdirectoriesByID(dirList)
+    subdirs = self.subdirCache.get(dirList)
+    if subdirs is not None:
+      return S_OK(subdirs)
+    result = self.getAllSubdirectoriesByID(dirList)
+    if result['OK']:
+      self.subdirCache.add(dirList, result['Value'])
+    return result
+
+  def getDirIDsUnder(self, dirIDs, ancestorRequest):
+    """ Get the directories of a list being one of the directories selected by an SQL request,
+        or one of their subdirectories. The trees able to do it in SQL override this method
+
+        :param list dirIDs: IDs of the directories to check
+        :param str ancestorRequest: SQL request selecting the DirIDs of the ancestors
+        :return: S_OK(set of DirIDs)
+    """
+    result = self.db._query(ancestorRequest)
+    if not result['OK']:
+      return result
+    ancestors = [row[0] for row in result['Value']]
+    if not ancestors:
+      return S_OK(set())
+    result = self.getCachedSubdirectoriesByID(ancestors)
+    if not result['OK']:
+      return result
+    subtrees = set(ancestors)
+    subtrees.update(result['Value'])
+    return S_OK(subtrees.intersection(dirIDs))
+
+  def _findCachedDir(self, path):
+    """ Find the directory ID for the given path in the directory cache
+
+        :return: S_OK(dirID) with res['Level'] as findDir, None if the directory is not cached
+    """
+    if self.dirCache is None:
+      return None
+    dpath = os.path.normpath(path)
+    dirID = self.dirCache.getDirID(dpath)
+    if dirID is None:
+      return None
+    res = S_OK(dirID)
+    res['Level'] = 0 if dpath == '/' else dpath.count('/')
+    return res
+
+  def _findDirToWrite(self, path):
+    """ Find the directory ID for the given path before registering entries under it. A DirID taken from
+        the directory cache is checked in the database: another service may have removed the directory
+        and not published it yet
+
+        :return: S_OK(dirID) as findDir
+    """
+    res = self._findCachedDir(path)
+    if res is None:
+      return self.findDir(path)
+    result = self._checkDirID(res['Value'])
+    if not result['OK']:
+      return result
+    if result['Value']:
+      return res
+    self.dirCache.discard(path, res['Value'])
+    return self.findDir(path)
+
+  def _checkDirID(self, dirID):
+    """ Check that a directory ID still exists in the database
+
+        :return: S_OK(bool)
+    """
+    req = "SELECT DirID FROM %s WHERE DirID=%d" % (self.getTreeTable(), dirID)
+    result = self.db._query(req)
+    if not result['OK']:
+      return result
+    return S_OK(bool(result['Value']))
+
+  def _getCachedPathIDs(self, path):
+    """ Get the IDs of the directories in the parent hierarchy of a directory from the directory cache
+
+        :return: list of IDs from the root directory to the directory, None if one of them is not cached
+    """
+    if self.dirCache is None:
+      return None
+    dpath = os.path.normpath(path)
+    paths = ['/']
+    for element in dpath.split('/')[1:]:
+      if element:
+        paths.append(os.path.join(paths[-1], element))
+    dirIDs = self.dirCache.getDirIDs(paths)
+    if len(dirIDs) != len(paths):
+      return None
+    return [dirIDs[dirPath] for dirPath in paths]
+
   def makeDirectory(self, path, credDict, status=0):
     """Create a new directory. The return value is the dictionary
        containing all the parameters of the newly created directory
@@ -132,23 +262,21 @@ class DirectoryTreeBase(object):
     if not path or path[0] != '/':
       return S_ERROR('Not an absolute path')
 
-    result = self.existsDir(path)
+    result = self._findDirToWrite(path)
     if not result['OK']:
       return result
-    result = result['Value']
-    if result['Exists']:
-      return S_OK(result['DirID'])
+    if result['Value']:
+      return S_OK(result['Value'])
 
     if path == '/':
       result = self.makeDirectory(path, credDict)
       return result
 
     parentDir = os.path.dirname(path)
-    result = self.existsDir(parentDir)
+    result = self._findDirToWrite(parentDir)
     if not result['OK']:
       return result
-    result = result['Value']
-    if result['Exists']:
+    if result['Value']:
       result = self.makeDirectory(path, credDict)
     else:
       result = self.makeDirectories(parentDir, credDict)
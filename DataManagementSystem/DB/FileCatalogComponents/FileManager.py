@@ -266,18 +266,23 @@ class FileManager(FileManagerBase):
         result = self.db.ugManager.getUserAndGroupID(ownerDict)
         if result['OK']:
           s_uid, s_gid = result['Value']
-      insertTuples.append("(%d,%d,%d,%d,%d,'%s')" % (dirID, size, s_uid, s_gid, statusID, fileName))
+      insertTuples.append([dirID, size, s_uid, s_gid, statusID, fileName])
       directorySESizeDict.setdefault(dirID, {})
       directorySESizeDict[dirID].setdefault(0, {'Files': 0, 'Size': 0})
       directorySESizeDict[dirID][0]['Size'] += lfns[lfn]['Size']
       directorySESizeDict[dirID][0]['Files'] += 1
 
-    req = "INSERT INTO FC_Files (DirID,Size,UID,GID,Status,FileName) VALUES %s" % (','.join(insertTuples))
-    res = self.db._update(req, connection)
+    res = self.db.insertMany('FC_Files', ['DirID', 'Size', 'UID', 'GID', 'Status', 'FileName'], insertTuples,
+                             conn=connection)
     if not res['OK']:
       return res
     # Get the fileIDs for the inserted files
-    res = self._findFiles(lfns.keys(), ['FileID'], connection=connection)
+    if 'lastRowIds' in res:
+      res = S_OK({'Successful': dict((lfn, {'FileID': fileID})
+                                     for lfn, fileID in zip(lfns.keys(), res['lastRowIds'])),
+                  'Failed': {}})
+    else:
+      res = self._findFiles(lfns.keys(), ['FileID'], connection=connection)
     if not res['OK']:
       for lfn in lfns.keys():
         failed[lfn] = 'Failed post insert check'
@@ -299,13 +304,11 @@ class FileManager(FileManagerBase):
       guid = fileInfo.get('GUID', '')
       mode = fileInfo.get('Mode', self.db.umask)
       toDelete.append(fileID)
-      insertTuples.append(
-          "(%d,'%s','%s','%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),%d)" %
-          (fileID, guid, checksum, checksumtype, mode))
+      insertTuples.append([fileID, guid, checksum, checksumtype, mode])
     if insertTuples:
-      fields = 'FileID,GUID,Checksum,ChecksumType,CreationDate,ModificationDate,Mode'
-      req = "INSERT INTO FC_FileInfo (%s) VALUES %s" % (fields, ','.join(insertTuples))
-      res = self.db._update(req)
+      res = self.db.insertMany('FC_FileInfo', ['FileID', 'GUID', 'Checksum', 'ChecksumType', 'Mode'], insertTuples,
+                               sqlValues={'CreationDate': 'UTC_TIMESTAMP()', 'ModificationDate': 'UTC_TIMESTAMP()'},
+                               conn=connection)
       if not res['OK']:
         self._deleteFiles(toDelete, connection=connection)
         for lfn in lfns.keys():
@@ -457,9 +460,8 @@ class FileManager(FileManagerBase):
     if not insertTuples:
       return S_OK({'Successful': successful, 'Failed': failed})
 
-    req = "INSERT INTO FC_Replicas (FileID,SEID,Status) VALUES %s" % \
-          (','.join(["(%d,%d,%d)" % (tuple_[0], tuple_[1], statusID) for tuple_ in insertTuples]))
-    res = self.db._update(req, connection)
+    res = self.db.insertMany('FC_Replicas', ['FileID', 'SEID', 'Status'],
+                             [[fileID, seID, statusID] for fileID, seID in insertTuples], conn=connection)
     if not res['OK']:
       return res
     res = self._getRepIDsForReplica(insertTuples, connection=connection)
@@ -488,11 +490,11 @@ class FileManager(FileManagerBase):
       if repID:
         pfn = fileDict['PFN']
         toDelete.append(repID)
-        insertReplicas.append("(%d,'%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),'%s')" % (repID, replicaType, pfn))
+        insertReplicas.append([repID, replicaType, pfn])
     if insertReplicas:
-      req = "INSERT INTO FC_ReplicaInfo (RepID,RepType,CreationDate,ModificationDate,PFN) VALUES %s" % (
-          ','.join(insertReplicas))
-      res = self.db._update(req, connection)
+      res = self.db.insertMany('FC_ReplicaInfo', ['RepID', 'RepType', 'PFN'], insertReplicas,
+                               sqlValues={'CreationDate': 'UTC_TIMESTAMP()', 'ModificationDate': 'UTC_TIMESTAMP()'},
+                               conn=connection)
       if not res['OK']:
         for lfn in lfns.keys():
           failed[lfn] = res['Message']
@@ -781,6 +783,26 @@ class FileManager(FileManagerBase):
       fileIDDict[repID] = (fileID, seID, statusID)
     return S_OK(fileIDDict)
 
+  def _getDirectoryFilesReplicas(self, dirFiles, statusIDs=None, withPFN=True, connection=False):
+    """ Get the replicas of the given files of several directories in a single query
+
+        :param dict dirFiles: DirID -> list of file names
+        :param list statusIDs: IDs of the replica statuses to consider, all if None
+        :param bool withPFN: whether the PFNs are needed, None otherwise
+
+        :return: S_OK(list of (DirID, FileName, SEID, PFN)), SEID None for the files without replicas
+    """
+    connection = self._getConnection(connection)
+    pfnColumn = "NULL"
+    pfnJoin = ""
+    if withPFN:
+      pfnColumn = "ri.PFN"
+      pfnJoin = " LEFT JOIN FC_ReplicaInfo ri ON ri.RepID=r.RepID"
+    req = "SELECT f.DirID,f.FileName,r.SEID,%s FROM FC_Files f" % pfnColumn
+    req += " LEFT JOIN FC_Replicas r ON r.FileID=f.FileID%s" % self._getStatusCondition(statusIDs, 'r.Status')
+    req += "%s WHERE %s" % (pfnJoin, self._getDirectoryFilesCondition(dirFiles))
+    return self.db._query(req, connection)
+
   def _getDirectoryReplicas(self, dirID, allStatus=False, connection=False):
     """ Get replicas for files in a given directory
     """
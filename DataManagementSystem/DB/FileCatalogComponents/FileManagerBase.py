@@ -9,7 +9,7 @@ import os
 import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import intListToString
+from DIRAC.Core.Utilities.List import intListToString, stringListToString, breakListIntoChunks
 from DIRAC.Core.Utilities.Pfn import pfnunparse
 
 
@@ -176,6 +176,19 @@ class FileManagerBase(object):
 
     return S_ERROR("To be implemented on derived class")
 
+  def _getDirectoryFilesReplicas(self, dirFiles, statusIDs=None, withPFN=True, connection=False):
+    """ To be implemented on derived class
+
+    Should return the replicas of the given files of several directories in a single query,
+    as a list of (DirID, FileName, SEID, PFN), with SEID None for the files without replicas
+
+    :param dict dirFiles: DirID -> list of file names
+    :param list statusIDs: IDs of the replica statuses to consider, all if None
+    :param bool withPFN: whether the PFNs are needed, None otherwise
+    """
+
+    return S_ERROR("To be implemented on derived class")
+
   def countFilesInDir(self, dirId):
     """ Count how many files there is in a given Directory
 
@@ -234,6 +247,11 @@ class FileManagerBase(object):
     else:
       failed.update(res['Value']['Failed'])
       successful.update(res['Value']['Successful'])
+    if successful:
+      # Keep the contents of the materialized datasets up to date
+      res = self.db.datasetManager.refreshMaterializedFiles(successful.keys(), credDict)
+      if not res['OK']:
+        gLogger.error("Failed to update the materialized datasets", res['Message'])
     return S_OK({'Successful': successful, 'Failed': failed})
 
   def _addFiles(self, lfns, credDict, connection=False):
@@ -672,6 +690,11 @@ class FileManagerBase(object):
       self._updateDirectoryUsage(directorySESizeDict, '-', connection=connection)
       for lfn in fileIDLfns.values():
         successful[lfn] = True
+      if lfns:
+        res = self.db.datasetManager.removeMaterializedFiles(dict((lfnDict['FileID'], lfnDict['Size'])
+                                                                   for lfnDict in lfns.values()))
+        if not res['OK']:
+          gLogger.error("Failed to update the materialized datasets", res['Message'])
     return S_OK({"Successful": successful, "Failed": failed})
 
   def _computeStorageUsageOnRemoveFile(self, lfns, connection=False):
@@ -995,22 +1018,56 @@ class FileManagerBase(object):
     return result
 
   def getReplicas(self, lfns, allStatus, connection=False):
-    """ Get file replicas from the catalog """
-    connection = self._getConnection(connection)
+    """ Get file replicas from the catalog
 
-    # Get FileID <-> LFN correspondence first
-    res = self._findFileIDs(lfns, connection=connection)
-    if not res['OK']:
-      return res
-    failed = res['Value']['Failed']
-    fileIDLFNs = {}
-    for lfn, fileID in res['Value']['Successful'].items():
-      fileIDLFNs[fileID] = lfn
+        The files and their replicas are got with a single query per chunk of directories,
+        and the SE names are resolved with a table indexed by SEID built once per call
+    """
+    connection = self._getConnection(connection)
 
-    result = self.__getReplicasForIDs(fileIDLFNs, allStatus, connection)
+    dirDict = self._getFileDirectories(lfns)
+    result = self.db.dtree.findDirs(dirDict.keys())
     if not result['OK']:
       return result
-    replicas = result['Value']
+    directoryIDs = result['Value']
+    directoryPaths = dict((dirID, dirPath) for dirPath, dirID in directoryIDs.iteritems() if dirPath in dirDict)
+
+    statusIDs = None
+    if not allStatus:
+      result = self._getStatusTable(connection=connection)
+      if not result['OK']:
+        return result
+      statusIDs = [statusID for statusID, status in enumerate(result['Value'])
+                   if status in self.db.visibleReplicaStatus]
+    withPFN = not self.db.lfnPfnConvention or self.db.lfnPfnConvention == "Weak"
+
+    rows = []
+    for dirIDs in breakListIntoChunks(directoryPaths.keys(), 1000):
+      dirFiles = dict((dirID, dirDict[directoryPaths[dirID]]) for dirID in dirIDs)
+      result = self._getDirectoryFilesReplicas(dirFiles, statusIDs=statusIDs, withPFN=withPFN,
+                                               connection=connection)
+      if not result['OK']:
+        return result
+      rows.extend(result['Value'])
+
+    seNames = self._getSETable()
+    if any(seID is not None and (seID >= len(seNames) or seNames[seID] is None) for _, _, seID, _ in rows):
+      # SE added by another service since the last refresh
+      self.db.seManager._refreshSEs(connection=connection)
+      seNames = self._getSETable()
+
+    replicas = {}
+    for dirID, fileName, seID, pfn in rows:
+      lfn = ('%s/%s' % (directoryPaths[dirID], fileName)).replace('//', '/')
+      seReplicas = replicas.setdefault(lfn, {})
+      if seID is None or seID >= len(seNames) or seNames[seID] is None:
+        continue
+      seReplicas[seNames[seID]] = pfn or ''
+
+    failed = {}
+    for lfn in lfns:
+      if lfn not in replicas:
+        failed[lfn] = "No such file or directory"
 
     result = S_OK({"Successful": replicas, 'Failed': failed})
 
@@ -1106,21 +1163,74 @@ class FileManagerBase(object):
       return res
     return S_OK(res['lastRowId'])
 
-  def _getIntStatus(self, statusID, connection=False):
-    if statusID in self.statusDict:
-      return S_OK(self.statusDict[statusID])
+  def __refreshStatuses(self, connection=False):
     connection = self._getConnection(connection)
     req = "SELECT StatusID,Status FROM FC_Statuses"
     res = self.db._query(req, connection)
     if not res['OK']:
       return res
-    if res['Value']:
-      for row in res['Value']:
-        self.statusDict[int(row[0])] = row[1]
+    for row in res['Value']:
+      self.statusDict[int(row[0])] = row[1]
+    return S_OK()
+
+  def _getIntStatus(self, statusID, connection=False):
+    if statusID in self.statusDict:
+      return S_OK(self.statusDict[statusID])
+    res = self.__refreshStatuses(connection=connection)
+    if not res['OK']:
+      return res
     if statusID in self.statusDict:
       return S_OK(self.statusDict[statusID])
     return S_OK('Unknown')
 
+  @staticmethod
+  def __denseTable(idDict):
+    """ Turn a dict ID -> value into a list indexed by the IDs, with None for the unused IDs
+    """
+    table = [None] * (max(idDict) + 1 if idDict else 0)
+    for itemID, value in idDict.iteritems():
+      table[itemID] = value
+    return table
+
+  def _getStatusTable(self, connection=False):
+    """ Get the status names as a list indexed by StatusID
+
+        The statuses are read from the DB only if some visible replica status is not known yet
+    """
+    if not set(self.db.visibleReplicaStatus) <= set(self.statusDict.itervalues()):
+      res = self.__refreshStatuses(connection=connection)
+      if not res['OK']:
+        return res
+    return S_OK(self.__denseTable(self.statusDict))
+
+  def _getSETable(self):
+    """ Get the SE names as a list indexed by SEID, from the cache of the SEManager
+    """
+    return self.__denseTable(self.db.seids)
+
+  @staticmethod
+  def _getDirectoryFilesCondition(dirFiles, table='f'):
+    """ Get the SQL condition selecting the given files of several directories
+
+        :param dict dirFiles: DirID -> list of file names
+        :param str table: alias of the FC_Files table
+    """
+    return " OR ".join("( %s.DirID=%d AND %s.FileName IN (%s) )" %
+                       (table, dirID, table, stringListToString(fileNames))
+                       for dirID, fileNames in dirFiles.iteritems())
+
+  @staticmethod
+  def _getStatusCondition(statusIDs, column):
+    """ Get the SQL condition on a status column, empty if statusIDs is None
+
+        :param list statusIDs: IDs of the statuses to consider
+    """
+    if statusIDs is None:
+      return ""
+    if not statusIDs:
+      return " AND FALSE"
+    return " AND %s IN (%s)" % (column, intListToString(statusIDs))
+
   def getFileIDsInDirectory(self, dirID, requestString=False):
     """ Get a list of IDs for all the files stored in given directories or their
         subdirectories
@@ -1357,3 +1467,18 @@ class FileManagerBase(object):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return S_ERROR("To be implemented on derived class")
+
+  def iterSEDump(self, seName, chunkSize=10000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size
+
+        :param seName: name of the StorageElement
+        :param chunkSize: number of files per chunk
+
+        :returns: S_OK with an iterator over lists of tuples (lfn, checksum, size)
+    """
+    result = self.getSEDump(seName)
+    if not result['OK']:
+      return result
+    seDump = result['Value']
+    return S_OK(seDump[i:i + chunkSize] for i in xrange(0, len(seDump), chunkSize))
@@ -367,3 +367,14 @@ class FileManagerFlat(FileManagerBase):
       if fileID not in replicas:
         replicas[fileID] = {}
     return S_OK(replicas)
+
+  def _getDirectoryFilesReplicas(self, dirFiles, statusIDs=None, withPFN=True, connection=False):
+    """ Get the replicas of the given files of several directories in a single query,
+        as a list of (DirID, FileName, SEID, PFN), SEID None for the files without replicas
+    """
+    connection = self._getConnection(connection)
+    pfnColumn = "r.PFN" if withPFN else "NULL"
+    req = "SELECT f.DirID,f.FileName,r.SEID,%s FROM FC_Files f" % pfnColumn
+    req += " LEFT JOIN FC_Replicas r ON r.FileID=f.FileID%s" % self._getStatusCondition(statusIDs, 'r.Status')
+    req += " WHERE %s" % self._getDirectoryFilesCondition(dirFiles)
+    return self.db._query(req, connection)
@@ -164,20 +164,20 @@ class FileMetadata:
         req = "DELETE FROM FC_FileMeta_%s WHERE FileID=%d" % (meta, fileID)
         result = self.db._update(req)
         if not result['OK']:
-          failedMeta[meta] = result['Value']
+          failedMeta[meta] = result['Message']
       else:
         # Meta parameter case
         req = "DELETE FROM FC_FileMeta WHERE MetaKey='%s' AND FileID=%d" % (meta, fileID)
         result = self.db._update(req)
         if not result['OK']:
-          failedMeta[meta] = result['Value']
+          failedMeta[meta] = result['Message']
 
     if failedMeta:
       metaExample = failedMeta.keys()[0]
       result = S_ERROR('Failed to remove %d metadata, e.g. %s' % (len(failedMeta), failedMeta[metaExample]))
       result['FailedMetadata'] = failedMeta
-    else:
-      return S_OK()
+      return result
+    return S_OK()
 
   def __getFileID(self, path):
 
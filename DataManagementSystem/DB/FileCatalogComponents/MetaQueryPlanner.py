@@ -0,0 +1,235 @@
+""" DIRAC FileCatalog component ordering the conditions of the directory metadata queries
+
+The conditions are evaluated from the most selective one, so that the following ones only have to
+check the few directories still selected. The number of directories selected by a condition is
+estimated from a histogram of the values of the metadata field, read from its FC_Meta_<field> table,
+times the average number of directories of the subtrees having the field.
+
+The histograms keep the counts of the most frequent values only, the other values being counted
+on average. They are updated when values are added, reloaded when values are changed or removed,
+and refreshed periodically for the changes done by the other services.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import threading
+
+from DIRAC import S_OK, gLogger
+
+
+def _toNumber(value):
+  """ :return: float value of a number or of a string representing a number, None otherwise
+  """
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def _compare(value, operation, operand):
+  """ Compare a metadata value with an operand, numerically if both are numbers, as strings otherwise
+  """
+  numValue = _toNumber(value)
+  numOperand = _toNumber(operand)
+  if numValue is not None and numOperand is not None:
+    value, operand = numValue, numOperand
+  else:
+    value, operand = str(value), str(operand)
+  if operation == '>':
+    return value > operand
+  if operation == '<':
+    return value < operand
+  if operation == '>=':
+    return value >= operand
+  return value <= operand
+
+
+class MetaQueryPlanner(object):
+  """ Estimates of the number of directories selected by the metadata conditions
+  """
+
+  def __init__(self, database=None, refreshPeriod=3600, maxValues=1000, sampleSize=10):
+    """ c'tor
+
+        :param database: FileCatalogDB
+        :param int refreshPeriod: seconds after which a histogram is reloaded
+        :param int maxValues: maximum number of values counted individually per field
+        :param int sampleSize: number of directories used to estimate the size of the subtrees of a field
+    """
+    self.db = database
+    self.refreshPeriod = refreshPeriod
+    self.maxValues = maxValues
+    self.sampleSize = sampleSize
+    self.__lock = threading.Lock()
+    # field -> histogram dict
+    self.__histograms = {}
+
+  def setDatabase(self, database):
+    self.db = database
+    self.invalidate()
+
+  def invalidate(self, meta=None):
+    """ Forget the histogram of a field, or of all the fields, to be reloaded at the next query
+    """
+    with self.__lock:
+      if meta is None:
+        self.__histograms.clear()
+      else:
+        self.__histograms.pop(meta, None)
+
+  def addValue(self, meta, value):
+    """ Count a value newly set for a directory. The histogram is replaced by an updated copy,
+        the queries may be reading the previous one
+    """
+    with self.__lock:
+      histogram = self.__histograms.get(meta)
+      if histogram is None:
+        return
+      histogram = dict(histogram)
+      histogram['Counts'] = dict(histogram['Counts'])
+      self.__histograms[meta] = histogram
+      histogram['Total'] += 1
+      value = str(value)
+      if value in histogram['Counts']:
+        histogram['Counts'][value] += 1
+      elif not histogram['Truncated'] and len(histogram['Counts']) < self.maxValues:
+        histogram['Counts'][value] = 1
+      else:
+        histogram['Truncated'] = True
+        histogram['Others'] += 1
+
+  def __loadHistogram(self, meta):
+    """ Read the histogram of a field from its table
+    """
+    result = self.db._query("SELECT COUNT(*), COUNT(DISTINCT Value) FROM FC_Meta_%s" % meta)
+    if not result['OK']:
+      return result
+    total, distinct = result['Value'][0]
+    result = self.db._query("SELECT Value, COUNT(*) AS N FROM FC_Meta_%s GROUP BY Value ORDER BY N DESC LIMIT %d" %
+                            (meta, self.maxValues))
+    if not result['OK']:
+      return result
+    counts = dict((str(value), int(count)) for value, count in result['Value'])
+    histogram = {'Total': int(total),
+                 'Counts': counts,
+                 'Truncated': int(distinct) > len(counts),
+                 'Others': int(total) - sum(counts.itervalues()),
+                 'OtherValues': max(int(distinct) - len(counts), 1),
+                 'SubtreeSize': self.__getAverageSubtreeSize(meta),
+                 'LoadTime': time.time()}
+    return S_OK(histogram)
+
+  def __getAverageSubtreeSize(self, meta):
+    """ Average number of directories, subdirectories included, of a sample of the directories having the field
+    """
+    result = self.db._query("SELECT DirID FROM FC_Meta_%s LIMIT %d" % (meta, self.sampleSize))
+    if not result['OK'] or not result['Value']:
+      return 1.
+    sizes = []
+    for row in result['Value']:
+      result = self.db.dtree.countSubdirectories(row[0], includeParent=True)
+      if not result['OK']:
+        return 1.
+      sizes.append(result['Value'])
+    return max(float(sum(sizes)) / len(sizes), 1.)
+
+  def getHistogram(self, meta):
+    """ Get the histogram of a field, reloaded if too old
+
+        :return: S_OK(dict) with Total, Counts: the counts of the most frequent values,
+                 Truncated: whether other values exist, Others: the number of directories with the other values,
+                 OtherValues: the number of other values and SubtreeSize: the average size of the subtrees.
+                 It is not changed afterwards, and must not be changed by the caller
+    """
+    with self.__lock:
+      histogram = self.__histograms.get(meta)
+    if histogram is not None and time.time() - histogram['LoadTime'] < self.refreshPeriod:
+      return S_OK(histogram)
+    result = self.__loadHistogram(meta)
+    if not result['OK']:
+      return result
+    with self.__lock:
+      self.__histograms[meta] = result['Value']
+    return result
+
+  @staticmethod
+  def __countValues(histogram, values):
+    """ Estimated number of directories having one of the values
+    """
+    count = 0.
+    for value in set(str(value) for value in values):
+      if value in histogram['Counts']:
+        count += histogram['Counts'][value]
+      elif histogram['Truncated']:
+        count += float(histogram['Others']) / histogram['OtherValues']
+    return count
+
+  def __countSelection(self, histogram, value):
+    """ Estimated number of directories having the field selected by a condition,
+        with the same conventions as DirectoryMetadata.__createMetaSelection
+    """
+    total = histogram['Total']
+    if isinstance(value, dict):
+      values = None
+      excluded = set()
+      checks = []
+      for operation, operand in value.items():
+        operands = operand if isinstance(operand, list) else [operand]
+        if operation in ['>', '<', '>=', '<=']:
+          checks.append(lambda hValue, operation=operation, operand=operand: _compare(hValue, operation, operand))
+        elif operation in ['in', '=']:
+          values = set(str(x) for x in operands)
+        elif operation in ['nin', '!=']:
+          excluded.update(str(x) for x in operands)
+      if values is not None:
+        return self.__countValues(histogram, [x for x in values - excluded if all(check(x) for check in checks)])
+      if not checks:
+        return total - self.__countValues(histogram, excluded)
+      counted = sum(histogram['Counts'].itervalues())
+      matched = sum(count for hValue, count in histogram['Counts'].iteritems()
+                    if hValue not in excluded and all(check(hValue) for check in checks))
+      # The other values are assumed to be distributed as the most frequent ones
+      if counted:
+        matched += float(histogram['Others']) * matched / counted
+      return matched
+    if isinstance(value, list):
+      return self.__countValues(histogram, value)
+    if value == 'Any':
+      return total
+    return self.__countValues(histogram, [value])
+
+  def estimate(self, meta, value):
+    """ Estimate the number of directories, subdirectories included, selected by a condition
+
+        :return: S_OK(float), None for the 'Missing' conditions, which select the directories without the field
+    """
+    if value == 'Missing':
+      return S_OK(None)
+    result = self.getHistogram(meta)
+    if not result['OK']:
+      return result
+    histogram = result['Value']
+    return S_OK(self.__countSelection(histogram, value) * histogram['SubtreeSize'])
+
+  def orderConditions(self, metaDict):
+    """ Order the conditions of a query from the most selective one, the 'Missing' conditions last.
+        The conditions that cannot be estimated keep their place after the estimated ones
+
+        :param dict metaDict: field -> condition
+        :return: S_OK(list of (field, condition))
+    """
+    estimated = []
+    others = []
+    for meta, value in metaDict.items():
+      result = self.estimate(meta, value)
+      if not result['OK']:
+        gLogger.warn("Failed to estimate the metadata condition", "%s: %s" % (meta, result['Message']))
+        others.append((meta, value))
+      elif result['Value'] is None:
+        others.append((meta, value))
+      else:
+        estimated.append((result['Value'], meta, value))
+    estimated.sort(key=lambda condition: condition[0])
+    others.sort(key=lambda condition: condition[1] == 'Missing')
+    return S_OK([(meta, value) for _estimate, meta, value in estimated] + others)
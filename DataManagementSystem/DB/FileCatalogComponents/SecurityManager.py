@@ -23,10 +23,85 @@ class SecurityManagerBase(object):
 
   def __init__(self, database=None):
     self.db = database
+    self.permCache = None
 
   def setDatabase(self, database):
     self.db = database
 
+  def setPermissionCache(self, permCache):
+    """ Keep the permissions of the directories computed recently in a PermissionCache
+    """
+    self.permCache = permCache
+
+  def invalidatePermissions(self, paths, recursive=False):
+    """ Forget the cached permissions of directories, e.g. when their owner, group or mode change
+
+        :param list paths: directory paths
+        :param bool recursive: also forget those of their subdirectories
+    """
+    if self.permCache is not None:
+      self.permCache.invalidate(paths, recursive=recursive)
+
+  def _getDirectoryPermissions(self, paths, credDict):
+    """ Get the permissions of paths as those of their nearest existing directory, like
+        the getPathPermissions of the directory tree, but computed once per directory
+        and taken from the permission cache when computed recently
+
+        :param list paths: file or directory paths
+        :param dict credDict: credentials of the user
+        :return: S_OK with Successful dict path: permission dict and Failed dict path: error
+    """
+    successful = {}
+    failed = {}
+    # path to resolve -> paths getting its permissions
+    toResolve = {}
+    for path in paths:
+      toResolve.setdefault(os.path.normpath(path), []).append(path)
+    # existing directory -> paths getting its permissions
+    directories = {}
+
+    while toResolve:
+      if self.permCache is not None:
+        for dirPath in toResolve.keys():
+          permissions = self.permCache.get(dirPath, credDict)
+          if permissions is not None:
+            for path in toResolve.pop(dirPath):
+              successful[path] = dict(permissions)
+        if not toResolve:
+          break
+
+      res = self.db.dtree.findDirs(toResolve.keys())
+      if not res['OK']:
+        return res
+      parents = {}
+      for dirPath, resolvedPaths in toResolve.items():
+        if dirPath in res['Value']:
+          directories.setdefault(dirPath, []).extend(resolvedPaths)
+        elif dirPath == '/':
+          # Nothing exists yet, starting from scratch
+          for path in resolvedPaths:
+            successful[path] = {'Read': True, 'Write': True, 'Execute': True}
+        elif not dirPath.startswith('/'):
+          for path in resolvedPaths:
+            failed[path] = 'Illegal Path'
+        else:
+          # Not an existing directory, the permissions are those of the parent
+          parents.setdefault(os.path.dirname(dirPath), []).extend(resolvedPaths)
+      toResolve = parents
+
+    for dirPath, resolvedPaths in directories.items():
+      res = self.db.dtree.getDirectoryPermissions(dirPath, credDict)
+      if not res['OK']:
+        for path in resolvedPaths:
+          failed[path] = res['Message']
+        continue
+      if self.permCache is not None:
+        self.permCache.add(dirPath, credDict, res['Value'])
+      for path in resolvedPaths:
+        successful[path] = dict(res['Value'])
+
+    return S_OK({'Successful': successful, 'Failed': failed})
+
   def getPathPermissions(self, paths, credDict):
     """ Get path permissions according to the policy
     """
@@ -115,7 +190,7 @@ class DirectorySecurityManager(SecurityManagerBase):
     permissions = {}
     failed = {}
     while toGet:
-      res = self.db.dtree.getPathPermissions(toGet.keys(), credDict)
+      res = self._getDirectoryPermissions(toGet.keys(), credDict)
       if not res['OK']:
         return res
       for path, mode in res['Value']['Successful'].items():
@@ -169,7 +244,7 @@ class FullSecurityManager(SecurityManagerBase):
       toGet.pop(path)
     while toGet:
       paths = toGet.keys()
-      res = self.db.dtree.getPathPermissions(paths, credDict)
+      res = self._getDirectoryPermissions(paths, credDict)
       if not res['OK']:
         return res
       for path, mode in res['Value']['Successful'].items():
@@ -341,6 +416,12 @@ class PolicyBasedSecurityManager(SecurityManagerBase):
 
     return pluginClassObj
 
+  def setPermissionCache(self, permCache):
+    """ The permissions are computed and cached by the policy
+    """
+    super(PolicyBasedSecurityManager, self).setPermissionCache(permCache)
+    self.policyObj.setPermissionCache(permCache)
+
   def hasAccess(self, opType, paths, credDict):
     return self.policyObj.hasAccess(opType, paths, credDict)
 
@@ -191,6 +191,12 @@ class VOMSPolicy( SecurityManagerBase ):
     if not path:
       return S_ERROR( 'Empty path' )
 
+    # Only the existing directories are cached
+    if self.permCache is not None:
+      permissions = self.permCache.get( path, credDict )
+      if permissions is not None:
+        return S_OK( permissions )
+
     # We check what is the group stored in the DB for the given path
     res = self.db.dtree.getDirectoryParameters( path )
     if not res['OK']:
@@ -223,10 +229,14 @@ class VOMSPolicy( SecurityManagerBase ):
 
     # If the two group share the same voms role, we do the query like if we were
     # the group stored in the DB
+    queryCredDict = credDict
     if self.__shareVomsRole( credDict.get( 'group', 'anon' ), origGrp ):
-      credDict = { 'username' : credDict.get( 'username', 'anon' ), 'group' : origGrp}
+      queryCredDict = { 'username' : credDict.get( 'username', 'anon' ), 'group' : origGrp}
 
-    return  self.db.dtree.getDirectoryPermissions( path, credDict )
+    res = self.db.dtree.getDirectoryPermissions( path, queryCredDict )
+    if res['OK'] and self.permCache is not None:
+      self.permCache.add( path, credDict, res['Value'] )
+    return res
 
 
 
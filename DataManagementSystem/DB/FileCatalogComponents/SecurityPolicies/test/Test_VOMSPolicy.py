@@ -10,6 +10,7 @@ import stat
 import mock
 from DIRAC import S_OK, S_ERROR
 import DIRAC.DataManagementSystem.DB.FileCatalogComponents.SecurityPolicies.VOMSPolicy
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryCache import PermissionCache
 
 # This just defines a few groups with their VOMSRole
 diracGrps = {'grp_admin' : None,
@@ -224,6 +225,7 @@ class mock_SecurityManagerBase( object ):
   """
   def __init__( self, database = False ):
     self.db = mock_db()
+    self.permCache = None
 
   def hasAdminAccess( self, credDict ):
     """ Returns true only if the group is grp_admin """
@@ -1827,6 +1829,41 @@ class TestUserGrpUsr1User( BaseCaseMixin, unittest.TestCase ):
 
 
 
+class TestPermissionCache( unittest.TestCase ):
+  """ The permissions of the directories are cached per user and group
+  """
+
+  @mock.patch( 'DIRAC.DataManagementSystem.DB.FileCatalogComponents.SecurityPolicies.VOMSPolicy.getGroupOption',
+               side_effect = mock_getGroupOption )
+  @mock.patch( 'DIRAC.DataManagementSystem.DB.FileCatalogComponents.SecurityPolicies.VOMSPolicy.getAllGroups',
+               side_effect = mock_getAllGroups )
+  def setUp( self, _a, _b ):
+    setupTree()
+    self.policy = DIRAC.DataManagementSystem.DB.FileCatalogComponents.SecurityPolicies.VOMSPolicy.VOMSPolicy()
+    self.policy.permCache = PermissionCache()
+    # grp_data shares the VOMS role of grp_mc, owner group of /mc/prod2
+    self.credDict = {'username':'dm', 'group':'grp_data'}
+
+  def test_cache( self ):
+    paths = ['/mc/prod2/file1.txt', '/mc/prod2/file2.txt']
+    dtree = self.policy.db.dtree
+    with mock.patch.object( dtree, 'getDirectoryParameters', wraps = dtree.getDirectoryParameters ) as getParameters:
+      res = self.policy.hasAccess( 'addFile', paths, self.credDict )
+      self.assertEqual( res['Value']['Successful'], dict.fromkeys( paths, True ) )
+      self.assertEqual( getParameters.call_count, 1 )
+
+      res = self.policy.hasAccess( 'addFile', paths, self.credDict )
+      self.assertEqual( res['Value']['Successful'], dict.fromkeys( paths, True ) )
+      self.assertEqual( getParameters.call_count, 1 )
+
+      # The changed directories are checked again
+      directoryTree['/mc/prod2']['mode'] = 0o555
+      self.policy.permCache.invalidate( ['/mc'], recursive = True )
+      res = self.policy.hasAccess( 'addFile', paths, self.credDict )
+      self.assertEqual( res['Value']['Successful'], dict.fromkeys( paths, False ) )
+      self.assertEqual( getParameters.call_count, 2 )
+
+
 if __name__ == '__main__':
 
   suite = unittest.defaultTestLoader.loadTestsFromTestCase( TestNonExistingUser )
@@ -1835,6 +1872,7 @@ if __name__ == '__main__':
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestDataGrpDmUser ) )
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestDataGrpUsr1User ) )
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestUserGrpUsr1User ) )
+  suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestPermissionCache ) )
 
 
   unittest.TextTestRunner( verbosity = 2 ).run( suite )
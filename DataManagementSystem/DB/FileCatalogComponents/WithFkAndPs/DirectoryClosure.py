@@ -11,7 +11,7 @@
 import os
 
 from DIRAC import S_OK, S_ERROR
-from DIRAC.Core.Utilities.List import intListToString, stringListToString
+from DIRAC.Core.Utilities.List import intListToString, stringListToString, breakListIntoChunks
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryTreeBase import DirectoryTreeBase
 
 __RCSID__ = "$Id$"
@@ -38,6 +38,9 @@ class DirectoryClosure( DirectoryTreeBase ):
 
       :returns: S_OK(id) and res['Level'] as the depth
     """
+    res = self._findCachedDir( path )
+    if res is not None:
+      return res
 
     dpath = os.path.normpath( path )
     result = self.db.executeStoredProcedure( 'ps_find_dir', ( dpath, 'ret1', 'ret2' ), outputIds = [1, 2] )
@@ -49,6 +52,8 @@ class DirectoryClosure( DirectoryTreeBase ):
 
     res = S_OK( result['Value'][0] )
     res['Level'] = result['Value'][1]
+    if self.dirCache is not None:
+      self.dirCache.add( dpath, res['Value'] )
     return res
 
 
@@ -61,6 +66,9 @@ class DirectoryClosure( DirectoryTreeBase ):
     """
 
     dirDict = {}
+    if self.dirCache is not None:
+      dirDict = self.dirCache.getDirIDs( paths )
+      paths = [path for path in paths if os.path.normpath( path ) not in dirDict]
     if not paths:
       return S_OK( dirDict )
     dpaths = stringListToString( [os.path.normpath( path ) for path in paths ] )
@@ -69,6 +77,8 @@ class DirectoryClosure( DirectoryTreeBase ):
       return result
     for dirName, dirID in result['Value']:
       dirDict[dirName] = dirID
+    if self.dirCache is not None:
+      self.dirCache.addMany( dict( result['Value'] ) )
 
     return S_OK( dirDict )
 
@@ -95,6 +105,9 @@ class DirectoryClosure( DirectoryTreeBase ):
 
     dirId = result['Value']
     result = self.db.executeStoredProcedure( 'ps_remove_dir', ( dirId, ), outputIds = [] )
+    if self.dirCache is not None:
+      self.dirCache.invalidate( path, dirId )
+    self._treeChanged()
     if not result['OK']:
       return result
 
@@ -102,6 +115,19 @@ class DirectoryClosure( DirectoryTreeBase ):
     return result
 
 
+  def _checkDirID( self, dirID ):
+    """ Check that a directory ID still exists in the database
+
+      :param dirID: directory ID
+
+      :returns: S_OK( bool )
+    """
+    result = self.db._query( "SELECT DirID FROM %s WHERE DirID=%d" % ( self.directoryTable, dirID ) )
+    if not result['OK']:
+      return result
+    return S_OK( bool( result['Value'] ) )
+
+
 
   def existsDir( self, path ):
     """ Check the existence of a directory at the specified path
@@ -129,6 +155,10 @@ class DirectoryClosure( DirectoryTreeBase ):
         :returns: S_OK(dir name), or S_ERROR if it does not exist
 
     """
+    if self.dirCache is not None:
+      dirName = self.dirCache.getPath( int( dirID ) )
+      if dirName is not None:
+        return S_OK( dirName )
 
     result = self.db.executeStoredProcedure( 'ps_get_dirName_from_id', ( dirID, 'out' ), outputIds = [1] )
     if not result['OK']:
@@ -139,6 +169,8 @@ class DirectoryClosure( DirectoryTreeBase ):
     if not dirName:
       return S_ERROR( 'Directory with id %d not found' % int( dirID ) )
 
+    if self.dirCache is not None:
+      self.dirCache.add( dirName, dirID )
     return S_OK( dirName )
 
   def getDirectoryPaths( self, dirIDList ):
@@ -154,6 +186,11 @@ class DirectoryClosure( DirectoryTreeBase ):
 
 
     dirDict = {}
+    if self.dirCache is not None:
+      dirDict = self.dirCache.getPaths( [int( dirId ) for dirId in dirs] )
+      dirs = [dirId for dirId in dirs if int( dirId ) not in dirDict]
+      if not dirs:
+        return S_OK( dirDict )
 
     # Format the list
     dIds = intListToString( dirs )
@@ -163,6 +200,8 @@ class DirectoryClosure( DirectoryTreeBase ):
 
     for dirId, dirName in result['Value']:
       dirDict[dirId] = dirName
+    if self.dirCache is not None:
+      self.dirCache.addMany( dict( ( dirName, dirId ) for dirId, dirName in result['Value'] ) )
 
     return S_OK( dirDict )
 
@@ -176,6 +215,9 @@ class DirectoryClosure( DirectoryTreeBase ):
 
         :returns: S_OK( list of ids ), S_ERROR if not found
     """
+    dirIDs = self._getCachedPathIDs( path )
+    if dirIDs is not None:
+      return S_OK( dirIDs )
 
     result = self.findDir( path )
     if not result['OK']:
@@ -198,6 +240,11 @@ class DirectoryClosure( DirectoryTreeBase ):
         :returns: S_OK( list of ids )
 
     """
+    if self.dirCache is not None:
+      dirName = self.dirCache.getPath( int( dirID ) )
+      dirIDs = self._getCachedPathIDs( dirName ) if dirName is not None else None
+      if dirIDs is not None:
+        return S_OK( dirIDs )
 
     result = self.db.executeStoredProcedureWithCursor( 'ps_get_parentIds_from_id', ( dirID, ) )
 
@@ -276,6 +323,27 @@ class DirectoryClosure( DirectoryTreeBase ):
     resultList = [dirId[0] for dirId in result['Value']]
     return S_OK( resultList )
 
+  def getDirIDsUnder( self, dirIDs, ancestorRequest ):
+    """ Get the directories of a list being one of the directories selected by an SQL request,
+        or one of their subdirectories, with the closure table instead of expanding the ancestors
+
+        :param dirIDs: list of ids of the directories to check
+        :param ancestorRequest: sql request selecting the ids of the ancestors
+
+        :returns: S_OK( set of dir ids )
+    """
+
+    dirIDsUnder = set()
+    for chunk in breakListIntoChunks( list( dirIDs ), 10000 ):
+      req = "SELECT SQL_NO_CACHE DISTINCT ChildID FROM FC_DirectoryClosure WHERE ChildID IN (%s) AND ParentID IN (%s)" \
+          % ( intListToString( chunk ), ancestorRequest )
+      result = self.db._query( req )
+      if not result['OK']:
+        return result
+      dirIDsUnder.update( row[0] for row in result['Value'] )
+
+    return S_OK( dirIDsUnder )
+
 
 
   def getSubdirectories( self, path ):
@@ -392,6 +460,7 @@ class DirectoryClosure( DirectoryTreeBase ):
         return result
 
       dirId = result['Value'][0][0]
+      self._treeChanged()
 
       result = S_OK( dirId )
       result['NewDirectory'] = True
@@ -822,6 +822,25 @@ class FileManagerPs(FileManagerBase):
 
     return S_OK(replicas)
 
+  def _getDirectoryFilesReplicas(self, dirFiles, statusIDs=None, withPFN=True, connection=False):
+    """ Get the replicas of the given files of several directories in a single query
+
+        The number of directories is variable, so a plain query is used rather than a stored procedure.
+        The SE names and statuses are resolved by the caller, without joining FC_StorageElements and FC_Statuses
+
+        :param dict dirFiles: DirID -> list of file names
+        :param list statusIDs: IDs of the replica statuses to consider, all if None
+        :param bool withPFN: whether the PFNs are needed, None otherwise
+
+        :return: S_OK(list of (DirID, FileName, SEID, PFN)), SEID None for the files without replicas
+    """
+    connection = self._getConnection(connection)
+    pfnColumn = "r.PFN" if withPFN else "NULL"
+    req = "SELECT SQL_NO_CACHE f.DirID, f.FileName, r.SEID, %s FROM FC_Files f" % pfnColumn
+    req += " LEFT JOIN FC_Replicas r ON r.FileID = f.FileID%s" % self._getStatusCondition(statusIDs, 'r.Status')
+    req += " WHERE %s" % self._getDirectoryFilesCondition(dirFiles)
+    return self.db._query(req, connection)
+
   def countFilesInDir(self, dirId):
     """ Count how many files there is in a given Directory
 
@@ -937,3 +956,21 @@ class FileManagerPs(FileManagerBase):
     seID = res['Value']
 
     return self.db.executeStoredProcedureWithCursor('ps_get_se_dump', (seID,))
+
+  def iterSEDump(self, seName, chunkSize=10000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size,
+         reading them from the server chunk by chunk
+
+        :param seName: name of the StorageElement
+        :param chunkSize: number of files per chunk
+
+        :returns: S_OK with an iterator over lists of tuples (lfn, checksum, size)
+    """
+
+    res = self.db.seManager.findSE(seName)
+    if not res['OK']:
+      return res
+    seID = res['Value']
+
+    return self.db._queryIter("CALL ps_get_se_dump(%d)" % seID, batchSize=chunkSize)
@@ -13,6 +13,7 @@ from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryLevelTree impo
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryNodeTree import DirectoryNodeTree
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManagerBase import FileManagerBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager import FileManager
 
 dbMock = MagicMock()
 ugManagerMock = MagicMock()
@@ -99,3 +100,35 @@ def test_Base_addFile():
   res = fmb.addFile({'aa': 'aaa/bbb'}, {})
   assert res['OK'] is True  # this will need to be implemented on a derived class, but it anyway returns S_OK()
   assert 'aa' in res['Value']['Failed']
+
+
+####################################################################################
+# FileManager
+
+
+def test_getReplicas():
+  """ The replicas are got in one query, with the SE names and statuses resolved from tables """
+  fmDBMock = MagicMock()
+  fmDBMock.lfnPfnConvention = False
+  fmDBMock.visibleReplicaStatus = ['AprioriGood', 'Trash']
+  fmDBMock.seids = {2: 'SE-A', 4: 'SE-B'}
+  fmDBMock.dtree.findDirs.return_value = {'OK': True, 'Value': {'/vo/data': 10}}
+  fmDBMock._query.side_effect = [{'OK': True, 'Value': ((1, 'AprioriGood'), (3, 'Trash'), (5, 'Removing'))},
+                                 {'OK': True, 'Value': ((10, 'f1', 2, 'pfn1'), (10, 'f1', 4, None),
+                                                        (10, 'f2', None, None))}]
+  fm = FileManager()
+  fm.db = fmDBMock
+
+  res = fm.getReplicas(['/vo/data/f1', '/vo/data/f2', '/vo/data/f3', '/vo/other/f'], allStatus=False,
+                       connection=True)
+  assert res['OK']
+  assert res['Value']['Successful'] == {'/vo/data/f1': {'SE-A': 'pfn1', 'SE-B': ''}, '/vo/data/f2': {}}
+  assert sorted(res['Value']['Failed']) == ['/vo/data/f3', '/vo/other/f']
+  assert 'SEPrefixes' not in res['Value']
+
+  req = fmDBMock._query.call_args[0][0]
+  assert "r.Status IN (1,3)" in req
+  assert "f.DirID=10 AND f.FileName IN ('f1','f2','f3')" in req
+  # The statuses are known from now on
+  fmDBMock._query.side_effect = [{'OK': True, 'Value': ()}]
+  assert fm.getReplicas(['/vo/data/f4'], allStatus=False, connection=True)['OK']
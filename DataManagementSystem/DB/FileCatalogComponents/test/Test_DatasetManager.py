@@ -0,0 +1,152 @@
+""" Unit tests for the incremental updates of the materialized datasets
+"""
+
+# pylint: disable=protected-access
+
+import hashlib
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DatasetManager import DatasetManager
+
+__RCSID__ = "$Id$"
+
+credDict = {'username': 'user', 'group': 'group'}
+sizes = {11: 100, 12: 50, 13: 10}
+
+
+def query(req, *_args, **_kwargs):
+  """ One dataset materialized in /vo/data holding the file 12, file 13 being in /vo/data/run2 """
+  if 'FC_Statuses' in req:
+    return S_OK(((1, "{'Path': '/vo/data', 'EventType': '3'}"),))
+  if 'COUNT(*)' in req:
+    return S_OK(((3, 160),))
+  if 'FROM FC_MetaDatasetFiles' in req:
+    rows = [fileID for fileID in [12] if str(fileID) in req.split('FileID IN')[1]]
+    if req.startswith('SELECT DatasetID'):
+      return S_OK(tuple((1, fileID) for fileID in rows))
+    return S_OK(tuple((fileID,) for fileID in rows))
+  if 'WHERE DirID IN' in req:
+    return S_OK(((11,), (12,)) if '101' in req else ((13,),))
+  if 'FROM FC_Files WHERE FileID IN' in req:
+    return S_OK(tuple((fileID, size) for fileID, size in sizes.items() if str(fileID) in req))
+  return S_OK(())
+
+
+def update(req, *_args, **_kwargs):
+  """ Number of rows changed: all the dataset files inserted or deleted """
+  if req.startswith('INSERT IGNORE INTO FC_MetaDatasetFiles'):
+    return S_OK(req.count('(') - 1)
+  if req.startswith('DELETE FROM FC_MetaDatasetFiles'):
+    return S_OK(len(req.split('IN (')[1].split(',')))
+  return S_OK(1)
+
+
+def getDBMock():
+  """ FileCatalogDB mock where the file 11 is selected by the dataset query """
+  dbMock = MagicMock()
+  dbMock._query.side_effect = query
+  dbMock._update.side_effect = update
+  dbMock.fmeta.findFilesByMetadata.return_value = S_OK({11: '/vo/data/run1/a'})
+  dbMock.fileManager._findFiles.return_value = S_OK({'Successful': {'/vo/data/run1/a': {'FileID': 11},
+                                                                    '/vo/data/run1/b': {'FileID': 12},
+                                                                    '/vo/other/c': {'FileID': 14}},
+                                                     'Failed': {}})
+  dbMock.dtree.findDir.return_value = S_OK(100)
+  dbMock.dtree.getCachedSubdirectoriesByID.return_value = S_OK([101])
+  return dbMock
+
+
+def getUpdates(dbMock):
+  return [args[0] for args, _kwargs in dbMock._update.call_args_list]
+
+
+def test_refreshMaterializedFiles():
+  """ The files of the dataset path are added or removed according to the dataset query """
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.refreshMaterializedFiles(['/vo/data/run1/a', '/vo/data/run1/b', '/vo/other/c'], credDict)['OK']
+
+  # The query is evaluated in the directory of the files only, the files outside the dataset path are ignored
+  dbMock.fmeta.findFilesByMetadata.assert_called_once_with({'EventType': '3'}, '/vo/data/run1', credDict)
+  updates = getUpdates(dbMock)
+  assert "INSERT IGNORE INTO FC_MetaDatasetFiles (DatasetID,FileID) VALUES (1,11)" in updates
+  assert "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=1 AND FileID IN (12)" in updates
+  assert "NumberOfFiles=NumberOfFiles+0, TotalSize=TotalSize+50," in updates[-1]
+
+  # Changes of metadata fields not used by the dataset query do not change its contents
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.refreshMaterializedFiles(['/vo/data/run1/a'], credDict, metaFields=['Other'])['OK']
+  assert not dbMock.fileManager._findFiles.called
+  assert not dbMock._update.called
+
+  # A concurrent refresh added the file already: the counters are set from the stored contents
+  dbMock = getDBMock()
+  dbMock._update.side_effect = lambda req: S_OK(0) if req.startswith('INSERT') else update(req)
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.refreshMaterializedFiles(['/vo/data/run1/a', '/vo/data/run1/b'], credDict)['OK']
+  assert "SET NumberOfFiles=3, TotalSize=160," in getUpdates(dbMock)[-1]
+
+
+def test_refreshMaterializedDirectory():
+  """ A directory metadata change above the dataset path updates the files of the dataset path """
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.refreshMaterializedDirectory('/vo', credDict, metaFields=['EventType'])['OK']
+
+  dbMock.dtree.findDir.assert_called_once_with('/vo/data')
+  dbMock.fmeta.findFilesByMetadata.assert_called_once_with({'EventType': '3'}, '/vo/data', credDict)
+  updates = getUpdates(dbMock)
+  assert "INSERT IGNORE INTO FC_MetaDatasetFiles (DatasetID,FileID) VALUES (1,11)" in updates
+  assert "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=1 AND FileID IN (12)" in updates
+
+  # Directories outside of the dataset path do not change its contents
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.refreshMaterializedDirectory('/vo/other', credDict)['OK']
+  assert not dbMock.fmeta.findFilesByMetadata.called
+  assert not dbMock._update.called
+
+
+def test_removeMaterializedFiles():
+  """ Removed files leave the materialized datasets holding them """
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  assert dsManager.removeMaterializedFiles({12: 50, 13: 10})['OK']
+
+  updates = getUpdates(dbMock)
+  assert updates[0] == "DELETE FROM FC_MetaDatasetFiles WHERE DatasetID=1 AND FileID IN (12)"
+  assert "NumberOfFiles=NumberOfFiles-1, TotalSize=TotalSize-50," in updates[1]
+  assert len(updates) == 2
+
+
+def test_checkMaterializedDataset():
+  """ The counters of the materialized datasets are checked against their stored contents,
+      their hash is set when frozen
+  """
+  dbMock = getDBMock()
+  dbMock._query.side_effect = lambda req: S_OK(((3, 160),) if 'COUNT(*)' in req else
+                                               ((repr({'Path': '/vo/data'}), '', 60, 2, 1, 5),))
+  dbMock.fileManager._getIntStatus.return_value = S_OK('Materialized')
+  dsManager = DatasetManager(dbMock)
+  dbMock._query.reset_mock()
+  result = dsManager.checkDataset({'ds': {}}, credDict)
+  assert result['OK']
+  assert result['Value']['Successful'] == {'ds': {'NumberOfFiles': (2, 3), 'TotalSize': (60, 160)}}
+  assert dbMock._query.call_count == 2
+  assert not dbMock.fmeta.findFilesByMetadata.called
+
+  dbMock = getDBMock()
+  dsManager = DatasetManager(dbMock)
+  dsManager._DatasetManager__getDatasetParameters = MagicMock(return_value=S_OK({'Status': 'Materialized',
+                                                                                 'DatasetID': 1}))
+  dbMock._query.side_effect = lambda req: S_OK(((12,),) if 'FROM FC_MetaDatasetFiles' in req else ((12, 50),))
+  dbMock.fileManager._getFileLFNs.return_value = S_OK({'Successful': {12: '/vo/data/run1/b'}, 'Failed': {}})
+  dbMock.fileManager._getStatusInt.return_value = S_OK(6)
+  assert dsManager.freezeDataset(['ds'], credDict)['Value']['Successful'] == {'ds': True}
+  datasetHash = hashlib.md5(str(['/vo/data/run1/b'])).hexdigest().upper()
+  updates = getUpdates(dbMock)
+  assert updates[0] == "UPDATE FC_MetaDatasets SET DatasetHash='%s' WHERE DatasetID=1" % datasetHash
+  assert not [req for req in updates if req.startswith('DELETE')]
@@ -0,0 +1,158 @@
+""" Unit tests for the cache of the directory path <-> DirID mapping
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryCache import DirectoryCache, SubdirectoryCache, \
+    PermissionCache
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryLevelTree import DirectoryLevelTree
+
+__RCSID__ = "$Id$"
+
+
+def test_lru():
+  """ The least recently used directories are evicted, in both directions """
+  cache = DirectoryCache(maxSize=2)
+  cache.addMany({'/a': 1, '/a/b/': 2})
+  assert cache.getDirID('/a/b') == 2
+  assert cache.getPath(1) == '/a'
+  cache.add('/c', 3)
+  assert len(cache) == 2
+  assert cache.getDirID('/a/b') is None
+  assert cache.getPath(2) is None
+  assert cache.getDirIDs(['/a', '/c', '/d']) == {'/a': 1, '/c': 3}
+  assert cache.getStats()['hits'] == 4
+
+
+def test_invalidate():
+  """ The removed directories are forgotten, by path or by ID """
+  cache = DirectoryCache()
+  cache.addMany({'/a': 1, '/b': 2, '/c': 0})
+  cache.invalidate('/a/')
+  cache.invalidate(dirID=2)
+  assert len(cache) == 0
+  # A directory created again has a new ID
+  cache.add('/a', 1)
+  cache.add('/a', 4)
+  assert cache.getDirID('/a') == 4
+  assert cache.getPath(1) is None
+
+
+def test_invalidationChannel():
+  """ The invalidations are shared with the other services """
+  channel = MagicMock()
+  channel.publish.return_value = S_OK()
+  channel.fetch.return_value = S_OK([(1, '/a')])
+  cache = DirectoryCache()
+  cache.setInvalidationChannel(channel, syncPeriod=0)
+  cache.addMany({'/a': 1, '/b': 2})
+  assert cache.getDirID('/a') is None
+  cache.invalidate('/b', 2)
+  channel.publish.assert_called_once_with([(2, '/b')])
+
+  cache.add('/b', 2)
+  channel.fetch.return_value = S_ERROR('No DB')
+  assert cache.getDirID('/b') is None
+
+
+def test_levelTree():
+  """ The directory tree queries the DB only for the directories not cached """
+  dbMock = MagicMock()
+  dbMock._escapeString.side_effect = lambda value: S_OK("'%s'" % value)
+  dbMock._query.return_value = S_OK(((10, 1),))
+  tree = DirectoryLevelTree()
+  tree.db = dbMock
+  tree.setDirectoryCache(DirectoryCache())
+
+  res = tree.findDir('/vo')
+  assert res['OK'] and res['Value'] == 10 and res['Level'] == 1
+  res = tree.findDir('/vo/')
+  assert res['OK'] and res['Value'] == 10 and res['Level'] == 1
+  assert dbMock._query.call_count == 1
+  assert tree.getDirectoryPath(10) == S_OK('/vo')
+
+  dbMock._query.return_value = S_OK((('/', 1), ('/vo/data', 11)))
+  res = tree.getPathIDs('/vo/data')
+  assert res['OK'] and res['Value'] == [1, 11]
+  assert tree.getPathIDs('/vo/data') == S_OK([1, 10, 11])
+  assert tree.findDirs(['/vo', '/vo/data']) == S_OK({'/vo': 10, '/vo/data': 11})
+  assert dbMock._query.call_count == 2
+
+  dbMock._update.return_value = S_OK(1)
+  res = tree.removeDir('/vo/data')
+  assert res['OK'] and res['DirID'] == 11
+  dbMock._query.return_value = S_OK(())
+  assert tree.findDir('/vo/data') == S_OK('')
+
+
+def test_makeDirectories():
+  """ The cached DirIDs are checked before registering files under them """
+  dbMock = MagicMock()
+  dbMock._escapeString.side_effect = lambda value: S_OK("'%s'" % value)
+  tree = DirectoryLevelTree()
+  tree.db = dbMock
+  tree.setDirectoryCache(DirectoryCache())
+  tree.dirCache.add('/vo/data', 11)
+
+  dbMock._query.return_value = S_OK(((11,),))
+  assert tree.makeDirectories('/vo/data', {}) == S_OK(11)
+  dbMock._query.assert_called_once_with("SELECT DirID FROM FC_DirectoryLevelTree WHERE DirID=11")
+
+  # Removed and created again by another service
+  dbMock._query.side_effect = lambda req, *_args: S_OK(() if 'DirID=11' in req else ((12, 2),))
+  assert tree.makeDirectories('/vo/data', {}) == S_OK(12)
+  assert tree.dirCache.getDirID('/vo/data') == 12
+  assert tree.dirCache.getPath(11) is None
+
+
+def test_subdirectoryCache():
+  """ The subtrees are kept within the size limit and for the cache time """
+  cache = SubdirectoryCache(maxSize=3, cacheTime=60)
+  cache.add([2, 1], [3, 4])
+  subdirs = cache.get([1, 2])
+  assert subdirs == [3, 4]
+  subdirs.append(5)
+  assert cache.get([2, 1, 1]) == [3, 4]
+  cache.add([5], [6])
+  cache.add([7], [8])
+  assert cache.get([1, 2]) is None
+  assert cache.get([5]) == [6]
+  assert cache.getStats()['size'] == 2
+  cache.clear()
+  assert len(cache) == 0
+
+  cache = SubdirectoryCache(cacheTime=-1)
+  cache.add([1], [2])
+  assert cache.get([1]) is None
+
+
+def test_permissionCache():
+  """ The permissions are kept per user and group, and forgotten for the changed directories """
+  user1 = {'username': 'user1', 'group': 'group1'}
+  user2 = {'username': 'user2', 'group': 'group1'}
+  cache = PermissionCache(maxSize=10, cacheTime=60)
+  cache.add('/vo/data/', user1, {'Read': True, 'Write': True, 'Execute': True})
+  cache.add('/vo/data', user2, {'Read': True, 'Write': False, 'Execute': True})
+  cache.add('/vo/data/run1', user1, {'Read': True, 'Write': False, 'Execute': True})
+  cache.add('/vo/database', user1, {'Read': False, 'Write': False, 'Execute': False})
+  permissions = cache.get('/vo/data', user1)
+  assert permissions['Write']
+  permissions['Write'] = False
+  assert cache.get('/vo/data', user1)['Write']
+  assert not cache.get('/vo/data', user2)['Write']
+  assert cache.get('/vo/data', {'username': 'user1', 'group': 'group2'}) is None
+
+  cache.invalidate(['/vo/data/run1'])
+  assert cache.get('/vo/data/run1', user1) is None
+  assert len(cache) == 3
+  cache.add('/vo/data/run1', user1, {'Read': True, 'Write': False, 'Execute': True})
+  cache.invalidate(['/vo/data/'], recursive=True)
+  assert len(cache) == 1
+  assert cache.get('/vo/database', user1) is not None
+
+  cache = PermissionCache(cacheTime=-1)
+  cache.add('/vo', user1, {'Read': True, 'Write': True, 'Execute': True})
+  assert cache.get('/vo', user1) is None
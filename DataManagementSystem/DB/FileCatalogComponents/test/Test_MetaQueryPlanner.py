@@ -0,0 +1,114 @@
+""" Unit tests for the ordering of the conditions of the directory metadata queries
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.MetaQueryPlanner import MetaQueryPlanner
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata import DirectoryMetadata
+
+__RCSID__ = "$Id$"
+
+# Rows of the FC_Meta_<field> tables
+metaTables = {'ConfigName': [(1, 'MC'), (2, 'Data')],
+              'EventType': [(10 + i, str(i % 50)) for i in xrange(200)],
+              'Year': [(100 + i, 2010 + i % 5) for i in xrange(20)]}
+
+
+def query(req, *_args, **_kwargs):
+  """ Answer the queries of the histograms and of the metadata selections """
+  if 'FC_MetaFields' in req:
+    return S_OK(tuple((meta, 'VARCHAR(128)') for meta in metaTables))
+  meta = req.split('FC_Meta_')[1].split()[0]
+  rows = metaTables[meta]
+  if 'COUNT(DISTINCT Value)' in req:
+    return S_OK(((len(rows), len(set(value for _dirID, value in rows))),))
+  if 'GROUP BY' in req:
+    counts = {}
+    for _dirID, value in rows:
+      counts[value] = counts.get(value, 0) + 1
+    limit = int(req.split('LIMIT')[1])
+    return S_OK(tuple(sorted(counts.items(), key=lambda item: -item[1])[:limit]))
+  if 'LIMIT' in req:
+    return S_OK(tuple((dirID,) for dirID, _value in rows[:int(req.split('LIMIT')[1])]))
+  if 'IN (0)' in req:
+    # No metadata in the parents of the root directory
+    return S_OK(())
+  value = req.split("Value='")[1].split("'")[0]
+  return S_OK(tuple((dirID,) for dirID, rowValue in rows if str(rowValue) == value))
+
+
+def getDBMock():
+  """ FileCatalogDB mock with a tree where ConfigName directories are big subtrees """
+  dbMock = MagicMock()
+  dbMock._query.side_effect = query
+  dbMock.dtree.countSubdirectories.side_effect = lambda dirID, includeParent: S_OK(1000 if dirID < 10 else 1)
+  return dbMock
+
+
+def test_estimate():
+  """ The estimates are the number of selected directories times the size of their subtrees """
+  planner = MetaQueryPlanner(getDBMock(), maxValues=10)
+  assert planner.estimate('ConfigName', 'MC') == S_OK(1000.)
+  assert planner.estimate('ConfigName', 'Any') == S_OK(2000.)
+  assert planner.estimate('ConfigName', 'Missing') == S_OK(None)
+  # Only 10 of the 50 event types are counted individually, the others are counted on average
+  assert planner.estimate('EventType', '3') == S_OK(4.)
+  assert planner.estimate('EventType', ['3', '42']) == S_OK(8.)
+  assert planner.estimate('EventType', {'nin': ['3']}) == S_OK(196.)
+  assert planner.estimate('Year', {'>=': 2013}) == S_OK(8.)
+  assert planner.estimate('Year', {'>': 2011, '<': 2013}) == S_OK(4.)
+
+  histogram = planner.getHistogram('EventType')['Value']
+  assert histogram['Truncated'] and histogram['Total'] == 200 and len(histogram['Counts']) == 10
+
+
+def test_updates():
+  """ The histograms follow the changes of the values """
+  dbMock = getDBMock()
+  planner = MetaQueryPlanner(dbMock)
+  assert planner.estimate('Year', 2010) == S_OK(4.)
+  histogram = planner.getHistogram('Year')['Value']
+  planner.addValue('Year', 2010)
+  planner.addValue('Year', 2042)
+  assert planner.estimate('Year', 2010) == S_OK(5.)
+  assert planner.getHistogram('Year')['Value']['Total'] == 22
+  # The histogram being read by a query does not change
+  assert histogram['Total'] == 20 and '2042' not in histogram['Counts']
+  nbQueries = dbMock._query.call_count
+  planner.invalidate('Year')
+  assert planner.estimate('Year', 2042) == S_OK(0.)
+  assert dbMock._query.call_count > nbQueries
+
+
+def test_orderConditions():
+  """ The most selective conditions first, the 'Missing' ones last """
+  planner = MetaQueryPlanner(getDBMock())
+  result = planner.orderConditions({'ConfigName': 'MC', 'Year': 'Missing', 'EventType': '3'})
+  assert result['OK']
+  assert [meta for meta, _value in result['Value']] == ['EventType', 'ConfigName', 'Year']
+
+
+def test_findDirIDsByMetadata():
+  """ The most selective condition is expanded, the others are checked on the selected directories only """
+  dbMock = getDBMock()
+  dbMock.dtree.getCachedSubdirectoriesByID.return_value = S_OK([1000, 1001])
+  dbMock.dtree.getDirIDsUnder.side_effect = lambda dirIDs, request: S_OK(set(dirIDs) - set([1001]))
+  dirMeta = DirectoryMetadata(dbMock)
+
+  result = dirMeta.findDirIDsByMetadata({'ConfigName': 'MC', 'EventType': '3'}, '/', {})
+  assert result['OK']
+  assert sorted(result['Value']) == [13, 63, 113, 163, 1000]
+  assert result['Selection'] == 'Done'
+  assert dbMock.dtree.getCachedSubdirectoriesByID.call_count == 1
+  dirIDs, request = dbMock.dtree.getDirIDsUnder.call_args[0]
+  assert dirIDs == set([13, 63, 113, 163, 1000, 1001])
+  assert "FC_Meta_ConfigName" in request and "Value='MC'" in request
+
+  # Nothing left to check once no directory is selected
+  dbMock.dtree.getDirIDsUnder.reset_mock()
+  result = dirMeta.findDirIDsByMetadata({'ConfigName': 'MC', 'EventType': 'NotThere'}, '/', {})
+  assert result['OK'] and result['Value'] == [] and result['Selection'] == 'None'
+  assert not dbMock.dtree.getDirIDsUnder.called
@@ -0,0 +1,77 @@
+""" Unit tests for the permission checks of the directory security manager
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryCache import PermissionCache
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.SecurityManager import DirectorySecurityManager
+
+__RCSID__ = "$Id$"
+
+# Existing directories and the Write permission of the user in them
+directories = {'/': False, '/vo': False, '/vo/data': False, '/vo/data/run1': True, '/vo/data/run2': False}
+lfns = ['/vo/data/run1/f1', '/vo/data/run1/f2', '/vo/data/run2/f3', '/vo/new/dir/f4']
+credDict = {'username': 'user', 'group': 'group', 'properties': []}
+
+
+def getDBMock():
+  """ FileCatalogDB mock with the directories above """
+  dbMock = MagicMock()
+  dbMock.globalReadAccess = False
+  dbMock.dtree.findDirs.side_effect = lambda paths: S_OK(dict((path, 1) for path in paths if path in directories))
+  dbMock.dtree.getDirectoryPermissions.side_effect = lambda path, _credDict: S_OK({'Read': True,
+                                                                                  'Write': directories[path],
+                                                                                  'Execute': True})
+  return dbMock
+
+
+def test_hasAccess():
+  """ The permissions are computed once per directory and taken from the cache afterwards """
+  dbMock = getDBMock()
+  securityManager = DirectorySecurityManager(dbMock)
+  securityManager.setPermissionCache(PermissionCache())
+
+  result = securityManager.hasAccess('addFile', lfns, credDict)
+  assert result['OK']
+  assert result['Value'] == {'Successful': {'/vo/data/run1/f1': True, '/vo/data/run1/f2': True,
+                                            '/vo/data/run2/f3': False, '/vo/new/dir/f4': False},
+                             'Failed': {}}
+  checkedDirs = sorted(args[0] for args, _kwargs in dbMock.dtree.getDirectoryPermissions.call_args_list)
+  assert checkedDirs == ['/vo', '/vo/data/run1', '/vo/data/run2']
+
+  # The files are not directories, their parents are in the cache
+  dbMock.dtree.getDirectoryPermissions.reset_mock()
+  assert securityManager.hasAccess('addFile', lfns, credDict) == result
+  assert not dbMock.dtree.getDirectoryPermissions.called
+
+  # Other credentials do not use the cached permissions
+  otherCredDict = dict(credDict, username='other')
+  assert securityManager.hasAccess('addFile', lfns[:1], otherCredDict)['OK']
+  assert dbMock.dtree.getDirectoryPermissions.call_count == 1
+
+  # The changed directories are computed again
+  dbMock.dtree.getDirectoryPermissions.reset_mock()
+  directories['/vo/data/run1'] = False
+  try:
+    securityManager.invalidatePermissions(['/vo/data'], recursive=True)
+    result = securityManager.hasAccess('addFile', lfns, credDict)
+    assert not result['Value']['Successful']['/vo/data/run1/f1']
+    checkedDirs = sorted(args[0] for args, _kwargs in dbMock.dtree.getDirectoryPermissions.call_args_list)
+    assert checkedDirs == ['/vo/data/run1', '/vo/data/run2']
+  finally:
+    directories['/vo/data/run1'] = True
+
+
+def test_noCache():
+  """ Without cache, the permissions are still computed once per directory per call """
+  dbMock = getDBMock()
+  securityManager = DirectorySecurityManager(dbMock)
+
+  result = securityManager.getPathPermissions(lfns + ['/vo/data/run1', 'relative/path'], credDict)
+  assert result['OK']
+  assert result['Value']['Failed'] == {'relative/path': 'Illegal Path'}
+  assert result['Value']['Successful']['/vo/data/run1'] == {'Read': True, 'Write': True, 'Execute': True}
+  assert dbMock.dtree.getDirectoryPermissions.call_count == 3
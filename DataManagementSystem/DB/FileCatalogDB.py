@@ -26,6 +26,8 @@ from DIRAC.DataManagementSystem.DB.FileCatalogComponents.UserAndGroupManager imp
     UserAndGroupManagerDB
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DatasetManager import DatasetManager
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryCache import DirectoryCache, DBInvalidationChannel, \
+    SubdirectoryCache, PermissionCache
 from DIRAC.Resources.Catalog.Utilities import checkArgumentFormat
 
 #############################################################################
@@ -84,6 +86,25 @@ class FileCatalogDB(DB):
       gLogger.fatal("Failed to create database objects", x)
       return S_ERROR("Failed to create database objects")
 
+    # Cache of the directory path <-> DirID mapping used by the directory tree
+    self.dirCache = None
+    if databaseConfig.get('DirectoryCacheSize'):
+      self.dirCache = DirectoryCache(databaseConfig['DirectoryCacheSize'])
+      if databaseConfig.get('DirectoryCacheInvalidation'):
+        self.dirCache.setInvalidationChannel(DBInvalidationChannel(self),
+                                             databaseConfig.get('DirectoryCacheSyncPeriod', 5))
+      self.dtree.setDirectoryCache(self.dirCache)
+
+    # Cache of the subtrees expanded by the metadata queries
+    if databaseConfig.get('SubdirectoryCacheSize') and databaseConfig.get('SubdirectoryCacheTime'):
+      self.dtree.setSubdirectoryCache(SubdirectoryCache(databaseConfig['SubdirectoryCacheSize'],
+                                                        databaseConfig['SubdirectoryCacheTime']))
+
+    # Cache of the permissions of the directories computed by the security manager
+    if databaseConfig.get('PermissionCacheSize') and databaseConfig.get('PermissionCacheTime'):
+      self.securityManager.setPermissionCache(PermissionCache(databaseConfig['PermissionCacheSize'],
+                                                              databaseConfig['PermissionCacheTime']))
+
     return S_OK()
 
   def setUmask(self, umask):
@@ -384,6 +405,8 @@ class FileCatalogDB(DB):
         fileArgs[path] = paths[path]
     if dirArgs:
       result = change_function_directory(dirArgs, recursive=recursive)
+      # The permissions of the directories may have changed, even if the call failed in the middle
+      self.securityManager.invalidatePermissions(dirArgs.keys(), recursive=recursive)
       if not result['OK']:
         return result
       successful.update(result['Value']['Successful'])
@@ -868,6 +891,7 @@ class FileCatalogDB(DB):
       return res
     failed.update(res['Value']['Failed'])
     successful = res['Value']['Successful']
+    self.securityManager.invalidatePermissions(successful.keys())
     if not successful:
       return S_OK({'Successful': successful, 'Failed': failed})
 
@@ -1051,12 +1075,16 @@ class FileCatalogDB(DB):
       return result
     if not result['Value']['Successful']:
       return S_ERROR('Failed to determine the path type')
-    if result['Value']['Successful'][path]:
+    isDirectory = result['Value']['Successful'][path]
+    if isDirectory:
       # This is a directory
-      return self.dmeta.setMetadata(path, metadataDict, credDict)
+      result = self.dmeta.setMetadata(path, metadataDict, credDict)
     else:
       # This is a file
-      return self.fmeta.setMetadata(path, metadataDict, credDict)
+      result = self.fmeta.setMetadata(path, metadataDict, credDict)
+    if result['OK']:
+      self.__updateMaterializedDatasets(path, isDirectory, metadataDict.keys(), credDict)
+    return result
 
   def setMetadataBulk(self, pathMetadataDict, credDict):
     """  Add metadata for the given paths
@@ -1102,12 +1130,26 @@ class FileCatalogDB(DB):
       return result
     if not result['Value']['Successful']:
       return S_ERROR('Failed to determine the path type')
-    if result['Value']['Successful'][path]:
+    isDirectory = result['Value']['Successful'][path]
+    if isDirectory:
       # This is a directory
-      return self.dmeta.removeMetadata(path, metadata, credDict)
+      result = self.dmeta.removeMetadata(path, metadata, credDict)
     else:
       # This is a file
-      return self.fmeta.removeMetadata(path, metadata, credDict)
+      result = self.fmeta.removeMetadata(path, metadata, credDict)
+    if result['OK']:
+      self.__updateMaterializedDatasets(path, isDirectory, list(metadata), credDict)
+    return result
+
+  def __updateMaterializedDatasets(self, path, isDirectory, metaFields, credDict):
+    """ Update the contents of the materialized datasets after a metadata change of the given path
+    """
+    if isDirectory:
+      result = self.datasetManager.refreshMaterializedDirectory(path, credDict, metaFields)
+    else:
+      result = self.datasetManager.refreshMaterializedFiles([path], credDict, metaFields)
+    if not result['OK']:
+      gLogger.error("Failed to update the materialized datasets", "%s: %s" % (path, result['Message']))
 
   #######################################################################
   #
@@ -1179,3 +1221,14 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return self.fileManager.getSEDump(seName)
+
+  def iterSEDump(self, seName, chunkSize=10000):
+    """
+         Iterate over all the files at a given SE, together with checksum and size
+
+        :param seName: name of the StorageElement
+        :param chunkSize: number of files per chunk
+
+        :returns: S_OK with an iterator over lists of tuples (lfn, checksum, size)
+    """
+    return self.fileManager.iterSEDump(seName, chunkSize)
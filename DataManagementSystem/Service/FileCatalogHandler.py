@@ -18,6 +18,7 @@ import os
 from types import IntType, LongType, DictType, StringTypes, BooleanType, ListType
 # from DIRAC
 from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
+from DIRAC.Core.Utilities.ReplicaRouting import readOnly
 
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
@@ -62,7 +63,14 @@ def initializeFileCatalogHandler(serviceInfo):
                    'ValidFileStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'ValidReplicaStatus': ['AprioriGood', 'Trash', 'Removing', 'Probing'],
                    'VisibleFileStatus': ['AprioriGood'],
-                   'VisibleReplicaStatus': ['AprioriGood']}
+                   'VisibleReplicaStatus': ['AprioriGood'],
+                   'DirectoryCacheSize': 100000,
+                   'DirectoryCacheInvalidation': True,
+                   'DirectoryCacheSyncPeriod': 5,
+                   'SubdirectoryCacheSize': 1000000,
+                   'SubdirectoryCacheTime': 60,
+                   'PermissionCacheSize': 100000,
+                   'PermissionCacheTime': 10}
   for configKey in sorted(defaultConfig.keys()):
     defaultValue = defaultConfig[configKey]
     configValue = getServiceOption(serviceInfo, configKey, defaultValue)
@@ -337,6 +345,7 @@ class FileCatalogHandler(RequestHandler):
 
   types_getReplicas = [[ListType, DictType] + list(StringTypes), BooleanType]
 
+  @readOnly
   def export_getReplicas(self, lfns, allStatus=False):
     """ Get replicas for supplied lfns """
     return gFileCatalogDB.getReplicas(lfns, allStatus, self.getRemoteCredentials())
@@ -397,6 +406,7 @@ class FileCatalogHandler(RequestHandler):
 
   types_listDirectory = [[ListType, DictType] + list(StringTypes), BooleanType]
 
+  @readOnly
   def export_listDirectory(self, lfns, verbose):
     """ List the contents of supplied directories """
     gMonitor.addMark('ListDirectory', 1)
@@ -724,6 +734,13 @@ class FileCatalogHandler(RequestHandler):
     """
     return gFileCatalogDB.datasetManager.releaseDataset(datasets, self.getRemoteCredentials())
 
+  types_materializeDataset = [DictType]
+
+  def export_materializeDataset(self, datasets):
+    """ Store the contents of the dataset and keep them up to date with the changes of the catalog
+    """
+    return gFileCatalogDB.datasetManager.materializeDataset(datasets, self.getRemoteCredentials())
+
   types_getDatasetFiles = [DictType]
 
   def export_getDatasetFiles(self, datasets):
@@ -741,6 +758,20 @@ class FileCatalogHandler(RequestHandler):
     """
     return gFileCatalogDB.getSEDump(seName)['Value']
 
+  # Number of (lfn, checksum, size) tuples per chunk of streamed SE dump
+  seDumpChunkSize = 10000
+
+  types_stream_getSEDump = [StringTypes]
+
+  def stream_getSEDump(self, seName):
+    """ Stream all the files at a given SE, together with checksum and size
+
+        :param seName: name of the StorageElement
+
+        :returns: S_OK with an iterator over lists of tuples (lfn, checksum, size)
+    """
+    return gFileCatalogDB.iterSEDump(seName, self.seDumpChunkSize)
+
   def transfer_toClient(self, seName, token, fileHelper):
     """ This method used to transfer the SEDump to the client,
         formated as CSV with '|' separation
@@ -752,13 +783,15 @@ class FileCatalogHandler(RequestHandler):
 
     """
 
-    retVal = self.getSEDump(seName)
+    retVal = gFileCatalogDB.iterSEDump(seName, self.seDumpChunkSize)
+    if not retVal['OK']:
+      return retVal
 
     try:
       csvOutput = cStringIO.StringIO()
       writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
+      for lfns in retVal['Value']:
+        writer.writerows(lfns)
 
       csvOutput.seek(0)
 
@@ -438,7 +438,7 @@ token is used for access rights confirmation.
 """
     if not self.__checkForDiskSpace( BASE_PATH, 10 * 1024 * 1024 ):
       return S_ERROR( 'Less than 10MB remaining' )
-    dirName = fileID.replace( '.bz2', '' ).replace( '.tar', '' )
+    dirName = fileID.replace( '.bz2', '' ).replace( '.gz', '' ).replace( '.tar', '' )
     dir_path = self.__resolveFileID( dirName, {} )
     res = fileHelper.networkToBulk( dir_path )
     if not res['OK']:
@@ -466,6 +466,9 @@ token is used for access rights confirmation.
       if re.search( '.bz2', fileID ):
         fileID = fileID.replace( '.bz2', '' )
         compress = True
+      elif fileID.endswith( '.tar.gz' ):
+        fileID = fileID.replace( '.gz', '' )
+        compress = 'gz'
       fileID = fileID.replace( '.tar', '' )
       strippedFiles.append( self.__resolveFileID( fileID, {} ) )
     res = fileHelper.bulkToNetwork( strippedFiles, compress=compress )
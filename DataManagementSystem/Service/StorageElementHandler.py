@@ -408,7 +408,7 @@ class StorageElementHandler(RequestHandler):
       return S_ERROR('Failed to get available free space')
     elif not result['Value']:
       return S_ERROR('Not enough disk space')
-    dirName = fileID.replace('.bz2', '').replace('.tar', '')
+    dirName = fileID.replace('.bz2', '').replace('.gz', '').replace('.tar', '')
     dir_path = self.__resolveFileID(dirName)
     res = fileHelper.networkToBulk(dir_path)
     if not res['OK']:
@@ -437,6 +437,9 @@ class StorageElementHandler(RequestHandler):
       if re.search('.bz2', fileID):
         fileID = fileID.replace('.bz2', '')
         compress = True
+      elif fileID.endswith('.tar.gz'):
+        fileID = fileID.replace('.gz', '')
+        compress = 'gz'
       fileID = fileID.replace('.tar', '')
       strippedFiles.append(self.__resolveFileID(fileID))
     res = fileHelper.bulkToNetwork(strippedFiles, compress=compress)
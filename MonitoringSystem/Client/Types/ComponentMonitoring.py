@@ -30,6 +30,7 @@ class ComponentMonitoring(BaseType):
     self.monitoringFields = ['runningTime', 'memoryUsage', 'threads', 'cpuPercentage',
                              'Connections', 'PendingQueries', 'ActiveQueries',
                              'RunningThreads', 'MaxFD', 'ServiceResponseTime',
+                             'CacheHits', 'CacheMisses', 'CacheHitRatio',
                              'cycleDuration', 'cycles']
 
     self.doc_type = "ComponentMonitoring"
@@ -105,10 +105,12 @@ class ResourceStatusHandler(RequestHandler):
     gLogger.info('insert: %s %s' % (table, params))
     res = db.insert(table, params)
     self.__logResult('insert', res)
+    self.srv_invalidateResponseCache('select')
 
     return res
 
   types_select = [[basestring, dict], dict]
+  cache_select = 5
 
   def export_select(self, table, params):
     '''
@@ -158,6 +160,7 @@ class ResourceStatusHandler(RequestHandler):
     gLogger.info('delete: %s %s' % (table, params))
     res = db.delete(table, params)
     self.__logResult('delete', res)
+    self.srv_invalidateResponseCache('select')
 
     return res
 
@@ -185,6 +188,7 @@ class ResourceStatusHandler(RequestHandler):
     gLogger.info('addOrModify: %s %s' % (table, params))
     res = db.addOrModify(table, params)
     self.__logResult('addOrModify', res)
+    self.srv_invalidateResponseCache('select')
 
     return res
 
@@ -212,5 +216,6 @@ class ResourceStatusHandler(RequestHandler):
     gLogger.info('addIfNotThere: %s %s' % (table, params))
     res = db.addIfNotThere(table, params)
     self.__logResult('addIfNotThere', res)
+    self.srv_invalidateResponseCache('select')
 
     return res
@@ -59,6 +59,7 @@ class FileCatalogClient(FileCatalogClientBase):
       'updateDataset',
       'freezeDataset',
       'releaseDataset',
+      'materializeDataset',
       'addUser',
       'deleteUser',
       'addGroup',
@@ -656,6 +657,12 @@ class FileCatalogClient(FileCatalogClientBase):
     """
     return self._getRPC(timeout=timeout).releaseDataset(datasets)
 
+  @checkCatalogArguments
+  def materializeDataset(self, datasets, timeout=120):
+    """ Store the contents of the dataset and keep them up to date with the changes of the catalog
+    """
+    return self._getRPC(timeout=timeout).materializeDataset(datasets)
+
   @checkCatalogArguments
   def getDatasetFiles(self, datasets, timeout=120):
     """ Get lfns in the given dataset
@@ -679,3 +686,13 @@ class FileCatalogClient(FileCatalogClientBase):
 
     dfc = TransferClient(self.serverURL)
     return dfc.receiveFile(outputFilename, seName)
+
+  def iterSEDump(self, seName, timeout=120):
+    """
+        Iterate over the content of an SE without holding it all in memory.
+
+        :param seName: name of the StorageElement
+
+        :returns: generator of S_OK with a list of [lfn,checksum,size], or a final S_ERROR
+    """
+    return self._getRPC(timeout=timeout).executeStream('getSEDump', (seName,))
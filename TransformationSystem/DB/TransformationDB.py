@@ -34,6 +34,9 @@ class TransformationDB(DB):
   """ TransformationDB class
   """
 
+  # Number of TransformationFiles rows read from the server at once
+  transFilesBatchSize = 10000
+
   def __init__(self, dbname=None, dbconfig=None, dbIn=None):
     """ The standard constructor takes the database name (dbname) and the name of the
         configuration section (dbconfig)
@@ -556,31 +559,35 @@ class TransformationDB(DB):
 
       req = "%s %s" % (req, self.buildCondition(condDict, older, newer, timeStamp, orderAttribute, limit,
                                                 offset=offset))
-    res = self._query(req, connection)
+    # The files are read from the server by batches, so that only the result is fully in memory
+    res = self._queryIter(req, batchSize=self.transFilesBatchSize)
     if not res['OK']:
       return res
+    batches = res['Value']
 
-    transFiles = res['Value']
-    fileIDs = [int(row[1]) for row in transFiles]
     webList = []
     resultList = []
-    if not fileIDs:
-      originalFileIDs = {}
-    else:
-      if not originalFileIDs:
-        res = self.__getLfnsForFileIDs(fileIDs, connection=connection)
-        if not res['OK']:
-          return res
-        originalFileIDs = res['Value'][1]
-      for row in transFiles:
-        lfn = originalFileIDs[row[1]]
-        # Prepare the structure for the web
-        fDict = {'LFN': lfn}
-        fDict.update(dict(zip(self.TRANSFILEPARAMS, row)))
-        # Note: the line below is returning "None" if the item is None... This seems to work but is ugly...
-        rList = [lfn] + [str(item) if not isinstance(item, (long, int)) else item for item in row]
-        webList.append(rList)
-        resultList.append(fDict)
+    try:
+      for transFiles in batches:
+        lfnsForFileIDs = originalFileIDs
+        if not lfnsForFileIDs:
+          res = self.__getLfnsForFileIDs([int(row[1]) for row in transFiles], connection=connection)
+          if not res['OK']:
+            return res
+          lfnsForFileIDs = res['Value'][1]
+        for row in transFiles:
+          lfn = lfnsForFileIDs[row[1]]
+          # Prepare the structure for the web
+          fDict = {'LFN': lfn}
+          fDict.update(zip(self.TRANSFILEPARAMS, row))
+          # Note: the line below is returning "None" if the item is None... This seems to work but is ugly...
+          rList = [lfn] + [str(item) if not isinstance(item, (long, int)) else item for item in row]
+          webList.append(rList)
+          resultList.append(fDict)
+    except Exception as x:
+      return self._except('getTransformationFiles', x, 'Failed to read the transformation files')
+    finally:
+      batches.close()
     result = S_OK(resultList)
     result['Records'] = webList
     result['ParameterNames'] = ['LFN'] + self.TRANSFILEPARAMS
@@ -1237,12 +1244,17 @@ class TransformationDB(DB):
       return res
     # Insert only files not found, and assume the LFN is unique in the table
     lfnFileIDs = res['Value'][1]
-    for lfn in set(lfns) - set(lfnFileIDs):
-      req = "INSERT INTO DataFiles (LFN,Status) VALUES ('%s','New');" % lfn
-      res = self._update(req, connection)
-      # If the LFN is duplicate we get an error and ignore it
-      if res['OK']:
-        lfnFileIDs[lfn] = res['lastRowId']
+    newLfns = list(set(lfns) - set(lfnFileIDs))
+    if not newLfns:
+      return S_OK(lfnFileIDs)
+    # The LFNs inserted meanwhile are ignored
+    res = self.insertMany('DataFiles', ['LFN', 'Status'], [[lfn, 'New'] for lfn in newLfns], ignore=True)
+    if not res['OK']:
+      return res
+    res = self.__getFileIDsForLfns(newLfns, connection=connection)
+    if not res['OK']:
+      return res
+    lfnFileIDs.update(res['Value'][1])
     return S_OK(lfnFileIDs)
 
   def __setDataFileStatus(self, fileIDs, status, connection=False):
@@ -5,6 +5,9 @@
 
 __RCSID__ = "$Id"
 
+import time
+import threading
+
 from DIRAC import S_OK, S_ERROR
 from DIRAC import gLogger
 
@@ -12,9 +15,36 @@ from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 
+# Job states counted against the running limits
+RUNNING_STATES = ['Running', 'Matched', 'Stalled']
+
+
+class RunningCounters(object):
+  """ Numbers of jobs in RUNNING_STATES by site and value of the limited job attributes,
+      shared by the Limiters of the process
+
+      They are snapshots of the JobDB counters for all the sites, taken by Limiter.refreshRunningCounters
+      (periodically in the Matcher service), incremented by the jobs matched in between.
+  """
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    # attName -> { siteName -> { attValue -> number of jobs } }
+    self.counters = {}
+    # attName -> time of the snapshot
+    self.snapshotTime = {}
+
+
+gRunningCounters = RunningCounters()
+
 
 class Limiter(object):
 
+  # Matching delays by site, shared by the Limiters of the process
+  delayMem = {}
+  # Age in seconds beyond which the running counters are refreshed while matching
+  maxCountersAge = 60
+
   def __init__(self, jobDB=None, opsHelper=None):
     """ Constructor
     """
@@ -22,7 +52,6 @@ class Limiter(object):
     self.__matchingDelaySection = "JobScheduling/MatchingDelay"
     self.csDictCache = DictCache()
     self.condCache = DictCache()
-    self.delayMem = {}
 
     if jobDB:
       self.jobDB = jobDB
@@ -163,18 +192,10 @@ class Limiter(object):
         self.log.error("Attribute does not exist",
                        "(%s). Check the job limits" % attName)
         continue
-      cK = "Running:%s:%s" % (siteName, attName)
-      data = self.condCache.get(cK)
-      if not data:
-        result = self.jobDB.getCounters(
-            'Jobs', [attName], {
-                'Site': siteName, 'Status': [
-                    'Running', 'Matched', 'Stalled']})
-        if not result['OK']:
-          return result
-        data = result['Value']
-        data = dict([(k[0][attName], k[1]) for k in data])
-        self.condCache.add(cK, 10, data)
+      result = self.__getRunningCounters(siteName, attName)
+      if not result['OK']:
+        return result
+      data = result['Value']
       for attValue in limitsDict[attName]:
         limit = limitsDict[attName][attValue]
         running = data.get(attValue, 0)
@@ -188,6 +209,62 @@ class Limiter(object):
     # negCond is something like : {'JobType': ['Merge']}
     return S_OK(negCond)
 
+  def __getRunningCounters(self, siteName, attName):
+    """ Get the numbers of running jobs at a site by value of a job attribute
+
+        The JobDB is only queried if the counters of the attribute were not loaded yet or are too old,
+        e.g. the first time a limit is set on an attribute.
+    """
+    snapshotTime = gRunningCounters.snapshotTime.get(attName)
+    if snapshotTime is None or time.time() - snapshotTime > self.maxCountersAge:
+      result = self.refreshRunningCounters([attName])
+      if not result['OK']:
+        return result
+    with gRunningCounters.lock:
+      return S_OK(dict(gRunningCounters.counters[attName].get(siteName, {})))
+
+  def refreshRunningCounters(self, attNames=None):
+    """ Take a snapshot of the numbers of running jobs of all the sites
+
+        :param list attNames: job attributes to count the jobs by, all the ones already counted by default
+    """
+    if attNames is None:
+      attNames = list(gRunningCounters.snapshotTime)
+    for attName in attNames:
+      snapshotTime = time.time()
+      result = self.jobDB.getCounters('Jobs', ['Site', attName], {'Status': RUNNING_STATES})
+      if not result['OK']:
+        self.log.error("Can't get the running jobs counters", result['Message'])
+        return result
+      counters = {}
+      for attDict, count in result['Value']:
+        counters.setdefault(attDict['Site'], {})[attDict[attName]] = count
+      with gRunningCounters.lock:
+        gRunningCounters.counters[attName] = counters
+        gRunningCounters.snapshotTime[attName] = snapshotTime
+    return S_OK()
+
+  def updateRunningCounters(self, siteName, jid):
+    """ Count a job matched at a site in the running counters, until their next snapshot
+    """
+    siteSection = "%s/%s" % (self.__runningLimitSection, siteName)
+    result = self.__extractCSData(siteSection)
+    if not result['OK']:
+      return result
+    attNames = [attName for attName in result['Value'] if attName in gRunningCounters.counters]
+    if not attNames:
+      return S_OK()
+    result = self.jobDB.getJobAttributes(jid, attNames)
+    if not result['OK']:
+      self.log.error("Error while retrieving attributes",
+                     "coming from %s: %s" % (siteSection, result['Message']))
+      return result
+    with gRunningCounters.lock:
+      for attName, attValue in result['Value'].items():
+        siteCounters = gRunningCounters.counters[attName].setdefault(siteName, {})
+        siteCounters[attValue] = siteCounters.get(attValue, 0) + 1
+    return S_OK()
+
   def updateDelayCounters(self, siteName, jid):
     # Get the info from the CS
     siteSection = "%s/%s" % (self.__matchingDelaySection, siteName)
@@ -212,10 +289,8 @@ class Limiter(object):
       return result
     atts = result['Value']
     # Create the DictCache if not there
-    if siteName not in self.delayMem:
-      self.delayMem[siteName] = DictCache()
+    delayCounter = self.delayMem.setdefault(siteName, DictCache())
     # Update the counters
-    delayCounter = self.delayMem[siteName]
     for attName in atts:
       attValue = atts[attName]
       if attValue in delayDict[attName]:
@@ -104,6 +104,101 @@ class Matcher(object):
         raise RuntimeError(result['Message'])
       raise RuntimeError("Job %s is not in Waiting state" % str(jobID))
 
+    pilotInfoReportedFlag = resourceDict.get('PilotInfoReportedFlag', False)
+    if not pilotInfoReportedFlag:
+      self._updatePilotInfo(resourceDict)
+
+    resultDict = self._assignJob(resourceDict, jobID, resAtt['Value'])
+
+    matchTime = time.time() - startTime
+    self.log.info("Match time", "[%s]" % str(matchTime))
+    gMonitor.addMark("matchTime", matchTime)
+
+    return resultDict
+
+  def selectJobs(self, resourceRequests, credDict):
+    """ Select several jobs in one go, e.g. for the slots of a multi-slot pilot
+
+        The credentials, site mask and limits are evaluated once for each resource description,
+        and the jobs matching a description are taken out from the task queues together
+
+        :param list resourceRequests: list of ( resourceDescription, numberOfJobs )
+        :param dict credDict: credentials of the requester
+
+        :return: list of dicts as returned by selectJob, one per selected job
+    """
+    startTime = time.time()
+
+    # Identical descriptions are matched together
+    requests = []
+    for resourceDescription, numberOfJobs in resourceRequests:
+      for request in requests:
+        if request[0] == resourceDescription:
+          request[1] += numberOfJobs
+          break
+      else:
+        requests.append([resourceDescription, numberOfJobs])
+
+    # All the descriptions are checked before any job is taken out of the task queues
+    negativeConds = {}
+    resourceRequests = []
+    for resourceDescription, numberOfJobs in requests:
+      resourceDict = self._getResourceDict(resourceDescription, credDict)
+      site = resourceDict['Site']
+      if site not in negativeConds:
+        negativeConds[site] = self.limiter.getNegativeCondForSite(site)
+      resourceRequests.append((resourceDict, numberOfJobs))
+
+    # Once jobs are assigned, the errors do not prevent serving them
+    jobs = []
+    for resourceDict, numberOfJobs in resourceRequests:
+      self.log.info('Resource description for matching %s jobs' % numberOfJobs, printDict(resourceDict))
+
+      result = self.tqDB.matchAndGetJobs(resourceDict, numberOfJobs, negativeCond=negativeConds[resourceDict['Site']])
+      if not result['OK']:
+        if not jobs:
+          raise RuntimeError(result['Message'])
+        self.log.error("Could not match more jobs", result['Message'])
+        break
+      jobIDs = [jobID for jobID, _tqID in result['Value']['jobs']]
+      if not jobIDs:
+        continue
+
+      resAtt = self.jobDB.getAttributesForJobList(jobIDs, ['OwnerDN', 'OwnerGroup', 'Status'])
+      if not resAtt['OK']:
+        # The jobs are out of the task queues
+        self._rescheduleJobs(jobIDs)
+        if not jobs:
+          raise RuntimeError('Could not retrieve job attributes')
+        self.log.error("Could not retrieve job attributes", resAtt['Message'])
+        break
+      if not resourceDict.get('PilotInfoReportedFlag', False):
+        self._updatePilotInfo(resourceDict)
+      for jobID in jobIDs:
+        jobAttributes = resAtt['Value'].get(jobID)
+        if not jobAttributes or jobAttributes['Status'] != 'Waiting':
+          self.log.error('Job matched by the TQ is not in Waiting state', str(jobID))
+          result = self.tqDB.deleteJob(jobID)
+          if not result['OK']:
+            self.log.error("Could not delete the job from the TQ", result['Message'])
+          continue
+        try:
+          jobs.append(self._assignJob(resourceDict, jobID, jobAttributes))
+        except RuntimeError as rte:
+          self.log.error("Could not assign job", "%s: %s" % (jobID, rte))
+          self._rescheduleJobs([jobID])
+
+    matchTime = time.time() - startTime
+    self.log.info("Match time", "[%s] for %s jobs" % (matchTime, len(jobs)))
+    gMonitor.addMark("matchTime", matchTime)
+
+    return jobs
+
+  def _assignJob(self, resourceDict, jobID, jobAttributes):
+    """ Assign a matched job to the resource
+
+        :return: dict with the JDL, ID, owner and optimizer parameters of the job
+    """
     self._reportStatus(resourceDict, jobID)
 
     result = self.jobDB.getJobJDL(jobID)
@@ -114,35 +209,44 @@ class Matcher(object):
     resultDict['JDL'] = result['Value']
     resultDict['JobID'] = jobID
 
-    matchTime = time.time() - startTime
-    self.log.info("Match time", "[%s]" % str(matchTime))
-    gMonitor.addMark("matchTime", matchTime)
-
     # Get some extra stuff into the response returned
     resOpt = self.jobDB.getJobOptParameters(jobID)
     if resOpt['OK']:
       for key, value in resOpt['Value'].items():
         resultDict[key] = value
-    resAtt = self.jobDB.getJobAttributes(jobID, ['OwnerDN', 'OwnerGroup'])
-    if not resAtt['OK']:
-      raise RuntimeError('Could not retrieve job attributes')
-    if not resAtt['Value']:
-      raise RuntimeError('No attributes returned for job')
 
+    if self.opsHelper.getValue("JobScheduling/CheckJobLimits", True):
+      self.limiter.updateRunningCounters(resourceDict['Site'], jobID)
     if self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
       self.limiter.updateDelayCounters(resourceDict['Site'], jobID)
 
-    pilotInfoReportedFlag = resourceDict.get('PilotInfoReportedFlag', False)
-    if not pilotInfoReportedFlag:
-      self._updatePilotInfo(resourceDict)
     self._updatePilotJobMapping(resourceDict, jobID)
 
-    resultDict['DN'] = resAtt['Value']['OwnerDN']
-    resultDict['Group'] = resAtt['Value']['OwnerGroup']
+    resultDict['DN'] = jobAttributes['OwnerDN']
+    resultDict['Group'] = jobAttributes['OwnerGroup']
     resultDict['PilotInfoReportedFlag'] = True
 
     return resultDict
 
+  def _rescheduleJobs(self, jobIDs):
+    """ Reschedule jobs taken out of the task queues which could not be served
+
+        Do not fail if errors happen here
+    """
+    for jobID in jobIDs:
+      result = self.jobDB.rescheduleJob(jobID)
+      if not result['OK']:
+        self.log.error("Problem rescheduling job", "jobID = %s: %s" % (jobID, result['Message']))
+        continue
+      result = self.jlDB.addLoggingRecord(jobID,
+                                          status=result['Status'],
+                                          minor=result['MinorStatus'],
+                                          application='Unknown',
+                                          source='Matcher')
+      if not result['OK']:
+        self.log.error("Problem reporting job status",
+                       "addLoggingRecord, jobID = %s: %s" % (jobID, result['Message']))
+
   def _getResourceDict(self, resourceDescription, credDict):
     """ from resourceDescription to resourceDict (just various mods)
     """
@@ -19,6 +19,7 @@ from DIRAC.Core.Utilities.File import mkDir
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.Core.Utilities.ReturnValues import returnSingleResult
 from DIRAC.Core.Utilities.File import getGlobbedTotalSize
+from DIRAC.Core.Utilities.ParallelGzip import ParallelGzipWriter
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOForGroup
 
 
@@ -127,14 +128,20 @@ class SandboxStoreClient(object):
     except Exception as e:
       return S_ERROR("Cannot create temporary file: %s" % repr(e))
 
-    with tarfile.open(name=tmpFilePath, mode="w|bz2") as tf:
-      for sFile in files2Upload:
-        if isinstance(sFile, basestring):
-          tf.add(os.path.realpath(sFile), os.path.basename(sFile), recursive=True)
-        elif isinstance(sFile, StringIO.StringIO):
-          tarInfo = tarfile.TarInfo(name='jobDescription.xml')
-          tarInfo.size = len(sFile.buf)
-          tf.addfile(tarinfo=tarInfo, fileobj=sFile)
+    # The blocks of the archive are compressed in parallel as independent gzip members,
+    # which the gzip readers (tarfile included) decompress as a single stream
+    with open(tmpFilePath, "wb") as fd:
+      with ParallelGzipWriter(fd,
+                              level=gConfig.getValue("/DIRAC/Transfers/BulkCompressionLevel", 6),
+                              threads=gConfig.getValue("/DIRAC/Transfers/BulkCompressionThreads", 0)) as gzipWriter:
+        with tarfile.open(name=tmpFilePath, mode="w|", fileobj=gzipWriter) as tf:
+          for sFile in files2Upload:
+            if isinstance(sFile, basestring):
+              tf.add(os.path.realpath(sFile), os.path.basename(sFile), recursive=True)
+            elif isinstance(sFile, StringIO.StringIO):
+              tarInfo = tarfile.TarInfo(name='jobDescription.xml')
+              tarInfo.size = len(sFile.buf)
+              tf.addfile(tarinfo=tarInfo, fileobj=sFile)
 
     if sizeLimit > 0:
       # Evaluate the compressed size of the sandbox
@@ -151,7 +158,7 @@ class SandboxStoreClient(object):
         bData = fd.read(10240)
 
     transferClient = self.__getTransferClient()
-    result = transferClient.sendFile(tmpFilePath, ("%s.tar.bz2" % oMD5.hexdigest(), assignTo))
+    result = transferClient.sendFile(tmpFilePath, ("%s.tar.gz" % oMD5.hexdigest(), assignTo))
     result['SandboxFileName'] = tmpFilePath
     try:
       if result['OK']:
@@ -7,13 +7,15 @@ import os
 import unittest
 import importlib
 import StringIO
+import tarfile
 
 from mock import MagicMock
 
 from DIRAC.DataManagementSystem.Client.test.mock_DM import dm_mock
-from DIRAC import S_OK
+from DIRAC import S_OK, S_ERROR
 from DIRAC.WorkloadManagementSystem.Client.DownloadInputData import DownloadInputData
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
+from DIRAC.WorkloadManagementSystem.Client import Limiter
 from DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient import SandboxStoreClient
 
 
@@ -148,6 +150,66 @@ class MatcherTestCase(ClientsTestCase):
 
     self.assertEqual(res, resExpected)
 
+  def test_selectJobs(self):
+
+    self.matcher._getResourceDict = MagicMock(side_effect=lambda resourceDescription, _credDict:
+                                              dict(resourceDescription))
+    self.matcher.limiter = MagicMock()
+    self.matcher.limiter.getNegativeCondForSite.return_value = {}
+    self.tqDBMock.matchAndGetJobs.return_value = S_OK({'jobs': [(1, 10), (2, 10), (3, 10)], 'tqMatch': {}})
+    self.jobDBMock.getAttributesForJobList.return_value = S_OK({1: {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup',
+                                                                    'Status': 'Waiting'},
+                                                                2: {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup',
+                                                                    'Status': 'Matched'},
+                                                                3: {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup',
+                                                                    'Status': 'Waiting'}})
+    self.jobDBMock.getJobJDL.side_effect = lambda jobID: (S_OK('[Executable = "my.sh";]') if jobID == 1
+                                                          else S_ERROR('No JDL'))
+    rescheduled = S_OK(3)
+    rescheduled.update({'Status': 'Received', 'MinorStatus': 'Job Rescheduled'})
+    self.jobDBMock.rescheduleJob.return_value = rescheduled
+    self.jobDBMock.getJobOptParameters.return_value = S_OK({'CPUTime': '100'})
+
+    resourceDescription = {'Setup': 'LHCb-Certification', 'CPUTime': 1080000, 'Site': 'DIRAC.Jenkins.ch'}
+    res = self.matcher.selectJobs([(resourceDescription, 1), (dict(resourceDescription), 2)], {})
+
+    # The identical descriptions are matched together, the jobs not Waiting are not served,
+    # the jobs which can not be assigned are rescheduled
+    self.tqDBMock.matchAndGetJobs.assert_called_once_with(resourceDescription, 3, negativeCond={})
+    self.tqDBMock.deleteJob.assert_called_once_with(2)
+    self.jobDBMock.rescheduleJob.assert_called_once_with(3)
+    self.assertEqual(res, [{'JDL': '[Executable = "my.sh";]', 'JobID': 1, 'CPUTime': '100',
+                            'DN': '/my/DN', 'Group': 'myGroup', 'PilotInfoReportedFlag': True}])
+
+#############################################################################
+
+
+class LimiterTestCase(ClientsTestCase):
+
+  def test_runningLimits(self):
+
+    Limiter.gRunningCounters.counters.clear()
+    Limiter.gRunningCounters.snapshotTime.clear()
+    self.jobDBMock.jobAttributeNames = ['JobType']
+    self.jobDBMock.getCounters.return_value = S_OK([({'Site': 'DIRAC.Jenkins.ch', 'JobType': 'Merge'}, 1),
+                                                    ({'Site': 'DIRAC.Other.ch', 'JobType': 'Merge'}, 5)])
+    self.jobDBMock.getJobAttributes.return_value = S_OK({'JobType': 'Merge'})
+    self.opsHelperMock.getValue.return_value = True
+    self.opsHelperMock.getSections.return_value = S_OK(['JobType'])
+    self.opsHelperMock.getOptionsDict.return_value = S_OK({'Merge': '2'})
+    limiter = Limiter.Limiter(jobDB=self.jobDBMock, opsHelper=self.opsHelperMock)
+
+    self.assertEqual(limiter.getNegativeCondForSite('DIRAC.Jenkins.ch'), {})
+    self.assertEqual(limiter.getNegativeCondForSite('DIRAC.Other.ch'), {'JobType': ['Merge']})
+    # The matched jobs are counted until the next snapshot
+    limiter.updateRunningCounters('DIRAC.Jenkins.ch', 123)
+    self.assertEqual(limiter.getNegativeCondForSite('DIRAC.Jenkins.ch'), {'JobType': ['Merge']})
+    self.assertEqual(self.jobDBMock.getCounters.call_count, 1)
+
+    self.jobDBMock.getCounters.return_value = S_OK([])
+    limiter.refreshRunningCounters()
+    self.assertEqual(limiter.getNegativeCondForSite('DIRAC.Jenkins.ch'), {})
+
 #############################################################################
 
 
@@ -157,10 +219,22 @@ class SandboxStoreTestCaseSuccess(ClientsTestCase):
 
     ourSSC = importlib.import_module('DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient')
     ourSSC.TransferClient = MagicMock()
+    sent = {}
+
+    def sendFile(filePath, fileId):
+      with tarfile.open(filePath) as tf:
+        sent[fileId[0]] = tf.extractfile('jobDescription.xml').read()
+      return S_OK()
+    ourSSC.TransferClient.return_value.sendFile.side_effect = sendFile
     ssc = SandboxStoreClient()
     fileList = [StringIO.StringIO('try')]
     res = ssc.uploadFilesAsSandbox(fileList)
-    print(res)
+    self.assertTrue(res['OK'])
+
+    # The sandbox is a gzip compressed tar archive, named after its MD5
+    self.assertEqual(sent.values(), ['try'])
+    self.assertTrue(sent.keys()[0].endswith('.tar.gz'))
+    self.assertFalse(os.path.exists(res['SandboxFileName']))
 
 
 #############################################################################
@@ -170,6 +244,7 @@ class SandboxStoreTestCaseSuccess(ClientsTestCase):
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(ClientsTestCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MatcherTestCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(LimiterTestCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DownloadInputDataSuccess))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(SandboxStoreTestCaseSuccess))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -27,6 +27,7 @@
     setInputData()
 
     insertNewJobIntoDB()
+    insertNewJobsIntoDB()
     removeJobFromDB()
 
     rescheduleJob()
@@ -46,6 +47,7 @@ from six.moves import range
 __RCSID__ = "$Id$"
 
 import operator
+import uuid
 
 from DIRAC.Core.Utilities import DErrno
 from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
@@ -517,24 +519,16 @@ class JobDB(DB):
     ret = self._escapeString(jobID)
     if not ret['OK']:
       return ret
-    jobID = ret['Value']
-    cmd = 'DELETE FROM InputData WHERE JobID=%s' % (jobID)
+    e_jobID = ret['Value']
+    cmd = 'DELETE FROM InputData WHERE JobID=%s' % (e_jobID)
     result = self._update(cmd)
     if not result['OK']:
       result = S_ERROR('JobDB.setInputData: operation failed.')
 
-    for lfn in inputData:
-      # some jobs are setting empty string as InputData
-      if not lfn:
-        continue
-      ret = self._escapeString(lfn.strip())
-      if not ret['OK']:
-        return ret
-      lfn = ret['Value']
-      cmd = 'INSERT INTO InputData (JobID,LFN) VALUES (%s, %s )' % (jobID, lfn)
-      res = self._update(cmd)
-      if not res['OK']:
-        return res
+    # some jobs are setting empty string as InputData
+    res = self.insertMany('InputData', ['JobID', 'LFN'], [[jobID, lfn.strip()] for lfn in inputData if lfn])
+    if not res['OK']:
+      return res
 
     return S_OK('Files added')
 
@@ -592,14 +586,15 @@ class JobDB(DB):
     self.log.debug('JobDB.selectJobs: retrieving jobs.')
 
     res = self.getFields('Jobs', ['JobID'], condDict=condDict, limit=limit,
-                         older=older, newer=newer, timeStamp=timeStamp, orderAttribute=orderAttribute)
+                         older=older, newer=newer, timeStamp=timeStamp, orderAttribute=orderAttribute,
+                         columns=True)
 
     if not res['OK']:
       return res
 
     if not res['Value']:
       return S_OK([])
-    return S_OK([self._to_value(i) for i in res['Value']])
+    return S_OK([str(jobID) for jobID in res['Value'][0]])
 
 #############################################################################
   def setJobAttribute(self, jobID, attrName, attrValue, update=False, myDate=None):
@@ -946,6 +941,43 @@ class JobDB(DB):
 
     return S_OK(jobID)
 
+  def __insertNewJDLs(self, jdlList):
+    """ Insert new JDLs in the system with multi-row inserts, this produces new JobIDs
+
+        :return: S_OK(list of JobIDs, in the order of jdlList)
+    """
+    if not jdlList:
+      return S_OK([])
+
+    # The rows are marked until their JDL is set, to find their IDs: the server may
+    # not give consecutive IDs to the rows of multi-row inserts
+    result = self._query("SELECT MAX(JobID) FROM JobJDLs")
+    if not result['OK']:
+      return result
+    maxJobID = result['Value'][0][0] or 0
+    marker = uuid.uuid4().hex
+
+    result = self.insertMany('JobJDLs', ['JDL', 'JobRequirements', 'OriginalJDL'],
+                             [['%s:%d' % (marker, i), '', jdl] for i, jdl in enumerate(jdlList)])
+    if not result['OK']:
+      self.log.error('Can not insert New JDLs', result['Message'])
+      return result
+
+    markedRows = "JobID > %d AND JDL LIKE '%s:%%'" % (maxJobID, marker)
+    result = self._query("SELECT JobID, JDL FROM JobJDLs WHERE %s" % markedRows)
+    if result['OK']:
+      jobIDDict = dict((int(jdl.split(':')[1]), int(jobID)) for jobID, jdl in result['Value'])
+      if len(jobIDDict) != len(jdlList):
+        result = S_ERROR('JobDB.__insertNewJDLs: Failed to retrieve the new Ids.')
+    if not result['OK']:
+      self._update("DELETE FROM JobJDLs WHERE %s" % markedRows)
+      return result
+    jobIDList = [jobIDDict[i] for i in range(len(jdlList))]
+
+    self.log.info('JobDB: New JobIDs served', "%d from %s to %s" % (len(jobIDList), jobIDList[0], jobIDList[-1]))
+
+    return S_OK(jobIDList)
+
 #############################################################################
   def getJobJDL(self, jobID, original=False, status=''):
     """ Get JDL for job specified by its jobID. By default the current job JDL
@@ -1074,26 +1106,7 @@ class JobDB(DB):
     if not result['OK']:
       return result
 
-    priority = classAdJob.getAttributeInt('Priority')
-    if priority is None:
-      priority = 0
-    jobAttrNames.append('UserPriority')
-    jobAttrValues.append(priority)
-
-    for jdlName in self.jdl2DBParameters:
-      # Defaults are set by the DB.
-      jdlValue = classAdJob.getAttributeString(jdlName)
-      if jdlValue:
-        jobAttrNames.append(jdlName)
-        jobAttrValues.append(jdlValue)
-
-    jdlValue = classAdJob.getAttributeString('Site')
-    if jdlValue:
-      jobAttrNames.append('Site')
-      if jdlValue.find(',') != -1:
-        jobAttrValues.append('Multiple')
-      else:
-        jobAttrValues.append(jdlValue)
+    self.__addJDLAttributes(classAdJob, jobAttrNames, jobAttrValues)
 
     jobAttrNames.append('VerifiedFlag')
     jobAttrValues.append('True')
@@ -1127,43 +1140,205 @@ class JobDB(DB):
     inputData = []
     if classAdJob.lookupAttribute('InputData'):
       inputData = classAdJob.getListFromExpression('InputData')
-    values = []
 
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    e_jobID = ret['Value']
+    # some jobs are setting empty string as InputData
+    result = self.insertMany('InputData', ['JobID', 'LFN'], [[jobID, lfn.strip()] for lfn in inputData if lfn])
+    if not result['OK']:
+      return result
 
-    for lfn in inputData:
-      # some jobs are setting empty string as InputData
-      if not lfn:
-        continue
-      ret = self._escapeString(lfn.strip())
-      if not ret['OK']:
-        return ret
-      lfn = ret['Value']
+    retVal['Status'] = initialStatus
+    retVal['MinorStatus'] = initialMinorStatus
 
-      values.append('(%s, %s )' % (e_jobID, lfn))
+    return retVal
 
-    if values:
-      cmd = 'INSERT INTO InputData (JobID,LFN) VALUES %s' % ', '.join(values)
-      result = self._update(cmd)
+  def insertNewJobsIntoDB(self, jdlList, owner, ownerDN, ownerGroup, diracSetup,
+                          initialStatus="Received",
+                          initialMinorStatus="Job accepted"):
+    """ Insert several new jobs, e.g. the jobs of a parametric job, doing for each of them
+        what insertNewJobIntoDB does, but with multi-row inserts for all the jobs: the
+        JDLs, attributes, parameters and input data of the jobs take a few statements
+        instead of several per job
+
+        :param list jdlList: job description JDLs
+        :param str owner: job owner user name
+        :param str ownerDN: job owner DN
+        :param str ownerGroup: job owner group
+        :param str diracSetup: setup in which context the jobs are submitted
+        :param str initialStatus: optional initial job status (Received by default)
+        :param str initialMinorStatus: optional initial minor job status
+        :return: S_OK(list of new job IDs, in the order of jdlList), with 'JobStatus', the dict
+                 jobID -> (status, minorStatus). If one of the jobs can not be inserted, none is
+                 and the error of the first failing job is returned
+    """
+    # 1.- Check all the JDLs before inserting anything
+    manifestList = []
+    for jdl in jdlList:
+      jobManifest = JobManifest()
+      result = jobManifest.load(jdl)
+      if not result['OK']:
+        return result
+      jobManifest.setOptionsFromDict({'OwnerName': owner,
+                                      'OwnerDN': ownerDN,
+                                      'OwnerGroup': ownerGroup,
+                                      'DIRACSetup': diracSetup})
+      result = jobManifest.check()
       if not result['OK']:
         return result
+      manifestList.append(jobManifest)
 
-    retVal['Status'] = initialStatus
-    retVal['MinorStatus'] = initialMinorStatus
+    # 2.- Insert the original JDLs on DB and get the new JobIDs
+    # Fix the possible lack of the brackets in the JDLs
+    originalJDLList = [jdl if jdl.strip()[0].find('[') == 0 else '[' + jdl + ']' for jdl in jdlList]
+    result = self.__insertNewJDLs(originalJDLList)
+    if not result['OK']:
+      return S_ERROR(EWMSSUBM, 'Failed to insert JDL in to DB')
+    jobIDList = result['Value']
+
+    # 3.- Check the JDLs and prepare the DIRAC JDLs and the rows of all the jobs
+    submissionTime = Time.toString()
+    # Values shared by the jobs of the submission
+    cache = {}
+    jdlRows = []
+    # Jobs rows by inserted attributes
+    jobRows = {}
+    parameterRows = []
+    inputDataRows = []
+    jobStatus = {}
+    for jobID, jobManifest, originalJDL in zip(jobIDList, manifestList, originalJDLList):
+      jobManifest.setOption('JobID', jobID)
+      jobAttrNames = ['JobID', 'LastUpdateTime', 'SubmissionTime', 'Owner', 'OwnerDN', 'OwnerGroup', 'DIRACSetup']
+      jobAttrValues = [jobID, submissionTime, submissionTime, owner, ownerDN, ownerGroup, diracSetup]
+
+      # Replace the JobID placeholder if any
+      jobJDL = jobManifest.dumpAsJDL().replace('%j', str(jobID))
+      classAdJob = ClassAd(jobJDL)
+      classAdReq = ClassAd('[]')
+      if not classAdJob.isOK():
+        result = S_OK('Error in JDL syntax')
+      else:
+        classAdJob.insertAttributeInt('JobID', jobID)
+        result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, cache)
+      if not result['OK'] or result['Value']:
+        # Nothing is kept from a submission with a failing job
+        self.__removeNewJobs(jobIDList)
+        if not result['OK']:
+          return result
+        return S_ERROR(EWMSSUBM, result['Value'])
+
+      self.__addJDLAttributes(classAdJob, jobAttrNames, jobAttrValues)
+      jobAttrNames += ['VerifiedFlag', 'Status', 'MinorStatus']
+      jobAttrValues += ['True', initialStatus, initialMinorStatus]
+
+      classAdJob.insertAttributeInt('JobRequirements', classAdReq.asJDL())
+
+      if classAdJob.lookupAttribute("Parameters"):
+        parameterRows.extend([jobID, name, value]
+                             for name, value in classAdJob.getDictionaryFromSubJDL("Parameters").items())
+      if classAdJob.lookupAttribute('InputData'):
+        # some jobs are setting empty string as InputData
+        inputDataRows.extend([jobID, lfn.strip()]
+                             for lfn in classAdJob.getListFromExpression('InputData') if lfn)
+
+      jobStatus[jobID] = (initialStatus, initialMinorStatus)
+      jdlRows.append([jobID, classAdJob.asJDL(), '', originalJDL])
+      jobRows.setdefault(tuple(jobAttrNames), []).append(jobAttrValues)
+
+    # 4.- Insert all the jobs, the marked JobJDLs rows being replaced by the final ones
+    result = self._update("DELETE FROM JobJDLs WHERE JobID IN (%s)" % ','.join(str(jobID) for jobID in jobIDList))
+    if result['OK'] and result['Value'] != len(jobIDList):
+      result = S_ERROR('JobDB.insertNewJobsIntoDB: new JobJDLs rows removed meanwhile')
+    if result['OK']:
+      result = self.insertMany('JobJDLs', ['JobID', 'JDL', 'JobRequirements', 'OriginalJDL'], jdlRows)
+    for jobAttrNames, valuesList in jobRows.items():
+      if result['OK']:
+        result = self.insertMany('Jobs', list(jobAttrNames), valuesList)
+    if result['OK']:
+      result = self.upsertMany('JobParameters', ['JobID', 'Name', 'Value'], parameterRows, updateFields=['Value'])
+    if result['OK']:
+      result = self.insertMany('InputData', ['JobID', 'LFN'], inputDataRows)
+    if not result['OK']:
+      self.log.error('Can not insert the new jobs', result['Message'])
+      self.__removeNewJobs(jobIDList)
+      return result
 
+    retVal = S_OK(jobIDList)
+    retVal['JobStatus'] = jobStatus
     return retVal
 
+  def __removeNewJobs(self, jobIDList):
+    """ Remove the rows of a bulk submission which could not be completed
+    """
+    result = self.removeJobFromDB(jobIDList)
+    if not result['OK']:
+      self.log.error('Can not remove the jobs of a failed submission',
+                     '%s: %s' % (result['Message'], result.get('FailedTables')))
+
+  def __addJDLAttributes(self, classAdJob, jobAttrNames, jobAttrValues):
+    """ Add the job attributes defined in the checked job JDL to the attributes to insert
+    """
+    priority = classAdJob.getAttributeInt('Priority')
+    if priority is None:
+      priority = 0
+    jobAttrNames.append('UserPriority')
+    jobAttrValues.append(priority)
+
+    for jdlName in self.jdl2DBParameters:
+      # Defaults are set by the DB.
+      jdlValue = classAdJob.getAttributeString(jdlName)
+      if jdlValue:
+        jobAttrNames.append(jdlName)
+        jobAttrValues.append(jdlValue)
+
+    jdlValue = classAdJob.getAttributeString('Site')
+    if jdlValue:
+      jobAttrNames.append('Site')
+      if jdlValue.find(',') != -1:
+        jobAttrValues.append('Multiple')
+      else:
+        jobAttrValues.append(jdlValue)
+
   def __checkAndPrepareJob(self, jobID, classAdJob, classAdReq, owner, ownerDN,
                            ownerGroup, diracSetup, jobAttrNames, jobAttrValues):
     """
       Check Consistency of Submitted JDL and set some defaults
       Prepare subJDL with Job Requirements
     """
+    result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup)
+    if not result['OK']:
+      return result
+    error = result['Value']
+
+    if error:
+      retVal = S_ERROR(EWMSSUBM, error)
+      retVal['JobId'] = jobID
+      retVal['Status'] = 'Failed'
+      retVal['MinorStatus'] = error
+
+      jobAttrNames.append('Status')
+      jobAttrValues.append('Failed')
+
+      jobAttrNames.append('MinorStatus')
+      jobAttrValues.append(error)
+      resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
+      if not resultInsert['OK']:
+        retVal['MinorStatus'] += '; %s' % resultInsert['Message']
+
+      return retVal
+
+    return S_OK()
+
+  def __prepareJob(self, classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, cache=None):
+    """ Check the consistency of a submitted JDL, set some defaults and fill the job requirements
+
+        :param dict cache: values shared by the jobs of a submission, filled on the way
+        :return: S_OK(error, empty if the JDL is consistent) / S_ERROR
+    """
+    if cache is None:
+      cache = {}
     error = ''
-    vo = getVOForGroup(ownerGroup)
+    if 'VO' not in cache:
+      cache['VO'] = getVOForGroup(ownerGroup)
+    vo = cache['VO']
 
     jdlDiracSetup = classAdJob.getAttributeString('DIRACSetup')
     jdlOwner = classAdJob.getAttributeString('Owner')
@@ -1197,8 +1372,10 @@ class JobDB(DB):
     if vo:
       classAdReq.insertAttributeString('VirtualOrganization', vo)
 
-    setup = gConfig.getValue('/DIRAC/Setup', '')
-    voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
+    if 'VOPolicy' not in cache:
+      setup = gConfig.getValue('/DIRAC/Setup', '')
+      cache['VOPolicy'] = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
+    voPolicyDict = cache['VOPolicy']
     # voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy')
     if voPolicyDict['OK']:
       voPolicy = voPolicyDict['Value']
@@ -1220,40 +1397,28 @@ class JobDB(DB):
       if cpuTime is not None:
         classAdJob.insertAttributeInt('CPUTime', cpuTime)
       else:
-        opsHelper = Operations(group=ownerGroup,
-                               setup=diracSetup)
-        cpuTime = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+        if 'DefaultCPUTime' not in cache:
+          opsHelper = Operations(group=ownerGroup,
+                                 setup=diracSetup)
+          cache['DefaultCPUTime'] = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+        cpuTime = cache['DefaultCPUTime']
     classAdReq.insertAttributeInt('CPUTime', cpuTime)
 
     # platform(s)
     platformList = classAdJob.getListFromExpression('Platform')
     if platformList:
-      result = self.getDIRACPlatform(platformList)
-      if not result['OK']:
-        return result
-      if result['Value']:
-        classAdReq.insertAttributeVectorString('Platforms', result['Value'])
+      platformKey = ('Platforms', tuple(platformList))
+      if platformKey not in cache:
+        result = self.getDIRACPlatform(platformList)
+        if not result['OK']:
+          return result
+        cache[platformKey] = result['Value']
+      if cache[platformKey]:
+        classAdReq.insertAttributeVectorString('Platforms', cache[platformKey])
       else:
         error = "OS compatibility info not found"
 
-    if error:
-      retVal = S_ERROR(EWMSSUBM, error)
-      retVal['JobId'] = jobID
-      retVal['Status'] = 'Failed'
-      retVal['MinorStatus'] = error
-
-      jobAttrNames.append('Status')
-      jobAttrValues.append('Failed')
-
-      jobAttrNames.append('MinorStatus')
-      jobAttrValues.append(error)
-      resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
-      if not resultInsert['OK']:
-        retVal['MinorStatus'] += '; %s' % resultInsert['Message']
-
-      return retVal
-
-    return S_OK()
+    return S_OK(error)
 
 #############################################################################
   def removeJobFromDB(self, jobIDs):
@@ -1942,30 +2107,12 @@ class JobDB(DB):
       self.log.warn(result['Message'])
 
     # Add dynamic data to the job heart beat log
-    # start = time.time()
-    valueList = []
-    for key, value in dynamicDataDict.items():
-      result = self._escapeString(key)
-      if not result['OK']:
-        self.log.warn('Failed to escape string ', key)
-        continue
-      e_key = result['Value']
-      result = self._escapeString(value)
-      if not result['OK']:
-        self.log.warn('Failed to escape string ', value)
-        continue
-      e_value = result['Value']
-      valueList.append("( %s, %s,%s,UTC_TIMESTAMP())" % (e_jobID, e_key, e_value))
-
-    if valueList:
-
-      valueString = ','.join(valueList)
-      req = "INSERT INTO HeartBeatLoggingInfo (JobID,Name,Value,HeartBeatTime) VALUES "
-      req += valueString
-      result = self._update(req)
-      if not result['OK']:
-        ok = False
-        self.log.warn(result['Message'])
+    result = self.insertMany('HeartBeatLoggingInfo', ['JobID', 'Name', 'Value'],
+                             [[jobID, key, str(value)] for key, value in dynamicDataDict.items()],
+                             sqlValues={'HeartBeatTime': 'UTC_TIMESTAMP()'})
+    if not result['OK']:
+      ok = False
+      self.log.warn(result['Message'])
 
     if ok:
       return S_OK()
@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -46,9 +47,58 @@ class JobLoggingDB(DB):
         UTC time is used.
     """
 
+    return self.addLoggingRecords(jobID, [(status, minor, application, date, source)])
+
+#############################################################################
+  def addLoggingRecords(self, jobID, records):
+    """ Add several entries to the JobLoggingDB table for a job, with a single statement
+
+        :param jobID: job ID
+        :param list records: tuples (status, minor, application, date, source), with the
+                             meaning of the arguments of addLoggingRecord
+    """
+    valuesList = []
+    for status, minor, application, date, source in records:
+      event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
+      self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+      _date, time_order = self.__getStatusTime(date)
+      valuesList.append([int(jobID), str(status), str(minor), str(application)[:255],
+                         str(_date), time_order, str(source)])
+
+    return self.insertMany('LoggingInfo',
+                           ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                            'StatusTime', 'StatusTimeOrder', 'StatusSource'],
+                           valuesList)
+
+  def addLoggingRecordForJobs(self,
+                              jobIDList,
+                              status='idem',
+                              minor='idem',
+                              application='idem',
+                              date='',
+                              source='Unknown'):
+    """ Add the same entry to the JobLoggingDB table for several jobs, e.g. the jobs of
+        a bulk submission, with a single statement
+
+        :param list jobIDList: job IDs
+        The other arguments have the meaning of the arguments of addLoggingRecord
+    """
     event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
-    self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+    self.log.info("Adding record for %d jobs " % len(jobIDList), ": '" + event + "' from " + source)
+    _date, time_order = self.__getStatusTime(date)
+    return self.insertMany('LoggingInfo',
+                           ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                            'StatusTime', 'StatusTimeOrder', 'StatusSource'],
+                           [[int(jobID), str(status), str(minor), str(application)[:255],
+                             str(_date), time_order, str(source)] for jobID in jobIDList])
 
+  def __getStatusTime(self, date):
+    """ Get the time stamp of a status and its order
+
+        :param date: '%Y-%m-%d %H:%M:%S' string, datetime.datetime or '' for the current UTC time
+
+        :return: ( datetime, float order )
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -76,13 +126,7 @@ class JobLoggingDB(DB):
         _date = Time.dateTime()
         epoc = time.mktime(_date.timetuple()) - MAGIC_EPOC_NUMBER
         time_order = round(epoc, 3)
-
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-        (int(jobID), status, minor, application[:255],
-         str(_date), time_order, source)
-
-    return self._update(cmd)
+    return _date, time_order
 
 #############################################################################
   def getJobLoggingInfo(self, jobID):
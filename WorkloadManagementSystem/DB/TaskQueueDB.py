@@ -3,8 +3,10 @@
 
 __RCSID__ = "$Id"
 
+import time
 import random
 import string
+import threading
 
 from DIRAC import gConfig, S_OK, S_ERROR
 from DIRAC.Core.Base.DB import DB
@@ -15,6 +17,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEFAULT_GROUP_SHARE = 1000
 TQ_MIN_SHARE = 0.001
@@ -60,6 +63,16 @@ class TaskQueueDB(DB):
     self.__opsHelper = Operations()
     self.__ensureInsertionIsSingle = False
     self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+    self.__matchIndex = None
+    self.__matchIndexLock = threading.Lock()
+    self.__matchIndexRefreshPeriod = 10
+    self.__matchIndexNextRefresh = 0
+    # Entities whose shares have to be recalculated, batched by a timer
+    self.__pendingShares = set()
+    self.__pendingSharesLock = threading.Lock()
+    self.__sharesTimer = None
+    # Time spent on the shares recalculations, for the entities and for all the TQs
+    self.__sharesStats = {'Entity': [0, 0., 0.], 'All': [0, 0., 0.]}
     result = self.__initializeDB()
     if not result['OK']:
       raise Exception("Can't create tables: %s" % result['Message'])
@@ -77,6 +90,81 @@ class TaskQueueDB(DB):
       return result
     return S_OK([row[0] for row in result['Value']])
 
+  def enableMatchIndex(self, refreshPeriod=10):
+    """ Match the task queues with an in-memory index of their definitions instead of an SQL query,
+        the DB being only queried to extract the jobs from the matched task queues
+
+        The index is updated by the changes made through this object and reloaded incrementally
+        from the DB every refreshPeriod seconds, for the changes made by the other processes.
+
+        :param int refreshPeriod: maximum age in seconds of the index used for a match
+    """
+    self.__matchIndexRefreshPeriod = refreshPeriod
+    self.__matchIndex = TaskQueueIndex(multiValueMatchFields, bannedJobMatchFields)
+    self.__matchIndexNextRefresh = 0
+    return self.__refreshMatchIndex()
+
+  def __refreshMatchIndex(self):
+    """ Update the match index with the task queues created, deleted or reprioritized in the DB
+    """
+    # One thread refreshes the index, the others go on matching with it meanwhile
+    if not self.__matchIndexLock.acquire(False):
+      return S_OK()
+    try:
+      result = self._query("SELECT TQId, Priority, Enabled FROM `tq_TaskQueues`")
+      if not result['OK']:
+        return result
+      indexedTQs = self.__matchIndex.getTaskQueueIds()
+      tqsInDB = set()
+      newTQs = []
+      for tqId, priority, enabled in result['Value']:
+        tqsInDB.add(tqId)
+        if tqId in indexedTQs:
+          self.__matchIndex.setPriority(tqId, priority)
+        elif enabled >= 1:
+          # The definition of a new task queue is complete once it is enabled
+          newTQs.append(tqId)
+      for tqId in indexedTQs - tqsInDB:
+        self.__matchIndex.removeTaskQueue(tqId)
+      if newTQs:
+        result = self.__getTaskQueueDefinitions(newTQs)
+        if not result['OK']:
+          return result
+        for tqId, tqDefDict in result['Value'].iteritems():
+          self.__matchIndex.addTaskQueue(tqId, tqDefDict)
+      self.__matchIndexNextRefresh = time.time() + self.__matchIndexRefreshPeriod
+      return S_OK()
+    finally:
+      self.__matchIndexLock.release()
+
+  def __getTaskQueueDefinitions(self, tqIdList):
+    """ Get the definitions of some task queues, with their priority
+
+        :return: S_OK(dict tqId -> definition) / S_ERROR
+    """
+    tqIds = ", ".join([str(tqId) for tqId in tqIdList])
+    sqlCmd = "SELECT TQId, Priority, %s FROM `tq_TaskQueues` WHERE TQId IN ( %s )" % (", ".join(singleValueDefFields),
+                                                                                       tqIds)
+    result = self._query(sqlCmd)
+    if not result['OK']:
+      return result
+    tqData = {}
+    for record in result['Value']:
+      tqData[record[0]] = dict(zip(('Priority', ) + singleValueDefFields, record[1:]))
+    for field in multiValueDefFields:
+      result = self._query("SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId IN ( %s )" % (field, tqIds))
+      if not result['OK']:
+        return result
+      for tqId, value in result['Value']:
+        if tqId in tqData:
+          tqData[tqId].setdefault(field, []).append(value)
+    return S_OK(tqData)
+
+  def __removeFromMatchIndex(self, tqIdList):
+    if self.__matchIndex is not None:
+      for tqId in tqIdList:
+        self.__matchIndex.removeTaskQueue(int(tqId))
+
   def isSharesCorrectionEnabled(self):
     return self.__getCSOption("EnableSharesCorrection", False)
 
@@ -315,6 +403,7 @@ class TaskQueueDB(DB):
         "DELETE FROM `tq_TaskQueues` WHERE TQId in ( %s )" % ','.join(orphanedTQs), conn=connObj)
     if not result['OK']:
       return result
+    self.__removeFromMatchIndex(orphanedTQs)
     return S_OK()
 
   def __setTaskQueueEnabled(self, tqId, enabled=True, connObj=False):
@@ -390,9 +479,12 @@ class TaskQueueDB(DB):
         self.log.error("Error inserting job in TQ", "Job %s TQ %s: %s" % (jobId, tqId, result['Message']))
         return result
       if newTQ:
-        self.recalculateTQSharesForEntity(tqDefDict['OwnerDN'], tqDefDict['OwnerGroup'], connObj=connObj)
+        self.__scheduleSharesRecalculation(tqDefDict['OwnerDN'], tqDefDict['OwnerGroup'], connObj=connObj)
     finally:
       self.__setTaskQueueEnabled(tqId, True)
+      if newTQ:
+        # Load the new task queue in the match index at the next match
+        self.__matchIndexNextRefresh = 0
     return S_OK()
 
   def __insertJobInTaskQueue(self, jobId, tqId, jobPriority, checkTQExists=True, connObj=False):
@@ -511,9 +603,30 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
         :param dict tqDefDict: dict for TQ definition
         :returns: S_OK() / S_ERROR
     """
+    retVal = self.matchAndGetJobs(tqMatchDict, 1, numJobsPerTry=numJobsPerTry, numQueuesPerTry=numQueuesPerTry,
+                                  negativeCond=negativeCond)
+    if not retVal['OK']:
+      return retVal
+    tqMatchDict = retVal['Value']['tqMatch']
+    if not retVal['Value']['jobs']:
+      return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+    jobId, tqId = retVal['Value']['jobs'][0]
+    return S_OK({'matchFound': True, 'jobId': jobId, 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+
+  def matchAndGetJobs(self, tqMatchDict, numJobs, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None):
+    """ Match several jobs based on the same requirements, e.g. for the slots of a multi-slot pilot
+
+        The task queues are matched once per try and the jobs are taken out of them
+        until numJobs jobs are extracted, using a single connection.
+
+        :param dict tqMatchDict: dict for TQ match
+        :param int numJobs: maximum number of jobs to extract
+        :returns: S_OK( { 'jobs' : list of ( jobId, tqId ), 'tqMatch' : tqMatchDict } ) / S_ERROR
+    """
     if negativeCond is None:
       negativeCond = {}
     # Make a copy to avoid modification of original if escaping needs to be done
+    rawMatchDict = tqMatchDict
     tqMatchDict = dict(tqMatchDict)
     retVal = self._checkMatchDefinition(tqMatchDict)
     if not retVal['OK']:
@@ -528,27 +641,29 @@ FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s"
     prioSQL = "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` \
 WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     postJobSQL = " ORDER BY `tq_Jobs`.JobId ASC LIMIT %s" % numJobsPerTry
+    if 'JobID' in tqMatchDict:
+      # A certain JobID is required by the resource, it can't be given several times
+      numJobs = 1
+    extractedJobs = []
     for _ in xrange(self.__maxMatchRetry):
       noJobsFound = False
       if 'JobID' in tqMatchDict:
         # A certain JobID is required by the resource, so all TQ are to be considered
-        retVal = self.matchAndGetTaskQueue(tqMatchDict,
-                                           numQueuesToGet=0,
-                                           skipMatchDictDef=True,
-                                           connObj=connObj)
+        retVal = self.__matchTaskQueues(tqMatchDict, rawMatchDict,
+                                        numQueuesToGet=0,
+                                        connObj=connObj)
         preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict['JobID'])
       else:
-        retVal = self.matchAndGetTaskQueue(tqMatchDict,
-                                           numQueuesToGet=numQueuesPerTry,
-                                           skipMatchDictDef=True,
-                                           negativeCond=negativeCond,
-                                           connObj=connObj)
+        retVal = self.__matchTaskQueues(tqMatchDict, rawMatchDict,
+                                        numQueuesToGet=max(numQueuesPerTry, numJobs),
+                                        negativeCond=negativeCond,
+                                        connObj=connObj)
       if not retVal['OK']:
         return retVal
       tqList = retVal['Value']
       if not tqList:
         self.log.info("No TQ matches requirements")
-        return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+        return S_OK({'jobs': extractedJobs, 'tqMatch': tqMatchDict})
       for tqId, tqOwnerDN, tqOwnerGroup in tqList:
         self.log.info("Trying to extract jobs from TQ", tqId)
         retVal = self._query(prioSQL % tqId, conn=connObj)
@@ -565,7 +680,7 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         if not jobTQList:
           self.log.info("Task queue seems to be empty, triggering a cleaning of", tqId)
           self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
-        while jobTQList:
+        while jobTQList and len(extractedJobs) < numJobs:
           jobId, tqId = jobTQList.pop(random.randint(0, len(jobTQList) - 1))
           self.log.info("Trying to extract job from TQ",
                         "%s : %s" % (jobId, tqId))
@@ -574,14 +689,19 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
             msgFix = "Could not take job"
             msgVar = " %s out from the TQ %s: %s" % (jobId, tqId, retVal['Message'])
             self.log.error(msgFix, msgVar)
+            if extractedJobs:
+              # The jobs already taken out from the TQs have to be served
+              return S_OK({'jobs': extractedJobs, 'tqMatch': tqMatchDict})
             return S_ERROR(msgFix + msgVar)
           if retVal['Value']:
             self.log.info("Extracted job with prio from TQ",
                           "(%s : %s : %s)" % (jobId, prio, tqId))
-            return S_OK({'matchFound': True, 'jobId': jobId, 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+            extractedJobs.append((jobId, tqId))
+        if len(extractedJobs) >= numJobs:
+          return S_OK({'jobs': extractedJobs, 'tqMatch': tqMatchDict})
         self.log.info("No jobs could be extracted from TQ", tqId)
-    if noJobsFound:
-      return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+    if noJobsFound or extractedJobs:
+      return S_OK({'jobs': extractedJobs, 'tqMatch': tqMatchDict})
 
     self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
     return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
@@ -593,11 +713,31 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     if negativeCond is None:
       negativeCond = {}
     # Make a copy to avoid modification of original if escaping needs to be done
+    rawMatchDict = None
     tqMatchDict = dict(tqMatchDict)
     if not skipMatchDictDef:
+      rawMatchDict = dict(tqMatchDict)
       retVal = self._checkMatchDefinition(tqMatchDict)
       if not retVal['OK']:
         return retVal
+    return self.__matchTaskQueues(tqMatchDict, rawMatchDict, numQueuesToGet=numQueuesToGet,
+                                  negativeCond=negativeCond, connObj=connObj)
+
+  def __matchTaskQueues(self, tqMatchDict, rawMatchDict, numQueuesToGet=1, negativeCond=None, connObj=False):
+    """ Get the queues that match the requirements, with the match index if enabled, with SQL otherwise
+
+        :param dict tqMatchDict: checked match dict, with the values escaped
+        :param dict rawMatchDict: match dict with the values not escaped, None if not available
+    """
+    if self.__matchIndex is not None and rawMatchDict is not None:
+      retVal = S_OK()
+      if time.time() >= self.__matchIndexNextRefresh:
+        retVal = self.__refreshMatchIndex()
+        if not retVal['OK']:
+          self.log.warn("Can't refresh the TQ match index, matching with SQL", retVal['Message'])
+      if retVal['OK']:
+        return self.__matchIndex.match(rawMatchDict, numQueuesToGet=numQueuesToGet,
+                                       negativeCond=negativeCond, isJobSharing=self.__isJobSharing)
     retVal = self.__generateTQMatchSQL(tqMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
     if not retVal['OK']:
       return retVal
@@ -607,6 +747,10 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
       return retVal
     return S_OK([(row[0], row[1], row[2]) for row in retVal['Value']])
 
+  @staticmethod
+  def __isJobSharing(group):
+    return Properties.JOB_SHARING in Registry.getPropertiesForGroup(group)
+
   @staticmethod
   def __generateSQLSubCond(sqlString, value, boolOp='OR'):
     if not isinstance(value, (list, tuple)):
@@ -1003,7 +1147,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       retVal = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
       if not retVal['OK']:
         return retVal
-      self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
+      self.__removeFromMatchIndex([tqId])
+      self.__scheduleSharesRecalculation(tqOwnerDN, tqOwnerGroup, connObj=connObj)
       self.log.info("Deleted empty and enabled TQ", tqId)
       return S_OK()
     return S_OK(False)
@@ -1040,7 +1185,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       if not retVal['OK']:
         return retVal
     if delTQ > 0:
-      self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
+      self.__removeFromMatchIndex([tqId])
+      self.__scheduleSharesRecalculation(tqOwnerDN, tqOwnerGroup, connObj=connObj)
       return S_OK(True)
     return S_OK(False)
 
@@ -1098,6 +1244,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
     for field in multiValueDefFields:
       table = "`tq_TQTo%s`" % field
       sqlCmd = "SELECT %s.TQId, %s.Value FROM %s" % (table, table, table)
+      if tqIdList is not None:
+        sqlCmd += " WHERE %s.TQId in ( %s )" % (table, ", ".join([str(id_) for id_ in tqIdList]))
       retVal = self._query(sqlCmd)
       if not retVal['OK']:
         self.log.error("Can't retrieve task queues field",
@@ -1141,10 +1289,72 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
         if group in newShares:
           self.__groupShares[group] = newShares[group]
 
+  def __scheduleSharesRecalculation(self, userDN, userGroup, connObj=False):
+    """
+    Recalculate the shares of a userDN/userGroup combo after a TQ creation or deletion,
+    batching the recalculations requested within JobScheduling/SharesUpdateDelay seconds
+    """
+    delay = self.__getCSOption("SharesUpdateDelay", 10)
+    if not delay:
+      return self.recalculateTQSharesForEntity(userDN, userGroup, connObj=connObj)
+    with self.__pendingSharesLock:
+      self.__pendingShares.add((userDN, userGroup))
+      if self.__sharesTimer is None:
+        self.__sharesTimer = threading.Timer(delay, self.__recalculatePendingShares)
+        self.__sharesTimer.daemon = True
+        self.__sharesTimer.start()
+    return S_OK()
+
+  def __recalculatePendingShares(self):
+    """
+    Recalculate the shares of the entities whose TQs changed since the last batch
+    """
+    with self.__pendingSharesLock:
+      pendingShares = self.__pendingShares
+      self.__pendingShares = set()
+      self.__sharesTimer = None
+    pendingDNs = {}
+    for userDN, userGroup in pendingShares:
+      pendingDNs.setdefault(userGroup, set()).add(userDN)
+    for userGroup, userDNs in pendingDNs.iteritems():
+      # Several owners of a group changed: all the owners of the group are recalculated at once
+      userDN = userDNs.pop() if len(userDNs) == 1 else "all"
+      result = self.recalculateTQSharesForEntity(userDN, userGroup)
+      if not result['OK']:
+        self.log.error("Could not recalculate shares", "for %s@%s: %s" % (userDN, userGroup, result['Message']))
+
+  def __accountSharesTime(self, kind, elapsed):
+    with self.__pendingSharesLock:
+      stats = self.__sharesStats[kind]
+      stats[0] += 1
+      stats[1] += elapsed
+      stats[2] = max(stats[2], elapsed)
+
+  def getSharesStats(self, reset=False):
+    """
+    Get the time spent on the shares recalculations
+      :returns: S_OK( { 'Entity' | 'All' : { 'Recalculations', 'TotalTime', 'MaxTime' } } )
+    """
+    stats = {}
+    with self.__pendingSharesLock:
+      for kind, (count, totalTime, maxTime) in self.__sharesStats.items():
+        stats[kind] = {'Recalculations': count, 'TotalTime': totalTime, 'MaxTime': maxTime}
+        if reset:
+          self.__sharesStats[kind] = [0, 0., 0.]
+    return S_OK(stats)
+
   def recalculateTQSharesForAll(self):
     """
     Recalculate all priorities for TQ's
     """
+    startTime = time.time()
+    result = self.__recalculateTQSharesForAll()
+    elapsed = time.time() - startTime
+    self.__accountSharesTime('All', elapsed)
+    self.log.info("Recalculated shares for all TQs", "in %.3f seconds" % elapsed)
+    return result
+
+  def __recalculateTQSharesForAll(self):
     if self.isSharesCorrectionEnabled():
       self.log.info("Updating correctors state")
       self.__sharesCorrector.update()
@@ -1164,6 +1374,12 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
     """
     Recalculate the shares for a userDN/userGroup combo
     """
+    startTime = time.time()
+    result = self.__recalculateTQSharesForEntity(userDN, userGroup, connObj=connObj)
+    self.__accountSharesTime('Entity', time.time() - startTime)
+    return result
+
+  def __recalculateTQSharesForEntity(self, userDN, userGroup, connObj=False):
     self.log.info("Recalculating shares",
                   "for %s@%s TQs" % (userDN, userGroup))
     if userGroup in self.__groupShares:
@@ -1216,10 +1432,10 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       tqCond.append("t.OwnerDN= %s " % userDN)
     tqCond.append("t.TQId = j.TQId")
     if consolidationFunc == 'AVG':
-      selectSQL = "SELECT j.TQId, SUM( j.RealPriority )/COUNT(j.RealPriority) \
+      selectSQL = "SELECT j.TQId, SUM( j.RealPriority )/COUNT(j.RealPriority), t.Priority \
 FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
     elif consolidationFunc == 'SUM':
-      selectSQL = "SELECT j.TQId, SUM( j.RealPriority ) FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
+      selectSQL = "SELECT j.TQId, SUM( j.RealPriority ), t.Priority FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
     else:
       return S_ERROR("Unknown consolidation func %s for setting priorities" % consolidationFunc)
     selectSQL += " AND ".join(tqCond)
@@ -1228,7 +1444,8 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
     if not result['OK']:
       return result
 
-    tqDict = dict(result['Value'])
+    tqDict = dict((row[0], row[1]) for row in result['Value'])
+    currentPrios = dict((row[0], row[2]) for row in result['Value'])
     if not tqDict:
       return S_OK()
     # Calculate Sum of priorities
@@ -1275,10 +1492,13 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
       for tqid in tqGroup:
         tqDict[tqid] = totalPrio
 
-    # Group by priorities
+    # Group by priorities, the TQs keeping their priority are not updated
     prioDict = {}
     for tqId in tqDict:
       prio = tqDict[tqId]
+      # Priority is a FLOAT column set with 4 decimals
+      if abs(prio - currentPrios[tqId]) <= max(0.0001, 1e-6 * prio):
+        continue
       if prio not in prioDict:
         prioDict[prio] = []
       prioDict[prio].append(tqId)
@@ -1287,7 +1507,10 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
     for prio in prioDict:
       tqList = ", ".join([str(tqId) for tqId in prioDict[prio]])
       updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % (prio, tqList)
-      self._update(updateSQL, conn=connObj)
+      result = self._update(updateSQL, conn=connObj)
+      if result['OK'] and self.__matchIndex is not None:
+        for tqId in prioDict[prio]:
+          self.__matchIndex.setPriority(tqId, prio)
     return S_OK()
 
   @staticmethod
@@ -176,8 +176,28 @@ class JobManagerHandler(RequestHandler):
       initialStatus = 'Received'
       initialMinorStatus = 'Job accepted'
 
-    for jobDescription in jobDescList:  # jobDescList because there might be a list generated by a parametric job
-      result = gJobDB.insertNewJobIntoDB(jobDescription,
+    if parametricJob:
+      # All the jobs generated by the parametric job are inserted at once
+      result = gJobDB.insertNewJobsIntoDB(jobDescList,
+                                          self.owner,
+                                          self.ownerDN,
+                                          self.ownerGroup,
+                                          self.diracSetup,
+                                          initialStatus=initialStatus,
+                                          initialMinorStatus=initialMinorStatus)
+      if not result['OK']:
+        return result
+
+      jobIDList = result['Value']
+      self.log.info('Jobs added to the JobDB', '%d jobs for %s/%s' % (len(jobIDList), self.ownerDN, self.ownerGroup))
+
+      jobsByStatus = {}
+      for jobID, jobStatus in result['JobStatus'].iteritems():
+        jobsByStatus.setdefault(jobStatus, []).append(jobID)
+      for (status, minorStatus), jobIDs in jobsByStatus.iteritems():
+        gJobLoggingDB.addLoggingRecordForJobs(sorted(jobIDs), status, minorStatus, source='JobManager')
+    else:
+      result = gJobDB.insertNewJobIntoDB(jobDescList[0],
                                          self.owner,
                                          self.ownerDN,
                                          self.ownerGroup,
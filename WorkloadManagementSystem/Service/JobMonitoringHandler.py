@@ -11,6 +11,7 @@ from datetime import timedelta
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.Utilities.ReplicaRouting import readOnly
 import DIRAC.Core.Utilities.Time as Time
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
@@ -75,6 +76,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getApplicationStates = []
+  cache_getApplicationStates = 30
 
   @staticmethod
   def export_getApplicationStates():
@@ -84,6 +86,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getJobTypes = []
+  cache_getJobTypes = 30
 
   @staticmethod
   def export_getJobTypes():
@@ -93,6 +96,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getOwners = []
+  cache_getOwners = 30
 
   @staticmethod
   def export_getOwners():
@@ -103,6 +107,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getProductionIds = []
+  cache_getProductionIds = 30
 
   @staticmethod
   def export_getProductionIds():
@@ -124,6 +129,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getSites = []
+  cache_getSites = 30
 
   @staticmethod
   def export_getSites():
@@ -134,6 +140,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getStates = []
+  cache_getStates = 30
 
   @staticmethod
   def export_getStates():
@@ -144,6 +151,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getMinorStates = []
+  cache_getMinorStates = 30
 
   @staticmethod
   def export_getMinorStates():
@@ -156,6 +164,7 @@ class JobMonitoringHandler(RequestHandler):
   types_getJobs = []
 
   @staticmethod
+  @readOnly
   def export_getJobs(attrDict=None, cutDate=None):
     """
     Return list of JobIds matching the condition given in attrDict
@@ -176,6 +185,7 @@ class JobMonitoringHandler(RequestHandler):
   types_getCounters = [list]
 
   @staticmethod
+  @readOnly
   def export_getCounters(attrList, attrDict=None, cutDate=''):
     """
     Retrieve list of distinct attributes values from attrList
@@ -210,6 +220,7 @@ class JobMonitoringHandler(RequestHandler):
   types_getCurrentJobCounters = []
 
   @staticmethod
+  @readOnly
   def export_getCurrentJobCounters(attrDict=None):
     """ Get job counters per Status with attrDict selection. Final statuses are given for
         the last day.
@@ -357,6 +368,7 @@ class JobMonitoringHandler(RequestHandler):
 ##############################################################################
   types_getJobPageSummaryWeb = [dict, list, int, int]
 
+  @readOnly
   def export_getJobPageSummaryWeb(self, selectDict, sortList, startItem, maxItems, selectJobs=True):
     """ Get the summary of the job information for a given page in the
         job monitor in a generic format
@@ -590,6 +602,7 @@ class JobMonitoringHandler(RequestHandler):
 
 ##############################################################################
   types_getSiteSummary = []
+  cache_getSiteSummary = 30
 
   @staticmethod
   def export_getSiteSummary():
@@ -230,6 +230,7 @@ class JobStateUpdateHandler(RequestHandler):
       result = jobDB.setStartExecTime(jobID, startDate)
 
     # Update the JobLoggingDB records
+    records = []
     for date in dates:
       sDict = statusDict[date]
       status = sDict['Status']
@@ -242,9 +243,10 @@ class JobStateUpdateHandler(RequestHandler):
       if not application:
         application = 'idem'
       source = sDict['Source']
-      result = logDB.addLoggingRecord(jobID, status, minor, application, date, source)
-      if not result['OK']:
-        return result
+      records.append((status, minor, application, date, source))
+    result = logDB.addLoggingRecords(jobID, records)
+    if not result['OK']:
+      return result
 
     return S_OK()
 
@@ -6,11 +6,13 @@
 
 __RCSID__ = "$Id$"
 
+import time
+
 from DIRAC import gLogger, S_OK, S_ERROR
 
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.Decorators import deprecated
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
@@ -49,16 +51,33 @@ def initializeMatcherHandler(serviceInfo):
                             'Matching', "matches", gMonitor.OP_RATE, 300)
   gMonitor.registerActivity('numTQs', "Number of Task Queues",
                             'Matching', "tqsk queues", gMonitor.OP_MEAN, 300)
+  gMonitor.registerActivity('sharesTime', "Task Queues shares recalculation time",
+                            'Matching', "secs", gMonitor.OP_MEAN, 300)
+
+  if getServiceOption(serviceInfo, 'MatchIndex', False):
+    result = gTaskQueueDB.enableMatchIndex(getServiceOption(serviceInfo, 'MatchIndexRefreshPeriod', 10))
+    if not result['OK']:
+      return result
 
-  gTaskQueueDB.recalculateTQSharesForAll()
-  gThreadScheduler.addPeriodicTask(120, gTaskQueueDB.recalculateTQSharesForAll)
+  recalculateTQShares()
+  gThreadScheduler.addPeriodicTask(120, recalculateTQShares)
   gThreadScheduler.addPeriodicTask(60, sendNumTaskQueues)
+  # The running jobs counters of the site limits are refreshed out of the match requests
+  gThreadScheduler.addPeriodicTask(10, Limiter(jobDB=gJobDB).refreshRunningCounters)
 
   sendNumTaskQueues()
 
   return S_OK()
 
 
+def recalculateTQShares():
+  startTime = time.time()
+  result = gTaskQueueDB.recalculateTQSharesForAll()
+  gMonitor.addMark('sharesTime', time.time() - startTime)
+  if not result['OK']:
+    gLogger.error("Cannot recalculate the task queues shares", result['Message'])
+
+
 def sendNumTaskQueues():
   result = gTaskQueueDB.getNumTaskQueues()
   if result['OK']:
@@ -103,6 +122,48 @@ class MatcherHandler(RequestHandler):
     # FIXME: This is correctly interpreted by the JobAgent, but DErrno should be used instead
     return S_ERROR("No match found")
 
+##############################################################################
+  types_requestJobs = [[dict, list], [int, long]]
+
+  def export_requestJobs(self, resourceDescriptions, numberOfJobs):
+    """ Serve several jobs in one call, e.g. to the slots of a multi-slot pilot
+
+        :param resourceDescriptions: resource description for which numberOfJobs jobs are requested,
+                                     or list of resource descriptions, one job being requested for each
+        :param int numberOfJobs: number of jobs requested for a single resource description
+
+        :return: S_OK(list of dicts as returned by requestJob), empty if no job matched
+    """
+    if isinstance(resourceDescriptions, dict):
+      resourceRequests = [(resourceDescriptions, numberOfJobs)]
+    else:
+      resourceRequests = [(resourceDescription, 1) for resourceDescription in resourceDescriptions]
+    maxJobs = getServiceOption(self.serviceInfoDict, 'MaxJobsPerRequest', 100)
+    if sum(number for _, number in resourceRequests) > maxJobs:
+      return S_ERROR("Too many jobs requested, at most %s per request" % maxJobs)
+    for resourceDescription, number in resourceRequests:
+      if not isinstance(resourceDescription, dict) or number < 1:
+        return S_ERROR("Invalid job request")
+      resourceDescription['Setup'] = self.serviceInfoDict['clientSetup']
+    credDict = self.getRemoteCredentials()
+
+    try:
+      opsHelper = Operations(group=credDict['group'])
+      matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
+                        jobDB=gJobDB,
+                        tqDB=gTaskQueueDB,
+                        jlDB=jlDB,
+                        opsHelper=opsHelper)
+      result = matcher.selectJobs(resourceRequests, credDict)
+    except RuntimeError as rte:
+      self.log.error("Error requesting jobs: ", rte)
+      return S_ERROR("Error requesting jobs")
+
+    gMonitor.addMark("matchesDone")
+    if result:
+      gMonitor.addMark("matchesOK", len(result))
+    return S_OK(result)
+
 ##############################################################################
   types_getActiveTaskQueues = []
 
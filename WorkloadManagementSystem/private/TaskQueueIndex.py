@@ -0,0 +1,270 @@
+""" In-memory index of the task queue definitions, to match the resources without querying the TaskQueueDB
+
+The task queues are indexed by Setup, owner and value of their multi-value fields (Sites, Platforms, Tags...),
+so that a match request only looks at the task queues that can match, as the SQL query generated by
+TaskQueueDB.__generateTQMatchSQL does. The string values are compared ignoring the case,
+like the DB columns.
+"""
+
+__RCSID__ = "$Id$"
+
+import random
+import string
+import threading
+
+from DIRAC import S_OK, S_ERROR
+
+
+def _toList(value):
+  if isinstance(value, (list, tuple)):
+    return list(value)
+  return [value]
+
+
+def _normalize(value):
+  return str(value).lower()
+
+
+def _isAny(values):
+  """ True if one of the values is "any", which means no condition
+  """
+  return any(''.join(c for c in value.lower() if c not in string.punctuation) == 'any'
+             for value in _toList(values))
+
+
+class TaskQueueIndex(object):
+  """ Task queue definitions, indexed for the matching
+  """
+
+  def __init__(self, multiValueMatchFields, bannedJobMatchFields=()):
+    """ c'tor
+
+        :param tuple multiValueMatchFields: match fields (Site, Tag...), whose values are
+                                            in the definition fields with an 's' (Sites, Tags...)
+        :param tuple bannedJobMatchFields: match fields whose values can be banned by the task queues (BannedSites)
+    """
+    self.__matchFields = tuple(multiValueMatchFields)
+    self.__bannedJobMatchFields = tuple(bannedJobMatchFields)
+    self.__lock = threading.RLock()
+    # tqId -> definition, with the normalized values
+    self.__taskQueues = {}
+    # value(s) -> set of tqIds
+    self.__bySetup = {}
+    self.__byDN = {}
+    self.__byGroup = {}
+    self.__byOwner = {}
+    # match field -> value -> set of tqIds having the value, and set of tqIds without value
+    self.__byValue = dict((field, {}) for field in self.__matchFields)
+    self.__withoutValue = dict((field, set()) for field in self.__matchFields)
+
+  def __len__(self):
+    return len(self.__taskQueues)
+
+  def getTaskQueueIds(self):
+    """ :return: set of the indexed task queue IDs
+    """
+    with self.__lock:
+      return set(self.__taskQueues)
+
+  @staticmethod
+  def __addTo(index, key, tqId):
+    index.setdefault(key, set()).add(tqId)
+
+  @staticmethod
+  def __removeFrom(index, key, tqId):
+    tqIds = index.get(key)
+    if tqIds is not None:
+      tqIds.discard(tqId)
+      if not tqIds:
+        del index[key]
+
+  def __indexKeys(self, tqDef):
+    """ Generate the (index, key) pairs a task queue is in
+    """
+    yield self.__bySetup, tqDef['Setup']
+    yield self.__byDN, tqDef['OwnerDN']
+    yield self.__byGroup, tqDef['OwnerGroup']
+    yield self.__byOwner, (tqDef['OwnerDN'], tqDef['OwnerGroup'])
+    for field in self.__matchFields:
+      for value in tqDef['Values'][field]:
+        yield self.__byValue[field], value
+
+  def addTaskQueue(self, tqId, tqDefDict):
+    """ Add or replace a task queue
+
+        :param int tqId: task queue ID
+        :param dict tqDefDict: definition as in the DB: OwnerDN, OwnerGroup, Setup, CPUTime, Priority
+                               and the lists of values of the multi-value fields (Sites, Tags...)
+    """
+    tqDef = {'OwnerDN': _normalize(tqDefDict['OwnerDN']),
+             'OwnerGroup': _normalize(tqDefDict['OwnerGroup']),
+             'Setup': _normalize(tqDefDict['Setup']),
+             'CPUTime': tqDefDict['CPUTime'],
+             'Priority': tqDefDict.get('Priority', 1),
+             'Owner': (tqDefDict['OwnerDN'], tqDefDict['OwnerGroup']),
+             'Values': {}}
+    defFields = self.__matchFields + tuple("Banned%s" % field for field in self.__bannedJobMatchFields)
+    for field in defFields:
+      tqDef['Values'][field] = frozenset(_normalize(value) for value in tqDefDict.get("%ss" % field, []))
+    with self.__lock:
+      self.removeTaskQueue(tqId)
+      self.__taskQueues[tqId] = tqDef
+      for index, key in self.__indexKeys(tqDef):
+        self.__addTo(index, key, tqId)
+      for field in self.__matchFields:
+        if not tqDef['Values'][field]:
+          self.__withoutValue[field].add(tqId)
+
+  def removeTaskQueue(self, tqId):
+    """ Remove a task queue, if indexed
+    """
+    with self.__lock:
+      tqDef = self.__taskQueues.pop(tqId, None)
+      if tqDef is None:
+        return
+      for index, key in self.__indexKeys(tqDef):
+        self.__removeFrom(index, key, tqId)
+      for field in self.__matchFields:
+        self.__withoutValue[field].discard(tqId)
+
+  def setPriority(self, tqId, priority):
+    """ Set the priority of a task queue, if indexed
+    """
+    with self.__lock:
+      if tqId in self.__taskQueues:
+        self.__taskQueues[tqId]['Priority'] = priority
+
+  @staticmethod
+  def __union(index, values):
+    tqIds = set()
+    for value in values:
+      tqIds.update(index.get(_normalize(value), ()))
+    return tqIds
+
+  def __getConditions(self, tqMatchDict, negativeCond, isJobSharing):
+    """ Get the conditions of a match request
+
+        :return: S_OK((list of candidate sets, list of checks of the task queue definitions)) / S_ERROR
+    """
+    candidateSets = []
+    checks = []
+
+    # Owner: only the group for the groups sharing their jobs
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      dns = _toList(tqMatchDict['OwnerDN'])
+      tqIds = set()
+      for group in _toList(tqMatchDict['OwnerGroup']):
+        if isJobSharing(group):
+          tqIds.update(self.__byGroup.get(_normalize(group), ()))
+        else:
+          for dn in dns:
+            tqIds.update(self.__byOwner.get((_normalize(dn), _normalize(group)), ()))
+      candidateSets.append(tqIds)
+    else:
+      if 'OwnerGroup' in tqMatchDict:
+        candidateSets.append(self.__union(self.__byGroup, _toList(tqMatchDict['OwnerGroup'])))
+      if 'OwnerDN' in tqMatchDict:
+        candidateSets.append(self.__union(self.__byDN, _toList(tqMatchDict['OwnerDN'])))
+    if 'Setup' in tqMatchDict:
+      candidateSets.append(self.__union(self.__bySetup, _toList(tqMatchDict['Setup'])))
+    if 'CPUTime' in tqMatchDict:
+      maxCPUTime = max(_toList(tqMatchDict['CPUTime']) or [0])
+      checks.append(lambda tqDef: tqDef['CPUTime'] <= maxCPUTime)
+
+    # No Tag nor RequiredTag: only the task queues without tags
+    tags = tqMatchDict.get('Tag', [])
+    if 'Tag' not in tqMatchDict and 'RequiredTag' in tqMatchDict:
+      tags = None
+
+    for field in self.__matchFields:
+      if field == 'Tag':
+        if tags is None or _isAny(tags):
+          continue
+        # All the tags of the task queue have to be provided by the resource
+        values = frozenset(_normalize(value) for value in _toList(tags))
+        checks.append(lambda tqDef, values=values: tqDef['Values']['Tag'] <= values)
+      else:
+        values = tqMatchDict.get(field)
+        if not values or _isAny(values):
+          continue
+        values = frozenset(_normalize(value) for value in _toList(values))
+        if field in self.__bannedJobMatchFields:
+          bannedField = "Banned%s" % field
+          checks.append(lambda tqDef, values=values, bannedField=bannedField:
+                        not values <= tqDef['Values'][bannedField])
+      # The task queues without values for the field or with one of the values of the resource
+      candidateSets.append(self.__withoutValue[field] | self.__union(self.__byValue[field], values))
+
+    requiredTags = _toList(tqMatchDict.get('RequiredTag', []))
+    if requiredTags and not _isAny(requiredTags):
+      if not set(requiredTags) <= set(_toList(tags or [])):
+        return S_ERROR('Wrong conditions')
+      requiredTags = frozenset(_normalize(value) for value in requiredTags)
+      checks.append(lambda tqDef: requiredTags <= tqDef['Values']['Tag'])
+
+    # Resource banning the task queues having one of its values
+    for field in self.__matchFields:
+      bannedValues = tqMatchDict.get("Banned%s" % field)
+      if not bannedValues or _isAny(bannedValues):
+        continue
+      bannedValues = frozenset(_normalize(value) for value in _toList(bannedValues))
+      checks.append(lambda tqDef, field=field, bannedValues=bannedValues:
+                    not bannedValues <= tqDef['Values'][field])
+
+    if negativeCond:
+      if isinstance(negativeCond, dict):
+        negativeCond = [negativeCond]
+      elif not isinstance(negativeCond, (list, tuple)):
+        return S_ERROR("negativeCond has to be either a list or a dict or a tuple, and it's %s" % type(negativeCond))
+      checks.append(lambda tqDef: any(self.__notMatching(tqDef, condDict) for condDict in negativeCond))
+
+    return S_OK((candidateSets, checks))
+
+  def __notMatching(self, tqDef, condDict):
+    """ not ( cond1 and cond2 ) = ( not cond1 or not cond2 ), as TaskQueueDB.__generateNotDictSQL
+    """
+    for field, values in condDict.iteritems():
+      values = [_normalize(value) for value in _toList(values)]
+      if field in self.__matchFields:
+        if all(value not in tqDef['Values'][field] for value in values):
+          return True
+      elif field in ('OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime'):
+        if field == 'CPUTime':
+          tqValue = str(tqDef['CPUTime'])
+        else:
+          tqValue = tqDef[field]
+        if any(value != tqValue for value in values):
+          return True
+    return False
+
+  def match(self, tqMatchDict, numQueuesToGet=1, negativeCond=None, isJobSharing=None):
+    """ Get the task queues matching a resource, as TaskQueueDB.matchAndGetTaskQueue
+
+        :param dict tqMatchDict: resource description, with the values not escaped
+        :param int numQueuesToGet: maximum number of task queues returned, all if 0
+        :param negativeCond: dict or list of dicts of conditions the task queues must not fulfill
+        :param isJobSharing: function telling if a group shares its jobs (JOB_SHARING property)
+
+        :return: S_OK(list of (tqId, ownerDN, ownerGroup)), ordered randomly weighted by the priorities
+    """
+    if isJobSharing is None:
+      isJobSharing = lambda group: False
+    with self.__lock:
+      result = self.__getConditions(tqMatchDict, negativeCond, isJobSharing)
+      if not result['OK']:
+        return result
+      candidateSets, checks = result['Value']
+      if candidateSets:
+        candidateSets.sort(key=len)
+        candidates = candidateSets[0].intersection(*candidateSets[1:])
+      else:
+        candidates = self.__taskQueues
+      matches = []
+      for tqId in candidates:
+        tqDef = self.__taskQueues[tqId]
+        if all(check(tqDef) for check in checks):
+          matches.append((random.random() / max(tqDef['Priority'], 1e-9), tqId, tqDef['Owner']))
+    matches.sort()
+    if numQueuesToGet:
+      matches = matches[:numQueuesToGet]
+    return S_OK([(tqId, ownerDN, ownerGroup) for _, tqId, (ownerDN, ownerGroup) in matches])
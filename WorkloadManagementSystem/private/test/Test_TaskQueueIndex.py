@@ -0,0 +1,93 @@
+""" Unit tests for the in-memory index of the task queues
+"""
+
+import pytest
+
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+__RCSID__ = "$Id$"
+
+multiValueMatchFields = ('GridCE', 'Site', 'GridMiddleware', 'Platform',
+                         'PilotType', 'SubmitPool', 'JobType', 'Tag')
+
+
+def tqDef(**kwargs):
+  """ Task queue definition, with default single values """
+  tqDefDict = {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup', 'Setup': 'aSetup', 'CPUTime': 86400, 'Priority': 1.}
+  tqDefDict.update(kwargs)
+  return tqDefDict
+
+
+@pytest.fixture
+def index():
+  """ Index of some task queues """
+  tqIndex = TaskQueueIndex(multiValueMatchFields, ('Site', ))
+  tqIndex.addTaskQueue(1, tqDef())
+  tqIndex.addTaskQueue(2, tqDef(Sites=['LCG.CERN.ch', 'LCG.PIC.es'], CPUTime=3600))
+  tqIndex.addTaskQueue(3, tqDef(BannedSites=['LCG.CERN.ch'], Platforms=['x86_64-slc6']))
+  tqIndex.addTaskQueue(4, tqDef(Tags=['MultiProcessor', 'GPU'], OwnerDN='/other/DN'))
+  tqIndex.addTaskQueue(5, tqDef(OwnerGroup='otherGroup', JobTypes=['User']))
+  return tqIndex
+
+
+def matchedTQs(index, matchDict, **kwargs):
+  """ Sorted IDs of the matched task queues """
+  resourceDict = {'Setup': 'aSetup', 'CPUTime': 100000}
+  resourceDict.update(matchDict)
+  result = index.match(resourceDict, numQueuesToGet=0, **kwargs)
+  assert result['OK']
+  return sorted(tqId for tqId, _ownerDN, _ownerGroup in result['Value'])
+
+
+@pytest.mark.parametrize("matchDict, expected", [
+    ({}, [1, 2, 3, 5]),
+    ({'Setup': 'otherSetup'}, []),
+    ({'CPUTime': 5000}, [2]),
+    ({'Site': 'LCG.CERN.ch'}, [1, 2, 5]),
+    ({'Site': ['lcg.cern.ch', 'LCG.IN2P3.fr']}, [1, 2, 3, 5]),
+    ({'Site': 'ANY'}, [1, 2, 3, 5]),
+    ({'Platform': 'x86_64-slc7'}, [1, 2, 5]),
+    ({'Tag': ['GPU', 'MultiProcessor', 'WholeNode']}, [1, 2, 3, 4, 5]),
+    ({'Tag': 'GPU'}, [1, 2, 3, 5]),
+    ({'Tag': ['GPU'], 'RequiredTag': 'GPU'}, []),
+    ({'Tag': ['GPU', 'MultiProcessor'], 'RequiredTag': ['GPU']}, [4]),
+    ({'RequiredTag': ['GPU']}, None),
+    ({'BannedSite': 'LCG.PIC.es'}, [1, 3, 5]),
+    ({'BannedJobType': 'User'}, [1, 2, 3]),
+    ({'OwnerGroup': 'myGroup'}, [1, 2, 3]),
+    ({'OwnerDN': '/other/DN', 'OwnerGroup': ['myGroup', 'otherGroup']}, []),
+])
+def test_match(index, matchDict, expected):
+  """ The conditions are those of the SQL match """
+  if expected is None:
+    resourceDict = {'Setup': 'aSetup', 'CPUTime': 100000}
+    resourceDict.update(matchDict)
+    assert not index.match(resourceDict)['OK']
+  else:
+    assert matchedTQs(index, matchDict) == expected
+
+
+def test_jobSharing(index):
+  """ The groups sharing their jobs match the task queues of all their members """
+  matchDict = {'OwnerDN': '/other/DN', 'OwnerGroup': ['myGroup', 'otherGroup']}
+  assert matchedTQs(index, matchDict, isJobSharing=lambda group: group == 'otherGroup') == [5]
+
+
+def test_negativeCond(index):
+  """ The task queues fulfilling the negative conditions are not matched """
+  assert matchedTQs(index, {}, negativeCond={'Site': 'LCG.CERN.ch'}) == [1, 3, 5]
+  assert matchedTQs(index, {}, negativeCond=[{'Site': 'LCG.CERN.ch', 'OwnerGroup': 'myGroup'}]) == [1, 3, 5]
+
+
+def test_updates(index):
+  """ The task queues can be removed and reprioritized """
+  index.removeTaskQueue(2)
+  index.removeTaskQueue(42)
+  assert matchedTQs(index, {'Site': 'LCG.CERN.ch'}) == [1, 5]
+  assert len(index) == 4
+  assert index.getTaskQueueIds() == set([1, 3, 4, 5])
+
+  index.setPriority(5, 1e9)
+  result = index.match({'Setup': 'aSetup', 'CPUTime': 100000}, numQueuesToGet=1)
+  assert [tqId for tqId, _ownerDN, _ownerGroup in result['Value']] == [5]
+  assert result['Value'][0][1:] == ('/my/DN', 'otherGroup')
@@ -90,6 +90,82 @@ try:
   assert RESULT['OK']
   assert len( RESULT['Value'] ) == 10
 
+  RESULT = TESTDB.getFields( NAME, ['Count', 'Name'], orderAttribute = 'Count', columns = True )
+  assert RESULT['OK']
+  assert RESULT['Value'] == [ range( 100 ), ['Name1'] * 100 ]
+
+  RESULT = TESTDB._queryIter( 'SELECT Count FROM %s ORDER BY Count' % NAME, batchSize = 30 )
+  assert RESULT['OK']
+  BATCHES = list( RESULT['Value'] )
+  assert [ len( batch ) for batch in BATCHES ] == [ 30, 30, 30, 10 ]
+  assert BATCHES[-1][-1] == ( 99, )
+
+  # Abandoned iteration
+  RESULT = TESTDB._queryIter( 'SELECT Count FROM %s' % NAME, batchSize = 30, columns = True )
+  assert RESULT['OK']
+  assert len( next( RESULT['Value'] )[0] ) == 30
+  RESULT['Value'].close()
+
+  RESULT = TESTDB._queryColumns( 'SELECT Count FROM %s WHERE Count < 0' % NAME )
+  assert RESULT['OK']
+  assert RESULT['Value'] == []
+
+  RESULT = TESTDB.insertMany( NAME, ['Name', 'Count'], [ [ "Many'%d" % J, 1000 + J ] for J in range( 50 ) ],
+                              sqlValues = { 'Time': 'UTC_TIMESTAMP()' } )
+  assert RESULT['OK']
+  assert RESULT['Value'] == 50
+  if 'lastRowIds' in RESULT:
+    assert RESULT['lastRowIds'] == range( 101, 151 )
+
+  RESULT = TESTDB.upsertMany( NAME, ['ID', 'Surname'], [ [ 101, 'Upserted' ], [ 1000, 'New' ] ] )
+  assert RESULT['OK']
+  assert RESULT['Value'] == 3
+
+  RESULT = TESTDB.getFields( NAME, ['Name', 'Surname'], { 'ID': [101, 1000] }, orderAttribute = 'ID' )
+  assert RESULT['OK']
+  assert RESULT['Value'] == ( ( "Many'0", 'Upserted' ), ( 'Yo', 'New' ) )
+
+  # Connections shared by the threads, at most 2 of them
+  BOUNDEDDB = MySQL( HOST, USER, PWD, DB, maxConnections = 2, waitTimeout = 1 )
+  RESULT = BOUNDEDDB.getFields( NAME, ['ID'], { 'ID': 101 } )
+  assert RESULT['OK']
+  assert RESULT['Value'] == ( ( 101, ), )
+  STATS = BOUNDEDDB.getConnectionPoolStats()['Value']
+  assert ( STATS['inUse'], STATS['idle'], STATS['maxConnections'] ) == ( 0, 1, 2 )
+
+  # The streaming queries have connections of their own, the thread streaming does not wait for them:
+  # beyond the 2 extra connections, the rows of its queries are read at once
+  ITERATORS = [ BOUNDEDDB._queryIter( 'SELECT ID FROM %s' % NAME, batchSize = 10 )['Value'] for J in range( 5 ) ]
+  STATS = BOUNDEDDB.getConnectionPoolStats()['Value']
+  assert ( STATS['inUse'], STATS['dedicated'], STATS['maxExtraConnections'] ) == ( 4, 4, 2 )
+  assert len( next( ITERATORS[-1] ) ) == 10
+  RESULT = BOUNDEDDB.getFields( NAME, ['ID'], { 'ID': 101 } )
+  assert RESULT['OK']
+  for ITERATOR in ITERATORS:
+    ITERATOR.close()
+  STATS = BOUNDEDDB.getConnectionPoolStats( reset = True )['Value']
+  assert ( STATS['inUse'], STATS['timeouts'], STATS['waits'] ) == ( 0, 0, 0 )
+
+  # The connection given by _getConnection is used by the queries of the thread until it is released
+  CONNECTION = BOUNDEDDB._getConnection()['Value']
+  assert BOUNDEDDB._query( 'SELECT 1' )['OK']
+  assert BOUNDEDDB.getConnectionPoolStats()['Value']['inUse'] == 1
+  del CONNECTION
+  assert BOUNDEDDB.getConnectionPoolStats()['Value']['inUse'] == 0
+
+  # The queries differing by their values are accounted together
+  RESULT = BOUNDEDDB.getQueryStats( sortBy = 'count' )
+  assert RESULT['OK']
+  QUERYSTATS = dict( ( STATS['fingerprint'], STATS ) for STATS in RESULT['Value'] )
+  assert QUERYSTATS['SELECT ?']['count'] == 1
+  STATS = [ STATS for FINGERPRINT, STATS in QUERYSTATS.items() if FINGERPRINT.startswith( 'SELECT `ID` FROM' ) ]
+  assert len( STATS ) == 1
+  assert ( STATS[0]['count'], STATS[0]['rows'] ) == ( 2, 2 )
+
+  RESULT = TESTDB.deleteEntries( NAME, { 'ID': range( 101, 151 ) + [1000] } )
+  assert RESULT['OK']
+  assert RESULT['Value'] == 51
+
   RESULT = TESTDB.getFields( NAME, limit = 1 )
   assert RESULT['OK']
   assert len( RESULT['Value'] ) == 1
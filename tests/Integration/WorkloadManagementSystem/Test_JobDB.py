@@ -102,3 +102,32 @@ def test_getCounters():
 
   res = jobDB.getCounters('Jobs', ['Status', 'MinorStatus'], {}, '2007-04-22 00:00:00')
   assert res['OK'] is True
+
+
+def test_insertNewJobsIntoDB():
+
+  jdlList = [jdl.replace('helloWorld"', 'helloWorld_%d"' % i).replace('InputData = ""',
+                                                                    'InputData = "/a/lfn/%d"' % i)
+             for i in range(3)]
+  res = jobDB.insertNewJobsIntoDB(jdlList, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup',
+                                  initialStatus='Submitting', initialMinorStatus='Bulk transaction confirmation')
+  assert res['OK'] is True
+  jobIDList = res['Value']
+  assert len(jobIDList) == 3
+  jobStatus = res['JobStatus']
+
+  for i, jobID in enumerate(jobIDList):
+    assert jobStatus[jobID] == ('Submitting', 'Bulk transaction confirmation')
+    res = jobDB.getJobAttributes(jobID, ['Status', 'JobName', 'Site'])
+    assert res['OK'] is True
+    assert res['Value'] == {'Status': 'Submitting', 'JobName': 'helloWorld_%d' % i, 'Site': 'ANY'}
+    res = jobDB.getJobJDL(jobID)
+    assert res['OK'] is True
+    assert 'helloWorld_%d' % i in res['Value']
+    res = jobDB.getInputData(jobID)
+    assert res['OK'] is True
+    assert res['Value'] == ['/a/lfn/%d' % i]
+
+  for jobID in jobIDList:
+    res = jobDB.removeJobFromDB(jobID)
+    assert res['OK'] is True
@@ -49,6 +49,10 @@ class JobLoggingCase(JobLoggingDBTestCase):
                                           minor='No date 2',
                                           source='Unittest')
     self.assertTrue(result['OK'])
+    result = self.jlogDB.addLoggingRecords(1, [("testing", 'Bulk 1', 'idem', '', 'Unittest'),
+                                               ("testing", "Bulk '2'", 'idem', date, 'Unittest')])
+    self.assertTrue(result['OK'])
+    self.assertEqual(result['Value'], 2)
     result = self.jlogDB.getJobLoggingInfo(1)
     self.assertTrue(result['OK'])
 
@@ -985,3 +985,74 @@ def test_TQ():
 
   result = tqDB.deleteTaskQueueIfEmpty(tq)
   assert result['OK'] is True
+
+
+def test_matchIndex():
+  """ the in-memory match index gives the matches of the SQL query
+  """
+  indexedDB = TaskQueueDB()
+  result = indexedDB.enableMatchIndex(refreshPeriod=0)
+  assert result['OK'] is True
+
+  tqDefDict = {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup', 'Setup': 'aSetup', 'CPUTime': 5000,
+               'Sites': ['LCG.CERN.ch'], 'Tags': ['MultiProcessor']}
+  result = tqDB.insertJob(131, tqDefDict, 10)
+  assert result['OK'] is True
+  tqDefDict = {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup', 'Setup': 'aSetup', 'CPUTime': 5000,
+               'BannedSites': ['LCG.CERN.ch']}
+  result = tqDB.insertJob(132, tqDefDict, 10)
+  assert result['OK'] is True
+  result = tqDB.getTaskQueueForJobs([131, 132])
+  tq_job1, tq_job2 = result['Value'][131], result['Value'][132]
+
+  for matchDict, expected in [({}, {tq_job2}),
+                              ({'Site': 'LCG.CERN.ch', 'Tag': ['MultiProcessor']}, {tq_job1}),
+                              ({'Site': 'LCG.PIC.es', 'Tag': ['MultiProcessor']}, {tq_job2}),
+                              ({'RequiredTag': 'MultiProcessor', 'Tag': 'MultiProcessor'}, {tq_job1})]:
+    matchDict.update({'Setup': 'aSetup', 'CPUTime': 50000})
+    for db in (tqDB, indexedDB):
+      result = db.matchAndGetTaskQueue(matchDict, numQueuesToGet=4)
+      assert result['OK'] is True
+      assert set([int(x[0]) for x in result['Value']]) == expected
+
+  for jobId, tqId in [(131, tq_job1), (132, tq_job2)]:
+    result = tqDB.deleteJob(jobId)
+    assert result['OK'] is True
+    result = tqDB.deleteTaskQueueIfEmpty(tqId)
+    assert result['OK'] is True
+  result = indexedDB.matchAndGetTaskQueue({'Setup': 'aSetup', 'CPUTime': 50000}, numQueuesToGet=4)
+  assert result['OK'] is True
+  assert result['Value'] == []
+
+
+def test_matchAndGetJobs():
+  """ several jobs are taken out from the task queues in one go
+  """
+  tqDefDict = {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup', 'Setup': 'aSetup', 'CPUTime': 5000}
+  for jobId in (141, 142, 143):
+    result = tqDB.insertJob(jobId, tqDefDict, 10)
+    assert result['OK'] is True
+
+  result = tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 50000}, 2)
+  assert result['OK'] is True
+  jobs = [jobId for jobId, _tqId in result['Value']['jobs']]
+  assert len(jobs) == 2
+  result = tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 50000}, 2)
+  assert result['OK'] is True
+  jobs += [jobId for jobId, _tqId in result['Value']['jobs']]
+  assert sorted(jobs) == [141, 142, 143]
+  result = tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 50000}, 2)
+  assert result['OK'] is True
+  assert result['Value']['jobs'] == []
+
+
+def test_sharesStats():
+  """ the time spent on the shares recalculations is accounted
+  """
+  result = tqDB.recalculateTQSharesForAll()
+  assert result['OK'] is True
+  result = tqDB.getSharesStats(reset=True)
+  assert result['OK'] is True
+  assert result['Value']['All']['Recalculations'] >= 1
+  assert result['Value']['All']['MaxTime'] <= result['Value']['All']['TotalTime']
+  assert tqDB.getSharesStats()['Value']['All']['Recalculations'] == 0
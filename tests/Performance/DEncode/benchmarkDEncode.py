@@ -0,0 +1,95 @@
+""" Micro benchmark of the DEncode codec
+
+It measures the encoding and decoding throughput on payloads shaped like the
+biggest DISET replies:
+
+  * lfnReplicas: dict of dicts, as returned by the FileCatalog getReplicas
+  * jobIDs: long list of job IDs
+  * jobAttributes: dict of dicts of strings and datetimes, as returned by getJobAttributes
+  * nestedDatetimes: lists of tuples containing datetimes
+
+The decoding is measured both with the single pass decoder used by DEncode.decode
+and with the per type functions of g_dDecodeFunctions, for comparison.
+
+Usage:
+
+  python benchmarkDEncode.py [repetitions]
+
+"""
+from __future__ import print_function
+
+import datetime
+import sys
+import timeit
+
+from DIRAC.Core.Utilities.DEncode import encode, decode, g_dDecodeFunctions
+
+
+def lfnReplicas(nbFiles=20000):
+  """ S_OK like structure of a getReplicas reply """
+  successful = {}
+  for fileNb in xrange(nbFiles):
+    lfn = '/lhcb/MC/2018/ALLSTREAMS.DST/00071234/0000/00071234_%08d_7.AllStreams.dst' % fileNb
+    successful[lfn] = dict(('SE-%d' % seNb, 'root://eos.example.org:1094//eos%s' % lfn)
+                           for seNb in xrange(3))
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': {}}}
+
+
+def jobIDs(nbJobs=200000):
+  """ Long list of job IDs """
+  return {'OK': True, 'Value': range(10000000, 10000000 + nbJobs)}
+
+
+def jobAttributes(nbJobs=10000):
+  """ S_OK like structure of a getJobsAttributes reply """
+  now = datetime.datetime.utcnow().replace(microsecond=0)
+  attributes = {}
+  for jobID in xrange(nbJobs):
+    attributes[jobID] = {'JobID': str(jobID),
+                         'Status': 'Running',
+                         'MinorStatus': 'Application',
+                         'Site': 'LCG.CERN.cern',
+                         'Owner': 'someuser',
+                         'SubmissionTime': now,
+                         'LastUpdateTime': now,
+                         'RescheduleCounter': 0}
+  return {'OK': True, 'Value': attributes}
+
+
+def nestedDatetimes(nbRecords=50000):
+  """ Accounting like records with nested datetimes """
+  now = datetime.datetime.utcnow()
+  return {'OK': True, 'Value': [(now, (now.date(), now.time()), [nb, nb * 1.5, None, True])
+                                for nb in xrange(nbRecords)]}
+
+
+PAYLOADS = (lfnReplicas, jobIDs, jobAttributes, nestedDatetimes)
+
+
+def perTypeDecode(data):
+  """ Decode through the per type functions """
+  return g_dDecodeFunctions[data[0]](data, 0)
+
+
+def bench(func, arg, repetitions):
+  """ Returns the best time of func(arg) over the repetitions """
+  return min(timeit.repeat(lambda: func(arg), number=1, repeat=repetitions))
+
+
+def main(repetitions=3):
+  """ Run all the payloads and print the throughput """
+  print("%-16s %10s %12s %12s %14s" % ('Payload', 'Size (MB)', 'Enc (MB/s)', 'Dec (MB/s)', 'PerType (MB/s)'))
+  for payloadFunc in PAYLOADS:
+    payload = payloadFunc()
+    encoded = encode(payload)
+    assert decode(encoded) == perTypeDecode(encoded)
+    sizeMB = len(encoded) / 1024. / 1024.
+    encTime = bench(encode, payload, repetitions)
+    decTime = bench(decode, encoded, repetitions)
+    perTypeTime = bench(perTypeDecode, encoded, repetitions)
+    print("%-16s %10.2f %12.1f %12.1f %14.1f" % (payloadFunc.__name__, sizeMB,
+                                                   sizeMB / encTime, sizeMB / decTime, sizeMB / perTypeTime))
+
+
+if __name__ == '__main__':
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+""" This script measures the speed of the replica lookup of the FileCatalogDB (getReplicas),
+    directly against the DB, without service. It compares, on the same random LFNs,
+    the former lookup (file IDs, then replicas of the file IDs) with the bulk lookup
+    (one joined query per chunk of directories), and prints the LFNs per second of both.
+    It assumes that the DB has been filled with the scripts in generateDB
+
+    Tunable parameters:
+      * managers: FileCatalog managers matching the DB schema
+      * nbQueries: number of getReplicas calls per measurement
+      * nbDirs: number of production directories per call
+      * filesPerDir: number of files per directory per call
+      * allStatus: consider all the replica statuses or only the visible ones
+
+The depths and number of files are to be put in relation with the config used to generate the db
+"""
+
+from __future__ import print_function
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+import random
+import time
+
+from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
+
+from generateDB import config
+
+managers = {'UserGroupManager': 'UserAndGroupManagerDB',
+            'SEManager': 'SEManagerDB',
+            'SecurityManager': 'NoSecurityManager',
+            'DirectoryManager': 'DirectoryClosure',
+            'FileManager': 'FileManagerPs',
+            'DirectoryMetadata': 'DirectoryMetadata',
+            'FileMetadata': 'FileMetadata',
+            'DatasetManager': 'DatasetManager'}
+
+nbQueries = 50
+nbDirs = 10
+filesPerDir = 100
+allStatus = False
+
+databaseConfig = {'UniqueGUID': False,
+                  'GlobalReadAccess': True,
+                  'LFNPFNConvention': 'Strong',
+                  'ResolvePFN': True,
+                  'DefaultUmask': 0o775,
+                  'ValidFileStatus': config.status,
+                  'ValidReplicaStatus': config.status,
+                  'VisibleFileStatus': ['AprioriGood'],
+                  'VisibleReplicaStatus': ['AprioriGood'],
+                  'DirectoryCacheSize': 100000,
+                  'DirectoryCacheInvalidation': False}
+databaseConfig.update(managers)
+
+
+def randomLFNs():
+  """ LFNs of random production files, as generated in generateDB """
+  lfns = []
+  for _ in xrange(nbDirs):
+    dirPath = '/' + '/'.join(str(random.randrange(size)) for size in config.hierarchySize[:config.prodFileDepth])
+    for fileNb in random.sample(xrange(config.prodFilesPerDir), filesPerDir):
+      lfns.append('%s/%s.txt' % (dirPath, fileNb))
+  return lfns
+
+
+def formerGetReplicas(fm, lfns):
+  """ Replica lookup as done before the bulk lookup """
+  res = fm._findFileIDs(lfns)
+  if not res['OK']:
+    return res
+  fileIDLFNs = dict((fileID, lfn) for lfn, fileID in res['Value']['Successful'].iteritems())
+  if not fileIDLFNs:
+    return res
+  return fm._getFileReplicas(fileIDLFNs.keys(), fields_input=[], allStatus=allStatus)
+
+
+def bulkGetReplicas(fm, lfns):
+  """ Bulk replica lookup """
+  return fm.getReplicas(lfns, allStatus)
+
+
+def measure(method, fm, queries):
+  """ :return: LFNs per second """
+  nbLFNs = 0
+  start = time.time()
+  for lfns in queries:
+    res = method(fm, lfns)
+    if not res['OK']:
+      print("%s failed: %s" % (method.__name__, res['Message']))
+      return 0.
+    nbLFNs += len(lfns)
+  return nbLFNs / (time.time() - start)
+
+
+db = FileCatalogDB()
+res = db.setConfig(databaseConfig)
+if not res['OK']:
+  print("Failed to configure the FileCatalogDB: %s" % res['Message'])
+  raise SystemExit(1)
+
+queries = [randomLFNs() for _ in xrange(nbQueries)]
+# Warm up the directory cache and the DB buffers, so that both lookups are measured in the same conditions
+measure(bulkGetReplicas, db.fileManager, queries)
+
+formerSpeed = measure(formerGetReplicas, db.fileManager, queries)
+bulkSpeed = measure(bulkGetReplicas, db.fileManager, queries)
+print("%s, %d calls of %d LFNs" % (managers['FileManager'], nbQueries, nbDirs * filesPerDir))
+print("Former lookup: %.1f LFNs/s" % formerSpeed)
+print("Bulk lookup  : %.1f LFNs/s" % bulkSpeed)
+if formerSpeed:
+  print("Speedup      : %.2f" % (bulkSpeed / formerSpeed))